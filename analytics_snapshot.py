@@ -0,0 +1,242 @@
+"""
+Columnar Analytics Snapshots for Picly
+Periodically copies analytics tables out of sqlite into compressed NumPy
+column files (.npz), and runs dashboard aggregates as vectorized scans over
+those files instead of GROUP BY queries on the live tables the request path
+writes to.
+
+Text columns are dictionary-encoded (int32 codes + a values array); timestamps
+become float seconds; NULL is NaN (or code -1). Snapshots are written to a
+temporary file and renamed into place, so readers never see a partial file.
+Tables are read in rowid order a chunk per query, so the export never holds
+a read lock across the whole table, and a lock file in the snapshot directory
+keeps the other workers from exporting at the same time.
+
+NumPy is optional: without it no snapshots are written and dashboards read
+the live tables as before.
+
+Usage:
+    python analytics_snapshot.py export [analytics.db]
+"""
+
+import calendar
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from file_lock import FileLock
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+
+SNAPSHOT_DIRNAME = 'analytics_snapshots'
+
+# Dashboards fall back to live queries when the newest snapshot is older than this
+SNAPSHOT_MAX_AGE_SECONDS = 3600
+
+# table -> [(column, kind)]; kinds: int, float, bool, time, category
+SNAPSHOT_COLUMNS = {
+    'generation_ratings': [
+        ('user_id', 'int'),
+        ('engine', 'category'),
+        ('model_version', 'category'),
+        ('rating', 'float'),
+        ('quality_score', 'float'),
+        ('downloaded', 'bool'),
+        ('shared', 'bool'),
+        ('regenerated', 'bool'),
+        ('time_to_rate', 'float'),
+        ('created_at', 'time'),
+        ('rated_at', 'time'),
+    ],
+}
+
+# Rows read per query while exporting
+FETCH_ROWS = 10000
+
+EXPORT_LOCK_NAME = '.export.lock'
+
+
+def to_seconds(value):
+    """sqlite timestamp text (or datetime/date) -> seconds, compared the way the text sorts"""
+    if value is None:
+        return float('nan')
+    if isinstance(value, str):
+        value = datetime.strptime(value[:19], '%Y-%m-%d %H:%M:%S' if len(value) > 10 else '%Y-%m-%d')
+    return float(calendar.timegm(value.timetuple()))
+
+
+def snapshot_dir_for(db_path):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), SNAPSHOT_DIRNAME)
+
+
+def _column_array(kind, values):
+    if kind == 'int':
+        return np.array([-1 if v is None else v for v in values], dtype=np.int64)
+    if kind == 'bool':
+        return np.array([1 if v else 0 for v in values], dtype=np.int8)
+    if kind == 'float':
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    if kind == 'time':
+        return np.array([to_seconds(v) for v in values], dtype=np.float64)
+    raise ValueError(f'Unknown column kind {kind}')
+
+
+def export_table(db_path, table, snapshot_dir=None):
+    """Write one table's snapshot; returns the number of rows exported"""
+    columns = SNAPSHOT_COLUMNS[table]
+    snapshot_dir = snapshot_dir or snapshot_dir_for(db_path)
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    raw = {name: [] for name, _ in columns}
+    query = f"""
+        SELECT rowid, {', '.join(name for name, _ in columns)} FROM {table}
+        WHERE rowid > ? ORDER BY rowid LIMIT ?
+    """
+    conn = sqlite3.connect(db_path)
+    last_rowid = 0
+    while True:
+        # Each chunk is its own statement, so writers only wait for one chunk
+        rows = conn.execute(query, (last_rowid, FETCH_ROWS)).fetchall()
+        if not rows:
+            break
+        last_rowid = rows[-1][0]
+        for (name, _), values in zip(columns, list(zip(*rows))[1:]):
+            raw[name].extend(values)
+        if len(rows) < FETCH_ROWS:
+            break
+    conn.close()
+
+    arrays = {'_exported_at': np.array(time.time())}
+    for name, kind in columns:
+        if kind == 'category':
+            values = sorted({v for v in raw[name] if v is not None})
+            index = {v: i for i, v in enumerate(values)}
+            arrays[f'{name}__codes'] = np.array([index.get(v, -1) for v in raw[name]], dtype=np.int32)
+            arrays[f'{name}__values'] = np.array(values, dtype=str)
+        else:
+            arrays[name] = _column_array(kind, raw[name])
+
+    path = os.path.join(snapshot_dir, f'{table}.npz')
+    temp_path = f'{path}.{os.getpid()}.tmp.npz'
+    np.savez_compressed(temp_path, **arrays)
+    os.replace(temp_path, path)
+    return len(raw[columns[0][0]])
+
+
+def export_snapshots(db_path='analytics.db', snapshot_dir=None):
+    """Snapshot every configured table; returns rows exported per table, or None if another process is exporting"""
+    snapshot_dir = snapshot_dir or snapshot_dir_for(db_path)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    lock = FileLock(os.path.join(snapshot_dir, EXPORT_LOCK_NAME))
+    if not lock.acquire():
+        return None
+    try:
+        return {table: export_table(db_path, table, snapshot_dir) for table in SNAPSHOT_COLUMNS}
+    finally:
+        lock.release()
+
+
+class Snapshot:
+    """Read-only columns of one exported table"""
+
+    def __init__(self, path):
+        with np.load(path) as data:
+            self.arrays = {name: data[name] for name in data.files}
+        self.exported_at = float(self.arrays.pop('_exported_at'))
+        first = next(iter(self.arrays.values()), None)
+        self.rows = len(first) if first is not None else 0
+
+    @property
+    def age_seconds(self):
+        return time.time() - self.exported_at
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def codes(self, name):
+        return self.arrays[f'{name}__codes']
+
+    def categories(self, name):
+        return self.arrays[f'{name}__values']
+
+    def group_by(self, name, mask):
+        """Yield (category value, row mask) for each value present under mask"""
+        codes = self.codes(name)
+        counts = np.bincount(codes[mask & (codes >= 0)], minlength=len(self.categories(name)))
+        for code in np.nonzero(counts)[0]:
+            yield str(self.categories(name)[code]), mask & (codes == code)
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def load_snapshot(table, snapshot_dir):
+    """Newest snapshot of a table (cached until the file changes), or None"""
+    if not NUMPY_AVAILABLE:
+        return None
+    path = os.path.join(snapshot_dir, f'{table}.npz')
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    snapshot = Snapshot(path)
+    with _cache_lock:
+        _cache[path] = (mtime, snapshot)
+    return snapshot
+
+
+def _mean(values):
+    values = values[~np.isnan(values)]
+    return float(values.mean()) if len(values) else None
+
+
+def dashboard_aggregates(snapshot, start_date):
+    """
+    get_analytics_dashboard's overall and per-engine rows, from a snapshot
+
+    Returns tuples shaped like the live SQL rows:
+        overall: (generations, avg_rating, avg_quality, downloads, shares, active_users)
+        engines: [(engine, generations, avg_rating, download_rate), ...] best rated first
+    """
+    recent = snapshot['created_at'] >= to_seconds(start_date)
+    overall = (
+        int(recent.sum()),
+        _mean(snapshot['rating'][recent]),
+        _mean(snapshot['quality_score'][recent]),
+        int(snapshot['downloaded'][recent].sum()),
+        int(snapshot['shared'][recent].sum()),
+        len(np.unique(snapshot['user_id'][recent]))
+    )
+
+    engines = []
+    rated = recent & ~np.isnan(snapshot['rating'])
+    for engine, rows in snapshot.group_by('engine', rated):
+        count = int(rows.sum())
+        engines.append((engine, count, _mean(snapshot['rating'][rows]),
+                        float(snapshot['downloaded'][rows].sum()) * 100.0 / count))
+    engines.sort(key=lambda row: row[2], reverse=True)
+    return overall, engines
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'export':
+        if not NUMPY_AVAILABLE:
+            sys.exit("numpy is not installed - pip install numpy")
+        exported = export_snapshots(sys.argv[2] if len(sys.argv) > 2 else 'analytics.db')
+        print(exported if exported is not None else "Another process is exporting - skipped")
+    else:
+        print("Usage: python analytics_snapshot.py export [analytics.db]")
@@ -9,244 +9,57 @@ from datetime import datetime, timedelta
 from collections import defaultdict
 import hashlib
 import os
+from migrations import migrate
+from services import lazy
+from batch_writer import BatchWriter
+from prompt_index import PromptIndex
+from analytics_snapshot import load_snapshot, dashboard_aggregates, snapshot_dir_for, SNAPSHOT_MAX_AGE_SECONDS
+
+# Events accepted per behavior batch; the rest are ignored
+MAX_BEHAVIOR_EVENTS = 500
+
+# generation_ratings action flag -> prompt_analytics counter
+ACTION_COUNTERS = {
+    'downloaded': 'download_count',
+    'shared': 'share_count',
+    'regenerated': 'regeneration_count',
+}
+
+
+def prompt_features(prompt_text, engine):
+    """Features of a prompt for the rating-prediction training set"""
+    return {
+        'prompt_length': len(prompt_text),
+        'word_count': len(prompt_text.split()),
+        'has_style_keywords': any(word in prompt_text.lower() for word in 
+            ['realistic', 'artistic', 'cinematic', 'detailed', 'vibrant']),
+        'has_quality_keywords': any(word in prompt_text.lower() for word in 
+            ['4k', '8k', 'hd', 'high quality', 'professional']),
+        'engine': engine,
+        'punctuation_count': sum(1 for char in prompt_text if char in '.,!?;:')
+    }
+
 
 class AnalyticsSystem:
-    def __init__(self, db_path='analytics.db'):
+    def __init__(self, db_path='analytics.db', snapshot_dir=None):
         self.db_path = db_path
+        self.snapshot_dir = snapshot_dir or snapshot_dir_for(db_path)
         self.init_database()
-    
-    def init_database(self):
-        """Create comprehensive analytics tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Generation Ratings Table - Core learning data
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS generation_ratings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                generation_id TEXT UNIQUE NOT NULL,
-                user_id INTEGER NOT NULL,
-                prompt TEXT NOT NULL,
-                prompt_hash TEXT NOT NULL,
-                engine TEXT NOT NULL,
-                model_version TEXT,
-                rating INTEGER CHECK(rating >= 1 AND rating <= 5),
-                quality_score REAL,
-                feedback_text TEXT,
-                feedback_tags TEXT,
-                used_in_project BOOLEAN DEFAULT 0,
-                downloaded BOOLEAN DEFAULT 0,
-                shared BOOLEAN DEFAULT 0,
-                regenerated BOOLEAN DEFAULT 0,
-                edited BOOLEAN DEFAULT 0,
-                time_to_rate INTEGER,
-                session_id TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                rated_at TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Prompt Analytics - Learn what works
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS prompt_analytics (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                prompt_hash TEXT NOT NULL,
-                prompt_text TEXT NOT NULL,
-                engine TEXT NOT NULL,
-                total_generations INTEGER DEFAULT 1,
-                avg_rating REAL,
-                total_ratings INTEGER DEFAULT 0,
-                five_star_count INTEGER DEFAULT 0,
-                four_star_count INTEGER DEFAULT 0,
-                three_star_count INTEGER DEFAULT 0,
-                two_star_count INTEGER DEFAULT 0,
-                one_star_count INTEGER DEFAULT 0,
-                avg_quality_score REAL,
-                success_rate REAL,
-                download_rate REAL,
-                share_rate REAL,
-                regeneration_rate REAL,
-                avg_time_to_rate INTEGER,
-                last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(prompt_hash, engine)
-            )
-        ''')
-        
-        # User Behavior Analytics
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_behavior (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                session_id TEXT NOT NULL,
-                action_type TEXT NOT NULL,
-                action_details TEXT,
-                page_url TEXT,
-                device_type TEXT,
-                browser TEXT,
-                screen_resolution TEXT,
-                interaction_time INTEGER,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # A/B Test Experiments
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ab_experiments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                experiment_name TEXT UNIQUE NOT NULL,
-                description TEXT,
-                variant_a TEXT NOT NULL,
-                variant_b TEXT NOT NULL,
-                metric_to_track TEXT NOT NULL,
-                status TEXT DEFAULT 'active',
-                start_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                end_date TIMESTAMP,
-                winner TEXT,
-                confidence_level REAL
-            )
-        ''')
-        
-        # A/B Test Assignments
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ab_assignments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                experiment_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                variant TEXT NOT NULL,
-                assigned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (experiment_id) REFERENCES ab_experiments (id),
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                UNIQUE(experiment_id, user_id)
-            )
-        ''')
-        
-        # A/B Test Results
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ab_results (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                experiment_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                variant TEXT NOT NULL,
-                metric_value REAL NOT NULL,
-                conversion BOOLEAN DEFAULT 0,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (experiment_id) REFERENCES ab_experiments (id),
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Feature Usage Analytics
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS feature_usage (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                feature_name TEXT NOT NULL,
-                user_id INTEGER,
-                usage_count INTEGER DEFAULT 1,
-                success_count INTEGER DEFAULT 0,
-                error_count INTEGER DEFAULT 0,
-                avg_duration REAL,
-                last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                metadata TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
         
-        # Conversion Funnel Analytics
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS conversion_funnel (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                session_id TEXT NOT NULL,
-                funnel_stage TEXT NOT NULL,
-                stage_order INTEGER NOT NULL,
-                time_spent INTEGER,
-                completed BOOLEAN DEFAULT 0,
-                dropped_off BOOLEAN DEFAULT 0,
-                conversion_value REAL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Model Performance Tracking
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS model_performance (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                engine TEXT NOT NULL,
-                model_version TEXT NOT NULL,
-                date DATE NOT NULL,
-                total_requests INTEGER DEFAULT 0,
-                successful_requests INTEGER DEFAULT 0,
-                failed_requests INTEGER DEFAULT 0,
-                avg_response_time REAL,
-                avg_rating REAL,
-                avg_quality_score REAL,
-                total_cost REAL DEFAULT 0,
-                total_revenue REAL DEFAULT 0,
-                profit_margin REAL,
-                UNIQUE(engine, model_version, date)
-            )
-        ''')
-        
-        # Engagement Metrics
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS engagement_metrics (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                date DATE NOT NULL,
-                session_count INTEGER DEFAULT 0,
-                total_time_spent INTEGER DEFAULT 0,
-                generations_created INTEGER DEFAULT 0,
-                features_explored INTEGER DEFAULT 0,
-                social_shares INTEGER DEFAULT 0,
-                feedback_given INTEGER DEFAULT 0,
-                help_accessed INTEGER DEFAULT 0,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                UNIQUE(user_id, date)
-            )
-        ''')
-        
-        # Cohort Analysis
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_cohorts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                cohort_date DATE NOT NULL,
-                acquisition_source TEXT,
-                user_segment TEXT,
-                initial_plan TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                UNIQUE(user_id)
-            )
-        ''')
-        
-        # Machine Learning Training Data
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ml_training_data (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                data_type TEXT NOT NULL,
-                features TEXT NOT NULL,
-                label REAL NOT NULL,
-                weight REAL DEFAULT 1.0,
-                validation_set BOOLEAN DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        # Ratings are written, aggregated and feature-extracted off the request thread
+        self.rating_writer = BatchWriter(self._flush_ratings, name='rating-aggregator', caller_flushes=False)
+        self.unknown_ratings = 0  # Ratings dropped because the generation was never recorded
         
-        # Create indexes for performance
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_generation_user ON generation_ratings(user_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_generation_prompt ON generation_ratings(prompt_hash)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_generation_rating ON generation_ratings(rating)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_prompt_hash ON prompt_analytics(prompt_hash)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_behavior ON user_behavior(user_id, timestamp)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_feature_usage ON feature_usage(feature_name, user_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_model_perf ON model_performance(engine, date)')
+        # Typeahead suggestions, updated from each rating batch
+        self.prompt_index = PromptIndex(db_path)
         
-        conn.commit()
-        conn.close()
+        # Behavior events (the highest-volume write) are appended in bulk
+        self.behavior_writer = BatchWriter(self._flush_behavior, name='behavior-writer', caller_flushes=False,
+                                           max_events=500, max_delay=1.0)
+    
+    def init_database(self):
+        """Create or upgrade analytics tables (no-op once current)"""
+        migrate(self.db_path, 'analytics')
     
     def hash_prompt(self, prompt_text):
         """Create hash of prompt for tracking similar prompts"""
@@ -286,85 +99,91 @@ class AnalyticsSystem:
     
     def submit_rating(self, generation_id, rating, quality_score=None, feedback_text=None, 
                      feedback_tags=None, time_to_rate=None):
-        """Submit user rating for a generation"""
+        """Submit user rating for a generation (buffered; prompt aggregates update in batches)"""
+        if rating not in (1, 2, 3, 4, 5):
+            return {'success': False, 'error': 'Rating must be 1-5'}
+        
+        # Unique-index lookup only; the write itself is still batched
         conn = sqlite3.connect(self.db_path)
+        known = conn.execute('SELECT 1 FROM generation_ratings WHERE generation_id = ?', (generation_id,)).fetchone()
+        conn.close()
+        if not known:
+            return {'success': False, 'error': 'Generation not found'}
+        
+        self.rating_writer.add((generation_id, rating, quality_score, feedback_text, feedback_tags, time_to_rate))
+        return {'success': True, 'message': 'Rating submitted successfully'}
+    
+    def flush_ratings(self):
+        """Apply buffered ratings now; returns how many were written"""
+        return self.rating_writer.flush()
+    
+    def _flush_ratings(self, ratings):
+        """Store a batch of ratings, fold them into prompt_analytics and queue ML features"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
         cursor = conn.cursor()
         
         try:
-            # Get generation details
-            cursor.execute('''
-                SELECT prompt_hash, engine FROM generation_ratings WHERE generation_id = ?
-            ''', (generation_id,))
-            result = cursor.fetchone()
+            # Star histogram per prompt: one prompt_analytics update per prompt, not per rating
+            histograms = defaultdict(lambda: [0, 0, 0, 0, 0])
+            training_rows = []
             
-            if not result:
-                return {'success': False, 'error': 'Generation not found'}
-            
-            prompt_hash, engine = result
-            
-            # Update generation rating
-            cursor.execute('''
-                UPDATE generation_ratings 
-                SET rating = ?, quality_score = ?, feedback_text = ?, 
-                    feedback_tags = ?, time_to_rate = ?, rated_at = CURRENT_TIMESTAMP
-                WHERE generation_id = ?
-            ''', (rating, quality_score, feedback_text, feedback_tags, time_to_rate, generation_id))
-            
-            # Update prompt analytics
-            rating_field = f"{['one', 'two', 'three', 'four', 'five'][rating-1]}_star_count"
-            cursor.execute(f'''
-                UPDATE prompt_analytics 
-                SET total_ratings = total_ratings + 1,
-                    {rating_field} = {rating_field} + 1,
-                    avg_rating = (
-                        (one_star_count * 1.0 + two_star_count * 2.0 + 
-                         three_star_count * 3.0 + four_star_count * 4.0 + 
-                         five_star_count * 5.0) / 
-                        CAST(total_ratings AS REAL)
-                    )
-                WHERE prompt_hash = ? AND engine = ?
-            ''', (prompt_hash, engine))
+            for generation_id, rating, quality_score, feedback_text, feedback_tags, time_to_rate in ratings:
+                cursor.execute('''
+                    UPDATE generation_ratings 
+                    SET rating = ?, quality_score = ?, feedback_text = ?, 
+                        feedback_tags = ?, time_to_rate = ?, rated_at = CURRENT_TIMESTAMP
+                    WHERE generation_id = ?
+                    RETURNING prompt_hash, engine, prompt
+                ''', (rating, quality_score, feedback_text, feedback_tags, time_to_rate, generation_id))
+                result = cursor.fetchone()
+                
+                if not result:
+                    self.unknown_ratings += 1
+                    continue
+                
+                prompt_hash, engine, prompt_text = result
+                histograms[(prompt_hash, engine)][rating - 1] += 1
+                training_rows.append((json.dumps(prompt_features(prompt_text, engine)), float(rating)))
             
-            # Calculate success rate (4-5 stars = success)
-            if rating >= 4:
+            # Averages and success rate (4-5 stars) come from the updated star counts
+            updated = []
+            for (prompt_hash, engine), stars in histograms.items():
                 cursor.execute('''
                     UPDATE prompt_analytics 
-                    SET success_rate = CAST((four_star_count + five_star_count) AS REAL) / total_ratings
-                    WHERE prompt_hash = ? AND engine = ?
-                ''', (prompt_hash, engine))
-            
-            # Prepare ML training data
-            cursor.execute('''
-                SELECT prompt_text FROM prompt_analytics WHERE prompt_hash = ? AND engine = ?
-            ''', (prompt_hash, engine))
-            prompt_text = cursor.fetchone()[0]
+                    SET total_ratings = total_ratings + :count,
+                        one_star_count = one_star_count + :one,
+                        two_star_count = two_star_count + :two,
+                        three_star_count = three_star_count + :three,
+                        four_star_count = four_star_count + :four,
+                        five_star_count = five_star_count + :five,
+                        avg_rating = (
+                            (one_star_count + :one) * 1.0 + (two_star_count + :two) * 2.0 + 
+                            (three_star_count + :three) * 3.0 + (four_star_count + :four) * 4.0 + 
+                            (five_star_count + :five) * 5.0
+                        ) / CAST(total_ratings + :count AS REAL),
+                        success_rate = CAST(four_star_count + :four + five_star_count + :five AS REAL) / 
+                                       (total_ratings + :count)
+                    WHERE prompt_hash = :prompt_hash AND engine = :engine
+                    RETURNING prompt_hash, engine, prompt_text, avg_rating, success_rate, total_ratings
+                ''', {
+                    'prompt_hash': prompt_hash, 'engine': engine, 'count': sum(stars),
+                    'one': stars[0], 'two': stars[1], 'three': stars[2], 'four': stars[3], 'five': stars[4]
+                })
+                updated.extend(cursor.fetchall())
             
-            # Extract features for ML
-            features = {
-                'prompt_length': len(prompt_text),
-                'word_count': len(prompt_text.split()),
-                'has_style_keywords': any(word in prompt_text.lower() for word in 
-                    ['realistic', 'artistic', 'cinematic', 'detailed', 'vibrant']),
-                'has_quality_keywords': any(word in prompt_text.lower() for word in 
-                    ['4k', '8k', 'hd', 'high quality', 'professional']),
-                'engine': engine,
-                'punctuation_count': sum(1 for char in prompt_text if char in '.,!?;:')
-            }
-            
-            cursor.execute('''
+            cursor.executemany('''
                 INSERT INTO ml_training_data (data_type, features, label)
                 VALUES ('rating_prediction', ?, ?)
-            ''', (json.dumps(features), float(rating)))
+            ''', training_rows)
             
             conn.commit()
-            return {'success': True, 'message': 'Rating submitted successfully'}
-            
-        except Exception as e:
+        except Exception:
             conn.rollback()
-            print(f"Error submitting rating: {e}")
-            return {'success': False, 'error': str(e)}
+            raise
         finally:
             conn.close()
+        
+        self.prompt_index.apply(updated)
     
     def update_generation_action(self, generation_id, action_type):
         """Track user actions on generations (download, share, edit, etc.)"""
@@ -382,29 +201,21 @@ class AnalyticsSystem:
             
             field = field_map.get(action_type)
             if field:
+                # Only the first action of a kind on a generation counts towards its prompt
                 cursor.execute(f'''
-                    UPDATE generation_ratings SET {field} = 1 WHERE generation_id = ?
-                ''', (generation_id,))
-                
-                # Update prompt analytics rates
-                cursor.execute('''
-                    SELECT prompt_hash, engine FROM generation_ratings WHERE generation_id = ?
+                    UPDATE generation_ratings SET {field} = 1 WHERE generation_id = ? AND NOT COALESCE({field}, 0)
+                    RETURNING prompt_hash, engine
                 ''', (generation_id,))
                 result = cursor.fetchone()
                 
-                if result:
+                # Per-prompt counters; rates are derived from total_generations when read
+                counter = ACTION_COUNTERS.get(field)
+                if result and counter:
                     prompt_hash, engine = result
-                    rate_field = f"{action_type}_rate"
-                    if rate_field in ['download_rate', 'share_rate', 'regeneration_rate']:
-                        cursor.execute(f'''
-                            UPDATE prompt_analytics 
-                            SET {rate_field} = (
-                                SELECT CAST(SUM(CASE WHEN {field} = 1 THEN 1 ELSE 0 END) AS REAL) / COUNT(*)
-                                FROM generation_ratings 
-                                WHERE prompt_hash = ? AND engine = ?
-                            )
-                            WHERE prompt_hash = ? AND engine = ?
-                        ''', (prompt_hash, engine, prompt_hash, engine))
+                    cursor.execute(f'''
+                        UPDATE prompt_analytics SET {counter} = {counter} + 1
+                        WHERE prompt_hash = ? AND engine = ?
+                    ''', (prompt_hash, engine))
                 
                 conn.commit()
                 return True
@@ -417,39 +228,68 @@ class AnalyticsSystem:
     
     def track_user_behavior(self, user_id, session_id, action_type, action_details=None,
                            page_url=None, device_info=None, interaction_time=None):
-        """Track granular user behavior for UX improvements"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        """Track granular user behavior for UX improvements (buffered, written in batches)"""
+        return self.track_behavior_batch(user_id, session_id, [{
+            'action': action_type,
+            'details': action_details,
+            'page': page_url,
+            'time': interaction_time
+        }], device_info=device_info) == 1
+    
+    def track_behavior_batch(self, user_id, session_id, events, page_url=None, device_info=None):
+        """
+        Buffer a batch of behavior events from one session
+        
+        events: [{'action', 'details', 'page', 'time'}]; page_url and device_info
+        apply to every event that does not carry its own page
+        
+        Returns:
+            Number of events accepted (events without an action are skipped)
+        """
+        device_info = device_info if isinstance(device_info, dict) else {}
+        received_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')  # Same format as CURRENT_TIMESTAMP
+        accepted = 0
+        
+        for event in events[:MAX_BEHAVIOR_EVENTS]:
+            if not isinstance(event, dict) or not event.get('action'):
+                continue
+            details = event.get('details')
+            self.behavior_writer.add((
+                user_id, session_id, str(event['action'])[:100], json.dumps(details) if details else None,
+                event.get('page') or page_url, device_info.get('type'), device_info.get('browser'),
+                device_info.get('screen'), event.get('time'), received_at
+            ))
+            accepted += 1
+        
+        return accepted
+    
+    def flush_behavior(self):
+        """Write buffered behavior events now; returns how many were written"""
+        return self.behavior_writer.flush()
+    
+    def _flush_behavior(self, rows):
+        conn = sqlite3.connect(self.db_path, timeout=30)
         try:
-            cursor.execute('''
+            conn.executemany('''
                 INSERT INTO user_behavior 
                 (user_id, session_id, action_type, action_details, page_url, 
-                 device_type, browser, screen_resolution, interaction_time)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (user_id, session_id, action_type, json.dumps(action_details) if action_details else None,
-                  page_url, device_info.get('type') if device_info else None,
-                  device_info.get('browser') if device_info else None,
-                  device_info.get('screen') if device_info else None,
-                  interaction_time))
-            
+                 device_type, browser, screen_resolution, interaction_time, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
             conn.commit()
-            return True
-        except Exception as e:
-            conn.rollback()
-            print(f"Error tracking behavior: {e}")
-            return False
         finally:
             conn.close()
     
     def get_top_prompts(self, engine=None, min_ratings=5, limit=100):
         """Get highest rated prompts for learning and suggestions"""
+        self.flush_ratings()
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         query = '''
-            SELECT prompt_text, engine, avg_rating, total_ratings, 
-                   success_rate, download_rate, share_rate
+            SELECT prompt_text, engine, avg_rating, total_ratings, success_rate,
+                   CAST(download_count AS REAL) / total_generations,
+                   CAST(share_count AS REAL) / total_generations
             FROM prompt_analytics
             WHERE total_ratings >= ?
         '''
@@ -477,26 +317,8 @@ class AnalyticsSystem:
         } for row in results]
     
     def get_prompt_suggestions(self, partial_prompt, engine, limit=5):
-        """Get AI-powered prompt suggestions based on successful prompts"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT prompt_text, avg_rating, success_rate
-            FROM prompt_analytics
-            WHERE engine = ? AND total_ratings >= 3 AND avg_rating >= 4.0
-            ORDER BY success_rate DESC, avg_rating DESC
-            LIMIT ?
-        ''', (engine, limit))
-        
-        results = cursor.fetchall()
-        conn.close()
-        
-        return [{
-            'prompt': row[0],
-            'avg_rating': row[1],
-            'success_rate': row[2]
-        } for row in results]
+        """Typeahead suggestions: rated prompts matching partial_prompt, best first (from memory)"""
+        return self.prompt_index.suggest(engine, partial_prompt, limit)
     
     def track_model_performance(self, engine, model_version, success, response_time, cost, revenue):
         """Track model performance metrics"""
@@ -533,38 +355,45 @@ class AnalyticsSystem:
     
     def get_analytics_dashboard(self, days=30):
         """Get comprehensive analytics for dashboard"""
+        self.flush_ratings()
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         start_date = (datetime.now() - timedelta(days=days)).date()
         
-        # Overall stats
-        cursor.execute('''
-            SELECT 
-                COUNT(*) as total_generations,
-                AVG(rating) as avg_rating,
-                AVG(quality_score) as avg_quality,
-                SUM(downloaded) as total_downloads,
-                SUM(shared) as total_shares,
-                COUNT(DISTINCT user_id) as active_users
-            FROM generation_ratings
-            WHERE created_at >= ?
-        ''', (start_date,))
-        overall = cursor.fetchone()
-        
-        # Engine performance
-        cursor.execute('''
-            SELECT 
-                engine,
-                COUNT(*) as generations,
-                AVG(rating) as avg_rating,
-                SUM(downloaded) * 100.0 / COUNT(*) as download_rate
-            FROM generation_ratings
-            WHERE created_at >= ? AND rating IS NOT NULL
-            GROUP BY engine
-            ORDER BY avg_rating DESC
-        ''', (start_date,))
-        engines = cursor.fetchall()
+        # Rating aggregates come from the columnar snapshot when a recent one exists
+        snapshot = load_snapshot('generation_ratings', self.snapshot_dir)
+        snapshot_used = snapshot is not None and snapshot.age_seconds < SNAPSHOT_MAX_AGE_SECONDS
+        if snapshot_used:
+            overall, engines = dashboard_aggregates(snapshot, start_date)
+        else:
+            # Overall stats
+            cursor.execute('''
+                SELECT 
+                    COUNT(*) as total_generations,
+                    AVG(rating) as avg_rating,
+                    AVG(quality_score) as avg_quality,
+                    SUM(downloaded) as total_downloads,
+                    SUM(shared) as total_shares,
+                    COUNT(DISTINCT user_id) as active_users
+                FROM generation_ratings
+                WHERE created_at >= ?
+            ''', (start_date,))
+            overall = cursor.fetchone()
+            
+            # Engine performance
+            cursor.execute('''
+                SELECT 
+                    engine,
+                    COUNT(*) as generations,
+                    AVG(rating) as avg_rating,
+                    SUM(downloaded) * 100.0 / COUNT(*) as download_rate
+                FROM generation_ratings
+                WHERE created_at >= ? AND rating IS NOT NULL
+                GROUP BY engine
+                ORDER BY avg_rating DESC
+            ''', (start_date,))
+            engines = cursor.fetchall()
         
         # Top prompts
         cursor.execute('''
@@ -598,8 +427,12 @@ class AnalyticsSystem:
                 'rating': round(p[1], 2),
                 'ratings': p[2],
                 'success_rate': round(p[3] * 100, 1) if p[3] else 0
-            } for p in top_prompts]
+            } for p in top_prompts],
+            'source': {
+                'ratings': 'snapshot' if snapshot_used else 'live',
+                'snapshot_age_seconds': round(snapshot.age_seconds) if snapshot_used else None
+            }
         }
 
 # Initialize global analytics system
-analytics_system = AnalyticsSystem()
+analytics_system = lazy('analytics_system', AnalyticsSystem)
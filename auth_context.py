@@ -0,0 +1,118 @@
+"""
+Request Auth Context for Picly
+Resolves the caller's session, credits and priority tier at most once per
+request and memoizes them on flask.g, so routes and the helpers they call
+share one validation and one balance read
+"""
+
+import os
+import threading
+from functools import wraps
+
+from flask import g, request, jsonify
+
+from job_scheduler import priority_class_for
+
+
+# Accounts allowed on /api/admin/* routes (comma separated usernames)
+ADMIN_USERNAMES = frozenset(name.strip() for name in os.getenv('ADMIN_USERNAMES', '').split(',') if name.strip())
+
+_user_db = None
+
+_counters = {'validations': 0, 'credit_lookups': 0, 'rejected': 0}
+_counters_lock = threading.Lock()
+
+
+def init_auth(user_db):
+    """Set the user database the context resolves against"""
+    global _user_db
+    _user_db = user_db
+
+
+def _count(name):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def request_token():
+    """Authorization: Bearer token for API access, else the web app's session cookie"""
+    # An explicit header wins, so a stale cookie in the same browser can't act as another account
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        return auth_header.replace('Bearer ', '', 1) or None
+    return request.cookies.get('session_token') or None
+
+
+def current_user():
+    """Validated session for this request ({'valid', 'user_id', 'username'}), or None"""
+    if 'auth_user' not in g:
+        g.session_token = request_token()
+        g.auth_user = None
+        g.auth_error = 'Must be logged in'
+        if g.session_token:
+            _count('validations')
+            validation = _user_db.validate_session(g.session_token)
+            if validation.get('valid'):
+                g.auth_user = validation
+            else:
+                g.auth_error = validation.get('error', 'Invalid session')
+    return g.auth_user
+
+
+def current_user_id(default=None):
+    user = current_user()
+    return user['user_id'] if user else default
+
+
+def current_token():
+    current_user()
+    return g.session_token
+
+
+def current_credits(refresh=False):
+    """get_user_credits() for the caller (None when anonymous); refresh after spending"""
+    if current_user() is None:
+        return None
+    if refresh or 'auth_credits' not in g:
+        _count('credit_lookups')
+        g.auth_credits = _user_db.get_user_credits(g.auth_user['user_id'])
+    return g.auth_credits
+
+
+def current_tier():
+    """Scheduler priority class for the caller"""
+    return priority_class_for(current_credits()) if current_user() else 'anonymous'
+
+
+def require_auth(f):
+    """Decorator: 401 unless the request carries a valid session"""
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if current_user() is None:
+            _count('rejected')
+            if g.session_token:
+                return jsonify({'success': False, 'error': 'Invalid session'}), 401
+            return jsonify({'success': False, 'error': 'Must be logged in', 'require_login': True}), 401
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+def require_admin(f):
+    """Decorator: 401 unless logged in, 403 unless the account is in ADMIN_USERNAMES"""
+
+    @require_auth
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if current_user()['username'] not in ADMIN_USERNAMES:
+            _count('rejected')
+            return jsonify({'success': False, 'error': 'Admin access required'}), 403
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+def auth_stats():
+    with _counters_lock:
+        return dict(_counters)
@@ -12,6 +12,8 @@ import threading
 import time
 from collections import defaultdict
 import re
+from migrations import migrate
+from services import lazy
 
 class AutonomousLearner:
     def __init__(self, db_path='learning.db'):
@@ -34,173 +36,8 @@ class AutonomousLearner:
         self.max_daily_harvests = 10000  # Rate limit
     
     def init_database(self):
-        """Create tables for continuous learning"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Harvested prompts from open-source
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS harvested_prompts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                prompt_text TEXT NOT NULL,
-                prompt_hash TEXT UNIQUE NOT NULL,
-                source TEXT NOT NULL,
-                source_url TEXT,
-                quality_indicators TEXT,
-                upvotes INTEGER DEFAULT 0,
-                engagement_score REAL DEFAULT 0,
-                image_url TEXT,
-                metadata TEXT,
-                learned_patterns TEXT,
-                harvested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Pattern library - learned structures
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS prompt_patterns (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                pattern_type TEXT NOT NULL,
-                pattern_template TEXT NOT NULL,
-                category TEXT,
-                effectiveness_score REAL DEFAULT 0,
-                usage_count INTEGER DEFAULT 0,
-                success_rate REAL DEFAULT 0,
-                example_prompts TEXT,
-                keywords TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Quality indicators - what makes prompts work
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS quality_indicators (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                indicator_type TEXT NOT NULL,
-                indicator_value TEXT NOT NULL,
-                category TEXT,
-                correlation_score REAL DEFAULT 0,
-                occurrence_count INTEGER DEFAULT 0,
-                avg_quality_when_present REAL DEFAULT 0,
-                avg_quality_when_absent REAL DEFAULT 0,
-                statistical_significance REAL DEFAULT 0
-            )
-        ''')
-        
-        # Style library - successful artistic directions
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS style_library (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                style_name TEXT UNIQUE NOT NULL,
-                style_keywords TEXT NOT NULL,
-                style_modifiers TEXT,
-                best_engines TEXT,
-                avg_quality REAL DEFAULT 0,
-                sample_count INTEGER DEFAULT 0,
-                example_images TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Negative prompt library
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS negative_patterns (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                negative_prompt TEXT NOT NULL,
-                category TEXT,
-                effectiveness_score REAL DEFAULT 0,
-                usage_count INTEGER DEFAULT 0,
-                improves_quality_by REAL DEFAULT 0
-            )
-        ''')
-        
-        # Knowledge graph - relationships between concepts
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS concept_relationships (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                concept_a TEXT NOT NULL,
-                concept_b TEXT NOT NULL,
-                relationship_type TEXT NOT NULL,
-                strength REAL DEFAULT 0,
-                co_occurrence_count INTEGER DEFAULT 0,
-                avg_quality REAL DEFAULT 0,
-                UNIQUE(concept_a, concept_b, relationship_type)
-            )
-        ''')
-        
-        # Trending patterns - what's working now
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS trending_patterns (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                pattern_text TEXT NOT NULL,
-                trend_score REAL DEFAULT 0,
-                velocity REAL DEFAULT 0,
-                peak_date DATE,
-                category TEXT,
-                source_count INTEGER DEFAULT 0,
-                first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Learning sessions log
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS learning_sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_type TEXT NOT NULL,
-                items_processed INTEGER DEFAULT 0,
-                patterns_discovered INTEGER DEFAULT 0,
-                quality_improvement REAL DEFAULT 0,
-                duration_seconds INTEGER DEFAULT 0,
-                status TEXT DEFAULT 'completed',
-                error_message TEXT,
-                started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                completed_at TIMESTAMP
-            )
-        ''')
-        
-        # Initialize common patterns
-        self.init_base_patterns(cursor)
-        
-        conn.commit()
-        conn.close()
-    
-    def init_base_patterns(self, cursor):
-        """Initialize foundational prompt patterns"""
-        base_patterns = [
-            {
-                'type': 'quality_modifiers',
-                'template': '{subject}, {quality_terms}',
-                'category': 'enhancement',
-                'keywords': json.dumps(['highly detailed', '4k', '8k', 'professional', 'masterpiece'])
-            },
-            {
-                'type': 'lighting',
-                'template': '{subject}, {lighting_type}',
-                'category': 'lighting',
-                'keywords': json.dumps(['golden hour', 'studio lighting', 'dramatic lighting', 'soft light'])
-            },
-            {
-                'type': 'style',
-                'template': '{subject}, in the style of {artist/style}',
-                'category': 'artistic',
-                'keywords': json.dumps(['cinematic', 'photorealistic', 'oil painting', 'digital art'])
-            },
-            {
-                'type': 'composition',
-                'template': '{subject}, {composition_type}',
-                'category': 'composition',
-                'keywords': json.dumps(['rule of thirds', 'centered', 'wide angle', 'close-up'])
-            }
-        ]
-        
-        for pattern in base_patterns:
-            cursor.execute('''
-                INSERT OR IGNORE INTO prompt_patterns 
-                (pattern_type, pattern_template, category, keywords)
-                VALUES (?, ?, ?, ?)
-            ''', (pattern['type'], pattern['template'], pattern['category'], pattern['keywords']))
+        """Create or upgrade continuous learning tables (no-op once current)"""
+        migrate(self.db_path, 'learning')
     
     def start_autonomous_learning(self):
         """Start background learning thread"""
@@ -730,4 +567,4 @@ class AutonomousLearner:
         return count
 
 # Initialize global learner
-autonomous_learner = AutonomousLearner()
+autonomous_learner = lazy('autonomous_learner', AutonomousLearner)
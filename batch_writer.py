@@ -0,0 +1,166 @@
+"""
+Batched Writer
+Buffers small writes in memory and hands them to a flush function in
+batches, so N events cost one transaction (and one fsync) instead of N.
+A batch is flushed when it reaches max_events, when its oldest event is
+max_delay seconds old, on demand, and at interpreter shutdown.
+"""
+
+import atexit
+import threading
+import time
+
+
+# Defaults: flush every 50 events or 250 ms, whichever comes first
+MAX_EVENTS = 50
+MAX_DELAY_SECONDS = 0.25
+
+# Events kept for retry after failed flushes before the oldest are dropped
+MAX_BUFFERED = 5000
+
+
+class BatchWriter:
+    def __init__(self, flush_fn, after_flush=None, max_events=MAX_EVENTS,
+                 max_delay=MAX_DELAY_SECONDS, max_buffered=MAX_BUFFERED, name='batch-writer',
+                 caller_flushes=True):
+        """
+        flush_fn(items) writes a list of items in one transaction and may raise
+        to have them retried; after_flush() runs after each successful flush,
+        outside the writer's locks. With caller_flushes=False a full batch wakes
+        the background thread instead of being written by the caller of add().
+        """
+        self.flush_fn = flush_fn
+        self.after_flush = after_flush
+        self.caller_flushes = caller_flushes
+        self.max_events = max_events
+        self.max_delay = max_delay
+        self.max_buffered = max_buffered
+        self.name = name
+
+        self.buffer = []
+        self.pending_weight = 0
+        self.oldest_at = None
+        self.retry_at = 0  # After a failed flush, the timer waits until then
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()  # One flush at a time, so batches land in order
+        self.wakeup = threading.Condition(self.lock)
+        self.thread = None
+        self.closed = False
+
+        self.flushes = 0
+        self.events_flushed = 0
+        self.flush_errors = 0
+        self.dropped = 0
+        self.last_flush_ms = None
+        self.max_flush_ms = 0
+        self.total_flush_ms = 0
+
+    def add(self, item, weight=0):
+        """
+        Buffer one item; weight (e.g. a cost) is summed into pending_weight
+        until the item is flushed. A full batch is flushed straight away, by the
+        caller unless caller_flushes is False.
+        """
+        with self.lock:
+            if not self.buffer:
+                self.oldest_at = time.monotonic()
+                self.wakeup.notify()
+            self.buffer.append((item, weight))
+            self.pending_weight += weight
+            full = self.closed or len(self.buffer) >= self.max_events
+            if self.thread is None and not self.closed:
+                self._start()
+            if full and not self.caller_flushes and not self.closed:
+                self.wakeup.notify()
+                full = False
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of items written"""
+        with self.flush_lock:
+            with self.lock:
+                batch, self.buffer = self.buffer, []
+                self.pending_weight, self.oldest_at = 0, None
+            if not batch:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                self.flush_fn([item for item, _ in batch])
+            except Exception as e:
+                self._requeue(batch)
+                print(f"⚠️  {self.name}: flush of {len(batch)} items failed: {e}")
+                return 0
+
+            elapsed = (time.perf_counter() - started) * 1000
+            self.last_flush_ms = elapsed
+            self.max_flush_ms = max(self.max_flush_ms, elapsed)
+            self.total_flush_ms += elapsed
+            self.flushes += 1
+            self.events_flushed += len(batch)
+
+        if self.after_flush:
+            try:
+                self.after_flush()
+            except Exception as e:
+                print(f"⚠️  {self.name}: after-flush hook failed: {e}")
+        return len(batch)
+
+    def _requeue(self, batch):
+        # Failed items go back in front of anything buffered since, oldest dropped past the cap
+        with self.lock:
+            self.flush_errors += 1
+            self.buffer = batch + self.buffer
+            overflow = len(self.buffer) - self.max_buffered
+            if overflow > 0:
+                self.buffer = self.buffer[overflow:]
+                self.dropped += overflow
+            self.pending_weight = sum(weight for _, weight in self.buffer)
+            self.oldest_at = time.monotonic()
+            self.retry_at = self.oldest_at + self.max_delay
+
+    def close(self):
+        """Stop the timer thread and flush synchronously (registered with atexit)"""
+        with self.lock:
+            self.closed = True
+            self.wakeup.notify()
+        self.flush()
+
+    def _start(self):
+        # Called with self.lock held, on the first add
+        self.thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def _loop(self):
+        while True:
+            with self.lock:
+                while not self.closed:
+                    if not self.buffer:
+                        self.wakeup.wait()
+                        continue
+                    now = time.monotonic()
+                    remaining = self.max_delay - (now - self.oldest_at)
+                    if remaining <= 0 or (len(self.buffer) >= self.max_events and now >= self.retry_at):
+                        break
+                    self.wakeup.wait(remaining)
+                if self.closed:
+                    return
+            self.flush()
+
+    def stats(self):
+        with self.lock:
+            depth = len(self.buffer)
+            oldest_age = (time.monotonic() - self.oldest_at) * 1000 if self.oldest_at else 0
+        return {
+            'buffer_depth': depth,
+            'oldest_age_ms': round(oldest_age, 1),
+            'flushes': self.flushes,
+            'events_flushed': self.events_flushed,
+            'flush_errors': self.flush_errors,
+            'dropped': self.dropped,
+            'last_flush_ms': round(self.last_flush_ms, 2) if self.last_flush_ms is not None else None,
+            'avg_flush_ms': round(self.total_flush_ms / self.flushes, 2) if self.flushes else None,
+            'max_flush_ms': round(self.max_flush_ms, 2)
+        }
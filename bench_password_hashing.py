@@ -0,0 +1,61 @@
+"""
+Password Hashing Benchmark
+Measures logins/sec per core and in aggregate through the hashing pool, and
+suggests an iteration count for a target per-login cost.
+
+Usage:
+    python bench_password_hashing.py [iterations] [seconds]
+"""
+
+import os
+import secrets
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from credentials import HashPool, PASSWORD_ALGORITHM, PASSWORD_ITERATIONS, calibrate_iterations, compute_hash
+
+
+def single_core(iterations, seconds):
+    """Hashes per second on the calling thread"""
+    salt = secrets.token_hex(32)
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        compute_hash('benchmark-password', salt, PASSWORD_ALGORITHM, iterations)
+        count += 1
+    return count / seconds
+
+
+def pooled(iterations, seconds, workers):
+    """Hashes per second through a HashPool driven by concurrent request threads"""
+    pool = HashPool(workers=workers, queue_limit=workers * 8)
+    salt = secrets.token_hex(32)
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        done = 0
+        while time.perf_counter() < deadline:
+            pool.hash('benchmark-password', salt, PASSWORD_ALGORITHM, iterations)
+            done += 1
+        return done
+
+    with ThreadPoolExecutor(max_workers=workers * 2) as clients:
+        total = sum(clients.map(lambda _: client(), range(workers * 2)))
+    return total / seconds, pool.stats()
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else PASSWORD_ITERATIONS
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    cores = os.cpu_count() or 1
+
+    print(f"{PASSWORD_ALGORITHM} @ {iterations:,} iterations, {cores} cores")
+    per_core = single_core(iterations, seconds)
+    print(f"  single core:  {per_core:8.1f} logins/sec ({1000 / per_core:.1f} ms each)")
+
+    total, stats = pooled(iterations, seconds, cores)
+    print(f"  pool ({cores} workers): {total:8.1f} logins/sec ({total / cores:.1f} per core)")
+
+    for target_ms in (50, 100, 250):
+        print(f"  ~{target_ms} ms per login: {calibrate_iterations(target_ms):,} iterations")
@@ -0,0 +1,93 @@
+"""
+Shared Control Plane for Picly
+Small fixed-layout state file that every worker process maps into memory
+(MAP_SHARED). A flag set by one gunicorn worker is visible to all the others
+as soon as the store lands, and reading a flag is a plain memory read - no
+file check or syscall per request.
+
+Each flag is a signed 64-bit slot. The file is created on first use and
+survives restarts, so emergency mode stays on until someone turns it off.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+
+
+CONTROL_PLANE_PATH = os.environ.get('CONTROL_PLANE_PATH', 'control_plane.state')
+
+# Flag name -> slot index; append new flags, never reorder
+SLOTS = {
+    'emergency_mode': 0,
+    'emergency_since': 1,  # Unix time emergency mode was switched on
+    'shed_openai': 2,      # Per-mille of paid-provider jobs to shed (see spend_forecast)
+    'shed_runway': 3,
+}
+
+SLOT_FORMAT = '<q'
+SLOT_SIZE = struct.calcsize(SLOT_FORMAT)
+FILE_SIZE = 4096  # One page, room for 512 flags
+
+
+class ControlPlane:
+    def __init__(self, path=CONTROL_PLANE_PATH):
+        self.path = path
+        self.map = None
+        self.map_lock = threading.Lock()
+        self.lock = threading.Lock()  # Serializes multi-slot updates within this process
+        self.writes = 0
+
+    def _mapped(self):
+        # Mapped on first use so importing the module touches no files
+        if self.map is None:
+            with self.map_lock:
+                if self.map is None:
+                    fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                    try:
+                        if os.fstat(fd).st_size < FILE_SIZE:
+                            os.ftruncate(fd, FILE_SIZE)  # New bytes read as zero
+                        self.map = mmap.mmap(fd, FILE_SIZE, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+                    finally:
+                        os.close(fd)  # The mapping keeps the file open
+        return self.map
+
+    def get(self, name):
+        return struct.unpack_from(SLOT_FORMAT, self._mapped(), SLOTS[name] * SLOT_SIZE)[0]
+
+    def set(self, name, value):
+        """Store a flag; other processes see it immediately, the file on disk after flush"""
+        shared = self._mapped()
+        struct.pack_into(SLOT_FORMAT, shared, SLOTS[name] * SLOT_SIZE, int(value))
+        shared.flush()  # Persist across restarts; not needed for other workers to see it
+        self.writes += 1
+
+    def set_emergency(self, active):
+        """Switch emergency mode on or off for every worker; returns True if it changed"""
+        with self.lock:
+            if bool(self.get('emergency_mode')) == active:
+                return False
+            # Timestamp first so a reader that sees the flag also sees when it started
+            self.set('emergency_since', int(time.time()) if active else 0)
+            self.set('emergency_mode', 1 if active else 0)
+        return True
+
+    @property
+    def emergency_mode(self):
+        return self.get('emergency_mode') == 1
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'flags': {name: self.get(name) for name in SLOTS},
+            'writes': self.writes
+        }
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+
+control_plane = ControlPlane()
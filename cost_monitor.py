@@ -7,9 +7,34 @@ import sqlite3
 from datetime import datetime, timedelta
 from collections import defaultdict
 import time
+from migrations import migrate
+from services import lazy
+from batch_writer import BatchWriter
+from control_plane import control_plane as shared_control_plane
+from spend_forecast import SpendForecaster
+from user_spend import UserSpendTracker
+
+# Timestamps are written explicitly in local time, in the same text format
+# the window queries compare against
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Rollup granularities: table suffix -> bucket_start format
+ROLLUP_BUCKETS = {
+    'minute': '%Y-%m-%d %H:%M:00',
+    'hour': '%Y-%m-%d %H:00:00',
+    'day': '%Y-%m-%d',
+}
+
+# Named reporting windows accepted by get_cost_breakdown
+PERIOD_HOURS = {'hourly': 1, 'daily': 24, 'weekly': 24 * 7}
+
+# Flush buffered costs immediately once today's spend plus the buffer
+# reaches this share of DAILY_COST_LIMIT, so the breaker is never late
+EMERGENCY_FLUSH_RATIO = 0.9
+
 
 class CostMonitor:
-    def __init__(self, db_path='cost_monitor.db'):
+    def __init__(self, db_path='cost_monitor.db', control_plane=None):
         self.db_path = db_path
         self.init_database()
         
@@ -18,72 +43,148 @@ class CostMonitor:
         self.DAILY_COST_LIMIT = 500.00
         self.PROFIT_MARGIN_MIN = 0.20  # 20% minimum
         
-        # Emergency shutdown
-        self.emergency_mode = False
+        # Emergency shutdown state is shared by every worker process
+        self.control_plane = control_plane or shared_control_plane
+        
+        # Hour whose hourly_stats row has not been written yet
+        self.open_hour = datetime.now().strftime(ROLLUP_BUCKETS['hour'])
+        
+        # Cost events are buffered and written in batches; alerts run once per batch
+        self.cost_writer = BatchWriter(self._flush_costs, after_flush=self._after_cost_flush, name='cost-writer')
+        self.daily_cost = 0  # Today's total as of the last alert check
+        
+        # Projects end-of-day spend and sheds paid-provider traffic before the limit
+        self.forecaster = SpendForecaster(self)
+        
+        # Live per-user spend window; flags unusually heavy spenders
+        self.user_spend = UserSpendTracker(self.db_path)
     
     def init_database(self):
-        """Create monitoring tables"""
+        """Create or upgrade monitoring tables (no-op once current)"""
+        migrate(self.db_path, 'cost_monitor')
+    
+    def log_api_cost(self, user_id, api_service, operation, cost, success=True, request_id=None):
+        """Log every API call cost (buffered; see flush_costs)"""
+        self.user_spend.record(user_id, cost)
+        self.cost_writer.add((datetime.now(), user_id, api_service, operation, cost, success, request_id), cost or 0)
+        
+        # Near the daily limit, write now so check_cost_alerts sees this spend
+        if self.daily_cost + self.cost_writer.pending_weight >= self.DAILY_COST_LIMIT * EMERGENCY_FLUSH_RATIO:
+            self.cost_writer.flush()
+    
+    def flush_costs(self):
+        """Write buffered cost events now; returns how many were written"""
+        return self.cost_writer.flush()
+    
+    def _flush_costs(self, events):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            self.write_costs(conn.cursor(), events)
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def _after_cost_flush(self):
+        # Runs inside a flush: read without flushing again, or every flush would recurse
+        self.close_finished_hours(flush=False)
+        
+        # Check if costs are too high
+        self._check_cost_alerts()
+        self.forecaster.refresh()
+        self.user_spend.persist()
+    
+    def write_costs(self, cursor, events):
+        """
+        Insert raw cost events and fold them into the minute/hour/day rollups
+        
+        events: [(datetime, user_id, api_service, operation, cost, success, request_id)];
+        runs inside the caller's transaction so raw rows and rollups always agree
+        """
+        cursor.executemany('''
+            INSERT INTO api_costs (timestamp, user_id, api_service, operation, cost, success, request_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(at.strftime(TIMESTAMP_FORMAT), *rest) for at, *rest in events])
+        
+        # Aggregate in memory first: one upsert per touched bucket, not per event
+        for granularity, bucket_format in ROLLUP_BUCKETS.items():
+            buckets = defaultdict(lambda: [0, 0, 0.0])
+            for at, user_id, api_service, operation, cost, success, _ in events:
+                key = (at.strftime(bucket_format), api_service or 'unknown', operation or 'unknown', user_id or 0)
+                bucket = buckets[key]
+                bucket[0] += 1
+                bucket[1] += 0 if success else 1
+                bucket[2] += cost or 0
+            
+            cursor.executemany(f'''
+                INSERT INTO cost_rollup_{granularity}
+                    (bucket_start, api_service, operation, user_id, requests, failures, total_cost)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (bucket_start, api_service, operation, user_id) DO UPDATE SET
+                    requests = requests + excluded.requests,
+                    failures = failures + excluded.failures,
+                    total_cost = total_cost + excluded.total_cost
+            ''', [(*key, *totals) for key, totals in buckets.items()])
+    
+    def backfill_rollups(self):
+        """Rebuild every rollup from raw api_costs rows (one transaction)"""
+        self.flush_costs()
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        # API cost tracking
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS api_costs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                user_id INTEGER,
-                api_service TEXT,
-                operation TEXT,
-                cost REAL,
-                success BOOLEAN,
-                request_id TEXT
-            )
-        ''')
-        
-        # Revenue tracking
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS revenue (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                user_id INTEGER,
-                amount REAL,
-                type TEXT,
-                description TEXT
-            )
-        ''')
-        
-        # Hourly summaries
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS hourly_stats (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                hour_start TIMESTAMP,
-                total_cost REAL,
-                total_revenue REAL,
-                profit REAL,
-                margin REAL,
-                requests_count INTEGER,
-                unique_users INTEGER
-            )
-        ''')
+        for granularity, bucket_format in ROLLUP_BUCKETS.items():
+            cursor.execute(f'DELETE FROM cost_rollup_{granularity}')
+            cursor.execute(f'''
+                INSERT INTO cost_rollup_{granularity}
+                    (bucket_start, api_service, operation, user_id, requests, failures, total_cost)
+                SELECT strftime(?, timestamp), COALESCE(api_service, 'unknown'), COALESCE(operation, 'unknown'),
+                       COALESCE(user_id, 0), COUNT(*), SUM(NOT COALESCE(success, 1)), COALESCE(SUM(cost), 0)
+                FROM api_costs
+                GROUP BY 1, 2, 3, 4
+            ''', (bucket_format,))
         
         conn.commit()
         conn.close()
     
-    def log_api_cost(self, user_id, api_service, operation, cost, success=True, request_id=None):
-        """Log every API call cost"""
+    def close_finished_hours(self, flush=True):
+        """Write the hourly_stats row for the previous hour once a new hour starts"""
+        current_hour = datetime.now().strftime(ROLLUP_BUCKETS['hour'])
+        if current_hour == self.open_hour:
+            return
+        finished, self.open_hour = self.open_hour, current_hour
+        self.record_hourly_stats(datetime.strptime(finished, ROLLUP_BUCKETS['hour']), flush=flush)
+    
+    def record_hourly_stats(self, hour_start, flush=True):
+        """Persist one clock hour's totals to hourly_stats (idempotent)"""
+        hour_key = hour_start.strftime(ROLLUP_BUCKETS['hour'])
+        hour_end = (hour_start + timedelta(hours=1)).strftime(TIMESTAMP_FORMAT)
+        if flush:
+            self.flush_costs()
+        
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
-            INSERT INTO api_costs (user_id, api_service, operation, cost, success, request_id)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, api_service, operation, cost, success, request_id))
+            SELECT SUM(total_cost), SUM(requests), COUNT(DISTINCT NULLIF(user_id, 0))
+            FROM cost_rollup_hour WHERE bucket_start = ?
+        ''', (hour_key,))
+        total_cost, requests, users = cursor.fetchone()
+        total_cost = total_cost or 0
+        
+        cursor.execute('SELECT SUM(amount) FROM revenue WHERE timestamp >= ? AND timestamp < ?', (hour_key, hour_end))
+        total_revenue = cursor.fetchone()[0] or 0
+        
+        profit = total_revenue - total_cost
+        margin = (profit / total_revenue * 100) if total_revenue > 0 else 0
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO hourly_stats
+                (hour_start, total_cost, total_revenue, profit, margin, requests_count, unique_users)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (hour_key, round(total_cost, 4), round(total_revenue, 2), round(profit, 2), round(margin, 1),
+              requests or 0, users or 0))
         
         conn.commit()
         conn.close()
-        
-        # Check if costs are too high
-        self.check_cost_alerts()
     
     def log_revenue(self, user_id, amount, revenue_type, description):
         """Log revenue (subscription, credit purchase, etc.)"""
@@ -91,26 +192,30 @@ class CostMonitor:
         cursor = conn.cursor()
         
         cursor.execute('''
-            INSERT INTO revenue (user_id, amount, type, description)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, amount, revenue_type, description))
+            INSERT INTO revenue (timestamp, user_id, amount, type, description)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (datetime.now().strftime(TIMESTAMP_FORMAT), user_id, amount, revenue_type, description))
         
         conn.commit()
         conn.close()
     
     def get_hourly_stats(self):
         """Get current hour statistics"""
+        self.flush_costs()
+        return self._hourly_stats()
+    
+    def _hourly_stats(self):
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         hour_ago = datetime.now() - timedelta(hours=1)
         
-        # Total costs this hour
+        # Total costs over the last 60 minute buckets
         cursor.execute('''
-            SELECT SUM(cost), COUNT(*), COUNT(DISTINCT user_id)
-            FROM api_costs
-            WHERE timestamp > ?
-        ''', (hour_ago,))
+            SELECT SUM(total_cost), SUM(requests), COUNT(DISTINCT NULLIF(user_id, 0))
+            FROM cost_rollup_minute
+            WHERE bucket_start >= ?
+        ''', (hour_ago.strftime(ROLLUP_BUCKETS['minute']),))
         
         cost_data = cursor.fetchone()
         total_cost = cost_data[0] or 0
@@ -122,7 +227,7 @@ class CostMonitor:
             SELECT SUM(amount)
             FROM revenue
             WHERE timestamp > ?
-        ''', (hour_ago,))
+        ''', (hour_ago.strftime(TIMESTAMP_FORMAT),))
         
         total_revenue = cursor.fetchone()[0] or 0
         
@@ -144,17 +249,21 @@ class CostMonitor:
     
     def get_daily_stats(self):
         """Get today's statistics"""
+        self.flush_costs()
+        return self._daily_stats()
+    
+    def _daily_stats(self):
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         
-        # Costs today
+        # Costs today (today's day buckets)
         cursor.execute('''
-            SELECT SUM(cost), COUNT(*), COUNT(DISTINCT user_id)
-            FROM api_costs
-            WHERE timestamp > ?
-        ''', (today,))
+            SELECT SUM(total_cost), SUM(requests), COUNT(DISTINCT NULLIF(user_id, 0))
+            FROM cost_rollup_day
+            WHERE bucket_start = ?
+        ''', (today.strftime(ROLLUP_BUCKETS['day']),))
         
         cost_data = cursor.fetchone()
         total_cost = cost_data[0] or 0
@@ -165,8 +274,8 @@ class CostMonitor:
         cursor.execute('''
             SELECT SUM(amount)
             FROM revenue
-            WHERE timestamp > ?
-        ''', (today,))
+            WHERE timestamp >= ?
+        ''', (today.strftime(TIMESTAMP_FORMAT),))
         
         total_revenue = cursor.fetchone()[0] or 0
         
@@ -188,8 +297,13 @@ class CostMonitor:
     
     def check_cost_alerts(self):
         """Check if costs exceed safe thresholds"""
-        hourly = self.get_hourly_stats()
-        daily = self.get_daily_stats()
+        self.flush_costs()
+        return self._check_cost_alerts()
+    
+    def _check_cost_alerts(self):
+        hourly = self._hourly_stats()
+        daily = self._daily_stats()
+        self.daily_cost = daily['total_cost']
         
         alerts = []
         
@@ -228,33 +342,28 @@ class CostMonitor:
         
         return alerts
     
+    @property
+    def emergency_mode(self):
+        """True while any worker has emergency mode switched on (a shared-memory read)"""
+        return self.control_plane.emergency_mode
+    
     def activate_emergency_mode(self):
-        """Emergency shutdown to prevent runaway costs"""
-        if self.emergency_mode:
+        """Emergency shutdown to prevent runaway costs (applies to every worker)"""
+        if not self.control_plane.set_emergency(True):
             return  # Already in emergency mode
-        
-        self.emergency_mode = True
+        self.forecaster.refresh(force=True)
         
         # Log emergency activation
         print("🚨 EMERGENCY MODE ACTIVATED - Daily cost limit exceeded!")
         print("Actions taken:")
         print("- Disabled DALL-E 3 (using free Flux/SD only)")
         print("- Disabled premium video generation")
-        print("- Reduced free tier from 10 to 5 images/day")
-        print("- Enabled request queueing")
-        
-        # This will be imported and checked in rootAI.py
-        with open('emergency_mode.flag', 'w') as f:
-            f.write(str(datetime.now()))
     
     def deactivate_emergency_mode(self):
-        """Restore normal operation"""
-        import os
-        
-        self.emergency_mode = False
-        
-        if os.path.exists('emergency_mode.flag'):
-            os.remove('emergency_mode.flag')
+        """Restore normal operation (applies to every worker)"""
+        if not self.control_plane.set_emergency(False):
+            return
+        self.forecaster.refresh(force=True)
         
         print("✅ Emergency mode deactivated - normal operation restored")
     
@@ -265,7 +374,9 @@ class CostMonitor:
             print(f"{symbol} [{alert['level']}] {alert['message']}")
     
     def get_cost_breakdown(self, hours=24):
-        """Get detailed cost breakdown by service"""
+        """Get detailed cost breakdown by service (hours, or 'hourly' / 'daily' / 'weekly')"""
+        hours = PERIOD_HOURS.get(hours, hours)
+        self.flush_costs()
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
@@ -273,14 +384,14 @@ class CostMonitor:
         
         cursor.execute('''
             SELECT api_service, operation, 
-                   COUNT(*) as count,
-                   SUM(cost) as total_cost,
-                   AVG(cost) as avg_cost
-            FROM api_costs
-            WHERE timestamp > ?
+                   SUM(requests) as count,
+                   SUM(total_cost) as total_cost,
+                   SUM(total_cost) / SUM(requests) as avg_cost
+            FROM cost_rollup_hour
+            WHERE bucket_start >= ?
             GROUP BY api_service, operation
             ORDER BY total_cost DESC
-        ''', (time_ago,))
+        ''', (time_ago.strftime(ROLLUP_BUCKETS['hour']),))
         
         breakdown = []
         for row in cursor.fetchall():
@@ -297,6 +408,7 @@ class CostMonitor:
     
     def get_user_costs(self, limit=10):
         """Get top cost-generating users"""
+        self.flush_costs()
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
@@ -304,19 +416,19 @@ class CostMonitor:
         
         cursor.execute('''
             SELECT user_id, 
-                   COUNT(*) as requests,
-                   SUM(cost) as total_cost
-            FROM api_costs
-            WHERE timestamp > ?
+                   SUM(requests) as requests,
+                   SUM(total_cost) as total_cost
+            FROM cost_rollup_hour
+            WHERE bucket_start >= ?
             GROUP BY user_id
             ORDER BY total_cost DESC
             LIMIT ?
-        ''', (day_ago, limit))
+        ''', (day_ago.strftime(ROLLUP_BUCKETS['hour']), limit))
         
         users = []
         for row in cursor.fetchall():
             users.append({
-                'user_id': row[0],
+                'user_id': row[0] or None,  # 0 = anonymous
                 'requests': row[1],
                 'total_cost': round(row[2], 2)
             })
@@ -366,7 +478,7 @@ class CostMonitor:
 
 
 # Global instance
-cost_monitor = CostMonitor()
+cost_monitor = lazy('cost_monitor', CostMonitor)
 
 
 if __name__ == "__main__":
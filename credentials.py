@@ -0,0 +1,217 @@
+"""
+Credential Hashing for Picly
+Password hashing runs on a bounded worker pool instead of the request thread,
+with per-account and per-IP login throttling in front of it. Every stored hash
+records its algorithm and cost, so raising the cost upgrades users
+transparently the next time they log in.
+
+Benchmark: python bench_password_hashing.py
+"""
+
+import hashlib
+import heapq
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Current algorithm and cost for new hashes. Stored rows keep their own
+# values; anything weaker is rehashed on the next successful login.
+PASSWORD_ALGORITHM = 'pbkdf2_sha256'
+PASSWORD_ITERATIONS = int(os.getenv('PASSWORD_ITERATIONS', '100000'))
+
+# Cost of every hash created before per-user parameters were stored
+LEGACY_ALGORITHM = 'pbkdf2_sha256'
+LEGACY_ITERATIONS = 100000
+
+# hashlib releases the GIL while hashing, so one thread per core saturates the CPU
+HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 2)))
+
+# Hashes queued beyond the running ones before new requests are turned away
+HASH_QUEUE_LIMIT = HASH_WORKERS * 8
+HASH_TIMEOUT = 10.0
+
+# Login throttling: failures allowed per window before lockout
+ACCOUNT_MAX_FAILURES = 5
+IP_MAX_FAILURES = 20
+THROTTLE_WINDOW_SECONDS = 900
+
+# Sprayed usernames / spoofed IPs: past SWEEP_KEYS tracked keys, expired ones are
+# swept (at most once a minute); past MAX_KEYS the oldest tenth is dropped
+THROTTLE_SWEEP_KEYS = 10000
+THROTTLE_MAX_KEYS = 100000
+THROTTLE_SWEEP_INTERVAL = 60
+
+
+_ALGORITHMS = {
+    'pbkdf2_sha256': 'sha256',
+    'pbkdf2_sha512': 'sha512',
+}
+
+
+class HashingBusy(Exception):
+    """The hashing pool is saturated; the caller should retry shortly"""
+
+    def __init__(self, retry_after=1):
+        super().__init__('Password hashing queue is full')
+        self.retry_after = retry_after
+
+
+def compute_hash(password, salt, algorithm, iterations):
+    """One password hash (blocking, CPU-bound)"""
+    digest = _ALGORITHMS.get(algorithm)
+    if digest is None:
+        raise ValueError(f'Unknown password algorithm: {algorithm}')
+    return hashlib.pbkdf2_hmac(digest, password.encode('utf-8'), salt.encode('utf-8'), iterations).hex()
+
+
+def needs_rehash(algorithm, iterations):
+    """True when a stored hash is weaker than the current settings"""
+    return algorithm != PASSWORD_ALGORITHM or (iterations or 0) < PASSWORD_ITERATIONS
+
+
+class HashPool:
+    """Bounded pool for password hashing; rejects early instead of queueing without limit"""
+
+    def __init__(self, workers=HASH_WORKERS, queue_limit=HASH_QUEUE_LIMIT):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self.slots = threading.BoundedSemaphore(workers + queue_limit)
+        self.lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+
+    def _run(self, password, salt, algorithm, iterations):
+        started = time.perf_counter()
+        try:
+            return compute_hash(password, salt, algorithm, iterations)
+        finally:
+            with self.lock:
+                self.completed += 1
+                self.total_seconds += time.perf_counter() - started
+
+    def hash(self, password, salt=None, algorithm=None, iterations=None, timeout=HASH_TIMEOUT):
+        """
+        Hash a password on the pool
+
+        Returns:
+            (password_hash, salt, algorithm, iterations)
+        """
+        salt = salt or secrets.token_hex(32)
+        algorithm = algorithm or PASSWORD_ALGORITHM
+        iterations = iterations or PASSWORD_ITERATIONS
+
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                self.rejected += 1
+            raise HashingBusy()
+        try:
+            future = self.executor.submit(self._run, password, salt, algorithm, iterations)
+            return future.result(timeout=timeout), salt, algorithm, iterations
+        finally:
+            self.slots.release()
+
+    def verify(self, password, salt, stored_hash, algorithm=None, iterations=None):
+        """Constant-time comparison against a stored hash"""
+        candidate, _, _, _ = self.hash(password, salt,
+                                       algorithm or LEGACY_ALGORITHM,
+                                       iterations or LEGACY_ITERATIONS)
+        return hmac.compare_digest(candidate, stored_hash)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'workers': self.workers,
+                'algorithm': PASSWORD_ALGORITHM,
+                'iterations': PASSWORD_ITERATIONS,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'avg_ms': round(self.total_seconds / self.completed * 1000, 1) if self.completed else None
+            }
+
+
+class LoginThrottle:
+    """Sliding-window failure counts per account and per IP, checked before any hashing"""
+
+    def __init__(self, account_limit=ACCOUNT_MAX_FAILURES, ip_limit=IP_MAX_FAILURES,
+                 window=THROTTLE_WINDOW_SECONDS, sweep_keys=THROTTLE_SWEEP_KEYS, max_keys=THROTTLE_MAX_KEYS):
+        self.account_limit = account_limit
+        self.ip_limit = ip_limit
+        self.window = window
+        self.sweep_keys = sweep_keys
+        self.max_keys = max_keys
+        self.failures = defaultdict(deque)  # key -> failure times
+        self.lock = threading.Lock()
+        self.next_sweep = 0
+        self.blocked = 0
+        self.evicted = 0
+
+    def _retry_after(self, key, limit, now):
+        attempts = self.failures.get(key)
+        if not attempts:
+            return 0
+        while attempts and now - attempts[0] >= self.window:
+            attempts.popleft()
+        if not attempts:
+            del self.failures[key]
+            return 0
+        if len(attempts) < limit:
+            return 0
+        return int(self.window - (now - attempts[-limit])) + 1
+
+    def check(self, username, ip):
+        """Seconds until this login may be attempted (0 = go ahead)"""
+        now = time.monotonic()
+        with self.lock:
+            wait = max(self._retry_after(('account', (username or '').lower()), self.account_limit, now),
+                       self._retry_after(('ip', ip), self.ip_limit, now))
+            if wait:
+                self.blocked += 1
+            return wait
+
+    def record_failure(self, username, ip):
+        now = time.monotonic()
+        with self.lock:
+            self.failures[('account', (username or '').lower())].append(now)
+            self.failures[('ip', ip)].append(now)
+            tracked = len(self.failures)
+            if tracked > self.max_keys or (tracked > self.sweep_keys and now >= self.next_sweep):
+                self._sweep(now)
+
+    def _sweep(self, now):
+        # Called with self.lock held
+        self.next_sweep = now + THROTTLE_SWEEP_INTERVAL
+        expired = [key for key, attempts in self.failures.items() if now - attempts[-1] >= self.window]
+        for key in expired:
+            del self.failures[key]
+        if len(self.failures) > self.max_keys:
+            excess = len(self.failures) - self.max_keys * 9 // 10
+            for key in heapq.nsmallest(excess, self.failures, key=lambda key: self.failures[key][-1]):
+                del self.failures[key]
+            self.evicted += excess
+
+    def record_success(self, username):
+        with self.lock:
+            self.failures.pop(('account', (username or '').lower()), None)
+
+    def stats(self):
+        with self.lock:
+            return {'tracked_keys': len(self.failures), 'blocked': self.blocked, 'evicted': self.evicted}
+
+
+def calibrate_iterations(target_ms=250, algorithm=PASSWORD_ALGORITHM, sample_iterations=20000):
+    """Iterations that take about target_ms on this machine, for choosing PASSWORD_ITERATIONS"""
+    started = time.perf_counter()
+    compute_hash('calibration', secrets.token_hex(32), algorithm, sample_iterations)
+    per_iteration = (time.perf_counter() - started) / sample_iterations
+    return int(target_ms / 1000 / per_iteration / 1000) * 1000
+
+
+# Global instances
+hash_pool = HashPool()
+login_throttle = LoginThrottle()
@@ -0,0 +1,153 @@
+"""
+Premium Credit Ledger for Picly
+Append-only double-entry ledger for premium credits. Every movement is one
+transfer of two rows (one per account) that sum to zero, written in the same
+transaction as the balance change it records.
+
+Balances stay materialized: a user's balance is users.premium_credits, and
+system accounts (stripe, promotions, usage, held, opening_balance) have a row
+in ledger_accounts. Lookups never sum the ledger; audits and finance reports
+read the ledger by account or by time window through its indexes.
+
+Usage:
+    python credit_ledger.py summary
+    python credit_ledger.py verify
+    python credit_ledger.py import events.json   # exported Stripe events
+"""
+
+import json
+import secrets
+import sqlite3
+import sys
+
+
+# System accounts credits flow between
+STRIPE = 'stripe'                # purchased with money
+PROMOTIONS = 'promotions'        # achievements, referrals, spin wheel
+USAGE = 'usage'                  # spent on generations
+HELD = 'held'                    # reserved for in-flight videos / batches
+OPENING_BALANCE = 'opening_balance'
+
+
+def user_account(user_id):
+    return f'user:{user_id}'
+
+
+def post_transfer(cursor, from_account, to_account, amount, entry_type, user_id=None, reference=None):
+    """
+    Record amount credits moving from one account to another
+
+    Must run inside the caller's transaction, after the balance update it
+    describes. System account balances are updated here; user balances are
+    users.premium_credits, which the caller has already changed.
+    """
+    if amount == 0:
+        return None
+
+    transfer_id = secrets.token_hex(8)
+    cursor.executemany('''
+        INSERT INTO credit_ledger (transfer_id, account, user_id, amount, entry_type, reference)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [
+        (transfer_id, from_account, user_id, -amount, entry_type, reference),
+        (transfer_id, to_account, user_id, amount, entry_type, reference),
+    ])
+
+    for account, delta in ((from_account, -amount), (to_account, amount)):
+        if not account.startswith('user:'):
+            cursor.execute('''
+                INSERT INTO ledger_accounts (account, balance) VALUES (?, ?)
+                ON CONFLICT(account) DO UPDATE SET balance = balance + excluded.balance,
+                                                   updated_at = CURRENT_TIMESTAMP
+            ''', (account, delta))
+
+    return transfer_id
+
+
+def ledger_summary(db_path='users.db', since=None):
+    """System account balances plus credit flows by entry type (optionally since a timestamp)"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute('SELECT account, balance FROM ledger_accounts ORDER BY account')
+    accounts = dict(cursor.fetchall())
+
+    # Flows are read from the receiving leg only, so each transfer counts once
+    query = '''
+        SELECT entry_type, COUNT(*), SUM(amount) FROM credit_ledger
+        WHERE amount > 0 {}
+        GROUP BY entry_type ORDER BY entry_type
+    '''
+    if since:
+        cursor.execute(query.format('AND created_at >= ?'), (since,))
+    else:
+        cursor.execute(query.format(''))
+    flows = {entry_type: {'transfers': count, 'credits': total} for entry_type, count, total in cursor.fetchall()}
+    conn.close()
+
+    return {
+        'accounts': accounts,
+        # Zero-sum: whatever the system accounts gave out is held by users
+        'user_credits_outstanding': -sum(accounts.values()),
+        'flows': flows
+    }
+
+
+def verify_ledger(db_path='users.db'):
+    """Users whose materialized balance disagrees with their ledger history"""
+    conn = sqlite3.connect(db_path)
+    mismatches = conn.execute('''
+        SELECT u.id, u.premium_credits, COALESCE(l.total, 0)
+        FROM users u
+        LEFT JOIN (
+            SELECT user_id, SUM(amount) AS total FROM credit_ledger
+            WHERE account LIKE 'user:%' GROUP BY user_id
+        ) l ON l.user_id = u.id
+        WHERE u.premium_credits != COALESCE(l.total, 0)
+    ''').fetchall()
+    unbalanced = conn.execute('SELECT COALESCE(SUM(amount), 0) FROM credit_ledger').fetchone()[0]
+    conn.close()
+
+    return {
+        'balanced': unbalanced == 0 and not mismatches,
+        'ledger_total': unbalanced,
+        'mismatched_users': [
+            {'user_id': user_id, 'balance': balance, 'ledger': ledger}
+            for user_id, balance, ledger in mismatches
+        ]
+    }
+
+
+def payments_from_events(events):
+    """Credit purchases from exported Stripe events (checkout.session.completed, one-time payments)"""
+    payments = []
+    for event in events:
+        if event.get('type') != 'checkout.session.completed':
+            continue
+        session = event['data']['object']
+        metadata = session.get('metadata') or {}
+        if session.get('mode') == 'subscription' or 'credits' not in metadata:
+            continue
+        payments.append({
+            'user_id': int(metadata['user_id']),
+            'credits': int(metadata['credits']),
+            'payment_id': session['payment_intent'],
+            'amount': session['amount_total'] / 100
+        })
+    return payments
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'summary'
+    if command == 'summary':
+        print(json.dumps(ledger_summary(), indent=2))
+    elif command == 'verify':
+        print(json.dumps(verify_ledger(), indent=2))
+    elif command == 'import' and len(sys.argv) > 2:
+        from database import UserDatabase
+        with open(sys.argv[2]) as f:
+            data = json.load(f)
+        events = data.get('data', data) if isinstance(data, dict) else data
+        print(json.dumps(UserDatabase().import_stripe_payments(payments_from_events(events)), indent=2))
+    else:
+        print("Usage: python credit_ledger.py [summary | verify | import events.json]")
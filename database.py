@@ -4,108 +4,49 @@ Handles user registration, login, and session management with encrypted password
 """
 
 import sqlite3
-import hashlib
 import secrets
-from datetime import datetime, timedelta
+import time
+from datetime import datetime, timedelta, date
 import os
+from migrations import migrate
+from credentials import hash_pool, needs_rehash, HashingBusy
+from session_tokens import SessionSigner, signed_sessions_enabled
+from credit_ledger import post_transfer, user_account, ledger_summary, STRIPE, PROMOTIONS, USAGE, HELD
+
+FREE_DAILY_CREDITS = 10
+
+
+def effective_free_credits(free_credits, last_reset, today=None):
+    """Free credits left today; a stale last_free_reset means a full daily allowance"""
+    today = today or date.today().isoformat()
+    return free_credits if last_reset == today else FREE_DAILY_CREDITS
+
+
+def effective_subscription_status(status, expires_at, now=None):
+    """Subscription status with expiry applied, without waiting for reconciliation"""
+    if status == 'active' and expires_at:
+        if datetime.fromisoformat(expires_at) < (now or datetime.now()):
+            return 'expired'
+    return status
+
 
 class UserDatabase:
-    def __init__(self, db_path='users.db'):
+    def __init__(self, db_path='users.db', signing_key=None):
         self.db_path = db_path
         self.init_database()
+        
+        # Signed session tokens replace the sessions table lookup when configured
+        if signing_key is None and signed_sessions_enabled():
+            signing_key = os.getenv('SESSION_SIGNING_KEY')
+        self.signer = SessionSigner(signing_key, db_path) if signing_key else None
     
     def init_database(self):
-        """Create users table if it doesn't exist"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                salt TEXT NOT NULL,
-                premium_credits INTEGER DEFAULT 0,
-                free_credits_today INTEGER DEFAULT 10,
-                last_free_reset DATE,
-                referral_code TEXT UNIQUE,
-                referred_by INTEGER,
-                total_generations INTEGER DEFAULT 0,
-                subscription_status TEXT DEFAULT 'none',
-                subscription_id TEXT,
-                subscription_expires_at TIMESTAMP,
-                low_token_threshold INTEGER DEFAULT 300,
-                low_token_notified BOOLEAN DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_login TIMESTAMP,
-                FOREIGN KEY (referred_by) REFERENCES users (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                session_token TEXT UNIQUE NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                stripe_payment_id TEXT,
-                amount REAL NOT NULL,
-                credits INTEGER NOT NULL,
-                status TEXT DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS achievements (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                achievement_type TEXT NOT NULL,
-                credits_awarded INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                UNIQUE(user_id, achievement_type)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS daily_stats (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date DATE NOT NULL UNIQUE,
-                total_generations INTEGER DEFAULT 0,
-                free_generations INTEGER DEFAULT 0,
-                premium_generations INTEGER DEFAULT 0,
-                revenue REAL DEFAULT 0
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """Create or upgrade the user database schema (no-op once current)"""
+        migrate(self.db_path, 'users')
     
-    def hash_password(self, password, salt=None):
-        """Hash password with salt using SHA-256"""
-        if salt is None:
-            salt = secrets.token_hex(32)
-        
-        # Hash password with salt
-        password_hash = hashlib.pbkdf2_hmac(
-            'sha256',
-            password.encode('utf-8'),
-            salt.encode('utf-8'),
-            100000  # iterations
-        ).hex()
-        
+    def hash_password(self, password, salt=None, algorithm=None, iterations=None):
+        """Hash password with salt on the hashing pool (current algorithm and cost by default)"""
+        password_hash, salt, _, _ = hash_pool.hash(password, salt, algorithm, iterations)
         return password_hash, salt
     
     def register_user(self, username, email, password):
@@ -119,7 +60,7 @@ class UserDatabase:
                 return {'success': False, 'error': 'Password must be at least 8 characters'}
             
             # Hash password
-            password_hash, salt = self.hash_password(password)
+            password_hash, salt, algorithm, iterations = hash_pool.hash(password)
             
             # Generate unique referral code
             referral_code = secrets.token_urlsafe(8)
@@ -129,9 +70,11 @@ class UserDatabase:
             cursor = conn.cursor()
             
             cursor.execute('''
-                INSERT INTO users (username, email, password_hash, salt, referral_code, last_free_reset)
-                VALUES (?, ?, ?, ?, ?, DATE('now'))
-            ''', (username, email, password_hash, salt, referral_code))
+                INSERT INTO users (username, email, password_hash, salt, password_algorithm, password_iterations,
+                                   referral_code, last_free_reset)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (username, email, password_hash, salt, algorithm, iterations,
+                  referral_code, date.today().isoformat()))
             
             conn.commit()
             user_id = cursor.lastrowid
@@ -150,6 +93,8 @@ class UserDatabase:
                 return {'success': False, 'error': 'Email already registered'}
             else:
                 return {'success': False, 'error': 'Registration failed'}
+        except HashingBusy as e:
+            return {'success': False, 'error': 'Server busy, please try again', 'busy': True, 'retry_after': e.retry_after}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
@@ -161,7 +106,7 @@ class UserDatabase:
             
             # Get user data
             cursor.execute('''
-                SELECT id, username, password_hash, salt
+                SELECT id, username, password_hash, salt, password_algorithm, password_iterations
                 FROM users
                 WHERE username = ? OR email = ?
             ''', (username, username))
@@ -172,23 +117,32 @@ class UserDatabase:
                 conn.close()
                 return {'success': False, 'error': 'Invalid username or password'}
             
-            user_id, username, stored_hash, salt = user
+            user_id, username, stored_hash, salt, algorithm, iterations = user
             
-            # Verify password
-            password_hash, _ = self.hash_password(password, salt)
-            
-            if password_hash != stored_hash:
+            # Verify password with the parameters it was stored under
+            if not hash_pool.verify(password, salt, stored_hash, algorithm, iterations):
                 conn.close()
                 return {'success': False, 'error': 'Invalid username or password'}
             
+            # Upgrade weaker hashes while the plaintext is at hand
+            if needs_rehash(algorithm, iterations):
+                new_hash, new_salt, algorithm, iterations = hash_pool.hash(password)
+                cursor.execute('''
+                    UPDATE users SET password_hash = ?, salt = ?, password_algorithm = ?, password_iterations = ?
+                    WHERE id = ?
+                ''', (new_hash, new_salt, algorithm, iterations, user_id))
+            
             # Create session token
-            session_token = secrets.token_urlsafe(32)
             expires_at = datetime.now() + timedelta(days=7)  # 7 day session
             
-            cursor.execute('''
-                INSERT INTO sessions (user_id, session_token, expires_at)
-                VALUES (?, ?, ?)
-            ''', (user_id, session_token, expires_at))
+            if self.signer:
+                session_token = self.signer.issue(user_id, username, expires_at)
+            else:
+                session_token = secrets.token_urlsafe(32)
+                cursor.execute('''
+                    INSERT INTO sessions (user_id, session_token, expires_at)
+                    VALUES (?, ?, ?)
+                ''', (user_id, session_token, expires_at))
             
             # Update last login
             cursor.execute('''
@@ -207,12 +161,17 @@ class UserDatabase:
                 'expires_at': expires_at.isoformat()
             }
             
+        except HashingBusy as e:
+            return {'success': False, 'error': 'Server busy, please try again', 'busy': True, 'retry_after': e.retry_after}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
     def validate_session(self, session_token):
         """Validate session token"""
         try:
+            if self.signer and self.signer.is_signed(session_token):
+                return self.signer.verify(session_token)
+            
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
@@ -247,6 +206,10 @@ class UserDatabase:
     def logout_user(self, session_token):
         """Delete session token"""
         try:
+            if self.signer and self.signer.is_signed(session_token):
+                self.signer.revoke(session_token)
+                return {'success': True, 'message': 'Logged out successfully'}
+            
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
@@ -260,16 +223,29 @@ class UserDatabase:
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def cleanup_expired_sessions(self):
-        """Remove expired sessions from database"""
+    def cleanup_expired_sessions(self, batch_size=1000):
+        """Remove up to batch_size expired sessions and revocations (short transaction; call repeatedly)"""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            cursor.execute('DELETE FROM sessions WHERE expires_at < CURRENT_TIMESTAMP')
+            # expires_at is stored in local time, like validate_session compares it
+            cursor.execute('''
+                DELETE FROM sessions WHERE id IN (
+                    SELECT id FROM sessions WHERE expires_at < ? LIMIT ?
+                )
+            ''', (datetime.now(), batch_size))
+            deleted = cursor.rowcount
+            
+            # Revocations are only needed until the token would have expired anyway
+            cursor.execute('''
+                DELETE FROM revoked_tokens WHERE id IN (
+                    SELECT id FROM revoked_tokens WHERE expires_at < ? LIMIT ?
+                )
+            ''', (int(time.time()), batch_size))
+            deleted += cursor.rowcount
             
             conn.commit()
-            deleted = cursor.rowcount
             conn.close()
             
             return {'success': True, 'deleted': deleted}
@@ -278,51 +254,28 @@ class UserDatabase:
             return {'success': False, 'error': str(e)}
     
     def get_user_credits(self, user_id):
-        """Get user's credit balance (resets daily free credits)"""
+        """Get user's credit balance (read-only; daily reset and expiry are computed, not written)"""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            # Check if daily free credits need reset
             cursor.execute('''
                 SELECT premium_credits, free_credits_today, last_free_reset,
                        referral_code, total_generations, subscription_status,
-                       subscription_expires_at
+                       subscription_expires_at, subscription_plan
                 FROM users WHERE id = ?
             ''', (user_id,))
             
             result = cursor.fetchone()
+            conn.close()
             if not result:
-                conn.close()
                 return {'success': False, 'error': 'User not found'}
             
-            premium, free, last_reset, ref_code, total_gens, sub_status, sub_expires = result
+            premium, free, last_reset, ref_code, total_gens, sub_status, sub_expires, sub_plan = result
             
-            # Check if subscription expired
-            if sub_status == 'active':
-                from datetime import datetime
-                if sub_expires and datetime.fromisoformat(sub_expires) < datetime.now():
-                    cursor.execute('''
-                        UPDATE users SET subscription_status = 'expired'
-                        WHERE id = ?
-                    ''', (user_id,))
-                    sub_status = 'expired'
-                    conn.commit()
-            
-            # Reset daily free credits if new day
-            from datetime import date
-            today = str(date.today())
-            
-            if last_reset != today:
-                free = 10  # Reset to 10 free credits
-                cursor.execute('''
-                    UPDATE users 
-                    SET free_credits_today = 10, last_free_reset = DATE('now')
-                    WHERE id = ?
-                ''', (user_id,))
-                conn.commit()
-            
-            conn.close()
+            # Persisted lazily by use_credit / reconcile_credit_state
+            free = effective_free_credits(free, last_reset)
+            sub_status = effective_subscription_status(sub_status, sub_expires)
             
             return {
                 'success': True,
@@ -332,6 +285,7 @@ class UserDatabase:
                 'total_generations': total_gens,
                 'subscription_status': sub_status,
                 'subscription_expires': sub_expires,
+                'subscription_plan': sub_plan if sub_status == 'active' else None,
                 'has_unlimited': sub_status == 'active'
             }
             
@@ -345,12 +299,16 @@ class UserDatabase:
             cursor = conn.cursor()
             
             if credit_type == 'free':
+                # Applies a pending daily reset in the same statement
+                today = date.today().isoformat()
                 cursor.execute('''
                     UPDATE users 
-                    SET free_credits_today = free_credits_today - 1,
+                    SET free_credits_today = CASE WHEN last_free_reset IS ?
+                                                  THEN free_credits_today ELSE ? END - 1,
+                        last_free_reset = ?,
                         total_generations = total_generations + 1
-                    WHERE id = ? AND free_credits_today > 0
-                ''', (user_id,))
+                    WHERE id = ? AND (last_free_reset IS NOT ? OR free_credits_today > 0)
+                ''', (today, FREE_DAILY_CREDITS, today, user_id, today))
             else:  # premium
                 cursor.execute('''
                     UPDATE users 
@@ -363,6 +321,9 @@ class UserDatabase:
                 conn.close()
                 return {'success': False, 'error': 'Insufficient credits'}
             
+            if credit_type != 'free':
+                post_transfer(cursor, user_account(user_id), USAGE, 1, 'generation', user_id)
+            
             conn.commit()
             conn.close()
             
@@ -371,28 +332,197 @@ class UserDatabase:
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def add_credits(self, user_id, credits, transaction_id=None, amount=0):
-        """Add premium credits to user and log transaction"""
+    def add_credits(self, user_id, credits, transaction_id=None, amount=0, entry_type=None):
+        """Add premium credits to user and log transaction (purchases with a transaction_id, else a promotion)"""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
+            self._credit_user(cursor, user_id, credits, transaction_id, amount, entry_type)
+            
+            conn.commit()
+            conn.close()
+            
+            return {'success': True, 'message': f'{credits} credits added'}
+            
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def _credit_user(self, cursor, user_id, credits, transaction_id=None, amount=0, entry_type=None):
+        cursor.execute('''
+            UPDATE users SET premium_credits = premium_credits + ?
+            WHERE id = ?
+        ''', (credits, user_id))
+        if cursor.rowcount == 0:
+            raise ValueError(f'User {user_id} not found')
+        
+        # Log transaction
+        if transaction_id:
             cursor.execute('''
-                UPDATE users SET premium_credits = premium_credits + ?
+                INSERT INTO transactions (user_id, stripe_payment_id, amount, credits, status)
+                VALUES (?, ?, ?, ?, 'completed')
+            ''', (user_id, transaction_id, amount, credits))
+            post_transfer(cursor, STRIPE, user_account(user_id), credits, entry_type or 'purchase', user_id, transaction_id)
+        else:
+            post_transfer(cursor, PROMOTIONS, user_account(user_id), credits, entry_type or 'grant', user_id)
+    
+    def import_stripe_payments(self, payments):
+        """
+        Apply a batch of Stripe credit purchases in one transaction
+        
+        payments: [{'user_id', 'credits', 'payment_id', 'amount'}]; payment ids
+        already recorded in transactions are skipped, so re-importing is safe.
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            imported = skipped = 0
+            for payment in payments:
+                cursor.execute('SELECT 1 FROM transactions WHERE stripe_payment_id = ?', (payment['payment_id'],))
+                if cursor.fetchone():
+                    skipped += 1
+                    continue
+                self._credit_user(cursor, payment['user_id'], payment['credits'],
+                                  payment['payment_id'], payment.get('amount', 0))
+                imported += 1
+            
+            conn.commit()
+            conn.close()
+            
+            return {'success': True, 'imported': imported, 'skipped': skipped}
+            
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def get_ledger_summary(self, since=None):
+        """Credit balances by system account and flows by entry type"""
+        try:
+            return {'success': True, **ledger_summary(self.db_path, since)}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def reserve_credits(self, user_id, credits, purpose=None, ttl_minutes=30):
+        """Hold premium credits for a multi-unit operation (one transaction)"""
+        try:
+            if credits < 1:
+                return {'success': False, 'error': 'Reservation must be at least 1 credit'}
+            
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE users SET premium_credits = premium_credits - ?
+                WHERE id = ? AND premium_credits >= ?
+            ''', (credits, user_id, credits))
+            
+            if cursor.rowcount == 0:
+                conn.close()
+                return {'success': False, 'error': 'Insufficient credits'}
+            
+            reservation_id = secrets.token_urlsafe(16)
+            expires_at = datetime.now() + timedelta(minutes=ttl_minutes)
+            cursor.execute('''
+                INSERT INTO credit_reservations (id, user_id, credits, purpose, expires_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (reservation_id, user_id, credits, purpose, expires_at.isoformat()))
+            post_transfer(cursor, user_account(user_id), HELD, credits, 'reservation', user_id, reservation_id)
+            
+            conn.commit()
+            conn.close()
+            
+            return {'success': True, 'reservation_id': reservation_id, 'credits': credits}
+            
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def commit_reservation(self, reservation_id, credits_used=None, generations=1):
+        """Charge a reservation, refunding any unused credits (one transaction)"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            # Claim the reservation first so a retry can never settle it twice
+            cursor.execute('''
+                UPDATE credit_reservations SET status = 'committed', settled_at = ?
+                WHERE id = ? AND status = 'held'
+            ''', (datetime.now().isoformat(), reservation_id))
+            
+            if cursor.rowcount == 0:
+                conn.close()
+                return {'success': False, 'error': 'Reservation not found or already settled'}
+            
+            cursor.execute('SELECT user_id, credits FROM credit_reservations WHERE id = ?', (reservation_id,))
+            user_id, held = cursor.fetchone()
+            
+            used = held if credits_used is None else max(0, min(credits_used, held))
+            cursor.execute('UPDATE credit_reservations SET credits_used = ? WHERE id = ?', (used, reservation_id))
+            cursor.execute('''
+                UPDATE users
+                SET premium_credits = premium_credits + ?,
+                    total_generations = total_generations + ?
                 WHERE id = ?
-            ''', (credits, user_id))
+            ''', (held - used, generations, user_id))
+            post_transfer(cursor, HELD, USAGE, used, 'generation', user_id, reservation_id)
+            post_transfer(cursor, HELD, user_account(user_id), held - used, 'refund', user_id, reservation_id)
             
-            # Log transaction
-            if transaction_id:
-                cursor.execute('''
-                    INSERT INTO transactions (user_id, stripe_payment_id, amount, credits, status)
-                    VALUES (?, ?, ?, ?, 'completed')
-                ''', (user_id, transaction_id, amount, credits))
+            conn.commit()
+            conn.close()
+            
+            return {'success': True, 'credits_used': used, 'credits_refunded': held - used}
+            
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def release_reservation(self, reservation_id):
+        """Return all held credits to the user (one transaction)"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE credit_reservations SET status = 'released', settled_at = ?
+                WHERE id = ? AND status = 'held'
+            ''', (datetime.now().isoformat(), reservation_id))
+            
+            if cursor.rowcount == 0:
+                conn.close()
+                return {'success': False, 'error': 'Reservation not found or already settled'}
+            
+            cursor.execute('SELECT user_id, credits FROM credit_reservations WHERE id = ?', (reservation_id,))
+            user_id, held = cursor.fetchone()
+            cursor.execute('''
+                UPDATE users SET premium_credits = premium_credits + ?
+                WHERE id = ?
+            ''', (held, user_id))
+            post_transfer(cursor, HELD, user_account(user_id), held, 'refund', user_id, reservation_id)
             
             conn.commit()
             conn.close()
             
-            return {'success': True, 'message': f'{credits} credits added'}
+            return {'success': True, 'message': 'Reservation released'}
+            
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def release_expired_reservations(self):
+        """Refund holds abandoned by crashed or disconnected requests"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            now = datetime.now().isoformat()
+            
+            cursor.execute('''
+                SELECT id FROM credit_reservations
+                WHERE status = 'held' AND expires_at < ?
+            ''', (now,))
+            expired = [row[0] for row in cursor.fetchall()]
+            conn.close()
+            
+            released = sum(1 for reservation_id in expired
+                           if self.release_reservation(reservation_id).get('success'))
+            
+            return {'success': True, 'released': released}
             
         except Exception as e:
             return {'success': False, 'error': str(e)}
@@ -420,13 +550,19 @@ class UserDatabase:
             ''', (referrer_id,))
             
             # Give 5 extra credits to new user
+            today = date.today().isoformat()
             cursor.execute('''
                 UPDATE users 
                 SET premium_credits = premium_credits + 5,
-                    free_credits_today = free_credits_today + 5,
+                    free_credits_today = CASE WHEN last_free_reset IS ?
+                                              THEN free_credits_today ELSE ? END + 5,
+                    last_free_reset = ?,
                     referred_by = ?
                 WHERE id = ?
-            ''', (referrer_id, user_id))
+            ''', (today, FREE_DAILY_CREDITS, today, referrer_id, user_id))
+            
+            post_transfer(cursor, PROMOTIONS, user_account(referrer_id), 10, 'referral', referrer_id, str(user_id))
+            post_transfer(cursor, PROMOTIONS, user_account(user_id), 5, 'referral', user_id, str(referrer_id))
             
             conn.commit()
             conn.close()
@@ -451,6 +587,7 @@ class UserDatabase:
                 UPDATE users SET premium_credits = premium_credits + ?
                 WHERE id = ?
             ''', (credits, user_id))
+            post_transfer(cursor, PROMOTIONS, user_account(user_id), credits, 'achievement', user_id, achievement_type)
             
             conn.commit()
             conn.close()
@@ -462,22 +599,13 @@ class UserDatabase:
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def activate_subscription(self, user_id, subscription_id):
-        """Activate unlimited subscription for user"""
+    def activate_subscription(self, user_id, subscription_id, plan=None):
+        """Activate unlimited subscription for user (plan: SUBSCRIPTION_PLANS id, if known)"""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            from datetime import datetime, timedelta
-            expires_at = datetime.now() + timedelta(days=30)
-            
-            cursor.execute('''
-                UPDATE users 
-                SET subscription_status = 'active',
-                    subscription_id = ?,
-                    subscription_expires_at = ?
-                WHERE id = ?
-            ''', (subscription_id, expires_at.isoformat(), user_id))
+            self._activate_subscription(cursor, user_id, subscription_id, plan)
             
             conn.commit()
             conn.close()
@@ -487,17 +615,24 @@ class UserDatabase:
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    def _activate_subscription(self, cursor, user_id, subscription_id, plan=None):
+        expires_at = datetime.now() + timedelta(days=30)
+        cursor.execute('''
+            UPDATE users 
+            SET subscription_status = 'active',
+                subscription_id = ?,
+                subscription_expires_at = ?,
+                subscription_plan = ?
+            WHERE id = ?
+        ''', (subscription_id, expires_at.isoformat(), plan, user_id))
+    
     def deactivate_subscription(self, subscription_id):
         """Deactivate subscription when cancelled"""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            cursor.execute('''
-                UPDATE users 
-                SET subscription_status = 'cancelled'
-                WHERE subscription_id = ?
-            ''', (subscription_id,))
+            self._deactivate_subscription(cursor, subscription_id)
             
             conn.commit()
             conn.close()
@@ -507,6 +642,13 @@ class UserDatabase:
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    def _deactivate_subscription(self, cursor, subscription_id):
+        cursor.execute('''
+            UPDATE users 
+            SET subscription_status = 'cancelled'
+            WHERE subscription_id = ?
+        ''', (subscription_id,))
+    
     def increment_generations(self, user_id):
         """Increment generation count for unlimited users"""
         try:
@@ -534,8 +676,8 @@ class UserDatabase:
             cursor = conn.cursor()
             
             cursor.execute('''
-                SELECT premium_credits, free_credits_today, low_token_threshold, 
-                       low_token_notified, subscription_status
+                SELECT premium_credits, free_credits_today, last_free_reset, low_token_threshold, 
+                       low_token_notified, subscription_status, subscription_expires_at
                 FROM users WHERE id = ?
             ''', (user_id,))
             
@@ -544,7 +686,9 @@ class UserDatabase:
                 conn.close()
                 return {'needs_alert': False}
             
-            premium, free, threshold, notified, sub_status = result
+            premium, free, last_reset, threshold, notified, sub_status, sub_expires = result
+            free = effective_free_credits(free, last_reset)
+            sub_status = effective_subscription_status(sub_status, sub_expires)
             
             # Don't alert unlimited users
             if sub_status == 'active':
@@ -631,3 +775,49 @@ class UserDatabase:
         except Exception as e:
             return {'success': False, 'error': str(e)}
 
+    
+    def reconcile_credit_state(self, batch_size=500):
+        """Persist lazily computed daily resets and subscription expiries in small batches"""
+        try:
+            today = date.today().isoformat()
+            now = datetime.now().isoformat()
+            expired = reset = 0
+            
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            # Short transactions so request writes never wait long on the lock
+            while True:
+                cursor.execute('''
+                    UPDATE users SET subscription_status = 'expired'
+                    WHERE id IN (
+                        SELECT id FROM users
+                        WHERE subscription_status = 'active' AND subscription_expires_at < ?
+                        LIMIT ?
+                    )
+                ''', (now, batch_size))
+                conn.commit()
+                expired += cursor.rowcount
+                if cursor.rowcount < batch_size:
+                    break
+            
+            while True:
+                cursor.execute('''
+                    UPDATE users SET free_credits_today = ?, last_free_reset = ?
+                    WHERE id IN (
+                        SELECT id FROM users
+                        WHERE last_free_reset IS NOT ?
+                        LIMIT ?
+                    )
+                ''', (FREE_DAILY_CREDITS, today, today, batch_size))
+                conn.commit()
+                reset += cursor.rowcount
+                if cursor.rowcount < batch_size:
+                    break
+            
+            conn.close()
+            
+            return {'success': True, 'subscriptions_expired': expired, 'free_credits_reset': reset}
+            
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
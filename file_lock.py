@@ -0,0 +1,44 @@
+"""
+Cross-process File Locks for Picly
+Non-blocking flock on a lock file, so only one of the gunicorn workers (or a
+CLI run next to them) does a job and the others skip it. The lock goes away
+when the holder releases it or its process exits.
+
+Without fcntl (Windows) every caller gets the lock.
+"""
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    fcntl = None
+    FCNTL_AVAILABLE = False
+
+
+class FileLock:
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    @property
+    def held(self):
+        return self.file is not None
+
+    def acquire(self):
+        """Take the lock without waiting; False if another process holds it"""
+        if self.file is not None:
+            return True
+        lock_file = open(self.path, 'a')
+        if FCNTL_AVAILABLE:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+        self.file = lock_file
+        return True
+
+    def release(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,265 @@
+"""
+Generation Job Scheduler
+Weighted-fair queueing in front of the provider workers so paid tiers keep
+steady latency during free-tier surges, with aging so free/anonymous
+traffic is never starved
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FuturesTimeout
+
+from rate_governor import rate_governor
+
+
+# Priority classes share the names used for rate limiting in rootAI.py
+# Weight = share of worker dispatches while every class has work queued
+CLASS_WEIGHTS = {
+    'unlimited_user': 8,
+    'premium_user': 4,
+    'free_user': 2,
+    'anonymous': 1,
+}
+
+# A job that has waited this long is dispatched next regardless of class
+AGING_SECONDS = 15.0
+
+MAX_QUEUE_DEPTH = {
+    'unlimited_user': 500,
+    'premium_user': 500,
+    'free_user': 200,
+    'anonymous': 100,
+}
+
+
+def priority_class_for(credits_info=None):
+    """Map get_user_credits() output (None for anonymous) to a priority class"""
+    if not credits_info or not credits_info.get('success', True):
+        return 'anonymous'
+    if credits_info.get('has_unlimited'):
+        return 'unlimited_user'
+    if credits_info.get('premium_credits', 0) > 0:
+        return 'premium_user'
+    return 'free_user'
+
+
+class JobRejected(Exception):
+    """Job refused at submit time (queue full or provider throttled)"""
+
+    def __init__(self, reason, retry_after=5):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class JobTimeout(FuturesTimeout):
+    """run() stopped waiting; a job still queued was cancelled, a started one keeps running"""
+
+    def __init__(self, future, started):
+        super().__init__('Generation timed out' + (' while running' if started else ' in queue'))
+        self.future = future
+        self.started = started
+
+
+class _Job:
+    __slots__ = ('priority_class', 'fn', 'args', 'kwargs', 'future', 'enqueued_at')
+
+    def __init__(self, priority_class, fn, args, kwargs):
+        self.priority_class = priority_class
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class _ClassMetrics:
+    def __init__(self):
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.aged_dispatches = 0
+        self.recent_waits = deque(maxlen=500)
+
+
+class GenerationScheduler:
+    def __init__(self, workers=None, weights=None, aging_seconds=AGING_SECONDS, max_queue_depth=None):
+        self.weights = dict(weights or CLASS_WEIGHTS)
+        self.aging_seconds = aging_seconds
+        self.max_queue_depth = dict(max_queue_depth or MAX_QUEUE_DEPTH)
+        self.worker_count = workers or int(os.getenv('GENERATION_WORKERS', 16))
+
+        self.queues = {cls: deque() for cls in self.weights}
+        self.passes = {cls: 0.0 for cls in self.weights}  # Stride-scheduling virtual time
+        self.virtual_time = 0.0
+        self.metrics = {cls: _ClassMetrics() for cls in self.weights}
+        self.condition = threading.Condition()
+        self.workers = []
+        self.running = 0
+        self.admission_checks = []
+
+    def add_admission_check(self, check):
+        """Register check(priority_class, provider), which raises JobRejected to refuse a job at submit"""
+        self.admission_checks.append(check)
+
+    def _ensure_workers(self):
+        # Started on first submit so gunicorn forks before any thread exists
+        if self.workers:
+            return
+        for i in range(self.worker_count):
+            worker = threading.Thread(target=self._worker_loop, name=f'generation-worker-{i}', daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def submit(self, priority_class, fn, *args, provider=None, **kwargs):
+        """
+        Queue a generation job
+
+        Args:
+            priority_class: one of CLASS_WEIGHTS (unknown classes run as 'anonymous')
+            provider: provider name; if its outbound throttle would reject, fail fast
+
+        Returns:
+            concurrent.futures.Future resolving to fn's return value
+
+        Raises:
+            JobRejected: queue for the class is full, the provider is throttled
+                or an admission check refused the job
+        """
+        if priority_class not in self.queues:
+            priority_class = 'anonymous'
+
+        self.admit(priority_class, provider)
+        job = _Job(priority_class, fn, args, kwargs)
+
+        with self.condition:
+            self._ensure_workers()
+            queue = self.queues[priority_class]
+            if len(queue) >= self.max_queue_depth.get(priority_class, 100):
+                self.metrics[priority_class].rejected += 1
+                raise JobRejected('Generation queue is full')
+
+            # A class returning from idle must not spend credit banked while idle
+            if not queue:
+                self.passes[priority_class] = max(self.passes[priority_class], self.virtual_time)
+
+            queue.append(job)
+            self.metrics[priority_class].submitted += 1
+            self.condition.notify()
+
+        return job.future
+
+    def admit(self, priority_class, provider=None):
+        """
+        Run the admission checks and provider throttle check for one job without
+        queueing it (for work that reaches providers another way, e.g. batches)
+
+        Raises:
+            JobRejected: the job would be refused at submit
+        """
+        if priority_class not in self.queues:
+            priority_class = 'anonymous'
+
+        try:
+            for check in self.admission_checks:
+                check(priority_class, provider)
+            if provider and rate_governor.would_reject(provider):
+                raise JobRejected(f'{provider} is rate limiting us',
+                                  retry_after=int(rate_governor.estimate_wait(provider)) + 1)
+        except JobRejected:
+            with self.condition:
+                self.metrics[priority_class].rejected += 1
+            raise
+
+    def run(self, priority_class, fn, *args, provider=None, timeout=None, **kwargs):
+        """
+        Submit a job and block until it finishes (for Flask request threads)
+
+        Raises:
+            JobTimeout: no result within timeout. A job still queued is cancelled
+                and never runs; one already running finishes on its future.
+        """
+        future = self.submit(priority_class, fn, *args, provider=provider, **kwargs)
+        try:
+            return future.result(timeout)
+        except FuturesTimeout:
+            raise JobTimeout(future, started=not future.cancel())
+
+    def _next_job(self):
+        """Pick the next job (caller holds the condition lock)"""
+        now = time.monotonic()
+        for cls, queue in self.queues.items():
+            # Jobs whose caller gave up are dropped without using a turn
+            while queue and queue[0].future.cancelled():
+                queue.popleft()
+                self.metrics[cls].cancelled += 1
+        waiting = [cls for cls, queue in self.queues.items() if queue]
+        if not waiting:
+            return None
+
+        # Anti-starvation: the longest-waiting job past the aging limit goes first
+        oldest = max(waiting, key=lambda cls: now - self.queues[cls][0].enqueued_at)
+        if now - self.queues[oldest][0].enqueued_at >= self.aging_seconds:
+            self.metrics[oldest].aged_dispatches += 1
+            chosen = oldest
+        else:
+            chosen = min(waiting, key=lambda cls: (self.passes[cls], -self.weights[cls]))
+
+        self.virtual_time = self.passes[chosen]
+        self.passes[chosen] += 1.0 / self.weights[chosen]
+        return self.queues[chosen].popleft()
+
+    def _worker_loop(self):
+        while True:
+            with self.condition:
+                job = self._next_job()
+                while job is None:
+                    self.condition.wait()
+                    job = self._next_job()
+                self.metrics[job.priority_class].recent_waits.append(time.monotonic() - job.enqueued_at)
+                self.running += 1
+
+            started = job.future.set_running_or_notify_cancel()
+            if started:
+                try:
+                    job.future.set_result(job.fn(*job.args, **job.kwargs))
+                except BaseException as e:
+                    job.future.set_exception(e)
+
+            with self.condition:
+                self.running -= 1
+                if started:
+                    self.metrics[job.priority_class].completed += 1
+                else:
+                    self.metrics[job.priority_class].cancelled += 1
+
+    def stats(self):
+        """Per-class queue depth and wait-time metrics"""
+        with self.condition:
+            classes = {}
+            for cls, queue in self.queues.items():
+                metrics = self.metrics[cls]
+                waits = sorted(metrics.recent_waits)
+                classes[cls] = {
+                    'weight': self.weights[cls],
+                    'queue_depth': len(queue),
+                    'submitted': metrics.submitted,
+                    'completed': metrics.completed,
+                    'rejected': metrics.rejected,
+                    'cancelled': metrics.cancelled,
+                    'aged_dispatches': metrics.aged_dispatches,
+                    'avg_wait': round(sum(waits) / len(waits), 3) if waits else 0,
+                    'p95_wait': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0
+                }
+            return {
+                'workers': self.worker_count,
+                'running': self.running,
+                'classes': classes
+            }
+
+
+# Global instance
+generation_scheduler = GenerationScheduler()
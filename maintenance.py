@@ -0,0 +1,222 @@
+"""
+Database Maintenance Daemon for Picly
+Session expiry, retention pruning, credit reconciliation, ANALYZE and
+analytics snapshots, run in short time-sliced batches on a background
+thread so no job holds a write lock long enough to stall requests.
+
+Every gunicorn worker starts the daemon, but only the one holding the
+maintenance lock file runs the jobs; the others wait to take over if it exits.
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+try:
+    import schedule
+    SCHEDULE_AVAILABLE = True
+except ImportError:
+    schedule = None
+    SCHEDULE_AVAILABLE = False
+
+from analytics_snapshot import export_snapshots, NUMPY_AVAILABLE
+from file_lock import FileLock
+
+
+# Every sqlite file the app writes to
+DATABASES = [
+    'users.db',
+    'cost_monitor.db',
+    'analytics.db',
+    'ratings.db',
+    'learning.db',
+    'social_content.db',
+]
+
+# (database, table, timestamp column) -> days kept
+RETENTION_DAYS = {
+    ('cost_monitor.db', 'api_costs', 'timestamp'): 90,
+    ('analytics.db', 'user_behavior', 'timestamp'): 90,
+    # Rollups: minutes feed the live hourly view, hours feed 24h/weekly reports; days are kept
+    ('cost_monitor.db', 'cost_rollup_minute', 'bucket_start'): 2,
+    ('cost_monitor.db', 'cost_rollup_hour', 'bucket_start'): 90,
+    ('cost_monitor.db', 'spend_anomalies', 'last_seen'): 90,
+}
+
+# Time slicing: rows per transaction, pause between slices, budget per run
+BATCH_SIZE = 1000
+SLICE_PAUSE = 0.05
+JOB_BUDGET_SECONDS = 5.0
+
+# Held by the one process that runs maintenance; the others retry this often
+LOCK_PATH = 'maintenance.lock'
+LOCK_RETRY_SECONDS = 60
+
+
+class MaintenanceDaemon:
+    def __init__(self, user_db=None, databases=None, retention=None, lock_path=LOCK_PATH):
+        self.user_db = user_db
+        self.lock = FileLock(lock_path)
+        self.databases = list(databases or DATABASES)
+        self.retention = dict(retention or RETENTION_DAYS)
+        self.scheduler = schedule.Scheduler() if SCHEDULE_AVAILABLE else None
+        self.active = False
+        self.last_runs = {}
+
+    def _sliced(self, step, budget=JOB_BUDGET_SECONDS):
+        """
+        Call step() until it reports less than a full batch or the budget runs out
+
+        step returns (rows_affected, batch_size); each call is its own transaction
+        """
+        deadline = time.monotonic() + budget
+        total = 0
+        while True:
+            affected, batch_size = step()
+            total += affected
+            if affected < batch_size or time.monotonic() >= deadline:
+                return total
+            time.sleep(SLICE_PAUSE)
+
+    def expire_sessions(self):
+        """Delete expired sessions in batches"""
+        if not self.user_db:
+            return 0
+
+        def step():
+            result = self.user_db.cleanup_expired_sessions(BATCH_SIZE)
+            return result.get('deleted', 0), BATCH_SIZE
+
+        return self._record('expire_sessions', self._sliced(step))
+
+    def prune_retention(self):
+        """Delete rows older than each table's retention window, in batches"""
+        deleted = {}
+        for (db_path, table, column), days in self.retention.items():
+            if not os.path.exists(db_path):
+                continue
+            # Timestamps are written as local 'YYYY-MM-DD HH:MM:SS'
+            cutoff = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+
+            def step():
+                conn = sqlite3.connect(db_path)
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    DELETE FROM {table} WHERE rowid IN (
+                        SELECT rowid FROM {table} WHERE {column} < ? LIMIT ?
+                    )
+                ''', (cutoff, BATCH_SIZE))
+                conn.commit()
+                affected = cursor.rowcount
+                conn.close()
+                return affected, BATCH_SIZE
+
+            try:
+                deleted[table] = self._sliced(step)
+            except sqlite3.OperationalError as e:
+                deleted[table] = f'skipped: {e}'
+
+        return self._record('prune_retention', deleted)
+
+    def reconcile_credits(self):
+        """Persist lazily computed free-credit resets / subscription expiries, release stale holds"""
+        if not self.user_db:
+            return {}
+        result = {
+            'credits': self.user_db.reconcile_credit_state(),
+            'reservations': self.user_db.release_expired_reservations()
+        }
+        return self._record('reconcile_credits', result)
+
+    def optimize(self):
+        """Refresh query planner statistics on every database"""
+        for db_path in self._existing():
+            conn = sqlite3.connect(db_path)
+            conn.execute('PRAGMA analysis_limit=1000')  # Bounded sampling keeps ANALYZE fast
+            conn.execute('ANALYZE')
+            conn.execute('PRAGMA optimize')
+            conn.close()
+        return self._record('optimize', len(self._existing()))
+
+    def export_analytics(self):
+        """Snapshot analytics tables to columnar files for the dashboards"""
+        if not NUMPY_AVAILABLE or 'analytics.db' not in self._existing():
+            return self._record('export_analytics', 'skipped')
+        exported = export_snapshots('analytics.db')
+        return self._record('export_analytics', exported if exported is not None else 'skipped: another process is exporting')
+
+    def _existing(self):
+        # Never create a database file just to maintain it
+        return [db_path for db_path in self.databases if os.path.exists(db_path)]
+
+    def _record(self, job, result):
+        self.last_runs[job] = {'at': datetime.now().isoformat(), 'result': result}
+        return result
+
+    def _safe(self, job):
+        def run():
+            try:
+                job()
+            except Exception as e:
+                print(f"Maintenance job {job.__name__} failed: {e}")
+        return run
+
+    def start(self):
+        """Start the maintenance thread"""
+        if self.active:
+            return
+        if not SCHEDULE_AVAILABLE:
+            print("⚠️  schedule not installed - database maintenance disabled")
+            return
+
+        self.scheduler.every(15).minutes.do(self._safe(self.expire_sessions))
+        self.scheduler.every().hour.do(self._safe(self.reconcile_credits))
+        self.scheduler.every().day.at("03:00").do(self._safe(self.prune_retention))
+        self.scheduler.every().day.at("03:30").do(self._safe(self.optimize))
+        self.scheduler.every(15).minutes.do(self._safe(self.export_analytics))
+
+        self.active = True
+        threading.Thread(target=self._loop, name='db-maintenance', daemon=True).start()
+
+    def stop(self):
+        self.active = False
+
+    def claim(self):
+        """Become the maintenance runner unless another process already is"""
+        return self.lock.acquire()
+
+    def _loop(self):
+        while self.active and not self.claim():
+            time.sleep(LOCK_RETRY_SECONDS)
+
+        # Catch up on anything missed while no process was running maintenance
+        if self.active:
+            self._safe(self.expire_sessions)()
+            self._safe(self.reconcile_credits)()
+            self._safe(self.export_analytics)()
+        while self.active:
+            self.scheduler.run_pending()
+            time.sleep(30)
+        self.lock.release()
+
+    def stats(self):
+        return {'active': self.active, 'runner': self.lock.held, 'last_runs': self.last_runs}
+
+
+def vacuum_offline(databases=None):
+    """Rebuild every database to return free pages to the filesystem (run with the app stopped)"""
+    for db_path in databases or DATABASES:
+        conn = sqlite3.connect(db_path)
+        conn.execute('VACUUM')
+        conn.close()
+        print(f"✅ Vacuumed {db_path}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'vacuum':
+        vacuum_offline(sys.argv[2:] or None)
+    else:
+        print("Usage: python maintenance.py vacuum [db ...]   (stop the app first)")
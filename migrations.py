@@ -0,0 +1,354 @@
+"""
+Schema Migrations for Picly
+Versioned schema changes per component, recorded in a schema_version table
+inside each component's sqlite database. Subsystems call migrate() at startup;
+once a database is current that costs a single read, and no DDL runs.
+
+Usage (offline, e.g. in the Render build/release step before workers boot):
+    python migrations.py            # apply pending migrations to every database
+    python migrations.py status     # show current versions
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+
+from schema_baseline import (
+    USERS_SCHEMA, COST_MONITOR_SCHEMA, ANALYTICS_SCHEMA, QUALITY_OPTIMIZER_SCHEMA,
+    RATINGS_SCHEMA, LEARNING_SCHEMA, SOCIAL_CONTENT_SCHEMA
+)
+
+
+# Default database file for each component
+COMPONENT_DATABASES = {
+    'users': 'users.db',
+    'cost_monitor': 'cost_monitor.db',
+    'analytics': 'analytics.db',
+    'quality_optimizer': 'analytics.db',
+    'ratings': 'ratings.db',
+    'learning': 'learning.db',
+    'social_content': 'social_content.db',
+}
+
+# component -> [(version, description, [statements])], in version order.
+# A statement is SQL text or a (sql, params) tuple.
+MIGRATIONS = {
+    'users': [
+        (1, 'baseline', USERS_SCHEMA),
+        (2, 'index session expiry and open credit reservations', [
+            'CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)',
+            'CREATE INDEX IF NOT EXISTS idx_credit_reservations_open ON credit_reservations (status, expires_at)',
+        ]),
+        # Existing rows were all hashed with PBKDF2-SHA256 at 100,000 iterations
+        (3, 'per-user password algorithm and cost for rehash on login', [
+            "ALTER TABLE users ADD COLUMN password_algorithm TEXT NOT NULL DEFAULT 'pbkdf2_sha256'",
+            'ALTER TABLE users ADD COLUMN password_iterations INTEGER NOT NULL DEFAULT 100000',
+        ]),
+        (4, 'revocation list for signed session tokens', [
+            '''
+                CREATE TABLE IF NOT EXISTS revoked_tokens (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    jti TEXT UNIQUE NOT NULL,
+                    expires_at INTEGER NOT NULL,
+                    revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''',
+            'CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires_at ON revoked_tokens (expires_at)',
+        ]),
+        # Opening entries carry existing balances (and credits already on hold) into the ledger
+        (5, 'double-entry premium credit ledger', [
+            '''
+                CREATE TABLE IF NOT EXISTS credit_ledger (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    transfer_id TEXT NOT NULL,
+                    account TEXT NOT NULL,
+                    user_id INTEGER,
+                    amount INTEGER NOT NULL,
+                    entry_type TEXT NOT NULL,
+                    reference TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''',
+            '''
+                CREATE TABLE IF NOT EXISTS ledger_accounts (
+                    account TEXT PRIMARY KEY,
+                    balance INTEGER NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''',
+            'CREATE INDEX IF NOT EXISTS idx_credit_ledger_user ON credit_ledger (user_id, created_at)',
+            'CREATE INDEX IF NOT EXISTS idx_credit_ledger_time ON credit_ledger (created_at, entry_type, amount)',
+            'CREATE INDEX IF NOT EXISTS idx_transactions_payment ON transactions (stripe_payment_id)',
+            '''
+                INSERT INTO credit_ledger (transfer_id, account, user_id, amount, entry_type)
+                SELECT 'opening:' || id, 'user:' || id, id, premium_credits, 'opening_balance'
+                FROM users WHERE premium_credits != 0
+            ''',
+            '''
+                INSERT INTO credit_ledger (transfer_id, account, user_id, amount, entry_type)
+                SELECT 'opening:' || id, 'opening_balance', id, -premium_credits, 'opening_balance'
+                FROM users WHERE premium_credits != 0
+            ''',
+            '''
+                INSERT INTO credit_ledger (transfer_id, account, user_id, amount, entry_type, reference)
+                SELECT 'opening:' || id, account, user_id, amount, 'opening_balance', id
+                FROM (
+                    SELECT id, 'held' AS account, user_id, credits AS amount FROM credit_reservations WHERE status = 'held'
+                    UNION ALL
+                    SELECT id, 'opening_balance', user_id, -credits FROM credit_reservations WHERE status = 'held'
+                )
+            ''',
+            '''
+                INSERT INTO ledger_accounts (account, balance)
+                SELECT account, SUM(amount) FROM credit_ledger
+                WHERE account NOT LIKE 'user:%' GROUP BY account
+            ''',
+        ]),
+        (6, 'durable Stripe webhook event queue', [
+            '''
+                CREATE TABLE IF NOT EXISTS stripe_events (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    event_id TEXT UNIQUE NOT NULL,
+                    event_type TEXT NOT NULL,
+                    stripe_created INTEGER,
+                    payload TEXT NOT NULL,
+                    status TEXT DEFAULT 'pending',
+                    attempts INTEGER DEFAULT 0,
+                    last_error TEXT,
+                    received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    applied_at TIMESTAMP
+                )
+            ''',
+            'CREATE INDEX IF NOT EXISTS idx_stripe_events_pending ON stripe_events (status, stripe_created, seq)',
+        ]),
+        # NULL for legacy unlimited subscriptions bought before plans were recorded
+        (7, 'subscription plan id for plan-gated features', [
+            'ALTER TABLE users ADD COLUMN subscription_plan TEXT',
+        ]),
+    ],
+    'cost_monitor': [
+        (1, 'baseline', COST_MONITOR_SCHEMA),
+        (2, 'covering indexes for time-window cost and revenue queries', [
+            # get_hourly_stats / get_daily_stats / get_user_costs / check_cost_alerts
+            'CREATE INDEX IF NOT EXISTS idx_api_costs_time_user ON api_costs (timestamp, user_id, cost)',
+            # get_cost_breakdown
+            'CREATE INDEX IF NOT EXISTS idx_api_costs_time_service ON api_costs (timestamp, api_service, operation, cost)',
+            'CREATE INDEX IF NOT EXISTS idx_revenue_time ON revenue (timestamp, amount)',
+        ]),
+        (3, 'minute/hour/day cost rollups, backfilled from api_costs', [
+            # Rows so far hold UTC CURRENT_TIMESTAMP defaults; from now on they are
+            # written in local time, like the windows the reports compare against
+            "UPDATE api_costs SET timestamp = datetime(timestamp, 'localtime') WHERE timestamp IS NOT NULL",
+            "UPDATE revenue SET timestamp = datetime(timestamp, 'localtime') WHERE timestamp IS NOT NULL",
+            *[f'''
+                CREATE TABLE IF NOT EXISTS cost_rollup_{granularity} (
+                    bucket_start TEXT NOT NULL,
+                    api_service TEXT NOT NULL,
+                    operation TEXT NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    requests INTEGER NOT NULL DEFAULT 0,
+                    failures INTEGER NOT NULL DEFAULT 0,
+                    total_cost REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (bucket_start, api_service, operation, user_id)
+                )
+            ''' for granularity in ('minute', 'hour', 'day')],
+            *[f'''
+                INSERT INTO cost_rollup_{granularity}
+                    (bucket_start, api_service, operation, user_id, requests, failures, total_cost)
+                SELECT {bucket}, COALESCE(api_service, 'unknown'), COALESCE(operation, 'unknown'),
+                       COALESCE(user_id, 0), COUNT(*), SUM(NOT COALESCE(success, 1)), COALESCE(SUM(cost), 0)
+                FROM api_costs
+                GROUP BY 1, 2, 3, 4
+            ''' for granularity, bucket in (
+                ('minute', "strftime('%Y-%m-%d %H:%M:00', timestamp)"),
+                ('hour', "strftime('%Y-%m-%d %H:00:00', timestamp)"),
+                ('day', "strftime('%Y-%m-%d', timestamp)"),
+            )],
+            'CREATE UNIQUE INDEX IF NOT EXISTS idx_hourly_stats_hour ON hourly_stats (hour_start)',
+        ]),
+        (4, 'per-user spend anomaly flags shared between workers', [
+            '''
+                CREATE TABLE IF NOT EXISTS spend_anomalies (
+                    user_id INTEGER PRIMARY KEY,
+                    tier TEXT NOT NULL,
+                    window_cost REAL NOT NULL,
+                    baseline REAL NOT NULL,
+                    first_flagged_at TEXT NOT NULL,
+                    last_seen TEXT NOT NULL
+                )
+            ''',
+            'CREATE INDEX IF NOT EXISTS idx_spend_anomalies_last_seen ON spend_anomalies (last_seen)',
+        ]),
+    ],
+    'analytics': [
+        (1, 'baseline', ANALYTICS_SCHEMA),
+        # Replaces the *_rate columns, which were recomputed over every generation of the prompt per click
+        (2, 'per-prompt download/share/regeneration counters', [
+            'ALTER TABLE prompt_analytics ADD COLUMN download_count INTEGER NOT NULL DEFAULT 0',
+            'ALTER TABLE prompt_analytics ADD COLUMN share_count INTEGER NOT NULL DEFAULT 0',
+            'ALTER TABLE prompt_analytics ADD COLUMN regeneration_count INTEGER NOT NULL DEFAULT 0',
+            '''
+                UPDATE prompt_analytics SET
+                    download_count = (SELECT COUNT(*) FROM generation_ratings g
+                                      WHERE g.prompt_hash = prompt_analytics.prompt_hash
+                                        AND g.engine = prompt_analytics.engine AND g.downloaded),
+                    share_count = (SELECT COUNT(*) FROM generation_ratings g
+                                   WHERE g.prompt_hash = prompt_analytics.prompt_hash
+                                     AND g.engine = prompt_analytics.engine AND g.shared),
+                    regeneration_count = (SELECT COUNT(*) FROM generation_ratings g
+                                          WHERE g.prompt_hash = prompt_analytics.prompt_hash
+                                            AND g.engine = prompt_analytics.engine AND g.regenerated)
+            ''',
+        ]),
+    ],
+    'quality_optimizer': [
+        (1, 'baseline', QUALITY_OPTIMIZER_SCHEMA),
+    ],
+    'ratings': [
+        (1, 'baseline', RATINGS_SCHEMA),
+        (2, 'per-user rating indexes for get_user_stats', [
+            'CREATE INDEX IF NOT EXISTS idx_image_ratings_user ON image_ratings (user_id, rating, timestamp)',
+            'CREATE INDEX IF NOT EXISTS idx_video_ratings_user ON video_ratings (user_id, rating)',
+        ]),
+    ],
+    'learning': [
+        (1, 'baseline', LEARNING_SCHEMA),
+        (2, 'index unlearned prompts by engagement for analyze_and_learn', [
+            'CREATE INDEX IF NOT EXISTS idx_harvested_unlearned ON harvested_prompts (learned_patterns, engagement_score)',
+        ]),
+    ],
+    'social_content': [
+        (1, 'baseline', SOCIAL_CONTENT_SCHEMA),
+        (2, 'index the posting queue and its joins', [
+            'CREATE INDEX IF NOT EXISTS idx_content_queue_status_time ON content_queue (status, scheduled_time)',
+            'CREATE INDEX IF NOT EXISTS idx_generated_content_queue ON generated_content (queue_id)',
+            'CREATE INDEX IF NOT EXISTS idx_posted_content_content ON posted_content (content_id)',
+        ]),
+    ],
+}
+
+
+# Persistent database settings, applied outside any transaction after migrating
+PRAGMAS = {
+    'users': ['PRAGMA journal_mode=WAL'],  # Balance reads proceed during writes
+}
+
+# (database, component) pairs known to be current in this process
+_current = set()
+_current_lock = threading.Lock()
+
+
+def latest_version(component):
+    return MIGRATIONS[component][-1][0] if MIGRATIONS.get(component) else 0
+
+
+def current_version(conn, component):
+    """Highest applied version for a component (0 if none)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            component TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (component, version)
+        )
+    ''')
+    row = conn.execute('SELECT MAX(version) FROM schema_version WHERE component = ?', (component,)).fetchone()
+    return row[0] or 0
+
+
+def _applied_version(conn, component):
+    """Read-only version check (0 if schema_version does not exist yet)"""
+    try:
+        row = conn.execute('SELECT MAX(version) FROM schema_version WHERE component = ?', (component,)).fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+
+def migrate(db_path, component):
+    """
+    Apply pending migrations for a component
+
+    Fast path: a database already at the latest version is only read, never
+    locked for writing. Otherwise each migration runs in its own IMMEDIATE
+    transaction, so concurrent workers serialize and whoever loses the race
+    sees it already applied.
+
+    Returns:
+        List of versions applied by this call
+    """
+    key = (os.path.abspath(db_path), component)
+    if key in _current:
+        return []
+
+    latest = latest_version(component)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.isolation_level = None  # Explicit transactions (DDL included)
+    applied = []
+
+    try:
+        if _applied_version(conn, component) >= latest:
+            with _current_lock:
+                _current.add(key)
+            return applied
+
+        for version, description, statements in MIGRATIONS.get(component, []):
+            if version <= current_version(conn, component):
+                continue
+
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if version <= current_version(conn, component):
+                    conn.execute('ROLLBACK')
+                    continue
+                for statement in statements:
+                    if isinstance(statement, tuple):
+                        conn.execute(*statement)
+                    else:
+                        conn.execute(statement)
+                conn.execute('INSERT INTO schema_version (component, version, description) VALUES (?, ?, ?)',
+                             (component, version, description))
+                conn.execute('COMMIT')
+                applied.append(version)
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+        for pragma in PRAGMAS.get(component, []):
+            conn.execute(pragma)
+    finally:
+        conn.close()
+
+    with _current_lock:
+        _current.add(key)
+    return applied
+
+
+def migrate_all():
+    """Apply pending migrations to every component's default database"""
+    return {component: migrate(db_path, component) for component, db_path in COMPONENT_DATABASES.items()}
+
+
+def status():
+    """Current and latest version for every component"""
+    result = {}
+    for component, db_path in COMPONENT_DATABASES.items():
+        conn = sqlite3.connect(db_path)
+        result[component] = {
+            'database': db_path,
+            'current': current_version(conn, component),
+            'latest': latest_version(component)
+        }
+        conn.close()
+    return result
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'status':
+        for component, info in status().items():
+            print(f"{component:18} {info['database']:20} v{info['current']} / v{info['latest']}")
+    else:
+        for component, versions in migrate_all().items():
+            print(f"✅ {component}: {'applied ' + str(versions) if versions else 'up to date'}")
@@ -0,0 +1,308 @@
+"""
+Prompt Suggestion Index
+In-memory inverted index over rated prompts from prompt_analytics, for
+typeahead suggestions. Each engine has a sorted token vocabulary (for prefix
+lookups of the word being typed) and per-token postings kept in quality order,
+so a query walks the best prompts first and stops after a bounded scan.
+Matches are ranked by how well they fit the query blended with avg_rating
+and success_rate.
+
+The index is loaded from the database on first use and updated in place as
+rating batches are applied. Ratings applied by other workers show up at the
+next periodic reload, which is rebuilt on a background thread while queries
+keep being served from the current index.
+"""
+
+import bisect
+import heapq
+import re
+import sqlite3
+import threading
+import time
+
+
+# Prompts need this many ratings and this average to be suggested
+MIN_RATINGS = 3
+MIN_AVG_RATING = 4.0
+
+# Quality is shrunk toward NEUTRAL_QUALITY for prompts with few ratings
+PRIOR_RATINGS = 3
+NEUTRAL_QUALITY = 0.5
+
+# Final score = RELEVANCE_WEIGHT * text relevance + (1 - RELEVANCE_WEIGHT) * quality
+RELEVANCE_WEIGHT = 0.6
+
+# Candidates ranked per query (x limit), and the most postings walked to find them
+CANDIDATE_FACTOR = 4
+MAX_SCAN = 2000
+
+# Most vocabulary tokens a prefix expands to (1-2 letter prefixes can match thousands)
+MAX_PREFIX_TOKENS = 256
+
+# Full reload from the database, to pick up ratings applied in other workers
+RELOAD_SECONDS = 300
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def quality_score(avg_rating, success_rate, total_ratings):
+    """0-1 blend of avg_rating and success_rate, shrunk toward neutral for few ratings"""
+    raw = 0.5 * ((avg_rating or 1) - 1) / 4 + 0.5 * (success_rate or 0)
+    confidence = total_ratings / (total_ratings + PRIOR_RATINGS)
+    return NEUTRAL_QUALITY + (raw - NEUTRAL_QUALITY) * confidence
+
+
+class _EngineShard:
+    """Index for one engine"""
+
+    def __init__(self):
+        self.entries = {}   # prompt_hash -> entry dict
+        self.postings = {}  # token -> sorted [(-quality, prompt_hash)]
+        self.vocab = []     # sorted tokens with postings
+        self.ranked = []    # sorted [(-quality, prompt_hash)] over every entry
+
+    def add(self, prompt_hash, entry):
+        posting = (-entry['quality'], prompt_hash)
+        self.entries[prompt_hash] = entry
+        bisect.insort(self.ranked, posting)
+        for token in entry['tokens']:
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = []
+                bisect.insort(self.vocab, token)
+            bisect.insort(postings, posting)
+
+    def remove(self, prompt_hash):
+        entry = self.entries.pop(prompt_hash, None)
+        if entry is None:
+            return
+        posting = (-entry['quality'], prompt_hash)
+        _discard(self.ranked, posting)
+        for token in entry['tokens']:
+            postings = self.postings[token]
+            _discard(postings, posting)
+            if not postings:
+                del self.postings[token]
+                _discard(self.vocab, token)
+
+    def term_lists(self, token, is_prefix):
+        """Posting lists matching one query term"""
+        if not is_prefix:
+            postings = self.postings.get(token)
+            return [postings] if postings else []
+        start = bisect.bisect_left(self.vocab, token)
+        stop = min(start + MAX_PREFIX_TOKENS, len(self.vocab))
+        end = bisect.bisect_left(self.vocab, token + '\uffff', start, stop)
+        return [self.postings[word] for word in self.vocab[start:end]]
+
+
+def _discard(sorted_list, item):
+    i = bisect.bisect_left(sorted_list, item)
+    if i < len(sorted_list) and sorted_list[i] == item:
+        del sorted_list[i]
+
+
+def _walk(lists):
+    """Postings of several lists in quality order, each prompt once"""
+    seen = set()
+    for _, prompt_hash in heapq.merge(*lists):
+        if prompt_hash not in seen:
+            seen.add(prompt_hash)
+            yield prompt_hash
+
+
+def _matches(entry, token, is_prefix):
+    if not is_prefix:
+        return token in entry['tokens']
+    return any(word.startswith(token) for word in entry['tokens'])
+
+
+class PromptIndex:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.shards = {}
+        self.loaded_at = None
+        self.reloading = False
+        self.replay = None  # Rows applied while a reload is reading the database
+        self.reloads = 0
+        self.queries = 0
+        self.total_query_us = 0
+        self.max_query_us = 0
+
+    def _entry(self, prompt_text, avg_rating, success_rate, total_ratings):
+        return {
+            'prompt': prompt_text,
+            'tokens': frozenset(tokenize(prompt_text)),
+            'normalized': ' '.join(tokenize(prompt_text)),
+            'avg_rating': avg_rating,
+            'success_rate': success_rate,
+            'total_ratings': total_ratings,
+            'quality': quality_score(avg_rating, success_rate, total_ratings)
+        }
+
+    def _eligible(self, avg_rating, total_ratings):
+        return (total_ratings or 0) >= MIN_RATINGS and (avg_rating or 0) >= MIN_AVG_RATING
+
+    def reload(self):
+        """Rebuild the whole index from prompt_analytics"""
+        with self.lock:
+            self.replay = []
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute('''
+            SELECT prompt_hash, engine, prompt_text, avg_rating, success_rate, total_ratings
+            FROM prompt_analytics WHERE total_ratings >= ? AND avg_rating >= ?
+        ''', (MIN_RATINGS, MIN_AVG_RATING)).fetchall()
+        conn.close()
+
+        shards = {}
+        for prompt_hash, engine, prompt_text, avg_rating, success_rate, total_ratings in rows:
+            shard = shards.get(engine)
+            if shard is None:
+                shard = shards[engine] = _EngineShard()
+            shard.add(prompt_hash, self._entry(prompt_text, avg_rating, success_rate, total_ratings))
+
+        with self.lock:
+            # Rows applied since the SELECT may be missing from it
+            self._apply_rows(shards, self.replay)
+            self.replay = None
+            self.shards = shards
+            self.loaded_at = time.monotonic()
+            self.reloads += 1
+
+    def apply(self, rows):
+        """
+        Fold updated prompt_analytics rows into the index
+
+        rows: [(prompt_hash, engine, prompt_text, avg_rating, success_rate, total_ratings)]
+        """
+        with self.lock:
+            if self.replay is not None:
+                self.replay.extend(rows)
+            if self.loaded_at is not None:
+                self._apply_rows(self.shards, rows)
+            # Otherwise the first query loads everything from the database
+
+    def _apply_rows(self, shards, rows):
+        # Called with self.lock held
+        for prompt_hash, engine, prompt_text, avg_rating, success_rate, total_ratings in rows:
+            shard = shards.get(engine)
+            if shard is None:
+                shard = shards[engine] = _EngineShard()
+            shard.remove(prompt_hash)
+            if self._eligible(avg_rating, total_ratings):
+                shard.add(prompt_hash, self._entry(prompt_text, avg_rating, success_rate, total_ratings))
+
+    def _refresh(self):
+        """Start a reload when the index is missing or stale; only the first load blocks a query"""
+        with self.lock:
+            due = not self.reloading and (self.loaded_at is None or
+                                          time.monotonic() - self.loaded_at > RELOAD_SECONDS)
+            if due:
+                self.reloading = True
+            first_load = self.loaded_at is None
+        if not due:
+            return
+        if first_load:
+            self._run_reload()  # Nothing to serve yet
+        else:
+            threading.Thread(target=self._run_reload, name='prompt-index-reload', daemon=True).start()
+
+    def _run_reload(self):
+        try:
+            self.reload()
+        finally:
+            with self.lock:
+                self.reloading = False
+                self.replay = None
+
+    def suggest(self, engine, partial_prompt, limit=5):
+        """Best rated prompts for an engine that match what has been typed so far"""
+        self._refresh()
+
+        started = time.perf_counter()
+        partial_prompt = partial_prompt or ''
+        tokens = tokenize(partial_prompt)
+        # The word still being typed matches as a prefix
+        typing = partial_prompt[-1:].isalnum()
+        terms = [(token, typing and i == len(tokens) - 1) for i, token in enumerate(tokens)]
+
+        with self.lock:
+            shard = self.shards.get(engine)
+            if shard is None:
+                results = []
+            elif not terms:
+                results = [self._result(shard.entries[prompt_hash], shard.entries[prompt_hash]['quality'])
+                           for _, prompt_hash in shard.ranked[:limit]]
+            else:
+                results = self._search(shard, terms, ' '.join(tokens), limit)
+
+        elapsed = (time.perf_counter() - started) * 1e6
+        self.queries += 1
+        self.total_query_us += elapsed
+        self.max_query_us = max(self.max_query_us, elapsed)
+        return results
+
+    def _search(self, shard, terms, normalized_query, limit):
+        # Called with self.lock held
+        wanted = limit * CANDIDATE_FACTOR
+        lists = [shard.term_lists(token, is_prefix) for token, is_prefix in terms]
+        candidates = {}
+
+        # Prompts matching every term, walked from the most selective term in quality order
+        if all(lists):
+            driver = min(range(len(terms)), key=lambda i: sum(len(postings) for postings in lists[i]))
+            others = [term for i, term in enumerate(terms) if i != driver]
+            for scanned, prompt_hash in enumerate(_walk(lists[driver])):
+                if len(candidates) >= wanted or scanned >= MAX_SCAN:
+                    break
+                entry = shard.entries[prompt_hash]
+                if all(_matches(entry, token, is_prefix) for token, is_prefix in others):
+                    candidates[prompt_hash] = len(terms)
+
+        # Too few: fill with prompts matching some of the terms
+        if len(candidates) < limit:
+            for scanned, prompt_hash in enumerate(_walk([postings for term_lists in lists for postings in term_lists])):
+                if len(candidates) >= wanted or scanned >= MAX_SCAN:
+                    break
+                if prompt_hash not in candidates:
+                    entry = shard.entries[prompt_hash]
+                    candidates[prompt_hash] = sum(1 for token, is_prefix in terms
+                                                  if _matches(entry, token, is_prefix))
+
+        scored = []
+        for prompt_hash, matched in candidates.items():
+            entry = shard.entries[prompt_hash]
+            relevance = (0.6 * matched / len(terms) +
+                         0.25 * min(1.0, len(terms) / max(len(entry['tokens']), 1)) +
+                         0.15 * entry['normalized'].startswith(normalized_query))
+            score = RELEVANCE_WEIGHT * relevance + (1 - RELEVANCE_WEIGHT) * entry['quality']
+            scored.append((score, prompt_hash))
+
+        return [self._result(shard.entries[prompt_hash], score)
+                for score, prompt_hash in heapq.nlargest(limit, scored)]
+
+    def _result(self, entry, score):
+        return {
+            'prompt': entry['prompt'],
+            'avg_rating': entry['avg_rating'],
+            'success_rate': entry['success_rate'],
+            'score': round(score, 4)
+        }
+
+    def stats(self):
+        with self.lock:
+            prompts = sum(len(shard.entries) for shard in self.shards.values())
+            tokens = sum(len(shard.vocab) for shard in self.shards.values())
+        return {
+            'prompts': prompts,
+            'tokens': tokens,
+            'reloads': self.reloads,
+            'queries': self.queries,
+            'avg_query_us': round(self.total_query_us / self.queries, 1) if self.queries else None,
+            'max_query_us': round(self.max_query_us, 1)
+        }
@@ -0,0 +1,14 @@
+"""
+Async AI Provider Clients for Picly
+asyncio clients per engine with per-provider concurrency limits.
+Flask routes call them through run_sync(); one event loop per worker
+drives every outstanding provider call.
+"""
+
+from providers.base import AsyncProvider, ProviderError, ProviderResponse, run_sync, submit, get_event_loop
+from providers.dalle import DalleProvider
+from providers.huggingface import HuggingFaceProvider
+from providers.replicate import ReplicateProvider
+from providers.runway import RunwayProvider
+from providers.stability import StabilityProvider
+from providers.pool import ProviderPool
@@ -0,0 +1,242 @@
+"""
+Async Provider Client Base
+Shared event loop, HTTP transport and per-provider concurrency limits
+"""
+
+import asyncio
+import functools
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from http import HTTPStatus
+
+import requests
+
+from rate_governor import rate_governor, ThrottleRejected
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except (ImportError, Exception):
+    aiohttp = None
+    AIOHTTP_AVAILABLE = False
+
+
+# Max in-flight jobs per provider. Defaults follow each provider's entry-tier
+# concurrency guidance; override per deployment with PROVIDER_CONCURRENCY_<NAME>
+PROVIDER_CONCURRENCY = {
+    'openai': 5,
+    'replicate': 10,
+    'huggingface': 2,   # Free Inference API is heavily shared
+    'stability': 10,
+    'runway': 2,        # Gen-3 tasks are long-running; keep the queue at Runway small
+}
+
+IMAGES_DIR = 'generated_images'
+
+
+class ProviderError(Exception):
+    """HTTP or transport failure talking to a provider"""
+    
+    def __init__(self, message, status_code=None, timeout=False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.timeout = timeout
+
+
+class ProviderResponse:
+    """Transport-independent HTTP response"""
+    
+    def __init__(self, status_code, headers, content, url=''):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.url = url
+    
+    def json(self):
+        return json.loads(self.content) if self.content else {}
+    
+    def raise_for_status(self):
+        """Raise ProviderError with a requests-style message on 4xx/5xx"""
+        if self.status_code >= 400:
+            try:
+                reason = HTTPStatus(self.status_code).phrase
+            except ValueError:
+                reason = 'Error'
+            kind = 'Client' if self.status_code < 500 else 'Server'
+            raise ProviderError(
+                f'{self.status_code} {kind} Error: {reason} for url: {self.url}',
+                status_code=self.status_code
+            )
+
+
+# ============ SHARED EVENT LOOP ============
+# One loop per worker process drives every outstanding provider call.
+# Created lazily so gunicorn forks before the loop thread exists.
+
+_loop = None
+_loop_lock = threading.Lock()
+_session = None
+
+
+def get_event_loop():
+    """Return the shared provider event loop, starting its thread on first use"""
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name='provider-loop', daemon=True)
+            thread.start()
+        return _loop
+
+
+def submit(coro):
+    """Schedule a coroutine on the provider loop and return a concurrent Future"""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+
+
+def run_sync(coro, timeout=None):
+    """Run a provider coroutine from synchronous (Flask) code and wait for its result"""
+    return submit(coro).result(timeout)
+
+
+async def _get_session():
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession()
+    return _session
+
+
+async def http_request(method, url, headers=None, json_body=None, data=None, files=None, timeout=60):
+    """
+    Issue an HTTP request without blocking the loop
+    
+    Uses aiohttp when installed; otherwise the blocking requests call is
+    offloaded to the loop's default executor.
+    
+    Args:
+        files: {field: (filename, bytes, content_type)} for multipart uploads
+    """
+    try:
+        if AIOHTTP_AVAILABLE:
+            session = await _get_session()
+            kwargs = {}
+            if files:
+                form = aiohttp.FormData()
+                for key, value in (data or {}).items():
+                    form.add_field(key, str(value))
+                for key, (filename, content, content_type) in files.items():
+                    form.add_field(key, content, filename=filename, content_type=content_type)
+                kwargs['data'] = form
+            elif data is not None:
+                kwargs['data'] = data
+            if json_body is not None:
+                kwargs['json'] = json_body
+            
+            async with session.request(method, url, headers=headers,
+                                       timeout=aiohttp.ClientTimeout(total=timeout), **kwargs) as resp:
+                content = await resp.read()
+                return ProviderResponse(resp.status, dict(resp.headers), content, url)
+        
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(None, functools.partial(
+            requests.request, method, url, headers=headers, json=json_body,
+            data=data, files=files, timeout=timeout
+        ))
+        return ProviderResponse(response.status_code, dict(response.headers), response.content, url)
+    
+    except asyncio.TimeoutError:
+        raise ProviderError(f'Request to {url} timed out', timeout=True)
+    except requests.Timeout:
+        raise ProviderError(f'Request to {url} timed out', timeout=True)
+    except requests.RequestException as e:
+        raise ProviderError(str(e))
+    except Exception as e:
+        if AIOHTTP_AVAILABLE and isinstance(e, aiohttp.ClientError):
+            raise ProviderError(str(e))
+        raise
+
+
+def save_image_bytes(content, prefix='generated'):
+    """Write image bytes under generated_images/ and return the public URL"""
+    # Suffix keeps filenames unique when many generations finish in the same second
+    filename = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.png"
+    os.makedirs(IMAGES_DIR, exist_ok=True)
+    with open(os.path.join(IMAGES_DIR, filename), 'wb') as f:
+        f.write(content)
+    return f'/{IMAGES_DIR}/{filename}'
+
+
+class AsyncProvider:
+    """Base class for async provider clients with a bounded job slot pool"""
+    
+    name = 'provider'
+    placeholder_key = None
+    primary_endpoint = 'default'
+    
+    def __init__(self, api_key, concurrency=None):
+        self.api_key = api_key
+        env_limit = os.getenv(f'PROVIDER_CONCURRENCY_{self.name.upper()}')
+        self.concurrency = concurrency or int(env_limit or PROVIDER_CONCURRENCY.get(self.name, 4))
+        self._semaphore = None
+        self.in_flight = 0
+    
+    @property
+    def configured(self):
+        return bool(self.api_key) and self.api_key != self.placeholder_key
+    
+    def slot(self):
+        """Semaphore bounding concurrent jobs (held for a job's full lifetime, polling included)"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+    
+    async def request(self, method, url, endpoint=None, **kwargs):
+        """
+        Send one request through the outbound rate governor
+        
+        Raises:
+            ThrottleRejected: the local queue wait exceeds the governor's budget;
+                _run_job turns it into a rate_limited result
+        """
+        endpoint = endpoint or self.primary_endpoint
+        await rate_governor.acquire(self.name, self.api_key, endpoint)
+        response = await http_request(method, url, **kwargs)
+        rate_governor.update_from_headers(self.name, self.api_key, endpoint,
+                                          response.status_code, response.headers)
+        return response
+    
+    def stats(self):
+        return {
+            'provider': self.name,
+            'concurrency': self.concurrency,
+            'in_flight': self.in_flight
+        }
+    
+    async def _run_job(self, coro):
+        """Run a provider job inside its concurrency slot"""
+        # Reject early instead of queueing behind a provider that is throttling us
+        wait = rate_governor.estimate_wait(self.name, self.primary_endpoint, self.api_key)
+        if wait > rate_governor.max_wait:
+            coro.close()
+            return self._throttled(wait)
+        
+        async with self.slot():
+            self.in_flight += 1
+            try:
+                return await coro
+            except ThrottleRejected as e:
+                # The bucket drained while this job queued for its slot
+                return self._throttled(e.wait_seconds)
+            finally:
+                self.in_flight -= 1
+    
+    def _throttled(self, wait):
+        return {
+            'success': False,
+            'error': f'{self.name} is busy. Please try again in {int(wait) + 1} seconds.',
+            'rate_limited': True,
+            'retry_after': round(wait, 1)
+        }
@@ -0,0 +1,144 @@
+"""
+OpenAI DALL-E Async Client
+DALL-E 3 generation plus DALL-E 2 edits and variations
+"""
+
+import asyncio
+import io
+
+from providers.base import AsyncProvider, ProviderError, ThrottleRejected
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except (ImportError, Exception):
+    Image = None
+    PIL_AVAILABLE = False
+
+
+class DalleProvider(AsyncProvider):
+    name = 'openai'
+    placeholder_key = 'your-openai-key-here'
+    primary_endpoint = 'images'
+    
+    GENERATIONS_URL = "https://api.openai.com/v1/images/generations"
+    EDITS_URL = "https://api.openai.com/v1/images/edits"
+    VARIATIONS_URL = "https://api.openai.com/v1/images/variations"
+    
+    async def generate(self, prompt, dimensions=None, quality_boost=True):
+        """Generate image using OpenAI DALL-E 3 with enhanced quality"""
+        if not self.configured:
+            return {
+                'success': False,
+                'error': 'Please add your OpenAI API key to the CONFIG dictionary',
+                'demo': True
+            }
+        return await self._run_job(self._generate(prompt, dimensions or {}, quality_boost))
+    
+    async def _generate(self, prompt, dimensions, quality_boost):
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        # DALL-E 3 supports specific sizes: 1024x1024, 1024x1792, or 1792x1024
+        width = dimensions.get('width', 1024)
+        height = dimensions.get('height', 1024)
+        
+        if width == height:
+            size = '1024x1024'
+        elif width > height:
+            size = '1792x1024'
+        else:
+            size = '1024x1792'
+        
+        # ALWAYS use HD quality for best results (industry standard)
+        quality = 'hd'
+        
+        # 'vivid' for hyper-real and dramatic images, 'natural' for less hyper-real
+        style_mode = 'vivid' if quality_boost else 'natural'
+        
+        payload = {
+            "model": "dall-e-3",
+            "prompt": prompt,
+            "n": 1,
+            "size": size,
+            "quality": quality,
+            "style": style_mode
+        }
+        
+        try:
+            response = await self.request('POST', self.GENERATIONS_URL, headers=headers,
+                                          json_body=payload, timeout=60)
+            response.raise_for_status()
+        except ProviderError as e:
+            return {
+                'success': False,
+                'error': f'OpenAI API Error: {str(e)}'
+            }
+        
+        data = response.json()
+        
+        return {
+            'success': True,
+            'image_url': data['data'][0]['url'],
+            'engine': 'DALL-E 3',
+            'revised_prompt': data['data'][0].get('revised_prompt', prompt),
+            'quality': quality,
+            'api_cost': 0.08 if quality == 'hd' else 0.04
+        }
+    
+    async def edit(self, image_path, prompt, edit_mode='edit'):
+        """Edit image (or create a variation when edit_mode == 'variation') using DALL-E 2"""
+        if not self.configured:
+            return {
+                'success': False,
+                'error': 'Please add your OpenAI API key',
+                'demo': True
+            }
+        return await self._run_job(self._edit(image_path, prompt, edit_mode))
+    
+    async def _edit(self, image_path, prompt, edit_mode):
+        try:
+            # Image conversion is CPU/disk work - keep it off the event loop
+            image_bytes = await asyncio.to_thread(_prepare_rgba_png, image_path)
+            
+            files = {'image': ('image.png', image_bytes, 'image/png')}
+            headers = {"Authorization": f"Bearer {self.api_key}"}
+            
+            if edit_mode == 'variation':
+                url = self.VARIATIONS_URL
+                data = {'n': 1, 'size': '1024x1024'}
+            else:
+                url = self.EDITS_URL
+                data = {'prompt': prompt, 'n': 1, 'size': '1024x1024'}
+            
+            response = await self.request('POST', url, headers=headers, data=data, files=files, timeout=120)
+            response.raise_for_status()
+            
+            return {
+                'success': True,
+                'image_url': response.json()['data'][0]['url'],
+                'engine': 'DALL-E',
+                'edit_mode': edit_mode
+            }
+        
+        except ThrottleRejected:
+            raise
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+
+def _prepare_rgba_png(image_path):
+    """Convert to 1024x1024 RGBA PNG as required by the DALL-E 2 edit endpoints"""
+    img = Image.open(image_path)
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+    img = img.resize((1024, 1024), Image.Resampling.LANCZOS)
+    
+    buffer = io.BytesIO()
+    img.save(buffer, 'PNG')
+    return buffer.getvalue()
@@ -0,0 +1,108 @@
+"""
+Hugging Face Inference API Async Client
+Free Flux Schnell generation with Stable Diffusion 2.1 fallback
+"""
+
+import asyncio
+
+from providers.base import AsyncProvider, ProviderError, ThrottleRejected, save_image_bytes
+
+
+class HuggingFaceProvider(AsyncProvider):
+    name = 'huggingface'
+    placeholder_key = 'your-huggingface-key-here'
+    primary_endpoint = 'inference'
+    
+    FLUX_URL = "https://api-inference.huggingface.co/models/black-forest-labs/FLUX.1-schnell"
+    SD21_URL = "https://api-inference.huggingface.co/models/stabilityai/stable-diffusion-2-1"
+    
+    def _headers(self):
+        # Public endpoint works without auth (rate limited but free)
+        if not self.configured:
+            return {"Content-Type": "application/json"}
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    async def generate(self, prompt, negative_prompt='', dimensions=None):
+        """Generate image using Hugging Face Inference API (completely free, no credit card needed)"""
+        return await self._run_job(self._generate(prompt, negative_prompt))
+    
+    async def _generate(self, prompt, negative_prompt):
+        full_prompt = prompt
+        if negative_prompt:
+            full_prompt = f"{prompt}. Avoid: {negative_prompt}"
+        
+        payload = {
+            "inputs": full_prompt,
+            "parameters": {
+                "num_inference_steps": 4,  # Schnell is optimized for 1-4 steps
+                "guidance_scale": 0.0,  # Schnell works best without guidance
+            }
+        }
+        
+        try:
+            content = await self._infer(self.FLUX_URL, payload, max_load_wait=30)
+            image_url = await asyncio.to_thread(save_image_bytes, content)
+            
+            # Hugging Face is FREE (no cost to log)
+            return {
+                'success': True,
+                'image_url': image_url,
+                'engine': 'Flux Schnell (Free)',
+                'quality_tier': 'Free Tier (9.0/10)'
+            }
+        
+        except ProviderError as e:
+            # Model retired - try Stable Diffusion 2.1 as final fallback
+            if e.status_code == 410:
+                try:
+                    fallback_payload = {
+                        "inputs": full_prompt,
+                        "parameters": {
+                            "num_inference_steps": 20,
+                            "guidance_scale": 7.5,
+                        }
+                    }
+                    content = await self._infer(self.SD21_URL, fallback_payload, max_load_wait=20)
+                    image_url = await asyncio.to_thread(save_image_bytes, content)
+                    
+                    return {
+                        'success': True,
+                        'image_url': image_url,
+                        'engine': 'Stable Diffusion 2.1 (Free)',
+                        'quality_tier': 'Free Tier (8.5/10)'
+                    }
+                except ThrottleRejected:
+                    raise
+                except Exception:
+                    pass
+            
+            return {
+                'success': False,
+                'error': f'Hugging Face API error: {str(e)}'
+            }
+        except ThrottleRejected:
+            raise
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Unexpected error: {str(e)}'
+            }
+    
+    async def _infer(self, url, payload, max_load_wait):
+        """POST to an inference endpoint, waiting once for a cold model to load (503)"""
+        response = await self.request('POST', url, headers=self._headers(), json_body=payload, timeout=90)
+        
+        if response.status_code == 503:
+            try:
+                estimated_time = response.json().get('estimated_time', 20)
+            except ValueError:
+                estimated_time = 20
+            print(f"Model loading, waiting {estimated_time} seconds...")
+            await asyncio.sleep(min(estimated_time + 5, max_load_wait))
+            response = await self.request('POST', url, headers=self._headers(), json_body=payload, timeout=90)
+        
+        response.raise_for_status()
+        return response.content
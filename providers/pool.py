@@ -0,0 +1,68 @@
+"""
+Provider Pool
+One configured async client per engine, shared by every request in the worker
+"""
+
+import asyncio
+
+from providers.base import submit
+from providers.dalle import DalleProvider
+from providers.huggingface import HuggingFaceProvider
+from providers.replicate import ReplicateProvider
+from providers.runway import RunwayProvider
+from providers.stability import StabilityProvider
+
+
+# Most provider calls a single batch request may have in flight at once
+BATCH_CONCURRENCY = 8
+
+
+class ProviderPool:
+    def __init__(self, config):
+        self.dalle = DalleProvider(config.get('OPENAI_API_KEY'))
+        self.replicate = ReplicateProvider(config.get('REPLICATE_API_KEY'))
+        self.huggingface = HuggingFaceProvider(config.get('HUGGINGFACE_API_KEY'))
+        self.stability = StabilityProvider(config.get('STABILITY_API_KEY'))
+        self.runway = RunwayProvider(config.get('RUNWAY_API_KEY'))
+    
+    @property
+    def providers(self):
+        return [self.dalle, self.replicate, self.huggingface, self.stability, self.runway]
+    
+    async def generate_free(self, prompt, negative_prompt='', dimensions=None, quality_boost=True):
+        """Free tier: Replicate Flux Schnell, falling back to Hugging Face when Replicate wants payment"""
+        result = await self.replicate.generate_flux(prompt, negative_prompt, dimensions, quality_boost)
+        
+        error = str(result.get('error', ''))
+        if not result.get('success') and ('402' in error or 'Payment Required' in error):
+            print("Replicate requires payment, falling back to Hugging Face...")
+            result = await self.huggingface.generate(prompt, negative_prompt, dimensions)
+        
+        return result
+    
+    def submit_batch(self, coros, concurrency=BATCH_CONCURRENCY, stop=None):
+        """
+        Schedule provider coroutines on the shared loop, at most `concurrency` in flight
+        
+        Once `stop` (a threading.Event) is set, coroutines that have not started
+        are skipped and their futures resolve to None; running ones finish, since
+        the provider may already be billing for them.
+        
+        Returns:
+            One concurrent Future per coroutine, in input order
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def bounded(coro):
+            try:
+                async with semaphore:
+                    if stop is not None and stop.is_set():
+                        return None
+                    return await coro
+            finally:
+                coro.close()  # Cancelled before it started
+        
+        return [submit(bounded(coro)) for coro in coros]
+    
+    def stats(self):
+        return {provider.name: provider.stats() for provider in self.providers}
@@ -0,0 +1,243 @@
+"""
+Replicate Async Client
+Flux Schnell (free tier) and SDXL + Refiner predictions
+"""
+
+import asyncio
+
+from providers.base import AsyncProvider, ProviderError, ThrottleRejected
+
+
+FLUX_SCHNELL_VERSION = "5599ed30703defd1d160a25a63321b4dec97101d98b4674bcc56e41f62f35637"
+SDXL_REFINER_VERSION = "7762fd07cf82c948538e41f63f77d685e02b063e37e496e96eefd46c929f9bdc"
+
+
+class ReplicateProvider(AsyncProvider):
+    name = 'replicate'
+    placeholder_key = 'your-replicate-key-here'
+    primary_endpoint = 'predictions'
+    
+    PREDICTIONS_URL = "https://api.replicate.com/v1/predictions"
+    
+    def _headers(self, wait=True):
+        headers = {
+            "Authorization": f"Token {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        if wait:
+            headers["Prefer"] = "wait"  # Wait for result instead of polling
+        return headers
+    
+    async def generate_flux(self, prompt, negative_prompt='', dimensions=None, quality_boost=True):
+        """Generate image using Replicate (Flux Schnell) with enhanced quality"""
+        if not self.configured:
+            return {
+                'success': False,
+                'error': 'Please add your Replicate API key to the CONFIG dictionary',
+                'demo': True
+            }
+        return await self._run_job(self._generate_flux(prompt, negative_prompt, dimensions or {}))
+    
+    async def _generate_flux(self, prompt, negative_prompt, dimensions):
+        width = dimensions.get('width', 1024)
+        height = dimensions.get('height', 1024)
+        aspect_ratio = "1:1"
+        if width > height:
+            aspect_ratio = "16:9"
+        elif height > width:
+            aspect_ratio = "9:16"
+        
+        input_params = {
+            "prompt": prompt,
+            "num_outputs": 1,
+            "aspect_ratio": aspect_ratio,
+            "output_format": "png",
+            "output_quality": 90
+        }
+        
+        # Flux Schnell doesn't support negative prompts, so add to main prompt
+        if negative_prompt:
+            input_params["prompt"] = f"{prompt}. Avoid: {negative_prompt}"
+        
+        payload = {"version": FLUX_SCHNELL_VERSION, "input": input_params}
+        
+        # The rate governor turns a 429 into a local hold (Retry-After or backoff),
+        # so a retry simply queues behind it instead of sleeping here
+        max_retries = 3
+        retry_delay = 2
+        
+        for retry in range(max_retries):
+            try:
+                response = await self.request('POST', self.PREDICTIONS_URL, headers=self._headers(),
+                                              json_body=payload, timeout=60)
+                
+                if response.status_code == 429:
+                    if retry < max_retries - 1:
+                        print(f"Rate limited by Replicate, queueing retry {retry + 1}/{max_retries}...")
+                        continue
+                    return {
+                        'success': False,
+                        'error': 'Rate limit exceeded. Please wait a moment and try again.',
+                        'rate_limited': True
+                    }
+                
+                response.raise_for_status()
+                prediction = response.json()
+                
+                # Replicate Flux Schnell is FREE (no cost to log)
+                if prediction.get('status') == 'succeeded' and prediction.get('output'):
+                    return {
+                        'success': True,
+                        'image_url': _first_output(prediction['output']),
+                        'engine': 'Flux Schnell'
+                    }
+                
+                prediction_id = prediction.get('id')
+                if not prediction_id:
+                    return {
+                        'success': False,
+                        'error': 'No prediction ID returned from API'
+                    }
+                
+                status_data = await self._poll(prediction_id, max_attempts=30, interval=1)
+                if status_data is None:
+                    return {
+                        'success': False,
+                        'error': 'Generation timeout after 30 seconds'
+                    }
+                if status_data.get('status') == 'failed':
+                    return {
+                        'success': False,
+                        'error': f"Generation failed: {status_data.get('error', 'Unknown error')}"
+                    }
+                return {
+                    'success': True,
+                    'image_url': _first_output(status_data['output']),
+                    'engine': 'Flux Schnell'
+                }
+            
+            except ProviderError as e:
+                if e.timeout:
+                    if retry < max_retries - 1:
+                        await asyncio.sleep(retry_delay)
+                        continue
+                    return {
+                        'success': False,
+                        'error': 'Request timeout - please try again'
+                    }
+                if retry < max_retries - 1 and e.status_code != 402:
+                    await asyncio.sleep(retry_delay)
+                    continue
+                return {
+                    'success': False,
+                    'error': f'API request failed: {str(e)}'
+                }
+            except ThrottleRejected:
+                raise
+            except Exception as e:
+                return {
+                    'success': False,
+                    'error': f'Unexpected error: {str(e)}'
+                }
+        
+        return {
+            'success': False,
+            'error': 'Maximum retries exceeded. Please try again later.'
+        }
+    
+    async def generate_sdxl(self, prompt, negative_prompt='', dimensions=None, quality_boost=True):
+        """Generate image using SDXL with Refiner for 9/10 quality at $0.003"""
+        if not self.configured:
+            return {
+                'success': False,
+                'error': 'Replicate API key not configured',
+                'demo': True
+            }
+        return await self._run_job(self._generate_sdxl(prompt, negative_prompt, dimensions or {}, quality_boost))
+    
+    async def _generate_sdxl(self, prompt, negative_prompt, dimensions, quality_boost):
+        payload = {
+            "version": SDXL_REFINER_VERSION,
+            "input": {
+                "prompt": prompt,
+                "negative_prompt": negative_prompt or "ugly, blurry, low quality, distorted",
+                "width": dimensions.get('width', 1024),
+                "height": dimensions.get('height', 1024),
+                "num_inference_steps": 50 if quality_boost else 30,
+                "guidance_scale": 9 if quality_boost else 7.5,
+                "refine": "expert_ensemble_refiner",
+                "high_noise_frac": 0.8,
+                "num_outputs": 1
+            }
+        }
+        
+        try:
+            response = await self.request('POST', self.PREDICTIONS_URL, headers=self._headers(),
+                                          json_body=payload, timeout=60)
+            response.raise_for_status()
+            prediction = response.json()
+            
+            if prediction.get('status') == 'succeeded' and prediction.get('output'):
+                return _sdxl_result(prediction['output'])
+            
+            prediction_id = prediction.get('id')
+            if not prediction_id:
+                return {'success': False, 'error': 'No prediction ID returned'}
+            
+            # SDXL takes ~20-30 seconds
+            status_data = await self._poll(prediction_id, max_attempts=40, interval=1)
+            if status_data is None:
+                return {'success': False, 'error': 'Generation timeout'}
+            if status_data.get('status') == 'failed':
+                return {'success': False, 'error': f"Generation failed: {status_data.get('error', 'Unknown error')}"}
+            return _sdxl_result(status_data['output'])
+        
+        except ProviderError as e:
+            return {'success': False, 'error': f'API error: {str(e)}'}
+        except ThrottleRejected:
+            raise
+        except Exception as e:
+            return {'success': False, 'error': f'Unexpected error: {str(e)}'}
+    
+    async def _poll(self, prediction_id, max_attempts, interval):
+        """Poll a prediction until it succeeds with output or fails; None on timeout"""
+        for attempt in range(max_attempts):
+            try:
+                status_response = await self.request(
+                    'GET', f"{self.PREDICTIONS_URL}/{prediction_id}",
+                    endpoint='predictions_poll',
+                    headers={"Authorization": f"Token {self.api_key}"},
+                    timeout=10
+                )
+                
+                # Rate limited while polling - the governor holds the next poll
+                if status_response.status_code == 429:
+                    continue
+                
+                status_data = status_response.json()
+                if status_data.get('status') == 'succeeded' and status_data.get('output'):
+                    return status_data
+                if status_data.get('status') == 'failed':
+                    return status_data
+            except ProviderError:
+                # If polling fails, wait and continue
+                await asyncio.sleep(2)
+                continue
+            
+            await asyncio.sleep(interval)
+        
+        return None
+
+
+def _first_output(output):
+    return output[0] if isinstance(output, list) else output
+
+
+def _sdxl_result(output):
+    return {
+        'success': True,
+        'image_url': _first_output(output),
+        'engine': 'SDXL + Refiner',
+        'quality': '9/10',
+        'api_cost': 0.003  # $0.003 per image
+    }
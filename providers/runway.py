@@ -0,0 +1,101 @@
+"""
+Runway Async Client
+Gen-3 Alpha Turbo image-to-video
+"""
+
+import asyncio
+import base64
+
+from providers.base import AsyncProvider, ProviderError, ThrottleRejected
+
+
+class RunwayProvider(AsyncProvider):
+    name = 'runway'
+    placeholder_key = 'your-runway-key-here'
+    primary_endpoint = 'generations'
+    
+    GENERATIONS_URL = "https://api.runwayml.com/v1/generations"
+    
+    def _headers(self):
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "X-Runway-Version": "2024-11-06"
+        }
+    
+    async def image_to_video(self, image_path, prompt, duration=5):
+        """
+        Generate video from image using Runway Gen-3 Alpha Turbo
+        Quality: 10/10 (industry-leading)
+        Cost: $0.05/second = $0.25 for 5s, $0.40 for 8s
+        """
+        if not self.configured:
+            return {
+                'success': False,
+                'error': 'Runway API key not configured',
+                'demo': True
+            }
+        return await self._run_job(self._image_to_video(image_path, prompt, duration))
+    
+    async def _image_to_video(self, image_path, prompt, duration):
+        try:
+            image_data = await asyncio.to_thread(_read_base64, image_path)
+            
+            payload = {
+                "model": "gen3a_turbo",  # Gen-3 Alpha Turbo (fastest, high quality)
+                "prompt": prompt,
+                "init_image": f"data:image/png;base64,{image_data}",
+                "duration": duration,  # 5 or 10 seconds
+                "ratio": "16:9",
+                "watermark": False
+            }
+            
+            response = await self.request('POST', self.GENERATIONS_URL, headers=self._headers(),
+                                          json_body=payload, timeout=30)
+            response.raise_for_status()
+            
+            task_id = response.json().get('id')
+            if not task_id:
+                return {'success': False, 'error': 'No task ID returned'}
+            
+            # Poll for completion (Gen-3 Turbo takes ~90 seconds)
+            max_attempts = 120
+            for attempt in range(max_attempts):
+                await asyncio.sleep(2)
+                
+                status_response = await self.request('GET', f"{self.GENERATIONS_URL}/{task_id}",
+                                                     endpoint='tasks_poll', headers=self._headers(), timeout=10)
+                if status_response.status_code != 200:
+                    continue
+                
+                status_data = status_response.json()
+                
+                if status_data.get('status') == 'succeeded':
+                    video_url = status_data.get('output', [{}])[0].get('url')
+                    if video_url:
+                        return {
+                            'success': True,
+                            'video_url': video_url,
+                            'duration': duration,
+                            'engine': 'Runway Gen-3 Alpha Turbo',
+                            'quality': '10/10',
+                            'api_cost': duration * 0.05  # $0.05 per second
+                        }
+                
+                elif status_data.get('status') == 'failed':
+                    error = status_data.get('failure_reason', 'Unknown error')
+                    return {'success': False, 'error': f'Generation failed: {error}'}
+            
+            return {'success': False, 'error': 'Video generation timeout'}
+        
+        except ProviderError as e:
+            return {'success': False, 'error': f'Runway API error: {str(e)}'}
+        except ThrottleRejected:
+            raise
+        except Exception as e:
+            return {'success': False, 'error': f'Unexpected error: {str(e)}'}
+
+
+def _read_base64(path):
+    with open(path, 'rb') as f:
+        return base64.b64encode(f.read()).decode('utf-8')
@@ -0,0 +1,84 @@
+"""
+Stability AI Async Client
+SDXL image-to-image editing
+"""
+
+import asyncio
+import base64
+import io
+
+from providers.base import AsyncProvider, ThrottleRejected, save_image_bytes
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except (ImportError, Exception):
+    Image = None
+    PIL_AVAILABLE = False
+
+
+class StabilityProvider(AsyncProvider):
+    name = 'stability'
+    placeholder_key = 'your-stability-key-here'
+    primary_endpoint = 'image_to_image'
+    
+    IMAGE_TO_IMAGE_URL = "https://api.stability.ai/v1/generation/stable-diffusion-xl-1024-v1-0/image-to-image"
+    
+    async def image_to_image(self, image_path, prompt, edit_mode='edit', quality_boost=True):
+        """Edit image using Stability AI"""
+        if not self.configured:
+            return {
+                'success': False,
+                'error': 'Please add your Stability API key',
+                'demo': True
+            }
+        return await self._run_job(self._image_to_image(image_path, prompt, edit_mode, quality_boost))
+    
+    async def _image_to_image(self, image_path, prompt, edit_mode, quality_boost):
+        try:
+            headers = {
+                "Authorization": f"Bearer {self.api_key}",
+                "Accept": "application/json"
+            }
+            
+            image_bytes = await asyncio.to_thread(_prepare_init_image, image_path)
+            files = {"init_image": ('init_image.png', image_bytes, 'image/png')}
+            
+            data = {
+                "text_prompts[0][text]": prompt,
+                "text_prompts[0][weight]": 1,
+                "cfg_scale": 8 if quality_boost else 7,
+                "steps": 50 if quality_boost else 30,
+                "samples": 1,
+                "image_strength": 0.35  # How much to change (0.0-1.0)
+            }
+            
+            response = await self.request('POST', self.IMAGE_TO_IMAGE_URL, headers=headers,
+                                          data=data, files=files, timeout=120)
+            response.raise_for_status()
+            
+            image_data = base64.b64decode(response.json()['artifacts'][0]['base64'])
+            image_url = await asyncio.to_thread(save_image_bytes, image_data, 'edited')
+            
+            return {
+                'success': True,
+                'image_url': image_url,
+                'engine': 'Stability AI',
+                'edit_mode': edit_mode
+            }
+        
+        except ThrottleRejected:
+            raise
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+
+def _prepare_init_image(image_path):
+    img = Image.open(image_path)
+    img = img.resize((1024, 1024), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
@@ -8,6 +8,8 @@ import json
 from datetime import datetime, timedelta
 from collections import defaultdict
 import statistics
+from migrations import migrate
+from services import lazy
 
 class QualityOptimizer:
     def __init__(self, analytics_db='analytics.db'):
@@ -21,125 +23,8 @@ class QualityOptimizer:
         self.speed_weight = 0.2  # Balance for generation speed
     
     def init_optimizer_tables(self):
-        """Create tables for quality optimization"""
-        conn = sqlite3.connect(self.analytics_db)
-        cursor = conn.cursor()
-        
-        # Engine performance profiles
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS engine_profiles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                engine TEXT NOT NULL,
-                settings_hash TEXT NOT NULL,
-                settings_json TEXT NOT NULL,
-                total_uses INTEGER DEFAULT 0,
-                avg_rating REAL DEFAULT 0,
-                avg_quality_score REAL DEFAULT 0,
-                avg_generation_time REAL DEFAULT 0,
-                avg_cost REAL DEFAULT 0,
-                success_rate REAL DEFAULT 0,
-                quality_per_dollar REAL DEFAULT 0,
-                quality_per_second REAL DEFAULT 0,
-                overall_score REAL DEFAULT 0,
-                last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(engine, settings_hash)
-            )
-        ''')
-        
-        # Generation performance logs
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS generation_performance (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                generation_id TEXT NOT NULL,
-                engine TEXT NOT NULL,
-                settings_hash TEXT NOT NULL,
-                prompt_category TEXT,
-                generation_time REAL NOT NULL,
-                cost REAL NOT NULL,
-                rating INTEGER,
-                quality_score REAL,
-                success BOOLEAN DEFAULT 1,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (generation_id) REFERENCES generation_ratings (generation_id)
-            )
-        ''')
-        
-        # Prompt category patterns
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS prompt_categories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                category_name TEXT UNIQUE NOT NULL,
-                keywords TEXT NOT NULL,
-                best_engine TEXT,
-                best_settings TEXT,
-                avg_rating REAL,
-                sample_count INTEGER DEFAULT 0
-            )
-        ''')
-        
-        # Real-time optimization cache
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS optimization_cache (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                cache_key TEXT UNIQUE NOT NULL,
-                recommended_engine TEXT NOT NULL,
-                recommended_settings TEXT NOT NULL,
-                confidence_score REAL NOT NULL,
-                reason TEXT,
-                valid_until TIMESTAMP NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Initialize default prompt categories
-        self.init_default_categories(cursor)
-        
-        conn.commit()
-        conn.close()
-    
-    def init_default_categories(self, cursor):
-        """Initialize common prompt categories"""
-        categories = [
-            {
-                'name': 'portrait',
-                'keywords': json.dumps(['portrait', 'face', 'person', 'selfie', 'headshot', 'character'])
-            },
-            {
-                'name': 'landscape',
-                'keywords': json.dumps(['landscape', 'scenery', 'nature', 'mountain', 'forest', 'ocean', 'sky'])
-            },
-            {
-                'name': 'product',
-                'keywords': json.dumps(['product', 'commercial', 'advertisement', 'packaging', 'logo'])
-            },
-            {
-                'name': 'artistic',
-                'keywords': json.dumps(['art', 'painting', 'artistic', 'abstract', 'creative', 'surreal'])
-            },
-            {
-                'name': 'photorealistic',
-                'keywords': json.dumps(['realistic', 'photorealistic', 'photo', 'real', 'cinematic'])
-            },
-            {
-                'name': 'illustration',
-                'keywords': json.dumps(['illustration', 'cartoon', 'drawing', 'sketch', 'anime', 'comic'])
-            },
-            {
-                'name': 'architecture',
-                'keywords': json.dumps(['building', 'architecture', 'interior', 'room', 'house'])
-            },
-            {
-                'name': 'fantasy',
-                'keywords': json.dumps(['fantasy', 'magical', 'dragon', 'wizard', 'mythical'])
-            }
-        ]
-        
-        for cat in categories:
-            cursor.execute('''
-                INSERT OR IGNORE INTO prompt_categories (category_name, keywords)
-                VALUES (?, ?)
-            ''', (cat['name'], cat['keywords']))
+        """Create or upgrade quality optimization tables (no-op once current)"""
+        migrate(self.analytics_db, 'quality_optimizer')
     
     def categorize_prompt(self, prompt):
         """Automatically categorize prompt based on keywords"""
@@ -465,4 +350,4 @@ class QualityOptimizer:
         conn.close()
 
 # Initialize global optimizer
-quality_optimizer = QualityOptimizer()
+quality_optimizer = lazy('quality_optimizer', QualityOptimizer)
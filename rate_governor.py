@@ -0,0 +1,304 @@
+"""
+Outbound Rate Governor
+Client-side token buckets per provider API key and endpoint, fed by the
+providers' rate-limit headers, so requests queue locally instead of
+hammering providers into 429 storms
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import re
+
+
+# Default budgets: (requests per minute, burst). Provider rate-limit headers
+# tighten these at runtime.
+DEFAULT_LIMITS = {
+    ('openai', 'images'): (5, 2),
+    ('replicate', 'predictions'): (600, 20),
+    ('replicate', 'predictions_poll'): (3000, 50),
+    ('huggingface', 'inference'): (30, 3),
+    ('stability', 'image_to_image'): (900, 10),
+    ('runway', 'generations'): (10, 2),
+    ('runway', 'tasks_poll'): (300, 10),
+}
+FALLBACK_LIMIT = (60, 5)
+
+# Longest a request may queue locally before it is rejected early
+DEFAULT_MAX_WAIT = 30.0
+
+# Backoff applied on a 429 that carries no usable headers
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 30.0
+
+
+class ThrottleRejected(Exception):
+    """Projected local queue wait exceeds the caller's budget"""
+
+    def __init__(self, provider, endpoint, wait_seconds):
+        super().__init__(f'{provider} {endpoint} throttled: estimated wait {wait_seconds:.1f}s')
+        self.provider = provider
+        self.endpoint = endpoint
+        self.wait_seconds = wait_seconds
+
+
+class TokenBucket:
+    """
+    Token bucket with reservations
+
+    Tokens may go negative: each reservation takes a token immediately and
+    is told how long to sleep, which queues callers FIFO without a queue.
+    """
+
+    def __init__(self, requests_per_minute, burst):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.consecutive_429s = 0
+
+        # Metrics
+        self.waiting = 0
+        self.total_requests = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+        self.rejected = 0
+        self.throttled_429s = 0
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def estimate_wait(self, now):
+        """Seconds the next request would have to wait"""
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def admissible(self, now, max_wait):
+        """Requests that could be reserved now without any of them waiting past max_wait"""
+        self._refill(now)
+        if self.blocked_until - now > max_wait:
+            return 0
+        return max(0, int(self.tokens + self.rate * max_wait))
+
+    def reserve(self, now):
+        """Take a token and return how long the caller must wait before sending"""
+        wait = self.estimate_wait(now)
+        self.tokens -= 1
+        return wait
+
+    def refund(self):
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def block_for(self, seconds, now):
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+    def clamp_remaining(self, remaining):
+        """Never believe we have more tokens than the provider says we do"""
+        self.tokens = min(self.tokens, float(remaining))
+
+
+class RateGovernor:
+    def __init__(self, limits=None, max_wait=DEFAULT_MAX_WAIT):
+        self.limits = dict(DEFAULT_LIMITS)
+        if limits:
+            self.limits.update(limits)
+        self.max_wait = max_wait
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def _key(self, provider, api_key, endpoint):
+        # Never keep raw API keys in memory dumps / stats output
+        key_id = hashlib.sha256((api_key or 'anonymous').encode()).hexdigest()[:12]
+        return (provider, key_id, endpoint)
+
+    def _bucket(self, provider, api_key, endpoint):
+        key = self._key(provider, api_key, endpoint)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            rpm, burst = self.limits.get((provider, endpoint), FALLBACK_LIMIT)
+            bucket = self.buckets[key] = TokenBucket(rpm, burst)
+        return bucket
+
+    async def acquire(self, provider, api_key, endpoint, max_wait=None):
+        """
+        Wait for permission to send one request
+
+        Returns:
+            Seconds spent queued locally
+
+        Raises:
+            ThrottleRejected: if the projected wait exceeds max_wait
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+
+        with self.lock:
+            bucket = self._bucket(provider, api_key, endpoint)
+            wait = bucket.reserve(time.monotonic())
+            if wait > max_wait:
+                bucket.refund()
+                bucket.rejected += 1
+                raise ThrottleRejected(provider, endpoint, wait)
+            bucket.total_requests += 1
+            bucket.total_wait += wait
+            bucket.max_wait_seen = max(bucket.max_wait_seen, wait)
+            bucket.waiting += 1
+
+        try:
+            if wait > 0:
+                await asyncio.sleep(wait)
+        finally:
+            with self.lock:
+                bucket.waiting -= 1
+
+        return wait
+
+    def update_from_headers(self, provider, api_key, endpoint, status_code, headers):
+        """Feed a provider response's status and rate-limit headers back into its bucket"""
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        now = time.monotonic()
+
+        remaining = _first_number(headers, (
+            'x-ratelimit-remaining-requests',  # OpenAI
+            'ratelimit-remaining',             # IETF draft
+            'x-ratelimit-remaining',
+        ))
+        reset = _parse_reset(headers, (
+            'x-ratelimit-reset-requests',
+            'ratelimit-reset',
+            'x-ratelimit-reset',
+        ))
+        retry_after = _parse_retry_after(headers.get('retry-after'))
+
+        with self.lock:
+            bucket = self._bucket(provider, api_key, endpoint)
+
+            if remaining is not None:
+                bucket.clamp_remaining(remaining)
+                if remaining <= 0 and reset:
+                    bucket.block_for(reset, now)
+
+            if status_code == 429:
+                bucket.throttled_429s += 1
+                bucket.consecutive_429s += 1
+                bucket.tokens = min(bucket.tokens, 0.0)
+                if retry_after is None and reset is None:
+                    retry_after = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** (bucket.consecutive_429s - 1)))
+                bucket.block_for(retry_after if retry_after is not None else reset, now)
+            else:
+                bucket.consecutive_429s = 0
+                if retry_after is not None and status_code == 503:
+                    bucket.block_for(retry_after, now)
+
+    def estimate_wait(self, provider, endpoint=None, api_key=None):
+        """Projected local queue wait for the next request to a provider (worst matching bucket)"""
+        now = time.monotonic()
+        with self.lock:
+            if api_key is not None and endpoint is not None:
+                return self._bucket(provider, api_key, endpoint).estimate_wait(now)
+
+            waits = [
+                bucket.estimate_wait(now)
+                for (p, _, e), bucket in self.buckets.items()
+                if p == provider and (endpoint is None or e == endpoint)
+            ]
+        return max(waits) if waits else 0.0
+
+    def would_reject(self, provider, endpoint=None, api_key=None, max_wait=None):
+        """Reject-early signal for the job scheduler"""
+        max_wait = self.max_wait if max_wait is None else max_wait
+        return self.estimate_wait(provider, endpoint, api_key) > max_wait
+
+    def capacity(self, provider, endpoint, api_key, max_wait=None):
+        """How many requests could be sent now before one would be rejected (for sizing batches)"""
+        max_wait = self.max_wait if max_wait is None else max_wait
+        with self.lock:
+            return self._bucket(provider, api_key, endpoint).admissible(time.monotonic(), max_wait)
+
+    def stats(self):
+        now = time.monotonic()
+        with self.lock:
+            return [{
+                'provider': provider,
+                'key_id': key_id,
+                'endpoint': endpoint,
+                'tokens': round(bucket.tokens, 2),
+                'queued': bucket.waiting,
+                'estimated_wait': round(bucket.estimate_wait(now), 3),
+                'avg_wait': round(bucket.total_wait / bucket.total_requests, 3) if bucket.total_requests else 0,
+                'max_wait': round(bucket.max_wait_seen, 3),
+                'requests': bucket.total_requests,
+                'rejected': bucket.rejected,
+                'throttled_429s': bucket.throttled_429s
+            } for (provider, key_id, endpoint), bucket in self.buckets.items()]
+
+
+def _first_number(headers, names):
+    for name in names:
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return float(value)
+        except ValueError:
+            continue
+    return None
+
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+
+
+def _parse_duration(value):
+    """Parse '20ms', '1s', '6m0s' (OpenAI style) or plain seconds"""
+    value = value.strip()
+    try:
+        seconds = float(value)
+        # Some providers send an epoch timestamp instead of a delta
+        if seconds > 1e9:
+            return max(0.0, seconds - time.time())
+        return seconds
+    except ValueError:
+        pass
+
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    multipliers = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+    return sum(float(amount) * multipliers[unit] for amount, unit in parts)
+
+
+def _parse_reset(headers, names):
+    for name in names:
+        value = headers.get(name)
+        if value:
+            seconds = _parse_duration(value)
+            if seconds is not None:
+                return seconds
+    return None
+
+
+def _parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+# Global instance
+rate_governor = RateGovernor()
@@ -6,6 +6,8 @@ Tracks user ratings to improve prompt quality over time
 import sqlite3
 from datetime import datetime
 from collections import defaultdict
+from migrations import migrate
+from services import lazy
 
 class RatingSystem:
     def __init__(self, db_path='ratings.db'):
@@ -13,73 +15,8 @@ class RatingSystem:
         self.init_database()
     
     def init_database(self):
-        """Create rating tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Image ratings
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS image_ratings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                user_id INTEGER,
-                image_url TEXT,
-                prompt TEXT,
-                negative_prompt TEXT,
-                engine TEXT,
-                style TEXT,
-                rating INTEGER CHECK(rating >= 1 AND rating <= 5),
-                feedback TEXT,
-                dimensions TEXT,
-                quality_boost BOOLEAN
-            )
-        ''')
-        
-        # Video ratings
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS video_ratings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                user_id INTEGER,
-                video_url TEXT,
-                image_url TEXT,
-                prompt TEXT,
-                engine TEXT,
-                duration INTEGER,
-                rating INTEGER CHECK(rating >= 1 AND rating <= 5),
-                feedback TEXT
-            )
-        ''')
-        
-        # Prompt analytics (learning data)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS prompt_analytics (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                prompt_keywords TEXT,
-                style TEXT,
-                engine TEXT,
-                avg_rating REAL,
-                total_ratings INTEGER,
-                success_rate REAL,
-                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # User preferences (for personalized recommendations)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_preferences (
-                user_id INTEGER PRIMARY KEY,
-                favorite_styles TEXT,
-                favorite_engines TEXT,
-                avg_rating_given REAL,
-                total_generations INTEGER,
-                high_rated_prompts TEXT,
-                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """Create or upgrade rating tables (no-op once current)"""
+        migrate(self.db_path, 'ratings')
     
     def rate_image(self, user_id, image_url, prompt, engine, rating, feedback='', **kwargs):
         """Record image rating"""
@@ -348,4 +285,4 @@ class RatingSystem:
 
 
 # Global instance
-rating_system = RatingSystem()
+rating_system = lazy('rating_system', RatingSystem)
@@ -3,7 +3,7 @@ AI Image Generator Backend Server
 Supports multiple AI image generation APIs with post-processing enhancement
 """
 
-from flask import Flask, request, jsonify, send_from_directory, make_response, render_template
+from flask import Flask, request, jsonify, send_from_directory, make_response, render_template, Response, g
 from flask_cors import CORS
 import os
 import requests
@@ -13,11 +13,25 @@ import json
 from database import UserDatabase
 from collections import defaultdict
 import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from cost_monitor import cost_monitor
 from rating_system import rating_system
 from analytics_system import analytics_system
 from quality_optimizer import quality_optimizer
 from autonomous_learner import autonomous_learner
+from providers import ProviderPool, run_sync
+from rate_governor import rate_governor
+from job_scheduler import generation_scheduler, JobRejected, JobTimeout
+from maintenance import MaintenanceDaemon
+from stripe_events import StripeEventQueue
+from services import lazy, service_stats
+from credentials import hash_pool, login_throttle
+from auth_context import (
+    init_auth, require_auth, request_token, current_user, current_user_id,
+    current_token, current_credits, current_tier, auth_stats, require_admin
+)
 
 # Image enhancement libraries
 try:
@@ -28,39 +42,8 @@ except (ImportError, Exception):
     ImageEnhance = None
     ImageFilter = None
     PIL_AVAILABLE = False
-try:
-    import cv2
-    CV2_AVAILABLE = True
-except (ImportError, Exception):
-    cv2 = None
-    CV2_AVAILABLE = False
-try:
-    from skimage import exposure
-    SKIMAGE_AVAILABLE = True
-except (ImportError, Exception):
-    exposure = None
-    SKIMAGE_AVAILABLE = False
 import io
-
-# Official AI SDKs
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except (ImportError, Exception):
-    OpenAI = None
-    OPENAI_AVAILABLE = False
-try:
-    import replicate
-    REPLICATE_AVAILABLE = True
-except (ImportError, Exception):
-    replicate = None
-    REPLICATE_AVAILABLE = False
-try:
-    import stripe
-    STRIPE_AVAILABLE = True
-except (ImportError, Exception):
-    stripe = None
-    STRIPE_AVAILABLE = False
+import zlib
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend requests
@@ -77,9 +60,28 @@ CONFIG = {
     'STRIPE_WEBHOOK_SECRET': os.getenv('STRIPE_WEBHOOK_SECRET', 'your-webhook-secret-here'),
 }
 
-# Initialize Stripe
-if stripe and STRIPE_AVAILABLE and CONFIG['STRIPE_SECRET_KEY'] != 'your-stripe-secret-key-here':
-    stripe.api_key = CONFIG['STRIPE_SECRET_KEY']
+# Async provider clients (one shared event loop per worker)
+provider_pool = ProviderPool(CONFIG)
+
+# Paid-provider jobs are shed as projected spend nears the daily limit
+generation_scheduler.add_admission_check(
+    lambda priority_class, provider: cost_monitor.forecaster.admit(priority_class, provider))
+
+_stripe = None
+
+
+def get_stripe():
+    """Import and configure the Stripe SDK on first payment request (None if not installed)"""
+    global _stripe
+    if _stripe is None:
+        try:
+            import stripe
+        except (ImportError, Exception):
+            return None
+        if CONFIG['STRIPE_SECRET_KEY'] != 'your-stripe-secret-key-here':
+            stripe.api_key = CONFIG['STRIPE_SECRET_KEY']
+        _stripe = stripe
+    return _stripe
 
 # ============ PRICING STRUCTURE (30%+ Profit Margins) - POUND STERLING (£) ============
 
@@ -210,18 +212,34 @@ RATE_LIMITS = {
     'unlimited_user': {'requests': 1000, 'window': 3600}  # 1000 requests per hour for unlimited
 }
 
+# Longest a request thread waits on the generation queue + provider call
+GENERATION_TIMEOUT = 300
+
+# Batch generation (Creator/Pro plans)
+BATCH_PLANS = ('creator', 'pro')
+BATCH_MAX_IMAGES = 50
+BATCH_MAX_VARIATIONS = 10
+
+# Post-processing is CPU-bound PIL work; threads are created on first use
+batch_postprocess_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='batch-postprocess')
+
 def get_client_ip():
     """Get client IP address (works with proxies)"""
     if request.headers.get('X-Forwarded-For'):
         return request.headers.get('X-Forwarded-For').split(',')[0]
     return request.remote_addr
 
-def check_rate_limit(user_type='anonymous'):
+def check_rate_limit(user_type='anonymous', user_id=None):
     """Check if request exceeds rate limit"""
     ip = get_client_ip()
     current_time = time.time()
     limit_config = RATE_LIMITS.get(user_type, RATE_LIMITS['anonymous'])
     
+    # Accounts spending far above their tier's norm get the anonymous quota until it settles
+    if cost_monitor.user_spend.is_flagged(user_id, user_type):
+        user_type = 'flagged accounts'
+        limit_config = RATE_LIMITS['anonymous']
+    
     # Clean old requests outside the time window
     rate_limit_storage[ip] = [
         timestamp for timestamp in rate_limit_storage[ip]
@@ -246,7 +264,35 @@ def check_rate_limit(user_type='anonymous'):
 os.makedirs('generated_images', exist_ok=True)
 
 # Initialize user database
-user_db = UserDatabase()
+user_db = lazy('user_db', UserDatabase)
+init_auth(user_db)
+
+# Background housekeeping: session expiry, retention, credit reconciliation, ANALYZE, snapshots
+maintenance = MaintenanceDaemon(user_db=user_db)
+
+# Stripe webhook events are stored on receipt and applied in order by a worker
+stripe_events = StripeEventQueue(user_db, cost_monitor=cost_monitor)
+
+_background_started = False
+_background_lock = threading.Lock()
+
+
+def start_background_services():
+    """Start the maintenance and Stripe event threads (once per process)"""
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+    maintenance.start()
+    stripe_events.start()
+
+
+@app.before_request
+def ensure_background_services():
+    # Started on the first request, not at import, so gunicorn forks (and tools
+    # importing rootAI run) before any thread or database exists
+    start_background_services()
 
 
 # ============ AUTHENTICATION ROUTES ============
@@ -264,6 +310,8 @@ def register():
         
         if result['success']:
             return jsonify(result), 201
+        elif result.get('busy'):
+            return jsonify(result), 503, {'Retry-After': str(result['retry_after'])}
         else:
             return jsonify(result), 400
             
@@ -278,10 +326,24 @@ def login():
         data = request.json
         username = data.get('username', '').strip()
         password = data.get('password', '')
+        ip = get_client_ip()
+        
+        # Refuse throttled attempts before spending any CPU on hashing
+        retry_after = login_throttle.check(username, ip)
+        if retry_after:
+            return jsonify({
+                'success': False,
+                'error': 'Too many failed login attempts. Please try again later.',
+                'retry_after': retry_after
+            }), 429, {'Retry-After': str(retry_after)}
         
         result = user_db.login_user(username, password)
         
+        if result.get('busy'):
+            return jsonify(result), 503, {'Retry-After': str(result['retry_after'])}
+        
         if result['success']:
+            login_throttle.record_success(username)
             response = make_response(jsonify(result), 200)
             # Set session token as HTTP-only cookie for security
             response.set_cookie(
@@ -294,6 +356,7 @@ def login():
             )
             return response
         else:
+            login_throttle.record_failure(username, ip)
             return jsonify(result), 401
             
     except Exception as e:
@@ -304,7 +367,7 @@ def login():
 def logout():
     """Logout user and destroy session"""
     try:
-        session_token = request.cookies.get('session_token')
+        session_token = request_token()
         
         if session_token:
             result = user_db.logout_user(session_token)
@@ -348,9 +411,9 @@ def logout():
 def validate_session():
     """Validate current session"""
     try:
-        session_token = request.cookies.get('session_token')
+        user = current_user()
         
-        if not session_token:
+        if not current_token():
             response = make_response(jsonify({'valid': False, 'error': 'No session token'}), 401)
             # Prevent caching of validation response
             response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
@@ -358,12 +421,10 @@ def validate_session():
             response.headers['Expires'] = '0'
             return response
         
-        result = user_db.validate_session(session_token)
-        
-        if result['valid']:
-            response = make_response(jsonify(result), 200)
+        if user:
+            response = make_response(jsonify(user), 200)
         else:
-            response = make_response(jsonify(result), 401)
+            response = make_response(jsonify({'valid': False, 'error': g.auth_error}), 401)
         
         # Prevent caching of validation response
         response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
@@ -377,30 +438,6 @@ def validate_session():
         return response
 
 
-# Middleware to check authentication for protected routes
-def require_auth(f):
-    """Decorator to require authentication"""
-    from functools import wraps
-    
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        session_token = request.cookies.get('session_token')
-        
-        if not session_token:
-            return jsonify({'error': 'Authentication required'}), 401
-        
-        validation = user_db.validate_session(session_token)
-        
-        if not validation.get('valid'):
-            return jsonify({'error': 'Invalid or expired session'}), 401
-        
-        # Add user info to request for use in route
-        request.user = validation
-        return f(*args, **kwargs)
-    
-    return decorated_function
-
-
 # ============ END AUTHENTICATION ROUTES ============
 
 
@@ -410,9 +447,7 @@ def require_auth(f):
 def get_credit_balance():
     """Get user's current credit balance"""
     try:
-        session_token = request.cookies.get('session_token')
-        
-        if not session_token:
+        if not current_token():
             # Return anonymous user state
             return jsonify({
                 'success': True,
@@ -421,12 +456,11 @@ def get_credit_balance():
                 'anonymous': True
             })
         
-        validation = user_db.validate_session(session_token)
-        if not validation.get('valid'):
+        if not current_user():
             return jsonify({'success': False, 'error': 'Invalid session'}), 401
         
-        user_id = validation['user_id']
-        result = user_db.get_user_credits(user_id)
+        user_id = current_user_id()
+        result = current_credits()
         
         # Check if low token alert is needed
         if result.get('success'):
@@ -451,18 +485,11 @@ def get_credit_packages():
 
 
 @app.route('/api/notifications/preferences', methods=['GET'])
+@require_auth
 def get_notification_preferences():
     """Get user's notification preferences"""
     try:
-        session_token = request.cookies.get('session_token')
-        if not session_token:
-            return jsonify({'success': False, 'error': 'Must be logged in'}), 401
-        
-        validation = user_db.validate_session(session_token)
-        if not validation.get('valid'):
-            return jsonify({'success': False, 'error': 'Invalid session'}), 401
-        
-        user_id = validation['user_id']
+        user_id = current_user_id()
         result = user_db.get_notification_preferences(user_id)
         
         return jsonify(result)
@@ -472,18 +499,11 @@ def get_notification_preferences():
 
 
 @app.route('/api/notifications/preferences', methods=['POST'])
+@require_auth
 def update_notification_preferences():
     """Update user's notification threshold"""
     try:
-        session_token = request.cookies.get('session_token')
-        if not session_token:
-            return jsonify({'success': False, 'error': 'Must be logged in'}), 401
-        
-        validation = user_db.validate_session(session_token)
-        if not validation.get('valid'):
-            return jsonify({'success': False, 'error': 'Invalid session'}), 401
-        
-        user_id = validation['user_id']
+        user_id = current_user_id()
         data = request.json
         new_threshold = data.get('threshold', 300)
         
@@ -496,32 +516,37 @@ def update_notification_preferences():
 
 
 @app.route('/api/subscription/create', methods=['POST'])
+@require_auth
 def create_subscription():
-    """Create unlimited subscription checkout"""
+    """Create subscription checkout for a plan ('user', 'creator', 'pro'; legacy unlimited if none given)"""
     try:
+        stripe = get_stripe()
         if not stripe:
             return jsonify({'success': False, 'error': 'Stripe not configured'}), 500
         
-        session_token = request.cookies.get('session_token')
-        if not session_token:
-            return jsonify({'success': False, 'error': 'Must be logged in'}), 401
-        
-        validation = user_db.validate_session(session_token)
-        if not validation.get('valid'):
-            return jsonify({'success': False, 'error': 'Invalid session'}), 401
+        user_id = current_user_id()
+        plan_id = (request.get_json(silent=True) or {}).get('plan')
+        if plan_id is not None and (plan_id not in SUBSCRIPTION_PLANS or not SUBSCRIPTION_PLANS[plan_id]['price']):
+            return jsonify({'success': False, 'error': 'Invalid plan'}), 400
         
-        user_id = validation['user_id']
+        if plan_id:
+            plan = SUBSCRIPTION_PLANS[plan_id]
+            currency, price, name = plan['currency'].lower(), plan['price'], f"{plan['name']} Plan"
+            description = ', '.join(plan['features'][:3])
+        else:
+            currency, price, name = 'usd', UNLIMITED_SUBSCRIPTION['monthly']['price'], UNLIMITED_SUBSCRIPTION['monthly']['name']
+            description = 'Unlimited DALL-E 3 HD generations - Premium quality'
         
         # Create Stripe checkout for subscription
         checkout_session = stripe.checkout.Session.create(
             payment_method_types=['card'],
             line_items=[{
                 'price_data': {
-                    'currency': 'usd',
-                    'unit_amount': int(UNLIMITED_SUBSCRIPTION['monthly']['price'] * 100),
+                    'currency': currency,
+                    'unit_amount': int(price * 100),
                     'product_data': {
-                        'name': UNLIMITED_SUBSCRIPTION['monthly']['name'],
-                        'description': 'Unlimited DALL-E 3 HD generations - Premium quality',
+                        'name': name,
+                        'description': description,
                     },
                     'recurring': {
                         'interval': 'month'
@@ -534,7 +559,9 @@ def create_subscription():
             cancel_url=request.host_url + 'subscription-cancelled',
             metadata={
                 'user_id': user_id,
-                'subscription_type': 'unlimited_monthly'
+                'subscription_type': f'{plan_id}_monthly' if plan_id else 'unlimited_monthly',
+                # Recorded on the user by the checkout webhook, for plan-gated features
+                'plan': plan_id or ''
             }
         )
         
@@ -549,21 +576,15 @@ def create_subscription():
 
 
 @app.route('/api/credits/purchase', methods=['POST'])
+@require_auth
 def create_checkout_session():
     """Create Stripe checkout session for credit purchase"""
     try:
+        stripe = get_stripe()
         if not stripe:
             return jsonify({'success': False, 'error': 'Stripe not configured'}), 500
         
-        session_token = request.cookies.get('session_token')
-        if not session_token:
-            return jsonify({'success': False, 'error': 'Must be logged in to purchase'}), 401
-        
-        validation = user_db.validate_session(session_token)
-        if not validation.get('valid'):
-            return jsonify({'success': False, 'error': 'Invalid session'}), 401
-        
-        user_id = validation['user_id']
+        user_id = current_user_id()
         data = request.json
         package_id = data.get('package')
         
@@ -608,8 +629,9 @@ def create_checkout_session():
 
 @app.route('/api/stripe/webhook', methods=['POST'])
 def stripe_webhook():
-    """Handle Stripe webhook events (payment confirmation)"""
+    """Verify and queue Stripe webhook events (applied by the stripe_events worker)"""
     try:
+        stripe = get_stripe()
         if not stripe:
             return jsonify({'error': 'Stripe not configured'}), 500
         
@@ -618,7 +640,7 @@ def stripe_webhook():
         
         # Verify webhook signature
         try:
-            event = stripe.Webhook.construct_event(
+            stripe.Webhook.construct_event(
                 payload, sig_header, CONFIG['STRIPE_WEBHOOK_SECRET']
             )
         except ValueError:
@@ -626,53 +648,8 @@ def stripe_webhook():
         except stripe.error.SignatureVerificationError:
             return jsonify({'error': 'Invalid signature'}), 400
         
-        # Handle successful payment
-        if event['type'] == 'checkout.session.completed':
-            session = event['data']['object']
-            user_id = int(session['metadata']['user_id'])
-            
-            # Check if it's a subscription or one-time payment
-            if session['mode'] == 'subscription':
-                # Activate unlimited subscription
-                subscription_id = session['subscription']
-                user_db.activate_subscription(user_id, subscription_id)
-                print(f"Subscription activated for user {user_id}")
-                
-                # Log subscription revenue
-                amount = session['amount_total'] / 100  # Convert cents to dollars
-                cost_monitor.log_revenue(
-                    user_id=user_id,
-                    amount=amount,
-                    revenue_type='subscription',
-                    description=f'Monthly subscription: {subscription_id}'
-                )
-            else:
-                # Add credits for one-time purchase
-                credits = int(session['metadata']['credits'])
-                package_id = session['metadata']['package_id']
-                
-                result = user_db.add_credits(
-                    user_id=user_id,
-                    credits=credits,
-                    transaction_id=session['payment_intent'],
-                    amount=session['amount_total'] / 100
-                )
-                print(f"Credits added: {result}")
-                
-                # Log credit purchase revenue
-                amount = session['amount_total'] / 100
-                cost_monitor.log_revenue(
-                    user_id=user_id,
-                    amount=amount,
-                    revenue_type='credits',
-                    description=f'{credits} credits purchased ({package_id})'
-                )
-        
-        # Handle subscription cancellation
-        elif event['type'] == 'customer.subscription.deleted':
-            subscription = event['data']['object']
-            user_db.deactivate_subscription(subscription['id'])
-            print(f"Subscription cancelled: {subscription['id']}")
+        # Persist and acknowledge at once; the event worker applies it exactly once
+        stripe_events.enqueue(payload.decode('utf-8'))
         
         return jsonify({'success': True})
         
@@ -682,18 +659,11 @@ def stripe_webhook():
 
 
 @app.route('/api/referral/apply', methods=['POST'])
+@require_auth
 def apply_referral():
     """Apply referral code to user account"""
     try:
-        session_token = request.cookies.get('session_token')
-        if not session_token:
-            return jsonify({'success': False, 'error': 'Must be logged in'}), 401
-        
-        validation = user_db.validate_session(session_token)
-        if not validation.get('valid'):
-            return jsonify({'success': False, 'error': 'Invalid session'}), 401
-        
-        user_id = validation['user_id']
+        user_id = current_user_id()
         data = request.json
         referral_code = data.get('code', '').strip()
         
@@ -705,18 +675,11 @@ def apply_referral():
 
 
 @app.route('/api/achievements/claim', methods=['POST'])
+@require_auth
 def claim_achievement():
     """Claim achievement credits"""
     try:
-        session_token = request.cookies.get('session_token')
-        if not session_token:
-            return jsonify({'success': False, 'error': 'Must be logged in'}), 401
-        
-        validation = user_db.validate_session(session_token)
-        if not validation.get('valid'):
-            return jsonify({'success': False, 'error': 'Invalid session'}), 401
-        
-        user_id = validation['user_id']
+        user_id = current_user_id()
         data = request.json
         achievement_type = data.get('type')
         
@@ -744,17 +707,10 @@ def claim_achievement():
 # ============ ANALYTICS & RATING SYSTEM ROUTES ============
 
 @app.route('/api/analytics/rate', methods=['POST'])
+@require_auth
 def submit_rating():
     """Submit rating for a generation"""
     try:
-        session_token = request.cookies.get('session_token')
-        if not session_token:
-            return jsonify({'success': False, 'error': 'Must be logged in'}), 401
-        
-        validation = user_db.validate_session(session_token)
-        if not validation.get('valid'):
-            return jsonify({'success': False, 'error': 'Invalid session'}), 401
-        
         data = request.json
         generation_id = data.get('generation_id')
         rating = data.get('rating')  # 1-5 stars
@@ -793,13 +749,10 @@ def submit_rating():
 
 
 @app.route('/api/analytics/action', methods=['POST'])
+@require_auth
 def track_generation_action():
     """Track actions on generations (download, share, edit, etc.)"""
     try:
-        session_token = request.cookies.get('session_token')
-        if not session_token:
-            return jsonify({'success': False, 'error': 'Must be logged in'}), 401
-        
         data = request.json
         generation_id = data.get('generation_id')
         action_type = data.get('action')  # download, share, edit, regenerate, use
@@ -819,13 +772,7 @@ def track_generation_action():
 def track_behavior():
     """Track user behavior for UX analytics"""
     try:
-        session_token = request.cookies.get('session_token')
-        user_id = 0  # Anonymous by default
-        
-        if session_token:
-            validation = user_db.validate_session(session_token)
-            if validation.get('valid'):
-                user_id = validation['user_id']
+        user_id = current_user_id(default=0)  # Anonymous by default
         
         data = request.json
         session_id = data.get('session_id')
@@ -854,9 +801,52 @@ def track_behavior():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+# Compressed batch bodies are inflated up to this size; larger ones are rejected
+MAX_BEHAVIOR_BATCH_BYTES = 1024 * 1024
+
+@app.route('/api/analytics/behavior/batch', methods=['POST'])
+def track_behavior_batch():
+    """Track a batch of behavior events from one session (body may be gzip-compressed)"""
+    try:
+        body = request.get_data(cache=False)
+        if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+            inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            body = inflater.decompress(body, MAX_BEHAVIOR_BATCH_BYTES)
+            if inflater.unconsumed_tail:
+                return jsonify({'success': False, 'error': 'Batch too large'}), 413
+        elif len(body) > MAX_BEHAVIOR_BATCH_BYTES:
+            return jsonify({'success': False, 'error': 'Batch too large'}), 413
+        
+        data = json.loads(body or b'{}')
+        if not isinstance(data, dict):
+            return jsonify({'success': False, 'error': 'Expected a JSON object'}), 400
+        session_id = data.get('session_id')
+        events = data.get('events')
+        if not session_id or not isinstance(events, list):
+            return jsonify({'success': False, 'error': 'Missing required fields'}), 400
+        
+        # One session lookup for the whole batch
+        user_id = current_user_id(default=0)
+        
+        accepted = analytics_system.track_behavior_batch(
+            user_id=user_id,
+            session_id=session_id,
+            events=events,
+            page_url=data.get('page'),
+            device_info=data.get('device')
+        )
+        
+        return jsonify({'success': True, 'accepted': accepted, 'dropped': len(events) - accepted})
+        
+    except (ValueError, zlib.error) as e:
+        return jsonify({'success': False, 'error': f'Invalid batch: {e}'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/api/analytics/prompt-suggestions', methods=['GET'])
 def get_prompt_suggestions():
-    """Get AI-powered prompt suggestions based on top performers"""
+    """Typeahead prompt suggestions from top performers matching what has been typed"""
     try:
         engine = request.args.get('engine', 'flux-pro')
         partial_prompt = request.args.get('prompt', '')
@@ -893,17 +883,10 @@ def get_top_prompts():
 
 
 @app.route('/api/analytics/dashboard', methods=['GET'])
+@require_auth
 def get_analytics_dashboard():
     """Get comprehensive analytics dashboard (admin only)"""
     try:
-        session_token = request.cookies.get('session_token')
-        if not session_token:
-            return jsonify({'success': False, 'error': 'Must be logged in'}), 401
-        
-        validation = user_db.validate_session(session_token)
-        if not validation.get('valid'):
-            return jsonify({'success': False, 'error': 'Invalid session'}), 401
-        
         # TODO: Add admin check here
         
         days = int(request.args.get('days', 30))
@@ -1325,44 +1308,17 @@ def generate_image():
     }
     """
     try:
-        # CRITICAL PROTECTION 1: Check emergency shutdown mode
-        if cost_monitor.emergency_mode:
-            return jsonify({
-                'success': False,
-                'error': 'Service temporarily unavailable due to high costs. Please try again later.',
-                'emergency_mode': True
-            }), 503
-        
-        # CRITICAL PROTECTION 2: Check cost alerts
-        alerts = cost_monitor.check_cost_alerts()
-        if alerts.get('daily_limit_exceeded'):
-            cost_monitor.activate_emergency_mode()
-            return jsonify({
-                'success': False,
-                'error': 'Daily cost limit exceeded. Service paused.',
-                'emergency_mode': True
-            }), 503
-        
-        # Check user authentication first
-        session_token = request.cookies.get('session_token')
-        user_id = None
-        user_type = 'anonymous'
+        # Cost protection happens in the scheduler: DALL-E and Runway jobs are shed
+        # progressively as projected spend nears the daily limit (entirely in
+        # emergency mode), while free engines keep serving everyone
         
-        if session_token:
-            validation = user_db.validate_session(session_token)
-            if validation.get('valid'):
-                user_id = validation['user_id']
-                # Determine user type for rate limiting
-                credits_info = user_db.get_user_credits(user_id)
-                if credits_info.get('has_unlimited'):
-                    user_type = 'unlimited_user'
-                elif credits_info.get('premium_credits', 0) > 0:
-                    user_type = 'premium_user'
-                else:
-                    user_type = 'free_user'
+        # Check user authentication first (identity, tier and credits resolve once per request)
+        user_id = current_user_id()
+        session_token = current_token()
+        user_type = current_tier()
         
         # Apply rate limiting
-        allowed, error_msg = check_rate_limit(user_type)
+        allowed, error_msg = check_rate_limit(user_type, user_id)
         if not allowed:
             return jsonify({
                 'success': False,
@@ -1397,7 +1353,7 @@ def generate_image():
                     'require_login': True
                 }), 401
             
-            credits = user_db.get_user_credits(user_id)
+            credits = current_credits()
             if not credits.get('success'):
                 return jsonify({'success': False, 'error': 'Could not check credits'}), 500
             
@@ -1409,7 +1365,7 @@ def generate_image():
                 }), 402  # Payment Required
             
             # Use DALL-E 3 HD for premium
-            result = generate_with_dalle(prompt, dimensions, quality_boost)
+            result = schedule_generation(user_type, 'openai', generate_with_dalle, prompt, dimensions, quality_boost)
             
             if result.get('success'):
                 # Log API cost
@@ -1437,7 +1393,7 @@ def generate_image():
             # Free tier - Try Replicate, fallback to Hugging Face if payment required
             if user_id:
                 # Logged in user - check daily free credits
-                credits = user_db.get_user_credits(user_id)
+                credits = current_credits()
                 if credits.get('free_credits', 0) < 1:
                     return jsonify({
                         'success': False,
@@ -1446,12 +1402,7 @@ def generate_image():
                     }), 402
                 
                 # Try Replicate first, fallback to Hugging Face
-                result = generate_with_replicate(prompt, negative_prompt, dimensions, quality_boost)
-                
-                # If Replicate fails with payment error, try Hugging Face
-                if not result.get('success') and ('402' in str(result.get('error', '')) or 'Payment Required' in str(result.get('error', ''))):
-                    print("Replicate requires payment, falling back to Hugging Face...")
-                    result = generate_with_huggingface(prompt, negative_prompt, dimensions)
+                result = schedule_generation(user_type, 'replicate', generate_free_image, prompt, negative_prompt, dimensions, quality_boost)
                 
                 if result.get('success'):
                     # Deduct free credit
@@ -1461,12 +1412,7 @@ def generate_image():
                         result['quality_tier'] = 'Free Tier (8.5/10)'
             else:
                 # Anonymous user - Try Replicate, fallback to Hugging Face
-                result = generate_with_replicate(prompt, negative_prompt, dimensions, quality_boost)
-                
-                # If Replicate fails with payment error, try Hugging Face
-                if not result.get('success') and ('402' in str(result.get('error', '')) or 'Payment Required' in str(result.get('error', ''))):
-                    print("Replicate requires payment, falling back to Hugging Face...")
-                    result = generate_with_huggingface(prompt, negative_prompt, dimensions)
+                result = schedule_generation(user_type, 'replicate', generate_free_image, prompt, negative_prompt, dimensions, quality_boost)
                 if result.get('success'):
                     result['credits_used'] = 'anonymous'
                     result['quality_tier'] = 'Flux Dev (9.0/10)'
@@ -1474,24 +1420,7 @@ def generate_image():
         
         # Apply post-processing if enabled and generation was successful
         if result.get('success') and post_process:
-            image_url = result.get('image_url', '')
-            
-            # Only post-process local files (not URLs from DALL-E)
-            if image_url.startswith('/generated_images/'):
-                local_path = image_url.replace('/generated_images/', 'generated_images/')
-                
-                # Apply enhancement
-                enhancement_level = 'heavy' if quality_boost else 'medium'
-                enhanced_path = enhance_image(local_path, enhancement_level)
-                
-                # Apply upscaling if requested
-                if upscale > 1:
-                    enhanced_path = upscale_image(enhanced_path, upscale)
-                
-                # Update the result with enhanced image path
-                result['image_url'] = enhanced_path.replace('generated_images/', '/generated_images/')
-                result['enhanced'] = True
-                result['upscaled'] = upscale if upscale > 1 else False
+            post_process_result(result, quality_boost, upscale)
         
         # Track generation in analytics system
         if result.get('success') and user_id:
@@ -1535,171 +1464,313 @@ def generate_image():
         return jsonify({'error': str(e)}), 500
 
 
-def generate_with_dalle(prompt, dimensions={}, quality_boost=True):
-    """Generate image using OpenAI DALL-E 3 with enhanced quality"""
-    api_key = CONFIG['OPENAI_API_KEY']
-    
-    if api_key == 'your-openai-key-here':
-        return {
-            'success': False,
-            'error': 'Please add your OpenAI API key to the CONFIG dictionary',
-            'demo': True
-        }
+def post_process_result(result, quality_boost=True, upscale=1):
+    """Enhance (and optionally upscale) a generated image in place on the result dict"""
+    image_url = result.get('image_url', '')
     
-    url = "https://api.openai.com/v1/images/generations"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    
-    # DALL-E 3 supports specific sizes: 1024x1024, 1024x1792, or 1792x1024
-    # Map dimensions to valid DALL-E sizes
-    width = dimensions.get('width', 1024)
-    height = dimensions.get('height', 1024)
-    
-    if width == height:
-        size = '1024x1024'
-    elif width > height:
-        size = '1792x1024'
-    else:
-        size = '1024x1792'
-    
-    # ALWAYS use HD quality for best results (industry standard)
-    quality = 'hd'
+    # Only post-process local files (not URLs from DALL-E)
+    if image_url.startswith('/generated_images/'):
+        local_path = image_url.replace('/generated_images/', 'generated_images/')
+        
+        # Apply enhancement
+        enhancement_level = 'heavy' if quality_boost else 'medium'
+        enhanced_path = enhance_image(local_path, enhancement_level)
+        
+        # Apply upscaling if requested
+        if upscale > 1:
+            enhanced_path = upscale_image(enhanced_path, upscale)
+        
+        # Update the result with enhanced image path
+        result['image_url'] = enhanced_path.replace('generated_images/', '/generated_images/')
+        result['enhanced'] = True
+        result['upscaled'] = upscale if upscale > 1 else False
     
-    # Style: 'vivid' for hyper-real and dramatic images (recommended)
-    # or 'natural' for more natural, less hyper-real images
-    style_mode = 'vivid' if quality_boost else 'natural'
+    return result
+
+
+@app.route('/api/generate/batch', methods=['POST'])
+@require_auth
+def generate_batch():
+    """
+    Generate up to 50 images in one call (Creator/Pro subscriptions)
+    One auth + credit check for the whole batch; provider calls fan out through
+    the shared provider pool and results stream back as newline-delimited JSON,
+    one line per image as it finishes, then a summary line. Premium batches
+    are also capped by what DALL-E's outbound rate budget can take right now.
     
-    payload = {
-        "model": "dall-e-3",
-        "prompt": prompt,
-        "n": 1,
-        "size": size,
-        "quality": quality,
-        "style": style_mode  # New parameter for better quality
+    Request body:
+    {
+        "items": [{"prompt": "...", "negative_prompt": "...", "variations": 4}, ...],
+        "quality_tier": "free" | "premium",
+        "style": "photorealistic" (optional),
+        "dimensions": {"width": 1024, "height": 1024},
+        "quality_boost": true/false,
+        "post_process": true/false,
+        "upscale": 1 | 2 | 4 (optional)
     }
-    
+    """
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        return {
-            'success': False,
-            'error': f'OpenAI API Error: {str(e)}'
+        # Cost protection is per image, as in /api/generate: DALL-E images are shed
+        # as projected spend nears the daily limit, free engines keep running
+        
+        user_id = current_user_id()
+        session_token = current_token()
+        credits = current_credits()
+        if not credits.get('success'):
+            return jsonify({'success': False, 'error': 'Could not check credits'}), 500
+        
+        if credits.get('subscription_plan') not in BATCH_PLANS:
+            return jsonify({
+                'success': False,
+                'error': 'Batch generation requires a Creator or Pro subscription',
+                'require_subscription': True,
+                'current_plan': credits.get('subscription_plan') or 'free'
+            }), 403
+        
+        user_type = current_tier()
+        allowed, error_msg = check_rate_limit(user_type, user_id)
+        if not allowed:
+            return jsonify({'success': False, 'error': error_msg, 'rate_limited': True}), 429
+        
+        data = request.json or {}
+        jobs = expand_batch_items(data.get('items', []), data.get('style', ''))
+        if not jobs:
+            return jsonify({'success': False, 'error': 'At least one prompt is required'}), 400
+        if len(jobs) > BATCH_MAX_IMAGES:
+            return jsonify({
+                'success': False,
+                'error': f'Batch too large: {len(jobs)} images requested, maximum is {BATCH_MAX_IMAGES}'
+            }), 400
+        
+        quality_tier = data.get('quality_tier', 'free')
+        reservation_id = None
+        if quality_tier == 'premium':
+            # DALL-E's outbound budget is small; past it the extra images would only come back rate limited
+            dalle = provider_pool.dalle
+            capacity = rate_governor.capacity(dalle.name, dalle.primary_endpoint, dalle.api_key)
+            if len(jobs) > capacity:
+                return jsonify({
+                    'success': False,
+                    'error': f'Premium batches are limited to {capacity} images right now '
+                             f'({len(jobs)} requested). Try a smaller batch or the free tier.',
+                    'rate_limited': True,
+                    'max_images': capacity
+                }), 429
+            
+            # One hold for the whole batch; unused tokens are refunded when it finishes
+            reservation = user_db.reserve_credits(user_id, len(jobs), purpose='batch')
+            if not reservation.get('success'):
+                return jsonify({
+                    'success': False,
+                    'error': f'Insufficient premium credits. Batch requires {len(jobs)} tokens.',
+                    'require_purchase': True
+                }), 402
+            reservation_id = reservation['reservation_id']
+        
+        options = {
+            'dimensions': data.get('dimensions', {'width': 1024, 'height': 1024}),
+            'quality_boost': data.get('quality_boost', True),
+            'post_process': data.get('post_process', True),
+            'upscale': data.get('upscale', 1)
         }
+        
+        return Response(
+            stream_batch(user_id, session_token, user_type, jobs, quality_tier, options, reservation_id),
+            mimetype='application/x-ndjson'
+        )
     
-    data = response.json()
-    image_url = data['data'][0]['url']
-    
-    # Calculate API cost based on quality and size
-    if quality == 'hd':
-        api_cost = 0.08  # $0.08 for HD quality
-    else:
-        api_cost = 0.04  # $0.04 for standard quality
-    
-    return {
-        'success': True,
-        'image_url': image_url,
-        'engine': 'DALL-E 3',
-        'revised_prompt': data['data'][0].get('revised_prompt', prompt),
-        'quality': quality,
-        'api_cost': api_cost
-    }
+    except Exception as e:
+        print(f"Batch error: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 
-def generate_with_stability(prompt, negative_prompt='', dimensions={}, quality_boost=True):
-    """Generate image using Stability AI SDXL with Refiner for 9/10 quality at $0.003"""
-    
-    # Using Replicate's SDXL + Refiner (cheaper and better than direct Stability API)
-    api_key = CONFIG['REPLICATE_API_KEY']
+def expand_batch_items(items, style=''):
+    """Flatten batch items into one job per image (prompt x variations)"""
+    jobs = []
+    for item in items:
+        if isinstance(item, str):
+            item = {'prompt': item}
+        prompt = (item.get('prompt') or '').strip()
+        if not prompt:
+            continue
+        if style:
+            prompt = f"{prompt}, {style}"
+        variations = max(1, min(int(item.get('variations', 1)), BATCH_MAX_VARIATIONS))
+        for variation in range(variations):
+            jobs.append({
+                'index': len(jobs),
+                'prompt': prompt,
+                'negative_prompt': item.get('negative_prompt', ''),
+                'variation': variation
+            })
+    return jobs
+
+
+def stream_batch(user_id, session_token, user_type, jobs, quality_tier, options, reservation_id=None):
+    """Run a batch and yield one NDJSON line per finished image, then a summary"""
+    premium = quality_tier == 'premium'
+    dimensions = options['dimensions']
+    quality_boost = options['quality_boost']
+    finished = queue.Queue()
     
-    if api_key == 'your-replicate-key-here':
-        return {
-            'success': False,
-            'error': 'Replicate API key not configured',
-            'demo': True
-        }
+    # Every image passes the scheduler's admission checks, so a batch is shed
+    # image by image like single generations; shed images never reach the provider
+    admitted = []
+    for job in jobs:
+        try:
+            generation_scheduler.admit(user_type, 'openai' if premium else 'replicate')
+            admitted.append(job)
+        except JobRejected as e:
+            finished.put((job, rejected_result(e)))
     
-    url = "https://api.replicate.com/v1/predictions"
-    headers = {
-        "Authorization": f"Token {api_key}",
-        "Content-Type": "application/json",
-        "Prefer": "wait"
-    }
+    if premium:
+        coros = [provider_pool.dalle.generate(job['prompt'], dimensions, quality_boost) for job in admitted]
+    else:
+        coros = [provider_pool.generate_free(job['prompt'], job['negative_prompt'], dimensions, quality_boost)
+                 for job in admitted]
     
-    # SDXL 1.0 with Refiner for best quality
-    # Cost: $0.003 per image (1000x cheaper than DALL-E!)
-    payload = {
-        "version": "7762fd07cf82c948538e41f63f77d685e02b063e37e496e96eefd46c929f9bdc",  # SDXL + Refiner
-        "input": {
-            "prompt": prompt,
-            "negative_prompt": negative_prompt or "ugly, blurry, low quality, distorted",
-            "width": dimensions.get('width', 1024),
-            "height": dimensions.get('height', 1024),
-            "num_inference_steps": 50 if quality_boost else 30,
-            "guidance_scale": 9 if quality_boost else 7.5,
-            "refine": "expert_ensemble_refiner",  # Use refiner for extra quality
-            "high_noise_frac": 0.8,
-            "num_outputs": 1
-        }
-    }
+    charges = BatchCharges(user_id, reservation_id, premium, len(admitted))
     
+    def on_generated(job, future):
+        # Runs on the post-processing pool, off the provider event loop
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        if result is None:
+            charges.finished(None)  # Skipped after the client went away
+            return
+        
+        charges.finished(result)
+        if result.get('success') and options['post_process']:
+            post_process_result(result, quality_boost, options['upscale'])
+        finished.put((job, result))
+    
+    stop = threading.Event()
+    futures = provider_pool.submit_batch(coros, stop=stop)
+    for job, future in zip(admitted, futures):
+        future.add_done_callback(lambda f, job=job: batch_postprocess_pool.submit(on_generated, job, f))
+    
+    succeeded = 0
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
-        prediction = response.json()
-        
-        # Check if already complete
-        if prediction.get('status') == 'succeeded' and prediction.get('output'):
-            return {
-                'success': True,
-                'image_url': prediction['output'][0] if isinstance(prediction['output'], list) else prediction['output'],
-                'engine': 'SDXL + Refiner',
-                'quality': '9/10',
-                'api_cost': 0.003  # $0.003 per image
-            }
-        
-        # Poll for completion
-        prediction_id = prediction.get('id')
-        if not prediction_id:
-            return {'success': False, 'error': 'No prediction ID returned'}
-        
-        max_attempts = 40  # SDXL takes ~20-30 seconds
-        for attempt in range(max_attempts):
-            time.sleep(1)
+        for _ in jobs:
+            try:
+                job, result = finished.get(timeout=GENERATION_TIMEOUT)
+            except queue.Empty:
+                yield json.dumps({'success': False, 'error': 'Batch timed out'}) + '\n'
+                break
             
-            status_response = requests.get(
-                f"https://api.replicate.com/v1/predictions/{prediction_id}",
-                headers={"Authorization": f"Token {api_key}"},
-                timeout=10
-            )
+            if result.get('success'):
+                succeeded += 1
+                record_batch_generation(user_id, session_token, job, result, premium, options)
             
-            if status_response.status_code == 200:
-                status_data = status_response.json()
-                
-                if status_data.get('status') == 'succeeded':
-                    output = status_data.get('output')
-                    if output:
-                        image_url = output[0] if isinstance(output, list) else output
-                        return {
-                            'success': True,
-                            'image_url': image_url,
-                            'engine': 'SDXL + Refiner',
-                            'quality': '9/10',
-                            'api_cost': 0.003
-                        }
-                
-                elif status_data.get('status') == 'failed':
-                    error = status_data.get('error', 'Unknown error')
-                    return {'success': False, 'error': f'Generation failed: {error}'}
-        
-        return {'success': False, 'error': 'Generation timeout'}
-        
-    except requests.RequestException as e:
-        return {'success': False, 'error': f'API error: {str(e)}'}
-    except Exception as e:
-        return {'success': False, 'error': f'Unexpected error: {str(e)}'}
+            yield json.dumps({**result, 'index': job['index'], 'prompt': job['prompt'],
+                              'variation': job['variation']}) + '\n'
+    finally:
+        # Client went away or timeout: nothing new is sent to a provider. Calls already
+        # running finish and are charged, so the hold settles when the last one is done
+        stop.set()
+        charges.close()
+    
+    yield json.dumps({
+        'done': True,
+        'requested': len(jobs),
+        'succeeded': succeeded,
+        'failed': len(jobs) - succeeded,
+        'shed': len(jobs) - len(admitted),
+        'credits_used': charges.produced if premium else 0
+    }) + '\n'
+
+
+class BatchCharges:
+    """
+    Charges a batch for every image a provider produced, whether or not it
+    reached the client: logs each premium image's API cost, and commits the
+    credit hold once the stream has ended and every provider call has finished
+    """
+    
+    def __init__(self, user_id, reservation_id, premium, calls):
+        self.user_id = user_id
+        self.reservation_id = reservation_id
+        self.premium = premium
+        self.outstanding = calls
+        self.produced = 0
+        self.closed = False
+        self.settled = False
+        self.lock = threading.Lock()
+    
+    def finished(self, result):
+        """One provider call finished (result None if it was skipped before starting)"""
+        produced = bool(result and result.get('success'))
+        if produced and self.premium:
+            cost_monitor.log_api_cost(
+                user_id=self.user_id,
+                api_service='openai',
+                operation='dalle3_hd',
+                cost=result.get('api_cost', 0.08),
+                success=True
+            )
+        with self.lock:
+            self.outstanding -= 1
+            self.produced += produced
+        self._settle()
+    
+    def close(self):
+        """The stream has ended; no more images will be delivered"""
+        with self.lock:
+            self.closed = True
+        self._settle()
+    
+    def _settle(self):
+        with self.lock:
+            if self.settled or not self.closed or self.outstanding:
+                return
+            self.settled = True
+        if self.reservation_id:
+            # Unused credits in the hold go back to the user
+            user_db.commit_reservation(self.reservation_id, credits_used=self.produced, generations=self.produced)
+
+
+def record_batch_generation(user_id, session_token, job, result, premium, options):
+    """Record analytics for one delivered batch image (cost and credits are settled by BatchCharges)"""
+    import uuid
+    
+    if premium:
+        result['credits_used'] = 'premium'
+        result['quality_tier'] = 'DALL-E 3 HD (9.5/10)'
+    else:
+        result['credits_used'] = 'subscription'
+        result.setdefault('quality_tier', 'Flux Dev (9.0/10)')
+    
+    generation_id = str(uuid.uuid4())
+    result['generation_id'] = generation_id
+    analytics_system.record_generation(
+        generation_id=generation_id,
+        user_id=user_id,
+        prompt=job['prompt'],
+        engine=result.get('engine', 'unknown'),
+        model_version=result.get('quality_tier', 'standard'),
+        session_id=session_token
+    )
+    quality_optimizer.log_generation_performance(
+        generation_id=generation_id,
+        engine=result.get('engine', 'unknown'),
+        settings={**options, 'batch': True},
+        prompt=job['prompt'],
+        generation_time=result.get('generation_time', 0),
+        cost=result.get('api_cost', 0)
+    )
+
+
+def generate_with_dalle(prompt, dimensions={}, quality_boost=True):
+    """Generate image using OpenAI DALL-E 3 with enhanced quality"""
+    return run_sync(provider_pool.dalle.generate(prompt, dimensions, quality_boost))
+
+
+def generate_with_stability(prompt, negative_prompt='', dimensions={}, quality_boost=True):
+    """Generate image using Stability AI SDXL with Refiner for 9/10 quality at $0.003"""
+    # Using Replicate's SDXL + Refiner (cheaper and better than direct Stability API)
+    return run_sync(provider_pool.replicate.generate_sdxl(prompt, negative_prompt, dimensions, quality_boost))
 
 
 def generate_with_stability_old(prompt, negative_prompt='', dimensions={}, quality_boost=True):
@@ -1763,289 +1834,51 @@ def generate_with_stability_old(prompt, negative_prompt='', dimensions={}, quali
 
 def generate_with_replicate(prompt, negative_prompt='', dimensions={}, quality_boost=True):
     """Generate image using Replicate (Flux) with enhanced quality"""
-    api_key = CONFIG['REPLICATE_API_KEY']
-    
-    if api_key == 'your-replicate-key-here':
-        return {
-            'success': False,
-            'error': 'Please add your Replicate API key to the CONFIG dictionary',
-            'demo': True
-        }
-    
-    # Using Flux Schnell (fast, free tier) - 4 second generation time
-    # Note: Flux Dev requires paid account, Schnell is free
-    
-    url = "https://api.replicate.com/v1/predictions"
-    headers = {
-        "Authorization": f"Token {api_key}",
-        "Content-Type": "application/json",
-        "Prefer": "wait"  # Wait for result instead of polling
-    }
-    
-    # Calculate aspect ratio
-    width = dimensions.get('width', 1024)
-    height = dimensions.get('height', 1024)
-    aspect_ratio = "1:1"  # Default square
-    if width > height:
-        aspect_ratio = "16:9"
-    elif height > width:
-        aspect_ratio = "9:16"
-    
-    input_params = {
-        "prompt": prompt,
-        "num_outputs": 1,
-        "aspect_ratio": aspect_ratio,
-        "output_format": "png",
-        "output_quality": 90
-    }
-    
-    # Flux Schnell doesn't support negative prompts, so add to main prompt
-    if negative_prompt:
-        input_params["prompt"] = f"{prompt}. Avoid: {negative_prompt}"
-    
-    payload = {
-        "version": "5599ed30703defd1d160a25a63321b4dec97101d98b4674bcc56e41f62f35637",  # Flux Schnell stable version
-        "input": input_params
-    }
-    
-    # Retry logic with exponential backoff for rate limits
-    max_retries = 3
-    retry_delay = 2
-    
-    for retry in range(max_retries):
-        try:
-            response = requests.post(url, headers=headers, json=payload, timeout=60)
-            
-            # Handle rate limiting
-            if response.status_code == 429:
-                if retry < max_retries - 1:
-                    wait_time = retry_delay * (2 ** retry)  # Exponential backoff
-                    print(f"Rate limited. Waiting {wait_time} seconds before retry {retry + 1}/{max_retries}...")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    return {
-                        'success': False,
-                        'error': 'Rate limit exceeded. Please wait a moment and try again.',
-                        'rate_limited': True
-                    }
-            
-            response.raise_for_status()
-            prediction = response.json()
-            
-            # If prediction is already complete (Prefer: wait), return immediately
-            if prediction.get('status') == 'succeeded' and prediction.get('output'):
-                # Replicate Flux Schnell is FREE (no cost to log)
-                return {
-                    'success': True,
-                    'image_url': prediction['output'][0] if isinstance(prediction['output'], list) else prediction['output'],
-                    'engine': 'Flux Schnell'
-                }
-            
-            # Otherwise poll for completion
-            prediction_id = prediction.get('id')
-            if not prediction_id:
-                return {
-                    'success': False,
-                    'error': 'No prediction ID returned from API'
-                }
-            
-            # Poll for completion (max 30 seconds for Schnell)
-            max_attempts = 30
-            for attempt in range(max_attempts):
-                try:
-                    status_response = requests.get(
-                        f"https://api.replicate.com/v1/predictions/{prediction_id}",
-                        headers={"Authorization": f"Token {api_key}"},
-                        timeout=10
-                    )
-                    
-                    # Handle rate limiting during polling
-                    if status_response.status_code == 429:
-                        time.sleep(2)
-                        continue
-                    
-                    status_data = status_response.json()
-                    
-                    if status_data.get('status') == 'succeeded':
-                        output = status_data.get('output')
-                        if output:
-                            image_url = output[0] if isinstance(output, list) else output
-                            # Replicate Flux Schnell is FREE (no cost to log)
-                            return {
-                                'success': True,
-                                'image_url': image_url,
-                                'engine': 'Flux Schnell'
-                            }
-                    elif status_data.get('status') == 'failed':
-                        error_detail = status_data.get('error', 'Unknown error')
-                        return {
-                            'success': False,
-                            'error': f'Generation failed: {error_detail}'
-                        }
-                    
-                    time.sleep(1)
-                except requests.RequestException:
-                    # If polling fails, wait and continue
-                    time.sleep(2)
-                    continue
-            
-            return {
-                'success': False,
-                'error': 'Generation timeout after 30 seconds'
-            }
-            
-        except requests.Timeout:
-            if retry < max_retries - 1:
-                time.sleep(retry_delay)
-                continue
-            return {
-                'success': False,
-                'error': 'Request timeout - please try again'
-            }
-        except requests.RequestException as e:
-            error_msg = str(e)
-            if '429' in error_msg or 'Too Many Requests' in error_msg:
-                if retry < max_retries - 1:
-                    wait_time = retry_delay * (2 ** retry)
-                    time.sleep(wait_time)
-                    continue
-                return {
-                    'success': False,
-                    'error': 'Rate limit exceeded. Please wait 30 seconds and try again.',
-                    'rate_limited': True
-                }
-            if retry < max_retries - 1:
-                time.sleep(retry_delay)
-                continue
-            return {
-                'success': False,
-                'error': f'API request failed: {error_msg}'
-            }
-        except Exception as e:
-            return {
-                'success': False,
-                'error': f'Unexpected error: {str(e)}'
-            }
-    
-    return {
-        'success': False,
-        'error': 'Maximum retries exceeded. Please try again later.'
-    }
+    return run_sync(provider_pool.replicate.generate_flux(prompt, negative_prompt, dimensions, quality_boost))
 
 
 def generate_with_huggingface(prompt, negative_prompt='', dimensions={}):
     """Generate image using Hugging Face Inference API (completely free, no credit card needed)"""
-    api_key = CONFIG.get('HUGGINGFACE_API_KEY', 'your-huggingface-key-here')
-    
-    # Using Flux Schnell (free, fast model on Hugging Face)
-    # Alternative: black-forest-labs/FLUX.1-schnell (latest free model)
-    
-    if api_key == 'your-huggingface-key-here':
-        # Use public endpoint without auth (rate limited but free)
-        api_url = "https://api-inference.huggingface.co/models/black-forest-labs/FLUX.1-schnell"
-        headers = {"Content-Type": "application/json"}
-    else:
-        # Use authenticated endpoint (higher rate limits)
-        api_url = "https://api-inference.huggingface.co/models/black-forest-labs/FLUX.1-schnell"
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-    
-    # Build full prompt with negative prompt
-    full_prompt = prompt
-    if negative_prompt:
-        full_prompt = f"{prompt}. Avoid: {negative_prompt}"
-    
-    payload = {
-        "inputs": full_prompt,
-        "parameters": {
-            "num_inference_steps": 4,  # Schnell is optimized for 1-4 steps
-            "guidance_scale": 0.0,  # Schnell works best without guidance
-        }
-    }
+    return run_sync(provider_pool.huggingface.generate(prompt, negative_prompt, dimensions))
+
+
+def generate_free_image(prompt, negative_prompt='', dimensions={}, quality_boost=True):
+    """Free tier generation: Replicate Flux, falling back to Hugging Face if payment required"""
+    return run_sync(provider_pool.generate_free(prompt, negative_prompt, dimensions, quality_boost))
+
+
+def schedule_generation(user_type, provider, fn, *args, on_late_result=None):
+    """
+    Run a generation through the tier-priority scheduler
     
+    A job that times out still queued is cancelled. One already running keeps
+    going; on_late_result(result) gets its result when it finishes, and the
+    returned dict is marked 'still_running'.
+    """
     try:
-        # Hugging Face API returns image bytes directly
-        response = requests.post(api_url, headers=headers, json=payload, timeout=90)
-        
-        # Handle model loading (503)
-        if response.status_code == 503:
-            error_data = response.json() if response.content else {}
-            estimated_time = error_data.get('estimated_time', 20)
-            print(f"Model loading, waiting {estimated_time} seconds...")
-            time.sleep(min(estimated_time + 5, 30))  # Wait but cap at 30 seconds
-            response = requests.post(api_url, headers=headers, json=payload, timeout=90)
-        
-        response.raise_for_status()
-        
-        # Save the image
-        filename = f"generated_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-        filepath = os.path.join('generated_images', filename)
-        
-        # Ensure directory exists
-        os.makedirs('generated_images', exist_ok=True)
-        
-        with open(filepath, 'wb') as f:
-            f.write(response.content)
-        
-        # Hugging Face is FREE (no cost to log)
-        return {
-            'success': True,
-            'image_url': f'/generated_images/{filename}',
-            'engine': 'Flux Schnell (Free)',
-            'quality_tier': 'Free Tier (9.0/10)'
-        }
-        
-    except requests.RequestException as e:
-        error_msg = str(e)
-        # If this model also fails, try one more fallback
-        if '410' in error_msg or 'Gone' in error_msg:
-            # Try Stable Diffusion 2.1 as final fallback
-            try:
-                fallback_url = "https://api-inference.huggingface.co/models/stabilityai/stable-diffusion-2-1"
-                fallback_headers = headers.copy()
-                fallback_payload = {
-                    "inputs": full_prompt,
-                    "parameters": {
-                        "num_inference_steps": 20,
-                        "guidance_scale": 7.5,
-                    }
-                }
-                fallback_response = requests.post(fallback_url, headers=fallback_headers, json=fallback_payload, timeout=90)
-                
-                if fallback_response.status_code == 503:
-                    time.sleep(20)
-                    fallback_response = requests.post(fallback_url, headers=fallback_headers, json=fallback_payload, timeout=90)
-                
-                fallback_response.raise_for_status()
-                
-                filename = f"generated_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-                filepath = os.path.join('generated_images', filename)
-                os.makedirs('generated_images', exist_ok=True)
-                
-                with open(filepath, 'wb') as f:
-                    f.write(fallback_response.content)
-                
-                return {
-                    'success': True,
-                    'image_url': f'/generated_images/{filename}',
-                    'engine': 'Stable Diffusion 2.1 (Free)',
-                    'quality_tier': 'Free Tier (8.5/10)'
-                }
-            except:
-                pass
-        
-        return {
-            'success': False,
-            'error': f'Hugging Face API error: {error_msg}'
-        }
+        return generation_scheduler.run(user_type, fn, *args, provider=provider, timeout=GENERATION_TIMEOUT)
+    except JobRejected as e:
+        return rejected_result(e)
+    except JobTimeout as e:
+        if not e.started:
+            return {'success': False, 'error': 'Generation timed out in queue. Please try again.'}
+        if on_late_result:
+            e.future.add_done_callback(lambda future: on_late_result(late_result(future)))
+        return {'success': False, 'error': 'Generation is taking longer than expected.', 'still_running': True}
+
+
+def rejected_result(rejection):
+    """Result dict for a job refused by the scheduler"""
+    return {'success': False, 'error': f'{rejection.reason}. Please try again shortly.',
+            'rate_limited': True, 'retry_after': rejection.retry_after}
+
+
+def late_result(future):
+    """Result dict of a finished scheduler future"""
+    try:
+        return future.result()
     except Exception as e:
-        return {
-            'success': False,
-            'error': f'Unexpected error: {str(e)}'
-        }
+        return {'success': False, 'error': str(e)}
 
 
 @app.route('/generated_images/<filename>')
@@ -2095,15 +1928,17 @@ def edit_image():
         upload_path = os.path.join('uploads', f'upload_{datetime.now().strftime("%Y%m%d_%H%M%S")}.png')
         image_file.save(upload_path)
         
-        # Route to appropriate editing API
+        # Route to appropriate editing API (through the scheduler, so paid edits are shed like generations)
         if engine == 'dalle':
-            result = edit_with_dalle(upload_path, prompt, edit_mode, quality_boost)
+            result = schedule_generation(current_tier(), 'openai', edit_with_dalle,
+                                         upload_path, prompt, edit_mode, quality_boost)
         elif engine == 'stability':
-            result = edit_with_stability(upload_path, prompt, edit_mode, quality_boost)
+            result = schedule_generation(current_tier(), 'stability', edit_with_stability,
+                                         upload_path, prompt, edit_mode, quality_boost)
         else:
             return jsonify({'error': f'Unknown engine: {engine}'}), 400
         
-        return jsonify(result)
+        return jsonify(result), 503 if result.get('rate_limited') else 200
     
     except Exception as e:
         print(f"Edit Error: {str(e)}")
@@ -2112,131 +1947,12 @@ def edit_image():
 
 def edit_with_dalle(image_path, prompt, edit_mode, quality_boost):
     """Edit image using DALL-E 2/3"""
-    api_key = CONFIG['OPENAI_API_KEY']
-    
-    if api_key == 'your-openai-key-here':
-        return {
-            'success': False,
-            'error': 'Please add your OpenAI API key',
-            'demo': True
-        }
-    
-    try:
-        # Convert image to RGBA PNG if needed
-        img = Image.open(image_path)
-        if img.mode != 'RGBA':
-            img = img.convert('RGBA')
-        
-        # Resize to 1024x1024 for DALL-E
-        img = img.resize((1024, 1024), Image.Resampling.LANCZOS)
-        rgba_path = image_path.replace('.png', '_rgba.png')
-        img.save(rgba_path, 'PNG')
-        
-        if edit_mode == 'variation':
-            # Create variation
-            url = "https://api.openai.com/v1/images/variations"
-            with open(rgba_path, 'rb') as f:
-                files = {'image': f}
-                headers = {"Authorization": f"Bearer {api_key}"}
-                data = {
-                    'n': 1,
-                    'size': '1024x1024'
-                }
-                response = requests.post(url, headers=headers, files=files, data=data)
-        else:
-            # Edit with prompt
-            url = "https://api.openai.com/v1/images/edits"
-            with open(rgba_path, 'rb') as f:
-                files = {'image': f}
-                headers = {"Authorization": f"Bearer {api_key}"}
-                data = {
-                    'prompt': prompt,
-                    'n': 1,
-                    'size': '1024x1024'
-                }
-                response = requests.post(url, headers=headers, files=files, data=data)
-        
-        response.raise_for_status()
-        data = response.json()
-        image_url = data['data'][0]['url']
-        
-        return {
-            'success': True,
-            'image_url': image_url,
-            'engine': 'DALL-E',
-            'edit_mode': edit_mode
-        }
-        
-    except Exception as e:
-        return {
-            'success': False,
-            'error': str(e)
-        }
+    return run_sync(provider_pool.dalle.edit(image_path, prompt, edit_mode))
 
 
 def edit_with_stability(image_path, prompt, edit_mode, quality_boost):
     """Edit image using Stability AI"""
-    api_key = CONFIG['STABILITY_API_KEY']
-    
-    if api_key == 'your-stability-key-here':
-        return {
-            'success': False,
-            'error': 'Please add your Stability API key',
-            'demo': True
-        }
-    
-    try:
-        url = "https://api.stability.ai/v1/generation/stable-diffusion-xl-1024-v1-0/image-to-image"
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Accept": "application/json"
-        }
-        
-        # Prepare image
-        img = Image.open(image_path)
-        img = img.resize((1024, 1024), Image.Resampling.LANCZOS)
-        img_bytes = io.BytesIO()
-        img.save(img_bytes, format='PNG')
-        img_bytes.seek(0)
-        
-        files = {
-            "init_image": img_bytes
-        }
-        
-        data = {
-            "text_prompts[0][text]": prompt,
-            "text_prompts[0][weight]": 1,
-            "cfg_scale": 8 if quality_boost else 7,
-            "steps": 50 if quality_boost else 30,
-            "samples": 1,
-            "image_strength": 0.35  # How much to change (0.0-1.0)
-        }
-        
-        response = requests.post(url, headers=headers, files=files, data=data)
-        response.raise_for_status()
-        
-        result = response.json()
-        
-        # Save result
-        image_data = result['artifacts'][0]['base64']
-        filename = f"edited_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-        filepath = os.path.join('generated_images', filename)
-        
-        with open(filepath, 'wb') as f:
-            f.write(base64.b64decode(image_data))
-        
-        return {
-            'success': True,
-            'image_url': f'/generated_images/{filename}',
-            'engine': 'Stability AI',
-            'edit_mode': edit_mode
-        }
-        
-    except Exception as e:
-        return {
-            'success': False,
-            'error': str(e)
-        }
+    return run_sync(provider_pool.stability.image_to_image(image_path, prompt, edit_mode, quality_boost))
 
 
 if __name__ == '__main__':
@@ -2266,6 +1982,8 @@ if __name__ == '__main__':
     print("Add your API keys to the CONFIG dictionary in rootAI.py")
     print("=" * 60 + "\n")
     
+    start_background_services()
+    
     # Start autonomous learning engine
     print("🤖 Starting Autonomous Learning Engine...")
     autonomous_learner.start_autonomous_learning()
@@ -2464,108 +2182,18 @@ def generate_video_runway(image_path, prompt, duration=5):
     Quality: 10/10 (industry-leading)
     Cost: $0.05/second = $0.25 for 5s, $0.40 for 8s
     """
-    api_key = CONFIG['RUNWAY_API_KEY']
-    
-    if api_key == 'your-runway-key-here':
-        return {
-            'success': False,
-            'error': 'Runway API key not configured',
-            'demo': True
-        }
-    
-    url = "https://api.runwayml.com/v1/generations"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "X-Runway-Version": "2024-11-06"
-    }
-    
-    # Read and encode image
-    import base64
-    with open(image_path, 'rb') as f:
-        image_data = base64.b64encode(f.read()).decode('utf-8')
-    
-    payload = {
-        "model": "gen3a_turbo",  # Gen-3 Alpha Turbo (fastest, high quality)
-        "prompt": prompt,
-        "init_image": f"data:image/png;base64,{image_data}",
-        "duration": duration,  # 5 or 10 seconds
-        "ratio": "16:9",
-        "watermark": False
-    }
-    
-    try:
-        # Submit generation request
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        
-        task_id = data.get('id')
-        if not task_id:
-            return {'success': False, 'error': 'No task ID returned'}
-        
-        # Poll for completion (Gen-3 Turbo takes ~90 seconds)
-        max_attempts = 120  # 2 minutes max
-        for attempt in range(max_attempts):
-            time.sleep(2)
-            
-            status_response = requests.get(
-                f"{url}/{task_id}",
-                headers=headers,
-                timeout=10
-            )
-            
-            if status_response.status_code == 200:
-                status_data = status_response.json()
-                
-                if status_data.get('status') == 'succeeded':
-                    video_url = status_data.get('output', [{}])[0].get('url')
-                    if video_url:
-                        # Calculate cost: $0.05 per second
-                        cost = duration * 0.05
-                        
-                        return {
-                            'success': True,
-                            'video_url': video_url,
-                            'duration': duration,
-                            'engine': 'Runway Gen-3 Alpha Turbo',
-                            'quality': '10/10',
-                            'api_cost': cost
-                        }
-                
-                elif status_data.get('status') == 'failed':
-                    error = status_data.get('failure_reason', 'Unknown error')
-                    return {'success': False, 'error': f'Generation failed: {error}'}
-        
-        return {'success': False, 'error': 'Video generation timeout'}
-        
-    except requests.RequestException as e:
-        return {'success': False, 'error': f'Runway API error: {str(e)}'}
-    except Exception as e:
-        return {'success': False, 'error': f'Unexpected error: {str(e)}'}
+    return run_sync(provider_pool.runway.image_to_video(image_path, prompt, duration))
 
 
 @app.route('/api/generate-video-preview', methods=['POST'])
+@require_auth
 def generate_video_preview():
     """Generate FREE preview image for video - first frame only, best quality, no credits used"""
     try:
-        # Check authentication
-        auth_header = request.headers.get('Authorization', '')
-        if not auth_header.startswith('Bearer '):
-            return jsonify({'success': False, 'error': 'Must be logged in'}), 401
-        
-        token = auth_header.replace('Bearer ', '')
-        session_token = token  # Use the token from header
-        
-        validation = user_db.validate_session(session_token)
-        if not validation.get('valid'):
-            return jsonify({'success': False, 'error': 'Invalid session'}), 401
-        
-        user_id = validation['user_id']
+        user_id = current_user_id()
         
         # Check subscription tier - Preview only available for Creator and Pro plans
-        user_data = user_db.get_user(user_id)
-        subscription_tier = user_data.get('subscription_tier', 'free')
+        subscription_tier = (current_credits() or {}).get('subscription_plan') or 'free'
         
         if subscription_tier not in ['creator', 'pro']:
             return jsonify({
@@ -2620,21 +2248,11 @@ def generate_video_preview():
 
 
 @app.route('/api/spin-wheel', methods=['POST'])
+@require_auth
 def spin_wheel():
     """Award prize from daily spin wheel"""
     try:
-        # Check authentication
-        auth_header = request.headers.get('Authorization', '')
-        if not auth_header.startswith('Bearer '):
-            return jsonify({'success': False, 'error': 'Must be logged in'}), 401
-        
-        token = auth_header.replace('Bearer ', '')
-        validation = user_db.validate_session(token)
-        
-        if not validation.get('valid'):
-            return jsonify({'success': False, 'error': 'Invalid session'}), 401
-        
-        user_id = validation['user_id']
+        user_id = current_user_id()
         
         # Get prize value
         data = request.get_json()
@@ -2649,12 +2267,11 @@ def spin_wheel():
         if prize == 'free_video':
             # Award 50 tokens (enough for one video)
             tokens_awarded = 50
-            for _ in range(50):
-                user_db.add_credit(user_id, 'premium')
+            user_db.add_credits(user_id, tokens_awarded, entry_type='spin_wheel')
         # 'no_win' awards nothing
         
         # Get updated token count
-        credits = user_db.get_user_credits(user_id)
+        credits = current_credits(refresh=True)
         total_tokens = credits.get('premium_credits', 0) + credits.get('free_credits', 0)
         
         return jsonify({
@@ -2669,65 +2286,73 @@ def spin_wheel():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def settle_video_reservation(user_id, reservation_id, result):
+    """Charge the held video tokens (and log the Runway cost) on success, refund them on failure"""
+    if not result.get('success'):
+        user_db.release_reservation(reservation_id)
+        return
+    
+    user_db.commit_reservation(reservation_id)
+    cost_monitor.log_api_cost(
+        user_id=user_id,
+        api_service='runway',
+        operation='gen3_turbo',
+        cost=result.get('api_cost', 0.40),
+        success=True
+    )
+
+
 @app.route('/api/generate-video', methods=['POST'])
+@require_auth
 def generate_video():
     """Generate video from image using premium AI"""
     try:
-        # Check authentication
-        session_token = request.cookies.get('session_token')
-        if not session_token:
-            return jsonify({'success': False, 'error': 'Must be logged in'}), 401
+        user_id = current_user_id()
         
-        validation = user_db.validate_session(session_token)
-        if not validation.get('valid'):
-            return jsonify({'success': False, 'error': 'Invalid session'}), 401
+        # Get image path and prompt
+        image_path = request.form.get('image_path')
+        prompt = request.form.get('prompt', 'smooth camera movement, high quality')
+        duration = int(request.form.get('duration', 8))  # 5, 8, or 10 seconds
         
-        user_id = validation['user_id']
+        if not image_path:
+            return jsonify({'success': False, 'error': 'No image provided'}), 400
         
-        # Check credits (video costs 40 tokens = $0.40 for 8s)
-        credits = user_db.get_user_credits(user_id)
+        credits = current_credits()
         if not credits.get('success'):
             return jsonify({'success': False, 'error': 'Could not check credits'}), 500
         
+        # Hold the tokens up front (video costs 40 tokens = $0.40 for 8s)
         video_cost = 40  # 40 tokens for 8-second video
-        if credits.get('premium_credits', 0) < video_cost:
+        reservation = user_db.reserve_credits(user_id, video_cost, purpose='video')
+        if not reservation.get('success'):
             return jsonify({
                 'success': False,
                 'error': f'Insufficient credits. Video requires {video_cost} tokens.',
                 'require_purchase': True
             }), 402
         
-        # Get image path and prompt
-        image_path = request.form.get('image_path')
-        prompt = request.form.get('prompt', 'smooth camera movement, high quality')
-        duration = int(request.form.get('duration', 8))  # 5, 8, or 10 seconds
-        
-        if not image_path:
-            return jsonify({'success': False, 'error': 'No image provided'}), 400
-        
         # Generate video
-        result = generate_video_runway(image_path, prompt, duration)
+        reservation_id = reservation['reservation_id']
+        try:
+            result = schedule_generation(
+                current_tier(), 'runway', generate_video_runway, image_path, prompt, duration,
+                on_late_result=lambda late: settle_video_reservation(user_id, reservation_id, late)
+            )
+        except Exception:
+            user_db.release_reservation(reservation_id)
+            raise
         
+        if result.get('still_running'):
+            # Runway is still working: the hold is charged or refunded when it finishes
+            result['error'] = 'Video is taking longer than expected. Your tokens stay on hold until it finishes.'
+            return jsonify(result), 504
+        
+        settle_video_reservation(user_id, reservation_id, result)
         if result.get('success'):
-            # Deduct credits
-            for _ in range(video_cost):
-                user_db.use_credit(user_id, 'premium')
-            
-            # Log API cost
-            api_cost = result.get('api_cost', 0.40)
-            cost_monitor.log_api_cost(
-                user_id=user_id,
-                api_service='runway',
-                operation='gen3_turbo',
-                cost=api_cost,
-                success=True
-            )
-            
             result['credits_used'] = video_cost
             return jsonify(result)
         else:
-            # Refund on failure
-            return jsonify(result), 500
+            return jsonify(result), 503 if result.get('rate_limited') else 500
             
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -2759,7 +2384,10 @@ def get_cost_stats():
             'daily': daily,
             'alerts': alerts,
             'breakdown': breakdown,
-            'top_users': top_users
+            'top_users': top_users,
+            'live_top_users': cost_monitor.user_spend.top_users(limit=10),
+            'spend_anomalies': cost_monitor.user_spend.anomalies(),
+            'forecast': cost_monitor.forecaster.refresh(force=True)
         })
         
     except Exception as e:
@@ -2779,21 +2407,71 @@ def get_cost_report():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/admin/emergency-mode', methods=['POST'])
+@require_admin
+def set_emergency_mode():
+    """Switch emergency mode on or off for every worker (admin only)"""
+    try:
+        active = (request.get_json(silent=True) or {}).get('active')
+        if not isinstance(active, bool):
+            return jsonify({'success': False, 'error': "'active' must be true or false"}), 400
+        if active:
+            cost_monitor.activate_emergency_mode()
+        else:
+            cost_monitor.deactivate_emergency_mode()
+        return jsonify({'success': True, 'emergency_mode': cost_monitor.emergency_mode})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/admin/credit-ledger', methods=['GET'])
+@require_admin
+def get_credit_ledger():
+    """Premium credit balances by account and flows by type, from the ledger (admin only)"""
+    try:
+        days = request.args.get('days', type=int)
+        since = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S') if days else None
+        return jsonify(user_db.get_ledger_summary(since))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/admin/provider-stats', methods=['GET'])
+@require_admin
+def get_provider_stats():
+    """Get provider concurrency, outbound throttle, job queue, hashing pool and cost writer state (admin only)"""
+    try:
+        return jsonify({
+            'success': True,
+            'providers': provider_pool.stats(),
+            'throttle': rate_governor.stats(),
+            'scheduler': generation_scheduler.stats(),
+            'services': service_stats(),
+            'password_hashing': hash_pool.stats(),
+            'login_throttle': login_throttle.stats(),
+            'auth': auth_stats(),
+            'stripe_events': stripe_events.stats(),
+            'cost_writer': cost_monitor.cost_writer.stats(),
+            'control_plane': cost_monitor.control_plane.stats(),
+            'spend_forecast': cost_monitor.forecaster.stats(),
+            'user_spend': cost_monitor.user_spend.stats(),
+            'rating_writer': {**analytics_system.rating_writer.stats(),
+                              'unknown_generations': analytics_system.unknown_ratings},
+            'behavior_writer': analytics_system.behavior_writer.stats(),
+            'prompt_index': analytics_system.prompt_index.stats()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 # ============ RATING SYSTEM - LEARNING AI FOUNDATION ============
 
 @app.route('/api/rate-image', methods=['POST'])
+@require_auth
 def rate_image():
     """Rate a generated image (foundation for learning AI)"""
     try:
-        session_token = request.cookies.get('session_token')
-        if not session_token:
-            return jsonify({'success': False, 'error': 'Must be logged in'}), 401
-        
-        validation = user_db.validate_session(session_token)
-        if not validation.get('valid'):
-            return jsonify({'success': False, 'error': 'Invalid session'}), 401
-        
-        user_id = validation['user_id']
+        user_id = current_user_id()
         data = request.json
         
         result = rating_system.rate_image(
@@ -2816,18 +2494,11 @@ def rate_image():
 
 
 @app.route('/api/rate-video', methods=['POST'])
+@require_auth
 def rate_video():
     """Rate a generated video"""
     try:
-        session_token = request.cookies.get('session_token')
-        if not session_token:
-            return jsonify({'success': False, 'error': 'Must be logged in'}), 401
-        
-        validation = user_db.validate_session(session_token)
-        if not validation.get('valid'):
-            return jsonify({'success': False, 'error': 'Invalid session'}), 401
-        
-        user_id = validation['user_id']
+        user_id = current_user_id()
         data = request.json
         
         result = rating_system.rate_video(
@@ -2871,18 +2542,11 @@ def suggest_improvements():
 
 
 @app.route('/api/rating-stats', methods=['GET'])
+@require_auth
 def get_rating_stats():
     """Get user's rating statistics"""
     try:
-        session_token = request.cookies.get('session_token')
-        if not session_token:
-            return jsonify({'success': False, 'error': 'Must be logged in'}), 401
-        
-        validation = user_db.validate_session(session_token)
-        if not validation.get('valid'):
-            return jsonify({'success': False, 'error': 'Invalid session'}), 401
-        
-        user_id = validation['user_id']
+        user_id = current_user_id()
         stats = rating_system.get_user_stats(user_id)
         
         return jsonify({
@@ -2912,8 +2576,8 @@ def get_rating_analytics():
 from social_content_creator import SocialContentCreator, estimate_monthly_costs
 from intelligent_social_system import IntelligentSocialSystem
 
-social_creator = SocialContentCreator()
-intelligent_system = IntelligentSocialSystem()
+social_creator = lazy('social_creator', SocialContentCreator)
+intelligent_system = lazy('intelligent_system', IntelligentSocialSystem)
 
 @app.route('/social-content')
 def social_content_dashboard():
@@ -2935,21 +2599,11 @@ def get_system_status():
 
 
 @app.route('/api/social-content/generate', methods=['POST'])
+@require_auth
 def generate_social_content():
     """Generate AI-optimized content using intelligent system (with learnings)"""
     try:
-        # Check authentication
-        auth_header = request.headers.get('Authorization', '')
-        if not auth_header.startswith('Bearer '):
-            return jsonify({'success': False, 'error': 'Must be logged in'}), 401
-        
-        token = auth_header.replace('Bearer ', '')
-        validation = user_db.validate_session(token)
-        
-        if not validation.get('valid'):
-            return jsonify({'success': False, 'error': 'Invalid session'}), 401
-        
-        user_id = validation['user_id']
+        user_id = current_user_id()
         
         # Get request data
         data = request.get_json()
@@ -3007,19 +2661,10 @@ def generate_social_content():
 
 
 @app.route('/api/social-content/scheduled', methods=['GET'])
+@require_auth
 def get_scheduled_content():
     """Get all scheduled content for user"""
     try:
-        auth_header = request.headers.get('Authorization', '')
-        if not auth_header.startswith('Bearer '):
-            return jsonify({'success': False, 'error': 'Must be logged in'}), 401
-        
-        token = auth_header.replace('Bearer ', '')
-        validation = user_db.validate_session(token)
-        
-        if not validation.get('valid'):
-            return jsonify({'success': False, 'error': 'Invalid session'}), 401
-        
         # Get scheduled content from database
         import sqlite3
         conn = sqlite3.connect(social_creator.db_path)
@@ -3048,19 +2693,10 @@ def get_scheduled_content():
 
 
 @app.route('/api/social-content/stats', methods=['GET'])
+@require_auth
 def get_social_stats():
     """Get social media content statistics"""
     try:
-        auth_header = request.headers.get('Authorization', '')
-        if not auth_header.startswith('Bearer '):
-            return jsonify({'success': False, 'error': 'Must be logged in'}), 401
-        
-        token = auth_header.replace('Bearer ', '')
-        validation = user_db.validate_session(token)
-        
-        if not validation.get('valid'):
-            return jsonify({'success': False, 'error': 'Invalid session'}), 401
-        
         # Get stats from database
         import sqlite3
         conn = sqlite3.connect(social_creator.db_path)
@@ -3099,19 +2735,10 @@ def get_social_stats():
 
 
 @app.route('/api/social-content/analytics', methods=['GET'])
+@require_auth
 def get_social_analytics():
     """Get comprehensive analytics report"""
     try:
-        auth_header = request.headers.get('Authorization', '')
-        if not auth_header.startswith('Bearer '):
-            return jsonify({'success': False, 'error': 'Must be logged in'}), 401
-        
-        token = auth_header.replace('Bearer ', '')
-        validation = user_db.validate_session(token)
-        
-        if not validation.get('valid'):
-            return jsonify({'success': False, 'error': 'Invalid session'}), 401
-        
         days = int(request.args.get('days', 30))
         report = social_creator.get_analytics_report(days)
         
@@ -3138,19 +2765,10 @@ def get_cost_estimate():
 
 
 @app.route('/api/social-content/post-now', methods=['POST'])
+@require_auth
 def post_content_now():
     """Post content immediately to platform"""
     try:
-        auth_header = request.headers.get('Authorization', '')
-        if not auth_header.startswith('Bearer '):
-            return jsonify({'success': False, 'error': 'Must be logged in'}), 401
-        
-        token = auth_header.replace('Bearer ', '')
-        validation = user_db.validate_session(token)
-        
-        if not validation.get('valid'):
-            return jsonify({'success': False, 'error': 'Invalid session'}), 401
-        
         data = request.get_json()
         content_id = data.get('content_id')
         platform = data.get('platform')
@@ -0,0 +1,744 @@
+"""
+Baseline Schema for Picly
+Version 1 of every component: the tables, indexes and seed rows each
+subsystem used to create in its init_database on every start
+"""
+
+import json
+
+
+# users.db - UserDatabase
+USERS_SCHEMA = [
+    '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            salt TEXT NOT NULL,
+            premium_credits INTEGER DEFAULT 0,
+            free_credits_today INTEGER DEFAULT 10,
+            last_free_reset DATE,
+            referral_code TEXT UNIQUE,
+            referred_by INTEGER,
+            total_generations INTEGER DEFAULT 0,
+            subscription_status TEXT DEFAULT 'none',
+            subscription_id TEXT,
+            subscription_expires_at TIMESTAMP,
+            low_token_threshold INTEGER DEFAULT 300,
+            low_token_notified BOOLEAN DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP,
+            FOREIGN KEY (referred_by) REFERENCES users (id)
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            session_token TEXT UNIQUE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            stripe_payment_id TEXT,
+            amount REAL NOT NULL,
+            credits INTEGER NOT NULL,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS achievements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            achievement_type TEXT NOT NULL,
+            credits_awarded INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            UNIQUE(user_id, achievement_type)
+        )
+    ''',
+    # Premium credits held for in-flight multi-unit operations (videos, batches)
+    '''
+        CREATE TABLE IF NOT EXISTS credit_reservations (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            credits INTEGER NOT NULL,
+            credits_used INTEGER DEFAULT 0,
+            purpose TEXT,
+            status TEXT DEFAULT 'held',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP NOT NULL,
+            settled_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date DATE NOT NULL UNIQUE,
+            total_generations INTEGER DEFAULT 0,
+            free_generations INTEGER DEFAULT 0,
+            premium_generations INTEGER DEFAULT 0,
+            revenue REAL DEFAULT 0
+        )
+    ''',
+]
+
+# cost_monitor.db - CostMonitor
+COST_MONITOR_SCHEMA = [
+    # API cost tracking
+    '''
+        CREATE TABLE IF NOT EXISTS api_costs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_id INTEGER,
+            api_service TEXT,
+            operation TEXT,
+            cost REAL,
+            success BOOLEAN,
+            request_id TEXT
+        )
+    ''',
+    # Revenue tracking
+    '''
+        CREATE TABLE IF NOT EXISTS revenue (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_id INTEGER,
+            amount REAL,
+            type TEXT,
+            description TEXT
+        )
+    ''',
+    # Hourly summaries
+    '''
+        CREATE TABLE IF NOT EXISTS hourly_stats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            hour_start TIMESTAMP,
+            total_cost REAL,
+            total_revenue REAL,
+            profit REAL,
+            margin REAL,
+            requests_count INTEGER,
+            unique_users INTEGER
+        )
+    ''',
+]
+
+# analytics.db - AnalyticsSystem
+ANALYTICS_SCHEMA = [
+    # Generation Ratings Table - Core learning data
+    '''
+        CREATE TABLE IF NOT EXISTS generation_ratings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            generation_id TEXT UNIQUE NOT NULL,
+            user_id INTEGER NOT NULL,
+            prompt TEXT NOT NULL,
+            prompt_hash TEXT NOT NULL,
+            engine TEXT NOT NULL,
+            model_version TEXT,
+            rating INTEGER CHECK(rating >= 1 AND rating <= 5),
+            quality_score REAL,
+            feedback_text TEXT,
+            feedback_tags TEXT,
+            used_in_project BOOLEAN DEFAULT 0,
+            downloaded BOOLEAN DEFAULT 0,
+            shared BOOLEAN DEFAULT 0,
+            regenerated BOOLEAN DEFAULT 0,
+            edited BOOLEAN DEFAULT 0,
+            time_to_rate INTEGER,
+            session_id TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            rated_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''',
+    # Prompt Analytics - Learn what works
+    '''
+        CREATE TABLE IF NOT EXISTS prompt_analytics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prompt_hash TEXT NOT NULL,
+            prompt_text TEXT NOT NULL,
+            engine TEXT NOT NULL,
+            total_generations INTEGER DEFAULT 1,
+            avg_rating REAL,
+            total_ratings INTEGER DEFAULT 0,
+            five_star_count INTEGER DEFAULT 0,
+            four_star_count INTEGER DEFAULT 0,
+            three_star_count INTEGER DEFAULT 0,
+            two_star_count INTEGER DEFAULT 0,
+            one_star_count INTEGER DEFAULT 0,
+            avg_quality_score REAL,
+            success_rate REAL,
+            download_rate REAL,
+            share_rate REAL,
+            regeneration_rate REAL,
+            avg_time_to_rate INTEGER,
+            last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(prompt_hash, engine)
+        )
+    ''',
+    # User Behavior Analytics
+    '''
+        CREATE TABLE IF NOT EXISTS user_behavior (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            session_id TEXT NOT NULL,
+            action_type TEXT NOT NULL,
+            action_details TEXT,
+            page_url TEXT,
+            device_type TEXT,
+            browser TEXT,
+            screen_resolution TEXT,
+            interaction_time INTEGER,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''',
+    # A/B Test Experiments
+    '''
+        CREATE TABLE IF NOT EXISTS ab_experiments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            experiment_name TEXT UNIQUE NOT NULL,
+            description TEXT,
+            variant_a TEXT NOT NULL,
+            variant_b TEXT NOT NULL,
+            metric_to_track TEXT NOT NULL,
+            status TEXT DEFAULT 'active',
+            start_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            end_date TIMESTAMP,
+            winner TEXT,
+            confidence_level REAL
+        )
+    ''',
+    # A/B Test Assignments
+    '''
+        CREATE TABLE IF NOT EXISTS ab_assignments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            experiment_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            variant TEXT NOT NULL,
+            assigned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (experiment_id) REFERENCES ab_experiments (id),
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            UNIQUE(experiment_id, user_id)
+        )
+    ''',
+    # A/B Test Results
+    '''
+        CREATE TABLE IF NOT EXISTS ab_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            experiment_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            variant TEXT NOT NULL,
+            metric_value REAL NOT NULL,
+            conversion BOOLEAN DEFAULT 0,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (experiment_id) REFERENCES ab_experiments (id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''',
+    # Feature Usage Analytics
+    '''
+        CREATE TABLE IF NOT EXISTS feature_usage (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            feature_name TEXT NOT NULL,
+            user_id INTEGER,
+            usage_count INTEGER DEFAULT 1,
+            success_count INTEGER DEFAULT 0,
+            error_count INTEGER DEFAULT 0,
+            avg_duration REAL,
+            last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            metadata TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''',
+    # Conversion Funnel Analytics
+    '''
+        CREATE TABLE IF NOT EXISTS conversion_funnel (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            session_id TEXT NOT NULL,
+            funnel_stage TEXT NOT NULL,
+            stage_order INTEGER NOT NULL,
+            time_spent INTEGER,
+            completed BOOLEAN DEFAULT 0,
+            dropped_off BOOLEAN DEFAULT 0,
+            conversion_value REAL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''',
+    # Model Performance Tracking
+    '''
+        CREATE TABLE IF NOT EXISTS model_performance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            engine TEXT NOT NULL,
+            model_version TEXT NOT NULL,
+            date DATE NOT NULL,
+            total_requests INTEGER DEFAULT 0,
+            successful_requests INTEGER DEFAULT 0,
+            failed_requests INTEGER DEFAULT 0,
+            avg_response_time REAL,
+            avg_rating REAL,
+            avg_quality_score REAL,
+            total_cost REAL DEFAULT 0,
+            total_revenue REAL DEFAULT 0,
+            profit_margin REAL,
+            UNIQUE(engine, model_version, date)
+        )
+    ''',
+    # Engagement Metrics
+    '''
+        CREATE TABLE IF NOT EXISTS engagement_metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            date DATE NOT NULL,
+            session_count INTEGER DEFAULT 0,
+            total_time_spent INTEGER DEFAULT 0,
+            generations_created INTEGER DEFAULT 0,
+            features_explored INTEGER DEFAULT 0,
+            social_shares INTEGER DEFAULT 0,
+            feedback_given INTEGER DEFAULT 0,
+            help_accessed INTEGER DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            UNIQUE(user_id, date)
+        )
+    ''',
+    # Cohort Analysis
+    '''
+        CREATE TABLE IF NOT EXISTS user_cohorts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            cohort_date DATE NOT NULL,
+            acquisition_source TEXT,
+            user_segment TEXT,
+            initial_plan TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            UNIQUE(user_id)
+        )
+    ''',
+    # Machine Learning Training Data
+    '''
+        CREATE TABLE IF NOT EXISTS ml_training_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            data_type TEXT NOT NULL,
+            features TEXT NOT NULL,
+            label REAL NOT NULL,
+            weight REAL DEFAULT 1.0,
+            validation_set BOOLEAN DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    # Create indexes for performance
+    'CREATE INDEX IF NOT EXISTS idx_generation_user ON generation_ratings(user_id)',
+    'CREATE INDEX IF NOT EXISTS idx_generation_prompt ON generation_ratings(prompt_hash)',
+    'CREATE INDEX IF NOT EXISTS idx_generation_rating ON generation_ratings(rating)',
+    'CREATE INDEX IF NOT EXISTS idx_prompt_hash ON prompt_analytics(prompt_hash)',
+    'CREATE INDEX IF NOT EXISTS idx_user_behavior ON user_behavior(user_id, timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_feature_usage ON feature_usage(feature_name, user_id)',
+    'CREATE INDEX IF NOT EXISTS idx_model_perf ON model_performance(engine, date)',
+]
+
+# analytics.db - QualityOptimizer
+QUALITY_OPTIMIZER_SCHEMA = [
+    # Engine performance profiles
+    '''
+        CREATE TABLE IF NOT EXISTS engine_profiles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            engine TEXT NOT NULL,
+            settings_hash TEXT NOT NULL,
+            settings_json TEXT NOT NULL,
+            total_uses INTEGER DEFAULT 0,
+            avg_rating REAL DEFAULT 0,
+            avg_quality_score REAL DEFAULT 0,
+            avg_generation_time REAL DEFAULT 0,
+            avg_cost REAL DEFAULT 0,
+            success_rate REAL DEFAULT 0,
+            quality_per_dollar REAL DEFAULT 0,
+            quality_per_second REAL DEFAULT 0,
+            overall_score REAL DEFAULT 0,
+            last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(engine, settings_hash)
+        )
+    ''',
+    # Generation performance logs
+    '''
+        CREATE TABLE IF NOT EXISTS generation_performance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            generation_id TEXT NOT NULL,
+            engine TEXT NOT NULL,
+            settings_hash TEXT NOT NULL,
+            prompt_category TEXT,
+            generation_time REAL NOT NULL,
+            cost REAL NOT NULL,
+            rating INTEGER,
+            quality_score REAL,
+            success BOOLEAN DEFAULT 1,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (generation_id) REFERENCES generation_ratings (generation_id)
+        )
+    ''',
+    # Prompt category patterns
+    '''
+        CREATE TABLE IF NOT EXISTS prompt_categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category_name TEXT UNIQUE NOT NULL,
+            keywords TEXT NOT NULL,
+            best_engine TEXT,
+            best_settings TEXT,
+            avg_rating REAL,
+            sample_count INTEGER DEFAULT 0
+        )
+    ''',
+    # Real-time optimization cache
+    '''
+        CREATE TABLE IF NOT EXISTS optimization_cache (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cache_key TEXT UNIQUE NOT NULL,
+            recommended_engine TEXT NOT NULL,
+            recommended_settings TEXT NOT NULL,
+            confidence_score REAL NOT NULL,
+            reason TEXT,
+            valid_until TIMESTAMP NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+]
+
+# Default prompt categories (QualityOptimizer.categorize_prompt)
+DEFAULT_PROMPT_CATEGORIES = {
+    'portrait': ['portrait', 'face', 'person', 'selfie', 'headshot', 'character'],
+    'landscape': ['landscape', 'scenery', 'nature', 'mountain', 'forest', 'ocean', 'sky'],
+    'product': ['product', 'commercial', 'advertisement', 'packaging', 'logo'],
+    'artistic': ['art', 'painting', 'artistic', 'abstract', 'creative', 'surreal'],
+    'photorealistic': ['realistic', 'photorealistic', 'photo', 'real', 'cinematic'],
+    'illustration': ['illustration', 'cartoon', 'drawing', 'sketch', 'anime', 'comic'],
+    'architecture': ['building', 'architecture', 'interior', 'room', 'house'],
+    'fantasy': ['fantasy', 'magical', 'dragon', 'wizard', 'mythical'],
+}
+
+QUALITY_OPTIMIZER_SCHEMA += [
+    ('INSERT OR IGNORE INTO prompt_categories (category_name, keywords) VALUES (?, ?)', (name, json.dumps(keywords)))
+    for name, keywords in DEFAULT_PROMPT_CATEGORIES.items()
+]
+
+
+# ratings.db - RatingSystem
+RATINGS_SCHEMA = [
+    # Image ratings
+    '''
+        CREATE TABLE IF NOT EXISTS image_ratings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_id INTEGER,
+            image_url TEXT,
+            prompt TEXT,
+            negative_prompt TEXT,
+            engine TEXT,
+            style TEXT,
+            rating INTEGER CHECK(rating >= 1 AND rating <= 5),
+            feedback TEXT,
+            dimensions TEXT,
+            quality_boost BOOLEAN
+        )
+    ''',
+    # Video ratings
+    '''
+        CREATE TABLE IF NOT EXISTS video_ratings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_id INTEGER,
+            video_url TEXT,
+            image_url TEXT,
+            prompt TEXT,
+            engine TEXT,
+            duration INTEGER,
+            rating INTEGER CHECK(rating >= 1 AND rating <= 5),
+            feedback TEXT
+        )
+    ''',
+    # Prompt analytics (learning data)
+    '''
+        CREATE TABLE IF NOT EXISTS prompt_analytics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prompt_keywords TEXT,
+            style TEXT,
+            engine TEXT,
+            avg_rating REAL,
+            total_ratings INTEGER,
+            success_rate REAL,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    # User preferences (for personalized recommendations)
+    '''
+        CREATE TABLE IF NOT EXISTS user_preferences (
+            user_id INTEGER PRIMARY KEY,
+            favorite_styles TEXT,
+            favorite_engines TEXT,
+            avg_rating_given REAL,
+            total_generations INTEGER,
+            high_rated_prompts TEXT,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+]
+
+# learning.db - AutonomousLearner
+LEARNING_SCHEMA = [
+    # Harvested prompts from open-source
+    '''
+        CREATE TABLE IF NOT EXISTS harvested_prompts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prompt_text TEXT NOT NULL,
+            prompt_hash TEXT UNIQUE NOT NULL,
+            source TEXT NOT NULL,
+            source_url TEXT,
+            quality_indicators TEXT,
+            upvotes INTEGER DEFAULT 0,
+            engagement_score REAL DEFAULT 0,
+            image_url TEXT,
+            metadata TEXT,
+            learned_patterns TEXT,
+            harvested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    # Pattern library - learned structures
+    '''
+        CREATE TABLE IF NOT EXISTS prompt_patterns (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pattern_type TEXT NOT NULL,
+            pattern_template TEXT NOT NULL,
+            category TEXT,
+            effectiveness_score REAL DEFAULT 0,
+            usage_count INTEGER DEFAULT 0,
+            success_rate REAL DEFAULT 0,
+            example_prompts TEXT,
+            keywords TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    # Quality indicators - what makes prompts work
+    '''
+        CREATE TABLE IF NOT EXISTS quality_indicators (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            indicator_type TEXT NOT NULL,
+            indicator_value TEXT NOT NULL,
+            category TEXT,
+            correlation_score REAL DEFAULT 0,
+            occurrence_count INTEGER DEFAULT 0,
+            avg_quality_when_present REAL DEFAULT 0,
+            avg_quality_when_absent REAL DEFAULT 0,
+            statistical_significance REAL DEFAULT 0
+        )
+    ''',
+    # Style library - successful artistic directions
+    '''
+        CREATE TABLE IF NOT EXISTS style_library (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            style_name TEXT UNIQUE NOT NULL,
+            style_keywords TEXT NOT NULL,
+            style_modifiers TEXT,
+            best_engines TEXT,
+            avg_quality REAL DEFAULT 0,
+            sample_count INTEGER DEFAULT 0,
+            example_images TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    # Negative prompt library
+    '''
+        CREATE TABLE IF NOT EXISTS negative_patterns (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            negative_prompt TEXT NOT NULL,
+            category TEXT,
+            effectiveness_score REAL DEFAULT 0,
+            usage_count INTEGER DEFAULT 0,
+            improves_quality_by REAL DEFAULT 0
+        )
+    ''',
+    # Knowledge graph - relationships between concepts
+    '''
+        CREATE TABLE IF NOT EXISTS concept_relationships (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            concept_a TEXT NOT NULL,
+            concept_b TEXT NOT NULL,
+            relationship_type TEXT NOT NULL,
+            strength REAL DEFAULT 0,
+            co_occurrence_count INTEGER DEFAULT 0,
+            avg_quality REAL DEFAULT 0,
+            UNIQUE(concept_a, concept_b, relationship_type)
+        )
+    ''',
+    # Trending patterns - what's working now
+    '''
+        CREATE TABLE IF NOT EXISTS trending_patterns (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pattern_text TEXT NOT NULL,
+            trend_score REAL DEFAULT 0,
+            velocity REAL DEFAULT 0,
+            peak_date DATE,
+            category TEXT,
+            source_count INTEGER DEFAULT 0,
+            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    # Learning sessions log
+    '''
+        CREATE TABLE IF NOT EXISTS learning_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_type TEXT NOT NULL,
+            items_processed INTEGER DEFAULT 0,
+            patterns_discovered INTEGER DEFAULT 0,
+            quality_improvement REAL DEFAULT 0,
+            duration_seconds INTEGER DEFAULT 0,
+            status TEXT DEFAULT 'completed',
+            error_message TEXT,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMP
+        )
+    ''',
+]
+
+# Foundational prompt patterns for the autonomous learner
+BASE_PATTERNS = [
+    ('quality_modifiers', '{subject}, {quality_terms}', 'enhancement',
+     ['highly detailed', '4k', '8k', 'professional', 'masterpiece']),
+    ('lighting', '{subject}, {lighting_type}', 'lighting',
+     ['golden hour', 'studio lighting', 'dramatic lighting', 'soft light']),
+    ('style', '{subject}, in the style of {artist/style}', 'artistic',
+     ['cinematic', 'photorealistic', 'oil painting', 'digital art']),
+    ('composition', '{subject}, {composition_type}', 'composition',
+     ['rule of thirds', 'centered', 'wide angle', 'close-up']),
+]
+
+LEARNING_SCHEMA += [
+    ('INSERT OR IGNORE INTO prompt_patterns (pattern_type, pattern_template, category, keywords) VALUES (?, ?, ?, ?)',
+     (pattern_type, template, category, json.dumps(keywords)))
+    for pattern_type, template, category, keywords in BASE_PATTERNS
+]
+
+
+# social_content.db - SocialContentCreator
+SOCIAL_CONTENT_SCHEMA = [
+    # Content queue table
+    '''
+        CREATE TABLE IF NOT EXISTS content_queue (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    content_type TEXT NOT NULL,
+                    topic TEXT,
+                    language TEXT DEFAULT 'en',
+                    target_platforms TEXT,
+                    status TEXT DEFAULT 'pending',
+                    scheduled_time TEXT,
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+    ''',
+    # Generated content table
+    '''
+        CREATE TABLE IF NOT EXISTS generated_content (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    queue_id INTEGER,
+                    platform TEXT NOT NULL,
+                    content_text TEXT,
+                    image_url TEXT,
+                    video_url TEXT,
+                    hashtags TEXT,
+                    seo_keywords TEXT,
+                    metadata JSON,
+                    language TEXT DEFAULT 'en',
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (queue_id) REFERENCES content_queue(id)
+                )
+    ''',
+    # Posted content tracking
+    '''
+        CREATE TABLE IF NOT EXISTS posted_content (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    content_id INTEGER,
+                    platform TEXT NOT NULL,
+                    post_id TEXT,
+                    post_url TEXT,
+                    posted_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                    engagement_data JSON,
+                    FOREIGN KEY (content_id) REFERENCES generated_content(id)
+                )
+    ''',
+    # Platform credentials
+    '''
+        CREATE TABLE IF NOT EXISTS platform_credentials (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    platform TEXT UNIQUE NOT NULL,
+                    credentials JSON NOT NULL,
+                    is_active INTEGER DEFAULT 1,
+                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+    ''',
+    # Content templates
+    '''
+        CREATE TABLE IF NOT EXISTS content_templates (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    content_type TEXT,
+                    template_text TEXT,
+                    language TEXT DEFAULT 'en',
+                    platforms TEXT,
+                    is_active INTEGER DEFAULT 1,
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+    ''',
+    # Posting schedule
+    '''
+        CREATE TABLE IF NOT EXISTS posting_schedule (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    platform TEXT NOT NULL,
+                    day_of_week TEXT,
+                    time_of_day TEXT NOT NULL,
+                    content_type TEXT,
+                    is_active INTEGER DEFAULT 1
+                )
+    ''',
+    # Analytics tracking
+    '''
+        CREATE TABLE IF NOT EXISTS content_analytics (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    posted_content_id INTEGER,
+                    platform TEXT NOT NULL,
+                    views INTEGER DEFAULT 0,
+                    likes INTEGER DEFAULT 0,
+                    comments INTEGER DEFAULT 0,
+                    shares INTEGER DEFAULT 0,
+                    saves INTEGER DEFAULT 0,
+                    click_through_rate REAL DEFAULT 0,
+                    engagement_rate REAL DEFAULT 0,
+                    last_updated TEXT DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (posted_content_id) REFERENCES posted_content(id)
+                )
+    ''',
+    # Hashtag performance tracking
+    '''
+        CREATE TABLE IF NOT EXISTS hashtag_performance (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    hashtag TEXT NOT NULL,
+                    platform TEXT NOT NULL,
+                    total_uses INTEGER DEFAULT 1,
+                    avg_engagement REAL DEFAULT 0,
+                    best_performing_time TEXT,
+                    language TEXT DEFAULT 'en',
+                    last_used TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+    ''',
+]
@@ -0,0 +1,61 @@
+"""
+Lazy Service Registry for Picly
+Subsystem singletons are built on first use instead of at import time, so
+importing rootAI (and booting a gunicorn worker) opens no databases
+"""
+
+import threading
+import time
+
+
+_registry = {}
+
+
+class LazyService:
+    """Stand-in for a singleton; the first attribute access builds the real object"""
+
+    def __init__(self, name, factory):
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_instance', None)
+        object.__setattr__(self, '_init_seconds', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+        _registry[name] = self
+
+    def _resolve(self):
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                if self._instance is None:
+                    started = time.perf_counter()
+                    object.__setattr__(self, '_instance', self._factory())
+                    object.__setattr__(self, '_init_seconds', time.perf_counter() - started)
+                instance = self._instance
+        return instance
+
+    def __getattr__(self, attr):
+        # Only reached for names the proxy itself does not define
+        return getattr(self._resolve(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._resolve(), attr, value)
+
+    def __repr__(self):
+        state = 'initialized' if self._instance is not None else 'pending'
+        return f'<LazyService {self._name} ({state})>'
+
+
+def lazy(name, factory):
+    """Register a service built by factory() on first use"""
+    return LazyService(name, factory)
+
+
+def service_stats():
+    """Which services have been built, and how long each took"""
+    return {
+        name: {
+            'initialized': service._instance is not None,
+            'init_seconds': round(service._init_seconds, 4) if service._init_seconds is not None else None
+        }
+        for name, service in _registry.items()
+    }
@@ -0,0 +1,134 @@
+"""
+Signed Session Tokens for Picly
+Optional stateless sessions: an HMAC-signed token carries user_id, username
+and expiry, so validation is an in-memory signature check instead of a
+sessions JOIN users query. Logout adds the token id to a revoked_tokens table;
+each worker keeps an in-memory copy of the unexpired revocations and pulls
+new rows at most every REVOCATION_SYNC_SECONDS.
+
+Enable with SESSION_TOKENS=signed and a SESSION_SIGNING_KEY shared by every
+worker. Tokens issued by the database mode keep validating after the switch.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+
+TOKEN_PREFIX = 's1.'
+
+# How stale a worker's revocation set may get before it re-reads the table
+REVOCATION_SYNC_SECONDS = 5.0
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def signed_sessions_enabled():
+    return os.getenv('SESSION_TOKENS', 'database') == 'signed' and bool(os.getenv('SESSION_SIGNING_KEY'))
+
+
+class SessionSigner:
+    def __init__(self, secret, db_path='users.db', sync_interval=REVOCATION_SYNC_SECONDS):
+        self.key = secret.encode('utf-8') if isinstance(secret, str) else secret
+        self.db_path = db_path
+        self.sync_interval = sync_interval
+        self.revoked = {}  # jti -> expiry (epoch seconds)
+        self.last_revocation_id = 0
+        self.last_sync = 0.0
+        self.lock = threading.Lock()
+
+    def _sign(self, payload):
+        return _b64encode(hmac.new(self.key, payload.encode('ascii'), hashlib.sha256).digest())
+
+    def is_signed(self, token):
+        return bool(token) and token.startswith(TOKEN_PREFIX)
+
+    def issue(self, user_id, username, expires_at):
+        """Signed token for a user; expires_at is a datetime"""
+        claims = {'u': user_id, 'n': username, 'e': int(expires_at.timestamp()), 'j': secrets.token_urlsafe(12)}
+        payload = TOKEN_PREFIX + _b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+        return payload + '.' + self._sign(payload)
+
+    def decode(self, token):
+        """Claims of a correctly signed token (expiry and revocation not checked), else None"""
+        try:
+            payload, signature = token.rsplit('.', 1)
+            if not hmac.compare_digest(signature, self._sign(payload)):
+                return None
+            return json.loads(_b64decode(payload[len(TOKEN_PREFIX):]))
+        except (ValueError, TypeError):
+            return None
+
+    def verify(self, token):
+        """Validate a signed token in memory, in the shape of UserDatabase.validate_session"""
+        claims = self.decode(token)
+        if not claims:
+            return {'valid': False, 'error': 'Invalid session'}
+        if time.time() > claims['e']:
+            return {'valid': False, 'error': 'Session expired'}
+
+        self.sync_revocations()
+        if claims['j'] in self.revoked:
+            return {'valid': False, 'error': 'Invalid session'}
+
+        return {'valid': True, 'user_id': claims['u'], 'username': claims['n']}
+
+    def revoke(self, token):
+        """Revoke a signed token in this worker now and in the others on their next sync"""
+        claims = self.decode(token)
+        if not claims:
+            return False
+
+        with self.lock:
+            self.revoked[claims['j']] = claims['e']
+
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('INSERT OR IGNORE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)',
+                     (claims['j'], claims['e']))
+        conn.commit()
+        conn.close()
+        return True
+
+    def sync_revocations(self, force=False):
+        """Pull revocations recorded since the last sync (at most once per sync_interval)"""
+        now = time.monotonic()
+        if not force and now - self.last_sync < self.sync_interval:
+            return 0
+
+        with self.lock:
+            if not force and now - self.last_sync < self.sync_interval:
+                return 0
+            conn = sqlite3.connect(self.db_path)
+            rows = conn.execute('''
+                SELECT id, jti, expires_at FROM revoked_tokens
+                WHERE id > ? AND expires_at > ?
+                ORDER BY id
+            ''', (self.last_revocation_id, int(time.time()))).fetchall()
+            conn.close()
+
+            for revocation_id, jti, expires in rows:
+                self.revoked[jti] = expires
+                self.last_revocation_id = revocation_id
+
+            # Expired tokens fail on expiry alone; keep the set small
+            cutoff = time.time()
+            for jti in [jti for jti, expires in self.revoked.items() if expires < cutoff]:
+                del self.revoked[jti]
+
+            self.last_sync = now
+            return len(rows)
+
+    def stats(self):
+        return {'revoked_in_memory': len(self.revoked), 'last_revocation_id': self.last_revocation_id}
@@ -16,6 +16,7 @@ import requests
 from PIL import Image
 import io
 import base64
+from migrations import migrate
 
 # Social Media API clients (you'll need to install these)
 # pip install tweepy facebook-sdk instagrapi linkedin-api-python tiktok-api pillow schedule
@@ -29,112 +30,9 @@ class SocialContentCreator:
         self.init_database()
         
     def init_database(self):
-        """Initialize database for content tracking, scheduling, and analytics"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        
-        # Content queue table
-        c.execute('''CREATE TABLE IF NOT EXISTS content_queue (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            content_type TEXT NOT NULL,
-            topic TEXT,
-            language TEXT DEFAULT 'en',
-            target_platforms TEXT,
-            status TEXT DEFAULT 'pending',
-            scheduled_time TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )''')
-        
-        # Generated content table
-        c.execute('''CREATE TABLE IF NOT EXISTS generated_content (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            queue_id INTEGER,
-            platform TEXT NOT NULL,
-            content_text TEXT,
-            image_url TEXT,
-            video_url TEXT,
-            hashtags TEXT,
-            seo_keywords TEXT,
-            metadata JSON,
-            language TEXT DEFAULT 'en',
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (queue_id) REFERENCES content_queue(id)
-        )''')
-        
-        # Posted content tracking
-        c.execute('''CREATE TABLE IF NOT EXISTS posted_content (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            content_id INTEGER,
-            platform TEXT NOT NULL,
-            post_id TEXT,
-            post_url TEXT,
-            posted_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            engagement_data JSON,
-            FOREIGN KEY (content_id) REFERENCES generated_content(id)
-        )''')
-        
-        # Platform credentials
-        c.execute('''CREATE TABLE IF NOT EXISTS platform_credentials (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            platform TEXT UNIQUE NOT NULL,
-            credentials JSON NOT NULL,
-            is_active INTEGER DEFAULT 1,
-            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )''')
-        
-        # Content templates
-        c.execute('''CREATE TABLE IF NOT EXISTS content_templates (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            content_type TEXT,
-            template_text TEXT,
-            language TEXT DEFAULT 'en',
-            platforms TEXT,
-            is_active INTEGER DEFAULT 1,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )''')
-        
-        # Posting schedule
-        c.execute('''CREATE TABLE IF NOT EXISTS posting_schedule (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            platform TEXT NOT NULL,
-            day_of_week TEXT,
-            time_of_day TEXT NOT NULL,
-            content_type TEXT,
-            is_active INTEGER DEFAULT 1
-        )''')
-        
-        # Analytics tracking
-        c.execute('''CREATE TABLE IF NOT EXISTS content_analytics (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            posted_content_id INTEGER,
-            platform TEXT NOT NULL,
-            views INTEGER DEFAULT 0,
-            likes INTEGER DEFAULT 0,
-            comments INTEGER DEFAULT 0,
-            shares INTEGER DEFAULT 0,
-            saves INTEGER DEFAULT 0,
-            click_through_rate REAL DEFAULT 0,
-            engagement_rate REAL DEFAULT 0,
-            last_updated TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (posted_content_id) REFERENCES posted_content(id)
-        )''')
-        
-        # Hashtag performance tracking
-        c.execute('''CREATE TABLE IF NOT EXISTS hashtag_performance (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            hashtag TEXT NOT NULL,
-            platform TEXT NOT NULL,
-            total_uses INTEGER DEFAULT 1,
-            avg_engagement REAL DEFAULT 0,
-            best_performing_time TEXT,
-            language TEXT DEFAULT 'en',
-            last_used TEXT DEFAULT CURRENT_TIMESTAMP
-        )''')
-        
-        conn.commit()
-        conn.close()
-        
+        """Create or upgrade content tracking tables (no-op once current)"""
+        migrate(self.db_path, 'social_content')
+    
     def generate_content(self, 
                         topic: str, 
                         content_type: str = 'image_post',
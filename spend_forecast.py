@@ -0,0 +1,135 @@
+"""
+Spend Forecasting & Progressive Load Shedding
+Projects end-of-day API spend from exponentially-weighted per-service spend
+rates and, as the projection approaches DAILY_COST_LIMIT, sheds a growing
+share of paid-provider traffic (Runway first, then DALL-E) at the scheduler.
+Free engines are never shed, so free-tier users keep generating instead of
+everyone hitting a 503 once the limit is crossed.
+
+Rates come from the minute cost rollups, so they cover every worker. Shed
+fractions are published through the shared control plane, so every worker
+applies the same policy with a memory read per job.
+"""
+
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from job_scheduler import JobRejected
+
+
+# Spend rates are an EWMA over complete minutes; a minute's weight halves every HALF_LIFE_MINUTES
+HALF_LIFE_MINUTES = 15
+WINDOW_MINUTES = 120
+
+# Recompute at most this often (the forecast is refreshed after cost flushes)
+REFRESH_SECONDS = 30
+
+# Paid providers shed as projected spend / DAILY_COST_LIMIT rises:
+# provider -> (ratio where shedding starts, ratio where all of its traffic is shed)
+SHED_POLICY = {
+    'runway': (0.8, 1.0),
+    'openai': (0.9, 1.2),
+}
+
+SHED_RETRY_AFTER = 60
+SHED_MESSAGE = 'Premium generation is paused to keep costs under control. Free quality is still available'
+
+
+def shed_fraction(ratio, start, full):
+    """Share of traffic to shed at a projected/limit ratio (linear ramp from start to full)"""
+    if ratio <= start:
+        return 0.0
+    if ratio >= full:
+        return 1.0
+    return (ratio - start) / (full - start)
+
+
+class SpendForecaster:
+    def __init__(self, cost_monitor, control_plane=None):
+        self.cost_monitor = cost_monitor
+        self.control_plane = control_plane or cost_monitor.control_plane
+        self.lock = threading.Lock()
+        self.last_refresh = 0
+        self.last_forecast = None
+        self.shed_counts = {provider: 0 for provider in SHED_POLICY}
+
+    def service_rates(self, cursor, now):
+        """EWMA spend rate per service in dollars per minute, from complete minute buckets"""
+        current_minute = now.replace(second=0, microsecond=0)
+        window_start = current_minute - timedelta(minutes=WINDOW_MINUTES)
+        cursor.execute('''
+            SELECT bucket_start, api_service, SUM(total_cost) FROM cost_rollup_minute
+            WHERE bucket_start >= ? AND bucket_start < ?
+            GROUP BY bucket_start, api_service
+        ''', (window_start.strftime('%Y-%m-%d %H:%M:00'), current_minute.strftime('%Y-%m-%d %H:%M:00')))
+
+        # Minutes with no spend are missing rows but still count as zeros in the average
+        decay = 0.5 ** (1 / HALF_LIFE_MINUTES)
+        total_weight = sum(decay ** age for age in range(WINDOW_MINUTES))
+        rates = {}
+        for bucket_start, service, cost in cursor.fetchall():
+            age = int((current_minute - datetime.strptime(bucket_start, '%Y-%m-%d %H:%M:00')).total_seconds() // 60) - 1
+            rates[service] = rates.get(service, 0) + (decay ** age) * (cost or 0) / total_weight
+        return rates
+
+    def forecast(self, now=None):
+        """Today's spend so far, per-service rates and the projected end-of-day total"""
+        now = now or datetime.now()
+        conn = sqlite3.connect(self.cost_monitor.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('SELECT SUM(total_cost) FROM cost_rollup_day WHERE bucket_start = ?', (now.strftime('%Y-%m-%d'),))
+        spent = (cursor.fetchone()[0] or 0) + self.cost_monitor.cost_writer.pending_weight
+        rates = self.service_rates(cursor, now)
+        conn.close()
+
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        minutes_left = (midnight - now).total_seconds() / 60
+        projected = spent + sum(rates.values()) * minutes_left
+        limit = self.cost_monitor.DAILY_COST_LIMIT
+
+        return {
+            'spent_today': round(spent, 2),
+            'projected_total': round(projected, 2),
+            'daily_limit': limit,
+            'ratio': round(projected / limit, 3) if limit else 0,
+            'rates_per_hour': {service: round(rate * 60, 4) for service, rate in sorted(rates.items())}
+        }
+
+    def refresh(self, force=False):
+        """Recompute the forecast and publish shed fractions to every worker"""
+        with self.lock:
+            if not force and time.monotonic() - self.last_refresh < REFRESH_SECONDS:
+                return self.last_forecast
+            self.last_refresh = time.monotonic()
+
+        forecast = self.forecast()
+        emergency = self.control_plane.emergency_mode
+        shed = {}
+        for provider, (start, full) in SHED_POLICY.items():
+            fraction = 1.0 if emergency else shed_fraction(forecast['ratio'], start, full)
+            shed[provider] = round(fraction, 3)
+            self.control_plane.set(f'shed_{provider}', round(fraction * 1000))
+
+        forecast['shed'] = shed
+        self.last_forecast = forecast
+        return forecast
+
+    def admit(self, priority_class, provider):
+        """Scheduler admission check: raises JobRejected for the shed share of a paid provider"""
+        if provider not in SHED_POLICY:
+            return  # Free engines always run
+        fraction = self.control_plane.get(f'shed_{provider}') / 1000
+        if fraction and random.random() < fraction:
+            self.shed_counts[provider] += 1
+            raise JobRejected(SHED_MESSAGE, retry_after=SHED_RETRY_AFTER)
+
+    def stats(self):
+        return {
+            'forecast': self.last_forecast,
+            'shed_now': {provider: self.control_plane.get(f'shed_{provider}') / 1000 for provider in SHED_POLICY},
+            'shed_counts': dict(self.shed_counts)
+        }
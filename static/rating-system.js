@@ -3,10 +3,18 @@
  * State-of-the-art user feedback collection with ML-ready data
  */
 
+// Behavior events are sent every 10 s, or sooner once this many are queued
+const BEHAVIOR_FLUSH_INTERVAL_MS = 10000;
+const BEHAVIOR_BATCH_SIZE = 50;
+
 class RatingSystem {
     constructor() {
         this.sessionId = this.generateSessionId();
         this.generationStartTime = {};
+
+        // Behavior events are queued and sent in batches
+        this.behaviorQueue = [];
+        this.behaviorTimer = setInterval(() => this.flushBehavior(), BEHAVIOR_FLUSH_INTERVAL_MS);
     }
 
     generateSessionId() {
@@ -208,25 +216,56 @@ class RatingSystem {
     }
 
     /**
-     * Track user behavior for UX analytics
+     * Track user behavior for UX analytics (queued; see flushBehavior)
      */
-    async trackBehavior(action, details = null, interactionTime = 0) {
+    trackBehavior(action, details = null, interactionTime = 0) {
+        this.behaviorQueue.push({
+            action: action,
+            details: details,
+            page: window.location.pathname,
+            time: interactionTime
+        });
+        if (this.behaviorQueue.length >= BEHAVIOR_BATCH_SIZE) {
+            this.flushBehavior();
+        }
+    }
+
+    /**
+     * Send queued behavior events in one request. On page exit the batch goes
+     * out with sendBeacon, which the browser delivers after the page is gone.
+     */
+    async flushBehavior(unloading = false) {
+        if (!this.behaviorQueue.length) return;
+        const events = this.behaviorQueue.splice(0, BEHAVIOR_BATCH_SIZE * 10);
+        const payload = JSON.stringify({
+            session_id: this.sessionId,
+            events: events,
+            page: window.location.pathname,
+            device: {
+                type: this.getDeviceType(),
+                browser: navigator.userAgent,
+                screen: `${window.screen.width}x${window.screen.height}`
+            }
+        });
+
+        if (unloading && navigator.sendBeacon) {
+            navigator.sendBeacon('/api/analytics/behavior/batch', new Blob([payload], {type: 'application/json'}));
+            return;
+        }
+
         try {
-            await fetch('/api/analytics/behavior', {
+            const headers = {'Content-Type': 'application/json'};
+            let body = payload;
+            if (window.CompressionStream) {
+                const stream = new Blob([payload]).stream().pipeThrough(new CompressionStream('gzip'));
+                body = await new Response(stream).blob();
+                headers['Content-Encoding'] = 'gzip';
+            }
+            await fetch('/api/analytics/behavior/batch', {
                 method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({
-                    session_id: this.sessionId,
-                    action: action,
-                    details: details,
-                    page: window.location.pathname,
-                    device: {
-                        type: this.getDeviceType(),
-                        browser: navigator.userAgent,
-                        screen: `${window.screen.width}x${window.screen.height}`
-                    },
-                    time: interactionTime
-                })
+                headers: headers,
+                body: body,
+                keepalive: true
             });
         } catch (error) {
             console.error('Behavior tracking error:', error);
@@ -347,4 +386,12 @@ let pageLoadTime = Date.now();
 window.addEventListener('beforeunload', () => {
     const timeSpent = Math.floor((Date.now() - pageLoadTime) / 1000);
     ratingSystem.trackBehavior('page_unload', {time_spent: timeSpent}, timeSpent);
+    ratingSystem.flushBehavior(true);
+});
+
+// Mobile browsers often skip beforeunload; send what is queued when the tab is hidden
+document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'hidden') {
+        ratingSystem.flushBehavior(true);
+    }
 });
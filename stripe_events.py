@@ -0,0 +1,198 @@
+"""
+Stripe Webhook Event Queue for Picly
+The webhook verifies the signature, stores the raw event under its unique
+Stripe event id and answers 200 straight away. A background worker applies
+stored events in Stripe's order. Marking an event applied happens in the same
+transaction as the credit or subscription change it makes, so a retried
+delivery or a second worker can never apply it twice.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+
+# Seconds between sweeps when no new event has been signalled
+POLL_SECONDS = 5.0
+
+# Events that keep failing are parked as 'failed' for manual replay
+MAX_ATTEMPTS = 5
+BATCH_LIMIT = 100
+
+
+class StripeEventQueue:
+    def __init__(self, user_db, cost_monitor=None, db_path=None):
+        self.user_db = user_db
+        self.cost_monitor = cost_monitor
+        self._db_path = db_path
+        self.wakeup = threading.Event()
+        self.active = False
+        self.applied = 0
+        self.duplicates = 0
+        self.failures = 0
+
+    @property
+    def db_path(self):
+        # Resolved on use so a lazy user_db is not built at import time
+        return self._db_path or self.user_db.db_path
+
+    def enqueue(self, payload):
+        """
+        Persist a verified event (raw JSON text); duplicates are ignored
+
+        Returns:
+            True if the event was new
+        """
+        event = json.loads(payload)
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR IGNORE INTO stripe_events (event_id, event_type, stripe_created, payload)
+            VALUES (?, ?, ?, ?)
+        ''', (event['id'], event['type'], event.get('created'), payload))
+        conn.commit()
+        new = cursor.rowcount == 1
+        conn.close()
+
+        if new:
+            self.wakeup.set()
+        else:
+            self.duplicates += 1
+        return new
+
+    def process_pending(self, limit=BATCH_LIMIT):
+        """Apply pending events oldest first; returns how many were applied"""
+        conn = sqlite3.connect(self.db_path)
+        pending = conn.execute('''
+            SELECT event_id FROM stripe_events
+            WHERE status = 'pending'
+            ORDER BY stripe_created, seq
+            LIMIT ?
+        ''', (limit,)).fetchall()
+        conn.close()
+
+        applied = 0
+        for (event_id,) in pending:
+            if self.apply_event(event_id):
+                applied += 1
+        return applied
+
+    def apply_event(self, event_id):
+        """Apply one stored event exactly once (False if already applied elsewhere or failed)"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        cursor = conn.cursor()
+        revenue = None
+
+        try:
+            # Claim first: the claim and the changes commit or roll back together
+            cursor.execute('''
+                UPDATE stripe_events SET status = 'applied', applied_at = CURRENT_TIMESTAMP,
+                                         attempts = attempts + 1
+                WHERE event_id = ? AND status = 'pending'
+            ''', (event_id,))
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return False
+
+            cursor.execute('SELECT payload FROM stripe_events WHERE event_id = ?', (event_id,))
+            event = json.loads(cursor.fetchone()[0])
+            revenue = self._apply(cursor, event)
+
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            self._record_failure(conn, event_id, e)
+            conn.close()
+            return False
+        conn.close()
+
+        self.applied += 1
+        if revenue and self.cost_monitor:
+            # Separate database: logged after the credit change is durable, never twice
+            self.cost_monitor.log_revenue(**revenue)
+        return True
+
+    def _apply(self, cursor, event):
+        """Make an event's database changes on cursor; returns revenue to log, if any"""
+        if event['type'] == 'checkout.session.completed':
+            session = event['data']['object']
+            user_id = int(session['metadata']['user_id'])
+            amount = session['amount_total'] / 100  # Convert cents to dollars
+
+            # Check if it's a subscription or one-time payment
+            if session['mode'] == 'subscription':
+                subscription_id = session['subscription']
+                plan = session['metadata'].get('plan') or None
+                self.user_db._activate_subscription(cursor, user_id, subscription_id, plan)
+                print(f"Subscription activated for user {user_id}")
+                return {
+                    'user_id': user_id,
+                    'amount': amount,
+                    'revenue_type': 'subscription',
+                    'description': f'Monthly subscription: {subscription_id}'
+                }
+
+            credits = int(session['metadata']['credits'])
+            package_id = session['metadata']['package_id']
+            self.user_db._credit_user(cursor, user_id, credits, session['payment_intent'], amount)
+            print(f"Credits added: {credits} for user {user_id}")
+            return {
+                'user_id': user_id,
+                'amount': amount,
+                'revenue_type': 'credits',
+                'description': f'{credits} credits purchased ({package_id})'
+            }
+
+        # Handle subscription cancellation
+        if event['type'] == 'customer.subscription.deleted':
+            subscription = event['data']['object']
+            self.user_db._deactivate_subscription(cursor, subscription['id'])
+            print(f"Subscription cancelled: {subscription['id']}")
+
+        return None
+
+    def _record_failure(self, conn, event_id, error):
+        self.failures += 1
+        print(f"Stripe event {event_id} failed: {error}")
+        conn.execute('''
+            UPDATE stripe_events
+            SET attempts = attempts + 1, last_error = ?,
+                status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END
+            WHERE event_id = ?
+        ''', (str(error), MAX_ATTEMPTS, event_id))
+        conn.commit()
+
+    def start(self):
+        """Start the background worker"""
+        if self.active:
+            return
+        self.active = True
+        threading.Thread(target=self._loop, name='stripe-events', daemon=True).start()
+
+    def stop(self):
+        self.active = False
+        self.wakeup.set()
+
+    def _loop(self):
+        while self.active:
+            self.wakeup.wait(POLL_SECONDS)
+            self.wakeup.clear()
+            try:
+                while self.process_pending() == BATCH_LIMIT:
+                    pass
+            except Exception as e:
+                print(f"Stripe event worker error: {e}")
+                time.sleep(POLL_SECONDS)
+
+    def stats(self):
+        conn = sqlite3.connect(self.db_path)
+        counts = dict(conn.execute('SELECT status, COUNT(*) FROM stripe_events GROUP BY status').fetchall())
+        conn.close()
+        return {
+            'active': self.active,
+            'by_status': counts,
+            'applied': self.applied,
+            'duplicates': self.duplicates,
+            'failures': self.failures
+        }
@@ -0,0 +1,81 @@
+"""
+Tests for the /api/admin/* routes
+"""
+
+import pytest
+
+pytest.importorskip('flask')
+
+from control_plane import ControlPlane
+from cost_monitor import CostMonitor
+
+
+class FakeUserDB:
+    def validate_session(self, token):
+        if token in ('admin', 'user'):
+            return {'valid': True, 'user_id': 1 if token == 'admin' else 2, 'username': f'{token}-account'}
+        return {'valid': False, 'error': 'Invalid session'}
+
+    def get_ledger_summary(self, since=None):
+        return {'success': True, 'accounts': {'system:grants': -100}, 'flows': {}}
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import rootAI
+    from auth_context import init_auth
+
+    monitor = CostMonitor(str(tmp_path / 'cost_monitor.db'), ControlPlane(str(tmp_path / 'control_plane.state')))
+    monitor.send_alerts = lambda alerts: None
+
+    db = FakeUserDB()
+    init_auth(db)
+    monkeypatch.setattr(rootAI, 'user_db', db)
+    monkeypatch.setattr('auth_context.ADMIN_USERNAMES', frozenset({'admin-account'}))
+    monkeypatch.setattr(rootAI, 'cost_monitor', monitor)
+    monkeypatch.setattr(rootAI, 'start_background_services', lambda: None)
+
+    yield rootAI.app.test_client(), monitor
+    monitor.cost_writer.close()
+    monitor.control_plane.close()
+
+
+def as_user(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_emergency_mode_toggle_is_admin_only(app):
+    client, monitor = app
+    monitor.activate_emergency_mode()
+
+    assert client.post('/api/admin/emergency-mode', json={'active': False}).status_code == 401
+    assert client.post('/api/admin/emergency-mode', json={'active': False}, headers=as_user('user')).status_code == 403
+    assert monitor.emergency_mode
+
+    response = client.post('/api/admin/emergency-mode', json={'active': False}, headers=as_user('admin'))
+    assert response.status_code == 200 and response.get_json()['emergency_mode'] is False
+
+
+def test_emergency_mode_needs_an_explicit_value(app):
+    client, monitor = app
+    monitor.activate_emergency_mode()
+
+    for body in ({}, {'active': 'no'}, {'active': 0}):
+        assert client.post('/api/admin/emergency-mode', json=body, headers=as_user('admin')).status_code == 400
+    assert monitor.emergency_mode
+
+
+def test_credit_ledger_is_admin_only(app):
+    client, monitor = app
+
+    assert client.get('/api/admin/credit-ledger').status_code == 401
+    assert client.get('/api/admin/credit-ledger', headers=as_user('user')).status_code == 403
+    assert client.get('/api/admin/credit-ledger', headers=as_user('admin')).get_json()['success']
+
+
+def test_provider_stats_are_admin_only(app):
+    client, monitor = app
+
+    assert client.get('/api/admin/provider-stats').status_code == 401
+    assert client.get('/api/admin/provider-stats', headers=as_user('user')).status_code == 403
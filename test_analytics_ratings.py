@@ -0,0 +1,82 @@
+"""
+Tests for buffered rating submission and incremental prompt aggregates and counters
+"""
+
+import sqlite3
+
+import pytest
+
+from analytics_system import AnalyticsSystem
+
+
+@pytest.fixture
+def analytics(tmp_path):
+    analytics = AnalyticsSystem(str(tmp_path / 'analytics.db'))
+    analytics.rating_writer.max_delay = 60  # Flushes happen when the test asks
+    yield analytics
+    analytics.rating_writer.close()
+
+
+def prompt_row(analytics, prompt):
+    conn = sqlite3.connect(analytics.db_path)
+    row = conn.execute('''
+        SELECT total_ratings, one_star_count, four_star_count, five_star_count, avg_rating, success_rate
+        FROM prompt_analytics WHERE prompt_text = ?
+    ''', (prompt,)).fetchone()
+    conn.close()
+    return row
+
+
+def test_ratings_aggregate_per_prompt_in_batches(analytics):
+    for i, rating in enumerate([5, 4, 1, 5]):
+        analytics.record_generation(f'gen-{i}', 1, 'a cinematic castle, 4k', 'flux')
+        assert analytics.submit_rating(f'gen-{i}', rating)['success']
+    analytics.record_generation('gen-other', 1, 'a cat', 'flux')
+    analytics.submit_rating('gen-other', 2)
+
+    assert analytics.flush_ratings() == 5
+    assert prompt_row(analytics, 'a cinematic castle, 4k') == (4, 1, 1, 2, 3.75, 0.75)
+    assert prompt_row(analytics, 'a cat')[4] == 2.0
+
+    conn = sqlite3.connect(analytics.db_path)
+    assert conn.execute("SELECT COUNT(*) FROM ml_training_data WHERE data_type = 'rating_prediction'").fetchone()[0] == 5
+    assert conn.execute("SELECT rating FROM generation_ratings WHERE generation_id = 'gen-2'").fetchone()[0] == 1
+    conn.close()
+
+
+def test_reads_see_buffered_ratings(analytics):
+    for i in range(3):
+        analytics.record_generation(f'gen-{i}', 1, 'portrait of an owl', 'dalle')
+        analytics.submit_rating(f'gen-{i}', 5)
+
+    [top] = analytics.get_top_prompts(min_ratings=3)
+    assert (top['prompt'], top['total_ratings'], top['avg_rating']) == ('portrait of an owl', 3, 5.0)
+
+
+def test_invalid_rating_is_rejected_up_front(analytics):
+    assert not analytics.submit_rating('gen-1', 6)['success']
+    assert analytics.rating_writer.stats()['buffer_depth'] == 0
+
+
+def test_unknown_generation_is_rejected_up_front(analytics):
+    result = analytics.submit_rating('gen-missing', 3)
+
+    assert result == {'success': False, 'error': 'Generation not found'}
+    assert analytics.rating_writer.stats()['buffer_depth'] == 0
+
+
+def test_action_counters_count_each_generation_once(analytics):
+    for i in range(4):
+        analytics.record_generation(f'gen-{i}', 1, 'neon city at night', 'flux')
+        analytics.submit_rating(f'gen-{i}', 4)
+    for generation_id, action in [('gen-0', 'download'), ('gen-0', 'download'), ('gen-1', 'download'),
+                                  ('gen-2', 'share'), ('gen-3', 'regenerate')]:
+        assert analytics.update_generation_action(generation_id, action)
+
+    conn = sqlite3.connect(analytics.db_path)
+    counters = conn.execute('SELECT download_count, share_count, regeneration_count FROM prompt_analytics').fetchone()
+    conn.close()
+    assert counters == (2, 1, 1)
+
+    [top] = analytics.get_top_prompts(min_ratings=1)
+    assert (top['download_rate'], top['share_rate']) == (0.5, 0.25)
@@ -0,0 +1,71 @@
+"""
+Tests for columnar analytics snapshots and the dashboard queries over them
+"""
+
+import os
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from analytics_snapshot import export_snapshots, load_snapshot, EXPORT_LOCK_NAME
+from analytics_system import AnalyticsSystem
+from file_lock import FileLock
+
+
+@pytest.fixture
+def analytics(tmp_path):
+    analytics = AnalyticsSystem(str(tmp_path / 'analytics.db'))
+    ratings = [('flux', 1, 5), ('flux', 2, 3), ('flux', 2, None), ('dalle', 3, 4), ('dalle', 1, 5)]
+    for i, (engine, user_id, rating) in enumerate(ratings):
+        analytics.record_generation(f'gen-{i}', user_id, f'prompt {i}', engine)
+        if rating:
+            analytics.submit_rating(f'gen-{i}', rating, quality_score=rating * 20)
+    analytics.update_generation_action('gen-0', 'download')
+    analytics.update_generation_action('gen-3', 'share')
+    yield analytics
+    analytics.rating_writer.close()
+
+
+def test_snapshot_dashboard_matches_live_queries(analytics):
+    live = analytics.get_analytics_dashboard(days=30)
+    assert live['source']['ratings'] == 'live'
+
+    assert export_snapshots(analytics.db_path) == {'generation_ratings': 5}
+    snapshot = analytics.get_analytics_dashboard(days=30)
+    assert snapshot['source']['ratings'] == 'snapshot'
+    assert snapshot['overall'] == live['overall']
+    assert snapshot['engines'] == live['engines']
+
+
+def test_snapshot_columns_are_typed_and_encoded(analytics):
+    analytics.flush_ratings()
+    export_snapshots(analytics.db_path)
+    snapshot = load_snapshot('generation_ratings', analytics.snapshot_dir)
+
+    assert snapshot.rows == 5
+    assert list(snapshot.categories('engine')) == ['dalle', 'flux']
+    assert np.isnan(snapshot['rating']).sum() == 1
+    assert snapshot['downloaded'].sum() == 1 and snapshot['shared'].sum() == 1
+    assert load_snapshot('generation_ratings', analytics.snapshot_dir) is snapshot  # Cached until re-exported
+
+
+def test_export_reads_the_table_in_chunks(analytics, monkeypatch):
+    monkeypatch.setattr('analytics_snapshot.FETCH_ROWS', 2)
+    analytics.flush_ratings()
+
+    assert export_snapshots(analytics.db_path) == {'generation_ratings': 5}
+    snapshot = load_snapshot('generation_ratings', analytics.snapshot_dir)
+    assert list(snapshot['user_id']) == [1, 2, 2, 3, 1]  # Every chunk, in table order
+
+
+def test_only_one_process_exports(analytics):
+    lock = FileLock(os.path.join(analytics.snapshot_dir, EXPORT_LOCK_NAME))
+    os.makedirs(analytics.snapshot_dir, exist_ok=True)
+    assert lock.acquire()  # Another worker is exporting
+
+    assert export_snapshots(analytics.db_path) is None
+    assert load_snapshot('generation_ratings', analytics.snapshot_dir) is None
+
+    lock.release()
+    assert export_snapshots(analytics.db_path) == {'generation_ratings': 5}
@@ -0,0 +1,88 @@
+"""
+Tests for the per-request auth context
+"""
+
+import pytest
+
+flask = pytest.importorskip('flask')
+
+from auth_context import init_auth, require_auth, require_admin, current_user_id, current_credits, current_tier
+
+
+class CountingUserDB:
+    def __init__(self):
+        self.calls = {'validate_session': 0, 'get_user_credits': 0}
+
+    def validate_session(self, token):
+        self.calls['validate_session'] += 1
+        if token == 'good':
+            return {'valid': True, 'user_id': 7, 'username': 'alice'}
+        return {'valid': False, 'error': 'Invalid session'}
+
+    def get_user_credits(self, user_id):
+        self.calls['get_user_credits'] += 1
+        return {'success': True, 'premium_credits': 5, 'free_credits': 10, 'has_unlimited': False}
+
+
+@pytest.fixture
+def client():
+    db = CountingUserDB()
+    init_auth(db)
+    app = flask.Flask(__name__)
+
+    @app.route('/me')
+    @require_auth
+    def me():
+        # Helpers called repeatedly share one validation and one balance read
+        current_user_id()
+        current_credits()
+        tier = current_tier()
+        return flask.jsonify({'user_id': current_user_id(), 'tier': tier,
+                              'credits': current_credits()['premium_credits']})
+
+    yield app.test_client(), db
+    init_auth(None)
+
+
+def test_identity_and_credits_resolve_once_per_request(client):
+    test_client, db = client
+    response = test_client.get('/me', headers={'Authorization': 'Bearer good'})
+    assert response.get_json() == {'user_id': 7, 'tier': 'premium_user', 'credits': 5}
+    assert db.calls == {'validate_session': 1, 'get_user_credits': 1}
+
+
+def test_cookie_and_missing_or_invalid_tokens(client):
+    test_client, db = client
+    test_client.set_cookie('session_token', 'good')
+    assert test_client.get('/me').status_code == 200
+
+    test_client.delete_cookie('session_token')
+    missing = test_client.get('/me')
+    assert missing.status_code == 401 and missing.get_json()['require_login']
+    assert test_client.get('/me', headers={'Authorization': 'Bearer bad'}).get_json()['error'] == 'Invalid session'
+
+
+def test_bearer_token_wins_over_the_cookie(client):
+    test_client, db = client
+    test_client.set_cookie('session_token', 'good')
+
+    response = test_client.get('/me', headers={'Authorization': 'Bearer bad'})
+
+    assert response.status_code == 401 and response.get_json()['error'] == 'Invalid session'
+
+
+def test_admin_routes_need_an_admin_account(client, monkeypatch):
+    test_client, db = client
+    monkeypatch.setattr('auth_context.ADMIN_USERNAMES', frozenset({'root'}))
+    app = test_client.application
+
+    @app.route('/admin-only')
+    @require_admin
+    def admin_only():
+        return flask.jsonify({'success': True})
+
+    assert test_client.get('/admin-only').status_code == 401
+    assert test_client.get('/admin-only', headers={'Authorization': 'Bearer good'}).status_code == 403
+
+    monkeypatch.setattr('auth_context.ADMIN_USERNAMES', frozenset({'alice'}))
+    assert test_client.get('/admin-only', headers={'Authorization': 'Bearer good'}).status_code == 200
@@ -0,0 +1,196 @@
+"""
+Tests for the /api/generate/batch endpoint
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+pytest.importorskip('flask')
+
+from control_plane import ControlPlane
+from cost_monitor import CostMonitor
+from providers.pool import ProviderPool
+from rate_governor import RateGovernor
+
+
+class FakeUserDB:
+    def __init__(self):
+        self.credits = {'success': True, 'premium_credits': 100, 'free_credits': 10,
+                        'total_generations': 0, 'has_unlimited': True, 'subscription_plan': 'creator'}
+        self.reservations = {}
+
+    def validate_session(self, token):
+        if token == 'good':
+            return {'valid': True, 'user_id': 7, 'username': 'alice'}
+        return {'valid': False, 'error': 'Invalid session'}
+
+    def get_user_credits(self, user_id):
+        return dict(self.credits)
+
+    def reserve_credits(self, user_id, credits, purpose=None):
+        reservation_id = f'res-{len(self.reservations)}'
+        self.reservations[reservation_id] = {'credits': credits, 'status': 'held'}
+        return {'success': True, 'reservation_id': reservation_id}
+
+    def commit_reservation(self, reservation_id, credits_used=None, generations=1):
+        self.reservations[reservation_id].update(status='committed', credits_used=credits_used)
+        return {'success': True}
+
+    def release_reservation(self, reservation_id):
+        self.reservations[reservation_id]['status'] = 'released'
+        return {'success': True}
+
+
+class FakePool:
+    """Provider pool with fake engines that count their calls"""
+
+    submit_batch = ProviderPool.submit_batch
+
+    def __init__(self):
+        self.calls = {'dalle': 0, 'free': 0}
+        pool = self
+
+        class Dalle:
+            name, primary_endpoint, api_key = 'openai', 'images', 'sk-test'
+
+            async def generate(self, prompt, dimensions=None, quality_boost=True):
+                pool.calls['dalle'] += 1
+                if 'slow' in prompt:
+                    await asyncio.sleep(0.3)
+                if 'fail' in prompt:
+                    return {'success': False, 'error': 'OpenAI API Error: 500'}
+                return {'success': True, 'image_url': '/x.png', 'engine': 'DALL-E 3', 'api_cost': 0.08}
+
+        self.dalle = Dalle()
+
+    async def generate_free(self, prompt, negative_prompt='', dimensions=None, quality_boost=True):
+        self.calls['free'] += 1
+        return {'success': True, 'image_url': '/y.png', 'engine': 'Flux'}
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import rootAI
+    from auth_context import init_auth
+
+    db = FakeUserDB()
+    pool = FakePool()
+    monitor = CostMonitor(str(tmp_path / 'cost_monitor.db'), ControlPlane(str(tmp_path / 'control_plane.state')))
+    monitor.send_alerts = lambda alerts: None
+
+    init_auth(db)
+    monkeypatch.setattr(rootAI, 'user_db', db)
+    monkeypatch.setattr(rootAI, 'provider_pool', pool)
+    monkeypatch.setattr(rootAI, 'cost_monitor', monitor)
+    monkeypatch.setattr(rootAI, 'record_batch_generation', lambda *args: None)
+    monkeypatch.setattr(rootAI, 'start_background_services', lambda: None)
+    monkeypatch.setattr(rootAI, 'rate_governor', RateGovernor(limits={('openai', 'images'): (600, 60)}))
+    rootAI.rate_limit_storage.clear()
+
+    yield rootAI.app.test_client(), db, pool, monitor
+    monitor.cost_writer.close()
+    monitor.control_plane.close()
+
+
+def post_batch(client, quality_tier, prompts):
+    return client.post('/api/generate/batch', headers={'Authorization': 'Bearer good'}, json={
+        'items': [{'prompt': prompt} for prompt in prompts],
+        'quality_tier': quality_tier,
+        'post_process': False
+    })
+
+
+def run_batch(client, quality_tier, prompts):
+    response = post_batch(client, quality_tier, prompts)
+    if response.mimetype != 'application/x-ndjson':
+        return response.status_code, response.get_json()
+    return response.status_code, [json.loads(line) for line in response.data.decode().splitlines()]
+
+
+def test_premium_batch_images_are_shed_by_the_forecast(app):
+    client, db, pool, monitor = app
+    monitor.forecaster.forecast = lambda: {'ratio': 1.5}  # Past the point where all DALL-E traffic is shed
+    monitor.forecaster.refresh(force=True)
+
+    status, lines = run_batch(client, 'premium', [f'castle {i}' for i in range(5)])
+
+    assert status == 200
+    assert all(line['rate_limited'] for line in lines[:-1])
+    assert lines[-1]['shed'] == 5 and lines[-1]['credits_used'] == 0
+    assert pool.calls['dalle'] == 0
+    assert db.reservations['res-0'] == {'credits': 5, 'status': 'committed', 'credits_used': 0}
+
+
+def test_free_batch_runs_in_emergency_mode(app):
+    client, db, pool, monitor = app
+    monitor.activate_emergency_mode()
+
+    status, lines = run_batch(client, 'free', ['a cat', 'a dog'])
+
+    assert status == 200
+    assert lines[-1]['succeeded'] == 2 and lines[-1]['shed'] == 0
+    assert pool.calls['free'] == 2
+
+
+def test_batch_requires_creator_or_pro_plan(app):
+    client, db, pool, monitor = app
+    db.credits['subscription_plan'] = 'user'  # Active subscription, but not a batch plan
+
+    status, body = run_batch(client, 'free', ['a cat'])
+
+    assert status == 403 and body['require_subscription'] and body['current_plan'] == 'user'
+    assert pool.calls['free'] == 0
+
+
+def test_batch_size_is_capped(app):
+    client, db, pool, monitor = app
+
+    status, body = run_batch(client, 'premium', [f'castle {i}' for i in range(51)])
+
+    assert status == 400 and 'maximum is 50' in body['error']
+    assert db.reservations == {} and pool.calls['dalle'] == 0
+
+
+def test_reservation_charges_only_produced_images(app):
+    client, db, pool, monitor = app
+
+    status, lines = run_batch(client, 'premium', ['castle', 'fail castle', 'castle at dusk'])
+
+    assert status == 200
+    assert lines[-1]['succeeded'] == 2 and lines[-1]['credits_used'] == 2
+    assert db.reservations['res-0'] == {'credits': 3, 'status': 'committed', 'credits_used': 2}
+
+
+def test_disconnect_charges_provider_calls_already_running(app):
+    client, db, pool, monitor = app
+    response = post_batch(client, 'premium', ['castle'] + [f'slow castle {i}' for i in range(10)])
+
+    lines = iter(response.response)
+    assert json.loads(next(lines))['prompt'] == 'castle'
+    response.close()  # Client goes away while slow calls are at the provider
+
+    reservation = db.reservations['res-0']
+    assert reservation['status'] == 'held'  # Settles once the running calls finish
+    deadline = time.monotonic() + 5
+    while reservation['status'] == 'held' and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    # Every call that reached the provider is charged; calls not yet started were skipped
+    assert reservation['status'] == 'committed'
+    assert reservation['credits_used'] == pool.calls['dalle'] < 11
+
+
+def test_premium_batch_larger_than_the_dalle_budget_is_rejected(app, monkeypatch):
+    client, db, pool, monitor = app
+    import rootAI
+    monkeypatch.setattr(rootAI, 'rate_governor', RateGovernor())  # Default 5/min, burst 2, 30s max wait
+
+    status, body = run_batch(client, 'premium', [f'castle {i}' for i in range(10)])
+
+    assert status == 429 and body['rate_limited'] and body['max_images'] == 4
+    assert db.reservations == {} and pool.calls['dalle'] == 0
+    assert run_batch(client, 'premium', ['castle', 'castle at dusk'])[0] == 200
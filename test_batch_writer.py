@@ -0,0 +1,82 @@
+"""
+Tests for the batched writer and the buffered cost recording path
+"""
+
+import sqlite3
+import time
+
+import pytest
+
+from batch_writer import BatchWriter
+from control_plane import ControlPlane
+from cost_monitor import CostMonitor
+
+
+def raw_cost_rows(monitor):
+    conn = sqlite3.connect(monitor.db_path)
+    count = conn.execute('SELECT COUNT(*) FROM api_costs').fetchone()[0]
+    conn.close()
+    return count
+
+
+@pytest.fixture
+def monitor(tmp_path):
+    monitor = CostMonitor(str(tmp_path / 'cost_monitor.db'), ControlPlane(str(tmp_path / 'control_plane.state')))
+    monitor.send_alerts = lambda alerts: None
+    yield monitor
+    monitor.cost_writer.close()
+    monitor.control_plane.close()
+
+
+def test_flushes_by_size_and_by_age():
+    batches = []
+    writer = BatchWriter(batches.append, max_events=3, max_delay=0.05)
+    for i in range(4):
+        writer.add(i)
+    assert batches == [[0, 1, 2]]
+
+    deadline = time.monotonic() + 2
+    while len(batches) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert batches == [[0, 1, 2], [3]]
+    stats = writer.stats()
+    assert (stats['flushes'], stats['events_flushed'], stats['buffer_depth']) == (2, 4, 0)
+    writer.close()
+
+
+def test_failed_batches_are_retried_then_capped():
+    attempts = []
+
+    def flaky(items):
+        attempts.append(list(items))
+        if len(attempts) < 3:
+            raise sqlite3.OperationalError('database is locked')
+
+    writer = BatchWriter(flaky, max_events=100, max_delay=60, max_buffered=3)
+    writer.add('a')
+    writer.add('b')
+    assert writer.flush() == 0
+    writer.add('c')
+    writer.add('d')
+    assert writer.flush() == 0
+    assert writer.flush() == 3
+    assert attempts[-1] == ['b', 'c', 'd']
+    assert (writer.stats()['flush_errors'], writer.stats()['dropped']) == (2, 1)
+    writer.close()
+
+
+def test_costs_are_buffered_until_read(monitor):
+    for _ in range(5):
+        monitor.log_api_cost(1, 'openai', 'dalle3_hd', 0.08)
+    assert raw_cost_rows(monitor) == 0
+    assert monitor.get_hourly_stats()['requests'] == 5
+    assert raw_cost_rows(monitor) == 5
+
+
+def test_flushes_immediately_near_daily_limit(monitor):
+    monitor.DAILY_COST_LIMIT = 1.00
+    monitor.log_api_cost(1, 'runway', 'video', 0.50)
+    assert raw_cost_rows(monitor) == 0
+    monitor.log_api_cost(1, 'runway', 'video', 0.60)
+    assert raw_cost_rows(monitor) == 2
+    assert monitor.emergency_mode
@@ -0,0 +1,63 @@
+"""
+Tests for batched behavior event ingestion
+"""
+
+import sqlite3
+
+import pytest
+
+from analytics_system import AnalyticsSystem, MAX_BEHAVIOR_EVENTS
+
+
+@pytest.fixture
+def analytics(tmp_path):
+    analytics = AnalyticsSystem(str(tmp_path / 'analytics.db'))
+    analytics.behavior_writer.max_delay = 60  # Flushes happen when the test asks
+    yield analytics
+    analytics.behavior_writer.close()
+
+
+def behavior_rows(analytics):
+    conn = sqlite3.connect(analytics.db_path)
+    rows = conn.execute('''
+        SELECT user_id, session_id, action_type, action_details, page_url, device_type, interaction_time, timestamp
+        FROM user_behavior ORDER BY id
+    ''').fetchall()
+    conn.close()
+    return rows
+
+
+def test_batch_is_written_in_one_flush(analytics):
+    events = [
+        {'action': 'page_load', 'page': '/gallery'},
+        {'action': 'click', 'details': {'button': 'generate'}, 'time': 3},
+        {'details': {'no': 'action'}},
+        'not an event',
+    ]
+    accepted = analytics.track_behavior_batch(7, 'session_1', events, page_url='/', device_info={'type': 'mobile'})
+
+    assert accepted == 2
+    assert behavior_rows(analytics) == []
+    assert analytics.flush_behavior() == 2
+    assert analytics.behavior_writer.flushes == 1
+
+    rows = behavior_rows(analytics)
+    assert [row[:7] for row in rows] == [
+        (7, 'session_1', 'page_load', None, '/gallery', 'mobile', None),
+        (7, 'session_1', 'click', '{"button": "generate"}', '/', 'mobile', 3),
+    ]
+    assert all(len(row[7]) == 19 for row in rows)  # Timestamps keep the CURRENT_TIMESTAMP format
+
+
+def test_single_events_share_the_buffer(analytics):
+    assert analytics.track_user_behavior(0, 'session_2', 'scroll', page_url='/pricing')
+    assert not analytics.track_user_behavior(0, 'session_2', '')
+    analytics.track_behavior_batch(0, 'session_2', [{'action': 'click'}])
+
+    assert analytics.flush_behavior() == 2
+    assert [row[2] for row in behavior_rows(analytics)] == ['scroll', 'click']
+
+
+def test_oversized_batch_is_truncated(analytics):
+    events = [{'action': 'move'}] * (MAX_BEHAVIOR_EVENTS + 25)
+    assert analytics.track_behavior_batch(0, 'session_3', events) == MAX_BEHAVIOR_EVENTS
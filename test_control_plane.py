@@ -0,0 +1,52 @@
+"""
+Tests for the shared control plane (emergency mode across worker processes)
+"""
+
+import subprocess
+import sys
+
+from control_plane import ControlPlane
+from cost_monitor import CostMonitor
+
+
+def test_flag_is_shared_between_mappings(tmp_path):
+    path = str(tmp_path / 'control_plane.state')
+    worker_a, worker_b = ControlPlane(path), ControlPlane(path)
+
+    assert not worker_b.emergency_mode
+    assert worker_a.set_emergency(True)
+    assert not worker_a.set_emergency(True)
+    assert worker_b.emergency_mode and worker_b.get('emergency_since') > 0
+
+    assert worker_b.set_emergency(False)
+    assert not worker_a.emergency_mode and worker_a.get('emergency_since') == 0
+
+
+def test_other_process_sees_activation_and_deactivation(tmp_path):
+    path = str(tmp_path / 'control_plane.state')
+    local = ControlPlane(path)
+    local.get('emergency_mode')  # Map before the other process writes
+
+    def run(active):
+        subprocess.run([sys.executable, '-c',
+                        f'from control_plane import ControlPlane; ControlPlane({path!r}).set_emergency({active})'],
+                       check=True)
+
+    run(True)
+    assert local.emergency_mode
+    run(False)
+    assert not local.emergency_mode
+
+
+def test_cost_monitor_breaker_trips_every_worker(tmp_path):
+    path = str(tmp_path / 'control_plane.state')
+    db = str(tmp_path / 'cost_monitor.db')
+    tripping, other = CostMonitor(db, ControlPlane(path)), CostMonitor(db, ControlPlane(path))
+    tripping.send_alerts = lambda alerts: None
+    tripping.DAILY_COST_LIMIT = 1.00
+
+    tripping.log_api_cost(1, 'runway', 'video', 1.50)
+    assert other.emergency_mode
+
+    other.deactivate_emergency_mode()
+    assert not tripping.emergency_mode
@@ -0,0 +1,125 @@
+"""
+Tests for incremental cost rollups and rollup-backed reporting
+"""
+
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from control_plane import ControlPlane
+from cost_monitor import CostMonitor
+from schema_baseline import COST_MONITOR_SCHEMA
+
+
+@pytest.fixture
+def monitor(tmp_path):
+    monitor = CostMonitor(str(tmp_path / 'cost_monitor.db'), ControlPlane(str(tmp_path / 'control_plane.state')))
+    monitor.send_alerts = lambda alerts: None
+    return monitor
+
+
+def rollup_rows(monitor, granularity):
+    monitor.flush_costs()
+    conn = sqlite3.connect(monitor.db_path)
+    rows = conn.execute(f'''
+        SELECT bucket_start, api_service, operation, user_id, requests, failures, ROUND(total_cost, 4)
+        FROM cost_rollup_{granularity} ORDER BY 1, 2, 3, 4
+    ''').fetchall()
+    conn.close()
+    return rows
+
+
+def test_reports_match_raw_events(monitor):
+    monitor.log_api_cost(1, 'openai', 'dalle3_hd', 0.08)
+    monitor.log_api_cost(1, 'openai', 'dalle3_hd', 0.08)
+    monitor.log_api_cost(2, 'runway', 'video', 0.40, success=False)
+    monitor.log_api_cost(None, 'replicate', 'flux', 0.0)
+
+    hourly = monitor.get_hourly_stats()
+    assert (hourly['total_cost'], hourly['requests'], hourly['users']) == (0.56, 4, 2)
+    assert monitor.get_daily_stats()['total_cost'] == 0.56
+
+    breakdown = monitor.get_cost_breakdown('daily')
+    assert breakdown[0] == {'service': 'runway', 'operation': 'video', 'count': 1, 'total_cost': 0.4, 'avg_cost': 0.4}
+    assert monitor.get_user_costs(limit=1) == [{'user_id': 2, 'requests': 1, 'total_cost': 0.4}]
+    assert rollup_rows(monitor, 'day')[-1][3:] == (2, 1, 1, 0.4)
+
+
+def test_backfill_matches_incremental(monitor):
+    for i in range(20):
+        monitor.log_api_cost(i % 3, 'openai', 'dalle3_hd' if i % 2 else 'dalle3_standard', 0.04 * (i % 2 + 1))
+    incremental = {g: rollup_rows(monitor, g) for g in ('minute', 'hour', 'day')}
+
+    monitor.backfill_rollups()
+    assert {g: rollup_rows(monitor, g) for g in ('minute', 'hour', 'day')} == incremental
+
+
+def test_finished_hour_is_recorded_once(monitor):
+    monitor.log_api_cost(1, 'openai', 'dalle3_hd', 0.08)
+    monitor.log_revenue(1, 9.0, 'subscription', 'Creator Monthly')
+
+    this_hour = datetime.now().replace(minute=0, second=0, microsecond=0)
+    monitor.open_hour = (this_hour - timedelta(hours=1)).strftime('%Y-%m-%d %H:00:00')
+    monitor.record_hourly_stats(this_hour)
+    monitor.record_hourly_stats(this_hour)
+    monitor.close_finished_hours()
+
+    conn = sqlite3.connect(monitor.db_path)
+    rows = conn.execute('SELECT hour_start, total_cost, total_revenue, requests_count FROM hourly_stats ORDER BY hour_start').fetchall()
+    conn.close()
+    assert rows[-1] == (this_hour.strftime('%Y-%m-%d %H:00:00'), 0.08, 9.0, 1)
+    assert len(rows) == 2  # The previous (empty) hour was closed too
+
+
+
+def test_after_flush_hook_does_not_flush_again(monitor):
+    flushed = []
+    write_costs = monitor._flush_costs
+    monitor.cost_writer.flush_fn = lambda events: (flushed.append(len(events)), write_costs(events))
+
+    check_cost_alerts = monitor._check_cost_alerts
+
+    def busy_check():
+        if len(flushed) == 1:
+            monitor.log_api_cost(2, 'openai', 'dalle3_hd', 0.08)  # Another request logs while alerts run
+        return check_cost_alerts()
+
+    monitor._check_cost_alerts = busy_check
+    monitor.log_api_cost(1, 'openai', 'dalle3_hd', 0.08)
+
+    assert monitor.flush_costs() == 1
+    assert flushed == [1]  # The hook read the stats without flushing the new event
+    assert monitor.cost_writer.stats()['buffer_depth'] == 1
+
+
+@pytest.fixture
+def new_york_time(monkeypatch):
+    monkeypatch.setenv('TZ', 'America/New_York')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_upgrade_moves_legacy_utc_rows_to_local_time(tmp_path, new_york_time):
+    db_path = str(tmp_path / 'cost_monitor.db')
+    conn = sqlite3.connect(db_path)
+    for statement in COST_MONITOR_SCHEMA:  # A database from before the rollups
+        conn.execute(statement)
+    conn.execute("CREATE TABLE schema_version (component TEXT, version INTEGER, description TEXT, applied_at TIMESTAMP)")
+    conn.execute("INSERT INTO schema_version (component, version) VALUES ('cost_monitor', 1)")
+    conn.execute("INSERT INTO api_costs (timestamp, user_id, api_service, operation, cost) "
+                 "VALUES ('2026-01-15 15:30:00', 1, 'openai', 'dalle3_hd', 0.08)")  # Written by CURRENT_TIMESTAMP
+    conn.execute("INSERT INTO revenue (timestamp, user_id, amount) VALUES ('2026-01-15 15:45:00', 1, 9.0)")
+    conn.commit()
+    conn.close()
+
+    monitor = CostMonitor(db_path, ControlPlane(str(tmp_path / 'control_plane.state')))
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT timestamp FROM api_costs').fetchone()[0] == '2026-01-15 10:30:00'
+    assert conn.execute('SELECT timestamp FROM revenue').fetchone()[0] == '2026-01-15 10:45:00'
+    conn.close()
+    assert rollup_rows(monitor, 'hour') == [('2026-01-15 10:00:00', 'openai', 'dalle3_hd', 1, 1, 0, 0.08)]
@@ -0,0 +1,91 @@
+"""
+Tests for pooled password hashing, rehash on login and login throttling
+"""
+
+import sqlite3
+
+import pytest
+
+import credentials
+from credentials import HashPool, HashingBusy, LoginThrottle
+from database import UserDatabase
+
+
+def stored_params(db, username):
+    conn = sqlite3.connect(db.db_path)
+    row = conn.execute('SELECT password_algorithm, password_iterations, password_hash FROM users WHERE username = ?',
+                       (username,)).fetchone()
+    conn.close()
+    return row
+
+
+def test_login_rehashes_weaker_password(tmp_path, monkeypatch):
+    db = UserDatabase(str(tmp_path / 'users.db'))
+    monkeypatch.setattr(credentials, 'PASSWORD_ITERATIONS', 1000)
+    db.register_user('alice', 'alice@example.com', 'password123')
+    algorithm, iterations, old_hash = stored_params(db, 'alice')
+    assert (algorithm, iterations) == ('pbkdf2_sha256', 1000)
+
+    monkeypatch.setattr(credentials, 'PASSWORD_ITERATIONS', 2000)
+    assert db.login_user('alice', 'password123')['success']
+    algorithm, iterations, new_hash = stored_params(db, 'alice')
+    assert iterations == 2000 and new_hash != old_hash
+
+    # The upgraded hash still verifies, and a wrong password still fails
+    assert db.login_user('alice', 'password123')['success']
+    assert not db.login_user('alice', 'wrong-password')['success']
+
+
+def test_legacy_rows_verify_with_default_parameters(tmp_path):
+    db = UserDatabase(str(tmp_path / 'users.db'))
+    legacy_hash = credentials.compute_hash('password123', 'salt', 'pbkdf2_sha256', 100000)
+    conn = sqlite3.connect(db.db_path)
+    conn.execute("INSERT INTO users (username, email, password_hash, salt) VALUES ('bob', 'bob@example.com', ?, 'salt')",
+                 (legacy_hash,))
+    conn.commit()
+    conn.close()
+
+    assert db.login_user('bob', 'password123')['success']
+
+
+def test_full_pool_rejects_instead_of_queueing():
+    pool = HashPool(workers=1, queue_limit=0)
+    pool.slots.acquire()  # Occupy the only slot
+    with pytest.raises(HashingBusy):
+        pool.hash('password123', iterations=1000)
+    pool.slots.release()
+    assert pool.hash('password123', iterations=1000)[3] == 1000
+    assert pool.stats()['rejected'] == 1
+
+
+def test_throttle_locks_account_and_ip():
+    throttle = LoginThrottle(account_limit=3, ip_limit=5, window=60)
+    for _ in range(3):
+        assert throttle.check('alice', '1.2.3.4') == 0
+        throttle.record_failure('alice', '1.2.3.4')
+    assert throttle.check('Alice', '5.6.7.8') > 0  # Account locked from any IP
+
+    for name in ('bob', 'carol'):
+        throttle.record_failure(name, '1.2.3.4')
+    assert throttle.check('dave', '1.2.3.4') > 0  # IP locked for any account
+    assert throttle.check('dave', '9.9.9.9') == 0
+
+    throttle.record_success('alice')
+    assert throttle.check('alice', '5.6.7.8') == 0
+
+
+def test_throttle_forgets_expired_and_excess_keys(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr('credentials.time.monotonic', lambda: clock[0])
+    throttle = LoginThrottle(window=60, sweep_keys=10, max_keys=20)
+
+    for i in range(5):
+        throttle.record_failure(f'sprayed{i}', f'10.0.0.{i}')
+    clock[0] += 61  # Past the window and the sweep interval
+    throttle.record_failure('alice', '1.2.3.4')
+    assert throttle.stats()['tracked_keys'] == 2  # The expired sprayed keys were swept
+
+    for i in range(30):
+        throttle.record_failure(f'user{i}', f'10.0.1.{i}')
+    assert throttle.stats()['tracked_keys'] <= 20 and throttle.stats()['evicted'] > 0
+    assert ('account', 'user29') in throttle.failures  # Newest failures are kept
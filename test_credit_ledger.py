@@ -0,0 +1,81 @@
+"""
+Tests for the double-entry premium credit ledger
+"""
+
+import sqlite3
+
+import pytest
+
+import credentials
+from credit_ledger import verify_ledger, payments_from_events
+from database import UserDatabase
+from migrations import migrate
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(credentials, 'PASSWORD_ITERATIONS', 1000)
+    return UserDatabase(str(tmp_path / 'users.db'))
+
+
+def register(db, name):
+    return db.register_user(name, f'{name}@example.com', 'password123')['user_id']
+
+
+def test_every_mutation_balances(db):
+    alice, bob = register(db, 'alice'), register(db, 'bob')
+    referral_code = db.get_user_credits(alice)['referral_code']
+
+    db.add_credits(alice, 100, transaction_id='pi_1', amount=9.99)
+    db.add_credits(alice, 50, entry_type='spin_wheel')
+    db.use_credit(alice, 'premium')
+    db.award_achievement(alice, 'first_generation', 5)
+    db.apply_referral(bob, referral_code)
+    reservation = db.reserve_credits(alice, 40, purpose='video')
+    db.commit_reservation(reservation['reservation_id'], credits_used=30)
+    db.release_reservation(db.reserve_credits(alice, 10)['reservation_id'])
+
+    assert verify_ledger(db.db_path)['balanced']
+    summary = db.get_ledger_summary()
+    assert summary['accounts'] == {'held': 0, 'promotions': -70, 'stripe': -100, 'usage': 31}
+    assert summary['user_credits_outstanding'] == (db.get_user_credits(alice)['premium_credits'] +
+                                                    db.get_user_credits(bob)['premium_credits'])
+    assert summary['flows']['purchase'] == {'transfers': 1, 'credits': 100}
+
+
+def test_opening_balances_for_existing_rows(tmp_path):
+    path = str(tmp_path / 'users.db')
+
+    # Bring the database to the pre-ledger schema, then add a user with a balance
+    import migrations
+    all_versions = migrations.MIGRATIONS['users']
+    migrations.MIGRATIONS['users'] = [m for m in all_versions if m[0] < 5]
+    try:
+        migrate(path, 'users')
+    finally:
+        migrations.MIGRATIONS['users'] = all_versions
+        migrations._current.clear()
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO users (username, email, password_hash, salt, premium_credits) "
+                 "VALUES ('old', 'old@example.com', 'x', 'y', 42)")
+    conn.commit()
+    conn.close()
+
+    assert migrate(path, 'users')[0] == 5
+    assert verify_ledger(path)['balanced']
+    assert UserDatabase(path).get_ledger_summary()['accounts'] == {'opening_balance': -42}
+
+
+def test_stripe_import_is_idempotent(db):
+    alice = register(db, 'alice')
+    events = [{
+        'type': 'checkout.session.completed',
+        'data': {'object': {'mode': 'payment', 'payment_intent': 'pi_9', 'amount_total': 1999,
+                            'metadata': {'user_id': str(alice), 'credits': '200', 'package_id': 'pro'}}}
+    }, {'type': 'customer.subscription.deleted', 'data': {'object': {'id': 'sub_1'}}}]
+
+    payments = payments_from_events(events)
+    assert db.import_stripe_payments(payments) == {'success': True, 'imported': 1, 'skipped': 0}
+    assert db.import_stripe_payments(payments) == {'success': True, 'imported': 0, 'skipped': 1}
+    assert db.get_user_credits(alice)['premium_credits'] == 200
+    assert verify_ledger(db.db_path)['balanced']
@@ -0,0 +1,58 @@
+"""
+Import-time checks: importing the app must stay cheap (no database work,
+no heavy optional SDKs) so gunicorn workers boot fast
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+
+# Cumulative `python -X importtime` budget for rootAI, in seconds
+ROOTAI_IMPORT_BUDGET = 2.0
+
+DEFERRED_MODULES = ['cv2', 'skimage', 'openai', 'replicate', 'stripe']
+
+
+def run_import(code, cwd):
+    env = dict(os.environ, PYTHONPATH=REPO)
+    return subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          cwd=cwd, env=env, capture_output=True, text=True, timeout=60)
+
+
+def cumulative_seconds(importtime_output, module):
+    for line in importtime_output.splitlines():
+        if line.startswith('import time:') and line.split('|')[-1].strip() == module:
+            return int(line.split('|')[1]) / 1e6
+    return None
+
+
+def test_subsystem_imports_open_no_databases(tmp_path):
+    result = run_import('import database, cost_monitor, rating_system, analytics_system, quality_optimizer', tmp_path)
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert not list(tmp_path.glob('*.db'))
+
+
+def test_rootAI_import_is_lean(tmp_path):
+    pytest.importorskip('flask')
+    code = f'import sys, rootAI; print(",".join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))'
+    result = run_import(code, tmp_path)
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    assert result.stdout.strip() == '', f'heavy modules imported eagerly: {result.stdout}'
+    seconds = cumulative_seconds(result.stderr, 'rootAI')
+    assert seconds is not None and seconds < ROOTAI_IMPORT_BUDGET, f'rootAI import took {seconds}s'
+
+
+def test_rootAI_import_starts_nothing(tmp_path):
+    pytest.importorskip('flask')
+    code = 'import threading, rootAI; print(",".join(t.name for t in threading.enumerate()))'
+    result = run_import(code, tmp_path)
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    # Background threads start on the first request, databases on first use
+    assert result.stdout.strip() == 'MainThread'
+    assert not list(tmp_path.glob('*.db'))
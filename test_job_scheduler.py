@@ -0,0 +1,112 @@
+"""
+Tests for the tier-priority generation scheduler
+"""
+
+import threading
+import time
+
+import pytest
+
+from job_scheduler import GenerationScheduler, JobRejected, JobTimeout, priority_class_for
+from rate_governor import rate_governor
+
+
+def _run_blocked(scheduler, submissions):
+    """Hold the single worker, queue submissions, then release and record dispatch order"""
+    gate = threading.Event()
+    order = []
+    scheduler.submit('anonymous', gate.wait)
+    time.sleep(0.05)  # Let the worker pick up the blocking job
+
+    futures = [scheduler.submit(cls, order.append, label) for cls, label in submissions]
+    gate.set()
+    for future in futures:
+        future.result(timeout=5)
+    return order
+
+
+def test_weighted_share_favours_paid_tiers():
+    scheduler = GenerationScheduler(workers=1)
+    submissions = [('free_user', f'free{i}') for i in range(6)] + [('premium_user', f'prem{i}') for i in range(6)]
+
+    order = _run_blocked(scheduler, submissions)
+    first_six = order[:6]
+    # Weight 4 vs 2: premium gets two dispatches for every free one
+    assert sum(1 for label in first_six if label.startswith('prem')) == 4
+
+
+def test_aging_prevents_starvation():
+    scheduler = GenerationScheduler(workers=1, aging_seconds=0.1)
+    gate = threading.Event()
+    order = []
+    scheduler.submit('unlimited_user', gate.wait)
+    time.sleep(0.05)
+
+    starved = scheduler.submit('anonymous', order.append, 'anon')
+    time.sleep(0.15)  # Anonymous job is now past the aging limit
+    paid = [scheduler.submit('unlimited_user', order.append, f'paid{i}') for i in range(5)]
+    gate.set()
+
+    starved.result(timeout=5)
+    for future in paid:
+        future.result(timeout=5)
+    assert order[0] == 'anon'
+    assert scheduler.stats()['classes']['anonymous']['aged_dispatches'] == 1
+
+
+def test_queue_depth_rejects_early():
+    scheduler = GenerationScheduler(workers=1, max_queue_depth={'anonymous': 1})
+    gate = threading.Event()
+    scheduler.submit('anonymous', gate.wait)
+    time.sleep(0.05)
+
+    scheduler.submit('anonymous', lambda: None)
+    with pytest.raises(JobRejected):
+        scheduler.submit('anonymous', lambda: None)
+    gate.set()
+    assert scheduler.stats()['classes']['anonymous']['rejected'] == 1
+
+
+def test_throttled_provider_rejects_before_queueing():
+    scheduler = GenerationScheduler(workers=1)
+    rate_governor.update_from_headers('sched-test', 'key', 'ep', 429, {'Retry-After': '120'})
+
+    with pytest.raises(JobRejected) as excinfo:
+        scheduler.submit('premium_user', lambda: None, provider='sched-test')
+    assert excinfo.value.retry_after > 100
+
+
+def test_priority_class_from_credits():
+    assert priority_class_for(None) == 'anonymous'
+    assert priority_class_for({'success': True, 'has_unlimited': True}) == 'unlimited_user'
+    assert priority_class_for({'success': True, 'premium_credits': 3}) == 'premium_user'
+    assert priority_class_for({'success': True, 'premium_credits': 0}) == 'free_user'
+
+
+def test_timed_out_job_is_not_executed():
+    scheduler = GenerationScheduler(workers=1)
+    gate = threading.Event()
+    ran = []
+    scheduler.submit('anonymous', gate.wait)
+    time.sleep(0.05)
+
+    with pytest.raises(JobTimeout) as timeout:
+        scheduler.run('anonymous', ran.append, 'late', timeout=0.05)
+    assert not timeout.value.started and timeout.value.future.cancelled()
+
+    gate.set()
+    scheduler.submit('anonymous', ran.append, 'next').result(timeout=5)
+    assert ran == ['next']
+    assert scheduler.stats()['classes']['anonymous']['cancelled'] == 1
+
+
+def test_timed_out_running_job_finishes_on_its_future():
+    scheduler = GenerationScheduler(workers=1)
+    gate = threading.Event()
+
+    with pytest.raises(JobTimeout) as timeout:
+        scheduler.run('anonymous', lambda: gate.wait() and 'done', timeout=0.2)
+    assert timeout.value.started
+
+    gate.set()
+    assert timeout.value.future.result(timeout=5) == 'done'
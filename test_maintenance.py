@@ -0,0 +1,72 @@
+"""
+Tests for the database maintenance jobs
+"""
+
+import sqlite3
+from datetime import datetime, timedelta
+
+from database import UserDatabase
+from maintenance import MaintenanceDaemon
+
+
+def test_expired_sessions_removed_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr('maintenance.BATCH_SIZE', 10)
+    monkeypatch.setattr('maintenance.SLICE_PAUSE', 0)
+    db = UserDatabase(str(tmp_path / 'users.db'))
+    user_id = db.register_user('bob', 'bob@example.com', 'password123')['user_id']
+
+    conn = sqlite3.connect(db.db_path)
+    past = datetime.now() - timedelta(days=1)
+    conn.executemany('INSERT INTO sessions (user_id, session_token, expires_at) VALUES (?, ?, ?)',
+                     [(user_id, f'old{i}', past) for i in range(25)])
+    conn.commit()
+    live = db.login_user('bob', 'password123')['session_token']
+
+    assert MaintenanceDaemon(user_db=db).expire_sessions() == 25
+    assert conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0] == 1
+    assert db.validate_session(live)['valid']
+    conn.close()
+
+
+def test_retention_prunes_only_old_rows(tmp_path):
+    db_path = str(tmp_path / 'costs.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE api_costs (id INTEGER PRIMARY KEY, timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP)')
+    conn.execute("INSERT INTO api_costs (timestamp) VALUES ('2000-01-01 00:00:00')")
+    conn.execute('INSERT INTO api_costs DEFAULT VALUES')
+    conn.commit()
+
+    daemon = MaintenanceDaemon(databases=[db_path], retention={(db_path, 'api_costs', 'timestamp'): 30})
+    assert daemon.prune_retention()['api_costs'] == 1
+    assert conn.execute('SELECT COUNT(*) FROM api_costs').fetchone()[0] == 1
+    conn.close()
+
+    daemon.optimize()
+
+
+def test_retention_cutoff_uses_local_time(tmp_path):
+    db_path = str(tmp_path / 'costs.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE api_costs (id INTEGER PRIMARY KEY, timestamp TIMESTAMP)')
+    cutoff = datetime.now() - timedelta(days=30)
+    conn.executemany('INSERT INTO api_costs (timestamp) VALUES (?)', [
+        ((cutoff - timedelta(minutes=5)).strftime('%Y-%m-%d %H:%M:%S'),),
+        ((cutoff + timedelta(minutes=5)).strftime('%Y-%m-%d %H:%M:%S'),)])
+    conn.commit()
+
+    daemon = MaintenanceDaemon(databases=[db_path], retention={(db_path, 'api_costs', 'timestamp'): 30})
+    assert daemon.prune_retention()['api_costs'] == 1
+    conn.close()
+
+
+def test_only_one_process_runs_maintenance(tmp_path):
+    lock_path = str(tmp_path / 'maintenance.lock')
+    runner = MaintenanceDaemon(lock_path=lock_path)
+    standby = MaintenanceDaemon(lock_path=lock_path)  # Another gunicorn worker
+
+    assert runner.claim() and not standby.claim()
+    assert runner.stats()['runner'] and not standby.stats()['runner']
+
+    runner.lock.release()  # The runner's worker exits
+    assert standby.claim()
+    standby.lock.release()
@@ -0,0 +1,133 @@
+"""
+Tests for the in-memory prompt suggestion index
+"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import prompt_index
+from analytics_system import AnalyticsSystem
+
+
+@pytest.fixture
+def analytics(tmp_path):
+    analytics = AnalyticsSystem(str(tmp_path / 'analytics.db'))
+    analytics.rating_writer.max_delay = 60  # Flushes happen when the test asks
+    yield analytics
+    analytics.rating_writer.close()
+
+
+def rate(analytics, prompt, ratings, engine='flux'):
+    for rating in ratings:
+        generation_id = f'gen-{rate.count}'
+        rate.count += 1
+        analytics.record_generation(generation_id, 1, prompt, engine)
+        analytics.submit_rating(generation_id, rating)
+    analytics.flush_ratings()
+
+
+rate.count = 0
+
+
+def prompts(suggestions):
+    return [suggestion['prompt'] for suggestion in suggestions]
+
+
+def test_suggestions_match_the_typed_prefix(analytics):
+    rate(analytics, 'a cinematic castle at dusk', [5, 5, 4])
+    rate(analytics, 'a cat wearing a hat', [4, 4, 4])
+    rate(analytics, 'neon city street, cinematic', [5, 4, 5])
+    rate(analytics, 'a castle in the clouds', [1, 2])  # Too poorly rated to suggest
+    rate(analytics, 'cinematic castle', [5, 5, 5], engine='dalle')
+
+    assert set(prompts(analytics.get_prompt_suggestions('cinem', 'flux'))) == {
+        'a cinematic castle at dusk', 'neon city street, cinematic'}
+    assert prompts(analytics.get_prompt_suggestions('cinematic cas', 'flux')) == [
+        'a cinematic castle at dusk', 'neon city street, cinematic']  # Full matches before partial ones
+    assert prompts(analytics.get_prompt_suggestions('castle', 'dalle')) == ['cinematic castle']
+    assert prompts(analytics.get_prompt_suggestions('ca', 'flux', limit=1)) == ['a cinematic castle at dusk']
+    assert len(analytics.get_prompt_suggestions('', 'flux')) == 3
+
+
+def test_better_rated_prompts_rank_first(analytics):
+    rate(analytics, 'portrait of an old sailor', [4, 4, 4])
+    rate(analytics, 'portrait of a young dancer', [5, 5, 5, 5])
+
+    assert prompts(analytics.get_prompt_suggestions('portrait of', 'flux')) == [
+        'portrait of a young dancer', 'portrait of an old sailor']
+
+
+def test_index_follows_new_ratings(analytics):
+    rate(analytics, 'misty forest, volumetric light', [4, 4, 4])
+    assert prompts(analytics.get_prompt_suggestions('mist', 'flux')) == ['misty forest, volumetric light']
+    reloads = analytics.prompt_index.reloads
+
+    rate(analytics, 'misty mountains', [5, 5, 5])
+    rate(analytics, 'misty forest, volumetric light', [1, 1, 1])
+
+    assert prompts(analytics.get_prompt_suggestions('mist', 'flux')) == ['misty mountains']
+    assert analytics.prompt_index.reloads == reloads  # Updated in place, not rebuilt
+
+
+def test_only_well_established_prompts_are_suggested(analytics):
+    rate(analytics, 'my private birthday card for anna', [5, 5])  # One user's prompt, too few ratings
+    rate(analytics, 'my cat asleep on the sofa', [4, 4, 3])  # Average below 4.0
+    rate(analytics, 'my garden in spring', [4, 4, 4])
+
+    assert prompts(analytics.get_prompt_suggestions('my', 'flux')) == ['my garden in spring']
+
+
+def test_partial_matches_fill_in(analytics):
+    rate(analytics, 'watercolor fox', [5, 5, 5])
+
+    assert prompts(analytics.get_prompt_suggestions('watercolor whale', 'flux')) == ['watercolor fox']
+    assert analytics.get_prompt_suggestions('zebra', 'flux') == []
+
+
+class PausedConnection:
+    """sqlite connection that blocks in close(), after the reload's SELECT has run"""
+
+    def __init__(self, conn, started, release):
+        self.conn = conn
+        self.started = started
+        self.release = release
+
+    def execute(self, *args):
+        return self.conn.execute(*args)
+
+    def close(self):
+        self.started.append(threading.current_thread().name)
+        self.release.wait(5)
+        self.conn.close()
+
+
+def test_stale_index_is_served_while_one_reload_runs(analytics, monkeypatch):
+    rate(analytics, 'misty forest, volumetric light', [4, 4, 4])
+    index = analytics.prompt_index
+    assert prompts(index.suggest('flux', 'mist')) == ['misty forest, volumetric light']
+
+    started, release = [], threading.Event()
+    connect = sqlite3.connect
+    monkeypatch.setattr(prompt_index.sqlite3, 'connect',
+                        lambda path: PausedConnection(connect(path), started, release))
+    index.loaded_at -= prompt_index.RELOAD_SECONDS + 1
+
+    # Stale: queries answer from the current index and a single rebuild starts
+    assert prompts(index.suggest('flux', 'mist')) == ['misty forest, volumetric light']
+    assert prompts(index.suggest('flux', 'mist')) == ['misty forest, volumetric light']
+    deadline = time.monotonic() + 5
+    while not started and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert started == ['prompt-index-reload']
+
+    monkeypatch.setattr(prompt_index.sqlite3, 'connect', connect)
+    rate(analytics, 'misty mountains', [5, 5, 5])  # Applied after the reload read the table
+    release.set()
+    while index.reloading and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert not index.reloading and index.reloads == 2
+    assert prompts(index.suggest('flux', 'mist')) == ['misty mountains', 'misty forest, volumetric light']
@@ -0,0 +1,116 @@
+"""
+Tests for the async provider clients
+"""
+
+import asyncio
+import threading
+from concurrent.futures import TimeoutError as FuturesTimeout
+
+import pytest
+
+import providers.base
+from providers.base import ProviderError, ProviderResponse, run_sync
+from providers.dalle import DalleProvider
+from providers.replicate import ReplicateProvider
+from rate_governor import RateGovernor
+
+
+def dalle_response(url='https://images.example/1.png'):
+    return ProviderResponse(200, {}, f'{{"data": [{{"url": "{url}"}}]}}'.encode(), DalleProvider.GENERATIONS_URL)
+
+
+@pytest.fixture
+def http(monkeypatch):
+    """Fake transport: returns queued responses (or raises queued errors) and records calls"""
+    calls = []
+    responses = []
+
+    async def http_request(method, url, **kwargs):
+        calls.append((method, url))
+        await asyncio.sleep(0.05)
+        response = responses.pop(0) if responses else dalle_response()
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(providers.base, 'http_request', http_request)
+    monkeypatch.setattr(providers.base, 'rate_governor', RateGovernor(limits={('openai', 'images'): (600, 10)}))
+    return calls, responses
+
+
+def test_jobs_queued_on_the_slot_are_rejected_when_the_bucket_drains(http, monkeypatch):
+    calls, _ = http
+    # One request per second with a burst of two; callers may queue 0.5s at most
+    monkeypatch.setattr(providers.base, 'rate_governor',
+                        RateGovernor(limits={('openai', 'images'): (60, 2)}, max_wait=0.5))
+    dalle = DalleProvider('sk-test', concurrency=1)
+
+    async def run():
+        return await asyncio.gather(*(dalle.generate(f'castle {i}') for i in range(4)))
+
+    results = asyncio.run(run())
+
+    # All four pass the early check while tokens remain, then queue for the single slot
+    assert [result['success'] for result in results] == [True, True, False, False]
+    for result in results[2:]:
+        assert result['rate_limited'] and 0.5 < result['retry_after'] <= 1.0
+    assert len(calls) == 2 and dalle.in_flight == 0
+
+
+def test_raise_for_status_uses_requests_style_messages():
+    with pytest.raises(ProviderError) as client_error:
+        ProviderResponse(404, {}, b'', 'https://api.example/x').raise_for_status()
+    assert str(client_error.value) == '404 Client Error: Not Found for url: https://api.example/x'
+    assert client_error.value.status_code == 404
+
+    with pytest.raises(ProviderError, match='^503 Server Error: Service Unavailable'):
+        ProviderResponse(503, {}, b'', 'https://api.example/x').raise_for_status()
+    ProviderResponse(201, {}, b'', 'https://api.example/x').raise_for_status()
+
+
+def test_dalle_errors_map_to_error_results(http):
+    calls, responses = http
+    dalle = DalleProvider('sk-test')
+    responses.extend([ProviderResponse(500, {}, b'', DalleProvider.GENERATIONS_URL),
+                      ProviderError('Connection reset by peer')])
+
+    server_error = run_sync(dalle.generate('castle'))
+    transport_error = run_sync(dalle.generate('castle'))
+
+    assert server_error == {'success': False, 'error': 'OpenAI API Error: 500 Server Error: '
+                            f'Internal Server Error for url: {DalleProvider.GENERATIONS_URL}'}
+    assert transport_error == {'success': False, 'error': 'OpenAI API Error: Connection reset by peer'}
+    assert run_sync(dalle.generate('castle'))['image_url'] == 'https://images.example/1.png'
+
+
+def test_replicate_payment_required_is_not_retried(http):
+    calls, responses = http
+    responses.append(ProviderResponse(402, {}, b'', ReplicateProvider.PREDICTIONS_URL))
+
+    result = run_sync(ReplicateProvider('r8-test').generate_flux('castle'))
+
+    assert result['success'] is False and 'Payment Required' in result['error']
+    assert len(calls) == 1  # generate_free falls back to Hugging Face on this error
+
+
+def test_unconfigured_provider_never_calls_out(http):
+    calls, _ = http
+
+    result = run_sync(DalleProvider(DalleProvider.placeholder_key).generate('castle'))
+
+    assert result['success'] is False and result['demo']
+    assert calls == []
+
+
+def test_run_sync_bridges_to_the_provider_loop():
+    async def where():
+        return threading.current_thread().name
+
+    async def fail():
+        raise ValueError('boom')
+
+    assert run_sync(where()) == 'provider-loop'
+    with pytest.raises(ValueError, match='boom'):
+        run_sync(fail())
+    with pytest.raises(FuturesTimeout):
+        run_sync(asyncio.sleep(0.5), timeout=0.01)
@@ -0,0 +1,76 @@
+"""
+Tests for the outbound rate governor
+"""
+
+import asyncio
+
+import pytest
+
+from rate_governor import RateGovernor, ThrottleRejected, _parse_duration
+
+
+def test_burst_then_queue():
+    governor = RateGovernor(limits={('test', 'ep'): (60, 2)})  # 1 req/s, burst 2
+    
+    async def run():
+        waits = []
+        for _ in range(3):
+            waits.append(await governor.acquire('test', 'key', 'ep', max_wait=5))
+        return waits
+    
+    waits = asyncio.run(run())
+    assert waits[0] == 0 and waits[1] == 0
+    assert 0.5 < waits[2] <= 1.0
+
+
+def test_reject_early_when_wait_exceeds_budget():
+    governor = RateGovernor(limits={('test', 'ep'): (6, 1)})  # 1 req per 10s
+    
+    async def run():
+        await governor.acquire('test', 'key', 'ep')
+        await governor.acquire('test', 'key', 'ep', max_wait=1)
+    
+    with pytest.raises(ThrottleRejected):
+        asyncio.run(run())
+    assert governor.would_reject('test', 'ep', 'key', max_wait=1)
+    assert governor.stats()[0]['rejected'] == 1
+
+
+def test_429_retry_after_blocks_bucket():
+    governor = RateGovernor()
+    governor.update_from_headers('replicate', 'key', 'predictions', 429, {'Retry-After': '12'})
+    
+    wait = governor.estimate_wait('replicate', 'predictions', 'key')
+    assert 11 < wait <= 12
+
+
+def test_remaining_zero_uses_reset_header():
+    governor = RateGovernor()
+    governor.update_from_headers('openai', 'key', 'images', 200, {
+        'x-ratelimit-remaining-requests': '0',
+        'x-ratelimit-reset-requests': '6m0s'
+    })
+    
+    assert governor.estimate_wait('openai', 'images', 'key') > 300
+
+
+def test_buckets_are_per_api_key():
+    governor = RateGovernor()
+    governor.update_from_headers('openai', 'key-a', 'images', 429, {'Retry-After': '30'})
+    
+    assert governor.estimate_wait('openai', 'images', 'key-b') == 0
+    assert governor.estimate_wait('openai') > 29
+
+
+def test_parse_duration():
+    assert _parse_duration('20ms') == pytest.approx(0.02)
+    assert _parse_duration('1m30s') == 90
+    assert _parse_duration('7') == 7
+
+
+def test_capacity_counts_requests_that_fit_the_wait_budget():
+    governor = RateGovernor(limits={('test', 'ep'): (60, 2)}, max_wait=3)  # 1 req/s, burst 2
+
+    assert governor.capacity('test', 'ep', 'key') == 5  # 2 now + 3 more within 3s
+    governor.update_from_headers('test', 'key', 'ep', 429, {'Retry-After': '10'})
+    assert governor.capacity('test', 'ep', 'key') == 0
@@ -0,0 +1,65 @@
+"""
+Tests for signed session tokens and cross-worker revocation
+"""
+
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import credentials
+from database import UserDatabase
+
+
+@pytest.fixture
+def signed_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(credentials, 'PASSWORD_ITERATIONS', 1000)
+    db = UserDatabase(str(tmp_path / 'users.db'), signing_key='test-signing-key')
+    user_id = db.register_user('alice', 'alice@example.com', 'password123')['user_id']
+    return db, user_id
+
+
+def test_signed_session_needs_no_sessions_row(signed_db):
+    db, user_id = signed_db
+    token = db.login_user('alice', 'password123')['session_token']
+
+    conn = sqlite3.connect(db.db_path)
+    assert conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0] == 0
+    conn.close()
+
+    assert db.validate_session(token) == {'valid': True, 'user_id': user_id, 'username': 'alice'}
+
+
+def test_tampered_and_expired_tokens_are_rejected(signed_db):
+    db, user_id = signed_db
+    token = db.login_user('alice', 'password123')['session_token']
+    assert not db.validate_session(token[:-2] + ('AA' if token[-2:] != 'AA' else 'BB'))['valid']
+
+    other = UserDatabase(db.db_path, signing_key='another-key')
+    assert not other.validate_session(token)['valid']
+
+    expired = db.signer.issue(user_id, 'alice', datetime.now() - timedelta(seconds=1))
+    assert db.validate_session(expired)['error'] == 'Session expired'
+
+
+def test_logout_revokes_across_workers(signed_db):
+    db, _ = signed_db
+    worker = UserDatabase(db.db_path, signing_key='test-signing-key')
+    token = db.login_user('alice', 'password123')['session_token']
+    assert worker.validate_session(token)['valid']
+
+    db.logout_user(token)
+    assert not db.validate_session(token)['valid']  # Immediately, in the revoking worker
+
+    worker.signer.sync_revocations(force=True)  # Other workers on their next sync
+    assert not worker.validate_session(token)['valid']
+
+
+def test_database_sessions_still_validate(tmp_path, monkeypatch):
+    monkeypatch.setattr(credentials, 'PASSWORD_ITERATIONS', 1000)
+    plain = UserDatabase(str(tmp_path / 'users.db'))
+    plain.register_user('bob', 'bob@example.com', 'password123')
+    token = plain.login_user('bob', 'password123')['session_token']
+
+    signed = UserDatabase(plain.db_path, signing_key='test-signing-key')
+    assert signed.validate_session(token)['valid']
@@ -0,0 +1,83 @@
+"""
+Tests for spend forecasting and progressive paid-provider shedding
+"""
+
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from control_plane import ControlPlane
+from cost_monitor import CostMonitor
+from job_scheduler import GenerationScheduler, JobRejected
+from spend_forecast import shed_fraction
+
+
+@pytest.fixture
+def monitor(tmp_path):
+    monitor = CostMonitor(str(tmp_path / 'cost_monitor.db'), ControlPlane(str(tmp_path / 'control_plane.state')))
+    monitor.send_alerts = lambda alerts: None
+    yield monitor
+    monitor.cost_writer.close()
+    monitor.control_plane.close()
+
+
+def spend_per_minute(monitor, service, dollars, minutes, now):
+    """Backdate steady spend into the last `minutes` complete minute buckets"""
+    current_minute = now.replace(second=0, microsecond=0)
+    conn = sqlite3.connect(monitor.db_path)
+    conn.executemany('''
+        INSERT INTO cost_rollup_minute (bucket_start, api_service, operation, user_id, requests, failures, total_cost)
+        VALUES (?, ?, 'gen', 1, 1, 0, ?)
+    ''', [((current_minute - timedelta(minutes=age)).strftime('%Y-%m-%d %H:%M:00'), service, dollars)
+          for age in range(1, minutes + 1)])
+    conn.commit()
+    conn.close()
+
+
+def test_shed_ramp():
+    assert shed_fraction(0.5, 0.8, 1.0) == 0
+    assert shed_fraction(0.9, 0.8, 1.0) == pytest.approx(0.5)
+    assert shed_fraction(1.3, 0.8, 1.0) == 1
+
+
+def test_projection_from_steady_spend(monitor):
+    now = datetime.now().replace(hour=12, minute=0, second=30)
+    spend_per_minute(monitor, 'runway', 0.50, 120, now)
+
+    forecast = monitor.forecaster.forecast(now)
+    assert forecast['rates_per_hour'] == {'runway': pytest.approx(30.0, rel=0.01)}
+    # Nothing logged today through the day rollup; 11.99 hours left at $30/hour
+    assert forecast['projected_total'] == pytest.approx(30.0 * (11 * 60 + 59.5) / 60, rel=0.01)
+
+
+def test_sheds_runway_before_openai_and_never_free_engines(monitor):
+    monitor.DAILY_COST_LIMIT = 100.00
+    monitor.forecaster.forecast = lambda: {'ratio': 0.95}
+    monitor.forecaster.refresh(force=True)
+
+    assert monitor.forecaster.stats()['shed_now'] == {'runway': 0.75, 'openai': 0.167}
+    for _ in range(50):
+        monitor.forecaster.admit('free_user', 'replicate')
+
+    monitor.activate_emergency_mode()
+    with pytest.raises(JobRejected):
+        monitor.forecaster.admit('premium_user', 'openai')
+    monitor.forecaster.admit('anonymous', 'replicate')
+
+    monitor.deactivate_emergency_mode()
+    assert monitor.forecaster.stats()['shed_now']['openai'] < 1
+
+
+def test_scheduler_admission_check_rejects_at_submit():
+    scheduler = GenerationScheduler(workers=1)
+
+    def refuse_openai(priority_class, provider):
+        if provider == 'openai':
+            raise JobRejected('paused', retry_after=60)
+
+    scheduler.add_admission_check(refuse_openai)
+    with pytest.raises(JobRejected):
+        scheduler.submit('premium_user', lambda: None, provider='openai')
+    assert scheduler.run('free_user', lambda: 'ok', provider='replicate', timeout=5) == 'ok'
+    assert scheduler.stats()['classes']['premium_user']['rejected'] == 1
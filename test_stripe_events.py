@@ -0,0 +1,86 @@
+"""
+Tests for queued, exactly-once Stripe webhook processing
+"""
+
+import json
+
+import pytest
+
+import credentials
+from database import UserDatabase
+from stripe_events import StripeEventQueue, MAX_ATTEMPTS
+
+
+class RevenueLog:
+    def __init__(self):
+        self.entries = []
+
+    def log_revenue(self, **entry):
+        self.entries.append(entry)
+
+
+def checkout_event(event_id, user_id, credits=100, payment_intent='pi_1', created=1):
+    return json.dumps({
+        'id': event_id,
+        'type': 'checkout.session.completed',
+        'created': created,
+        'data': {'object': {
+            'mode': 'payment', 'payment_intent': payment_intent, 'amount_total': 999,
+            'metadata': {'user_id': str(user_id), 'credits': str(credits), 'package_id': 'starter'}
+        }}
+    })
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(credentials, 'PASSWORD_ITERATIONS', 1000)
+    db = UserDatabase(str(tmp_path / 'users.db'))
+    user_id = db.register_user('alice', 'alice@example.com', 'password123')['user_id']
+    return StripeEventQueue(db, cost_monitor=RevenueLog()), db, user_id
+
+
+def test_redelivered_event_is_applied_once(queue):
+    events, db, user_id = queue
+    assert events.enqueue(checkout_event('evt_1', user_id))
+    assert not events.enqueue(checkout_event('evt_1', user_id))  # Stripe retry
+
+    assert events.process_pending() == 1
+    assert events.process_pending() == 0
+    assert not events.apply_event('evt_1')  # A second worker racing on the same event
+    assert db.get_user_credits(user_id)['premium_credits'] == 100
+    assert len(events.cost_monitor.entries) == 1
+
+
+def test_events_apply_in_stripe_order(queue):
+    events, db, user_id = queue
+    cancel = json.dumps({'id': 'evt_cancel', 'type': 'customer.subscription.deleted', 'created': 20,
+                         'data': {'object': {'id': 'sub_1'}}})
+    subscribe = json.dumps({'id': 'evt_sub', 'type': 'checkout.session.completed', 'created': 10,
+                            'data': {'object': {'mode': 'subscription', 'subscription': 'sub_1',
+                                                'amount_total': 2999, 'metadata': {'user_id': str(user_id)}}}})
+    events.enqueue(cancel)  # Delivered out of order
+    events.enqueue(subscribe)
+
+    assert events.process_pending() == 2
+    assert db.get_user_credits(user_id)['subscription_status'] == 'cancelled'
+
+
+def test_subscription_checkout_records_the_plan(queue):
+    events, db, user_id = queue
+    events.enqueue(json.dumps({'id': 'evt_sub', 'type': 'checkout.session.completed', 'created': 10,
+                               'data': {'object': {'mode': 'subscription', 'subscription': 'sub_1', 'amount_total': 1799,
+                                                   'metadata': {'user_id': str(user_id), 'plan': 'creator'}}}}))
+
+    assert events.process_pending() == 1
+    credits = db.get_user_credits(user_id)
+    assert credits['subscription_status'] == 'active' and credits['subscription_plan'] == 'creator'
+
+
+def test_failing_event_rolls_back_and_is_parked(queue):
+    events, db, user_id = queue
+    events.enqueue(checkout_event('evt_bad', user_id + 99))  # Unknown user
+
+    for _ in range(MAX_ATTEMPTS):
+        assert events.process_pending() == 0
+    assert events.stats()['by_status'] == {'failed': 1}
+    assert events.cost_monitor.entries == []
@@ -0,0 +1,83 @@
+"""
+Tests for credit reservations and write-free balance reads
+"""
+
+import sqlite3
+
+import pytest
+
+from database import UserDatabase
+
+
+@pytest.fixture
+def db_user(tmp_path):
+    db = UserDatabase(str(tmp_path / 'users.db'))
+    user_id = db.register_user('alice', 'alice@example.com', 'password123')['user_id']
+    db.add_credits(user_id, 100)
+    return db, user_id
+
+
+def test_reserve_and_commit_charges_once(db_user):
+    db, user_id = db_user
+    reservation = db.reserve_credits(user_id, 40, purpose='video')
+    assert reservation['success']
+    assert db.get_user_credits(user_id)['premium_credits'] == 60
+
+    assert db.commit_reservation(reservation['reservation_id'])['success']
+    assert not db.commit_reservation(reservation['reservation_id'])['success']
+    credits = db.get_user_credits(user_id)
+    assert credits['premium_credits'] == 60
+    assert credits['total_generations'] == 1
+
+
+def test_partial_commit_refunds_unused(db_user):
+    db, user_id = db_user
+    reservation = db.reserve_credits(user_id, 50, purpose='batch')
+    result = db.commit_reservation(reservation['reservation_id'], credits_used=30, generations=30)
+    assert result['credits_refunded'] == 20
+    assert db.get_user_credits(user_id)['premium_credits'] == 70
+
+
+def test_release_restores_everything(db_user):
+    db, user_id = db_user
+    reservation = db.reserve_credits(user_id, 40)
+    assert db.release_reservation(reservation['reservation_id'])['success']
+    assert not db.commit_reservation(reservation['reservation_id'])['success']
+    assert db.get_user_credits(user_id)['premium_credits'] == 100
+
+
+def test_insufficient_credits_holds_nothing(db_user):
+    db, user_id = db_user
+    assert not db.reserve_credits(user_id, 101)['success']
+    assert db.get_user_credits(user_id)['premium_credits'] == 100
+
+
+def test_expired_reservations_are_released(db_user):
+    db, user_id = db_user
+    db.reserve_credits(user_id, 25, ttl_minutes=-1)
+    assert db.release_expired_reservations()['released'] == 1
+    assert db.get_user_credits(user_id)['premium_credits'] == 100
+
+
+def test_credit_reads_do_not_write(db_user):
+    db, user_id = db_user
+    conn = sqlite3.connect(db.db_path)
+    conn.execute("UPDATE users SET free_credits_today = 0, last_free_reset = '2000-01-01', "
+                 "subscription_status = 'active', subscription_expires_at = '2000-01-01T00:00:00' WHERE id = ?",
+                 (user_id,))
+    conn.commit()
+
+    credits = db.get_user_credits(user_id)
+    assert credits['free_credits'] == 10
+    assert credits['subscription_status'] == 'expired'
+    assert conn.execute('SELECT free_credits_today, subscription_status FROM users WHERE id = ?',
+                        (user_id,)).fetchone() == (0, 'active')
+
+    # Spending applies the stale reset atomically
+    assert db.use_credit(user_id, 'free')['success']
+    assert db.get_user_credits(user_id)['free_credits'] == 9
+
+    result = db.reconcile_credit_state()
+    assert result['subscriptions_expired'] == 1
+    assert conn.execute('SELECT subscription_status FROM users WHERE id = ?', (user_id,)).fetchone() == ('expired',)
+    conn.close()
@@ -0,0 +1,97 @@
+"""
+Tests for the per-user spend window and anomaly flags
+"""
+
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import user_spend
+from migrations import migrate
+from user_spend import UserSpendTracker
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'cost_monitor.db')
+    migrate(path, 'cost_monitor')
+    return path
+
+
+def test_window_totals_and_expiry(db_path, monkeypatch):
+    clock = [1_000_000 * 60.0]
+    monkeypatch.setattr(user_spend.time, 'time', lambda: clock[0])
+    tracker = UserSpendTracker(db_path, window_minutes=10)
+
+    tracker.record(1, 0.08)
+    clock[0] += 5 * 60
+    tracker.record(1, 0.08)
+    tracker.record(2, 0.40)
+    assert tracker.spend(1) == pytest.approx(0.16)
+    assert tracker.top_users() == [{'user_id': 2, 'window_cost': 0.4}, {'user_id': 1, 'window_cost': 0.16}]
+
+    clock[0] += 6 * 60  # First event has left the window
+    assert tracker.spend(1) == pytest.approx(0.08)
+    clock[0] += 10 * 60
+    tracker.persist(force=True)
+    assert tracker.stats()['tracked_users'] == 0
+
+
+def test_flags_depend_on_tier_baseline(db_path):
+    tracker = UserSpendTracker(db_path)
+    for _ in range(20):
+        tracker.record(7, 0.08)  # $1.60: a normal hour for premium, far too much for free
+
+    assert tracker.is_flagged(7, 'free_user')
+    assert not tracker.is_flagged(7, 'premium_user')
+    assert not tracker.is_flagged(None, 'anonymous')
+
+
+def test_flag_expires_without_further_costs(db_path, monkeypatch):
+    clock = [1_000_000 * 60.0]
+    monkeypatch.setattr(user_spend.time, 'time', lambda: clock[0])
+    tracker = UserSpendTracker(db_path, window_minutes=10)
+    for _ in range(3):
+        tracker.record(7, 0.40)
+    assert tracker.is_flagged(7, 'free_user')
+
+    clock[0] += 11 * 60  # Quiet worker: no costs logged, nothing persisted
+    assert not tracker.is_flagged(7, 'free_user')
+
+
+def test_tiers_are_swept_with_the_windows(db_path):
+    tracker = UserSpendTracker(db_path)
+    for user_id in range(1, 101):
+        tracker.is_flagged(user_id, 'free_user')  # Seen by the rate limiter, never spent
+    tracker.record(1, 0.08)
+
+    tracker.persist(force=True)
+    assert tracker.stats()['known_tiers'] == 1
+
+
+def test_flags_are_shared_between_workers(db_path):
+    worker_a, worker_b = UserSpendTracker(db_path), UserSpendTracker(db_path)
+    worker_a.is_flagged(9, 'free_user')
+    for _ in range(3):
+        worker_a.record(9, 0.40)
+
+    worker_a.persist(force=True)
+    worker_b.persist(force=True)
+    assert worker_b.is_flagged(9, 'free_user')
+    [anomaly] = worker_b.anomalies()
+    assert (anomaly['user_id'], anomaly['tier'], anomaly['window_cost'], anomaly['active']) == (9, 'free_user', 1.2, True)
+
+
+def test_window_is_warmed_from_minute_rollups(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        INSERT INTO cost_rollup_minute (bucket_start, api_service, operation, user_id, requests, failures, total_cost)
+        VALUES (?, 'runway', 'video', 3, 2, 0, 0.80)
+    ''', (datetime.now().strftime('%Y-%m-%d %H:%M:00'),))
+    conn.commit()
+    conn.close()
+
+    tracker = UserSpendTracker(db_path)
+    tracker.record(3, 0.40)
+    assert tracker.spend(3) == pytest.approx(1.20)
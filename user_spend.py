@@ -0,0 +1,219 @@
+"""
+Per-User Spend Tracking & Anomaly Detection
+Keeps a sliding one-hour window of API spend per user in memory (one counter
+per minute, running totals updated on every cost event), so "who is spending
+what right now" never needs an aggregate query. Users whose window spend runs
+far above their tier's normal hourly spend are flagged; flags feed the rate
+limiter and the admin dashboard.
+
+Each worker only sees the costs it logs itself, so flags are persisted to
+spend_anomalies every few seconds and flags raised by other workers are read
+back on the same tick. The window is warmed from the minute cost rollups the
+first time it is used.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+
+WINDOW_MINUTES = 60
+
+# Normal spend per hour for an active user of each tier, in dollars
+TIER_BASELINE_PER_HOUR = {
+    'anonymous': 0.05,
+    'free_user': 0.10,      # Flux/SD at well under a cent per image
+    'premium_user': 1.60,   # ~20 DALL-E 3 HD images an hour
+    'unlimited_user': 2.00,
+}
+
+# Flag when window spend exceeds ANOMALY_FACTOR x baseline (and at least MIN_ANOMALY_COST)
+ANOMALY_FACTOR = 5
+MIN_ANOMALY_COST = 1.00
+
+# How often flags are written to and read back from the database
+PERSIST_SECONDS = 10
+
+
+class UserSpendTracker:
+    def __init__(self, db_path, window_minutes=WINDOW_MINUTES):
+        self.db_path = db_path
+        self.window_minutes = window_minutes
+        self.lock = threading.Lock()
+        self.windows = {}   # user_id -> deque of [minute, cost], oldest first
+        self.totals = {}    # user_id -> spend inside the window
+        self.tiers = {}     # user_id -> tier last seen by the rate limiter
+        self.flagged = {}   # user_id -> anomaly raised in this worker, not yet persisted or still active
+        self.shared_flags = set()
+        self.warmed = False
+        self.last_persist = 0
+        self.flags_raised = 0
+
+    def _minute(self, at=None):
+        return int((at if at is not None else time.time()) // 60)
+
+    def _warm(self):
+        # Called with self.lock held: seed the window with what every worker already logged
+        self.warmed = True
+        since = (datetime.now() - timedelta(minutes=self.window_minutes)).strftime('%Y-%m-%d %H:%M:00')
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute('''
+            SELECT bucket_start, user_id, SUM(total_cost) FROM cost_rollup_minute
+            WHERE bucket_start >= ? AND user_id != 0
+            GROUP BY bucket_start, user_id ORDER BY bucket_start
+        ''', (since,)).fetchall()
+        conn.close()
+        for bucket_start, user_id, cost in rows:
+            self._add(user_id, cost or 0, self._minute(datetime.strptime(bucket_start, '%Y-%m-%d %H:%M:00').timestamp()))
+
+    def _add(self, user_id, cost, minute):
+        window = self.windows.get(user_id)
+        if window is None:
+            window = self.windows[user_id] = deque()
+        if window and window[-1][0] == minute:
+            window[-1][1] += cost
+        else:
+            window.append([minute, cost])
+        self.totals[user_id] = self.totals.get(user_id, 0) + cost
+
+    def _expire(self, user_id, now_minute):
+        window = self.windows.get(user_id)
+        if window is None:
+            return 0
+        while window and window[0][0] <= now_minute - self.window_minutes:
+            self.totals[user_id] -= window.popleft()[1]
+        if not window:
+            del self.windows[user_id]
+            del self.totals[user_id]
+            return 0
+        return self.totals[user_id]
+
+    def record(self, user_id, cost):
+        """Add one cost event for a logged-in user (anonymous events are not attributed)"""
+        if not user_id or not cost:
+            return
+        now_minute = self._minute()
+        with self.lock:
+            if not self.warmed:
+                self._warm()
+            self._add(user_id, cost, now_minute)
+            self._evaluate(user_id, now_minute)
+
+    def _evaluate(self, user_id, now_minute):
+        # Called with self.lock held
+        spend = self._expire(user_id, now_minute)
+        tier = self.tiers.get(user_id, 'free_user')
+        baseline = TIER_BASELINE_PER_HOUR.get(tier, TIER_BASELINE_PER_HOUR['free_user']) * self.window_minutes / 60
+        if spend >= max(baseline * ANOMALY_FACTOR, MIN_ANOMALY_COST):
+            if user_id not in self.flagged:
+                self.flags_raised += 1
+                print(f"⚠️  Spend anomaly: user {user_id} ({tier}) spent ${spend:.2f} in {self.window_minutes} min "
+                      f"(baseline ${baseline:.2f})")
+            self.flagged[user_id] = {'user_id': user_id, 'tier': tier, 'window_cost': round(spend, 4),
+                                     'baseline': round(baseline, 4), 'ratio': round(spend / baseline, 1)}
+        else:
+            self.flagged.pop(user_id, None)
+
+    def is_flagged(self, user_id, tier=None):
+        """Rate-limiter check: True while the user's spend is anomalous in any worker"""
+        if not user_id:
+            return False
+        with self.lock:
+            if tier:
+                self.tiers[user_id] = tier
+            # Re-check on every call: a quiet worker may not persist (and re-evaluate) for a long time
+            self._evaluate(user_id, self._minute())
+            return user_id in self.flagged or user_id in self.shared_flags
+
+    def spend(self, user_id):
+        """Spend inside the window for one user"""
+        with self.lock:
+            return self._expire(user_id, self._minute())
+
+    def top_users(self, limit=10):
+        """Highest spenders inside the window, from memory"""
+        now_minute = self._minute()
+        with self.lock:
+            spends = [(user_id, self._expire(user_id, now_minute)) for user_id in list(self.windows)]
+        spends.sort(key=lambda item: item[1], reverse=True)
+        return [{'user_id': user_id, 'window_cost': round(cost, 4)} for user_id, cost in spends[:limit] if cost > 0]
+
+    def persist(self, force=False):
+        """Write this worker's flags and load flags raised by other workers (throttled)"""
+        if not force and time.monotonic() - self.last_persist < PERSIST_SECONDS:
+            return
+        self.last_persist = time.monotonic()
+
+        now = datetime.now()
+        with self.lock:
+            # Also sweeps out users who have stopped spending
+            now_minute = self._minute()
+            for user_id in set(self.windows) | set(self.flagged):
+                if user_id in self.flagged:
+                    self._evaluate(user_id, now_minute)
+                else:
+                    self._expire(user_id, now_minute)
+            for user_id in [user_id for user_id in self.tiers if user_id not in self.windows]:
+                del self.tiers[user_id]
+            flags = list(self.flagged.values())
+
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO spend_anomalies (user_id, tier, window_cost, baseline, first_flagged_at, last_seen)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                tier = excluded.tier,
+                window_cost = MAX(excluded.window_cost, CASE WHEN last_seen >= ? THEN window_cost ELSE 0 END),
+                baseline = excluded.baseline,
+                first_flagged_at = CASE WHEN last_seen >= ? THEN first_flagged_at ELSE excluded.first_flagged_at END,
+                last_seen = excluded.last_seen
+        ''', [(flag['user_id'], flag['tier'], flag['window_cost'], flag['baseline'],
+               now.strftime('%Y-%m-%d %H:%M:%S'), now.strftime('%Y-%m-%d %H:%M:%S'),
+               *(2 * [(now - timedelta(minutes=self.window_minutes)).strftime('%Y-%m-%d %H:%M:%S')]))
+              for flag in flags])
+        conn.commit()
+
+        # A flag stays active while some worker has re-confirmed it recently
+        active_since = (now - timedelta(seconds=3 * PERSIST_SECONDS)).strftime('%Y-%m-%d %H:%M:%S')
+        shared = {row[0] for row in cursor.execute('SELECT user_id FROM spend_anomalies WHERE last_seen >= ?',
+                                                   (active_since,))}
+        conn.close()
+
+        with self.lock:
+            self.shared_flags = shared
+
+    def anomalies(self, hours=24):
+        """Users flagged in the last `hours`, across all workers, worst first"""
+        since = (datetime.now() - timedelta(hours=hours)).strftime('%Y-%m-%d %H:%M:%S')
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute('''
+            SELECT user_id, tier, window_cost, baseline, first_flagged_at, last_seen FROM spend_anomalies
+            WHERE last_seen >= ? ORDER BY window_cost / baseline DESC
+        ''', (since,)).fetchall()
+        conn.close()
+
+        with self.lock:
+            active = set(self.flagged) | self.shared_flags
+        return [{
+            'user_id': user_id,
+            'tier': tier,
+            'window_cost': window_cost,
+            'baseline': baseline,
+            'ratio': round(window_cost / baseline, 1) if baseline else None,
+            'first_flagged_at': first_flagged_at,
+            'last_seen': last_seen,
+            'active': user_id in active
+        } for user_id, tier, window_cost, baseline, first_flagged_at, last_seen in rows]
+
+    def stats(self):
+        with self.lock:
+            return {
+                'tracked_users': len(self.windows),
+                'known_tiers': len(self.tiers),
+                'flagged_here': len(self.flagged),
+                'flagged_anywhere': len(set(self.flagged) | self.shared_flags),
+                'flags_raised': self.flags_raised
+            }